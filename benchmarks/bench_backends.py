@@ -0,0 +1,71 @@
+"""Per-backend evaluation cost for the float, decimal, fraction and interval backends.
+
+Run with ``python benchmarks/bench_backends.py``. Parsing is excluded
+throughout. "compute" lowers the tree against the backend's function table
+on every call, which is where the arithmetic happens for closed expressions.
+"warm" reuses the cached program, i.e. the cost of a repeated evaluation.
+"""
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from calc_backends import DecimalBackend, get_backend  # noqa: E402
+from calc_core import compile_expression, evaluate_compiled  # noqa: E402
+from calc_eval import lower  # noqa: E402
+
+WORKLOADS: Dict[str, List[str]] = {
+    "arithmetic": ["0.1+0.2", "1/3+1/7", "(12.5*4-3)/7", "2^10-1000", "12%*250"],
+    "transcendental": ["sin(1)+cos(2)", "sqrt(2)*exp(1)", "ln(10)/ln(2)", "atan(1)*4", "tanh(0.5)"],
+    "factorial": ["20!", "30!/28!", "factorial(12)/factorial(10)", "(3+2)!!/100!", "gamma(11)"],
+}
+BACKENDS = {
+    "float": "float",
+    "decimal(28)": "decimal",
+    "decimal(60)": DecimalBackend(60),
+    "fraction": "fraction",
+    "interval": "interval",
+}
+
+
+def _time_per_call(fn: Callable[[], object], budget: float = 0.2) -> float:
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget:
+            return elapsed / calls
+
+
+def main() -> None:
+    header = "".join(f"{name:>14}" for name in BACKENDS)
+    print(f"{'workload':<16}{'mode':<9}{header}   (us per evaluation)")
+    for workload, exprs in WORKLOADS.items():
+        compiled = [compile_expression(e) for e in exprs]
+        compute, warm = [], []
+        for spec in BACKENDS.values():
+            backend = get_backend(spec) if isinstance(spec, str) else spec
+
+            def run_compute() -> None:
+                with backend.context():
+                    number = None if backend.name == "float" else backend.number
+                    for c in compiled:
+                        lower(c.tree, backend.names(), c.limits, number)({})
+
+            def run_warm() -> None:
+                for c in compiled:
+                    evaluate_compiled(c, backend)
+
+            run_warm()  # build the function table and cache the programs
+            compute.append(_time_per_call(run_compute) / len(compiled) * 1e6)
+            warm.append(_time_per_call(run_warm) / len(compiled) * 1e6)
+        print(f"{workload:<16}{'compute':<9}" + "".join(f"{v:>14.2f}" for v in compute))
+        print(f"{'':<16}{'warm':<9}" + "".join(f"{v:>14.2f}" for v in warm))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""Benchmark suite for calc_core with baseline regression tracking.
+
+    python benchmarks/bench_calc_core.py                      # run, print summary
+    python benchmarks/bench_calc_core.py -o results.json      # also write JSON
+    python benchmarks/bench_calc_core.py --save-baseline      # refresh baseline.json
+    python benchmarks/bench_calc_core.py --threshold 0.15     # flag >15% slowdowns
+
+Every benchmark reports nanoseconds per operation (best of several
+repeats). When a baseline file exists, each result is compared with it.
+Anything slower by more than the threshold is flagged, and the exit status
+is 1, so CI can gate on it. Baselines are machine-specific: regenerate them
+on the machine that runs the comparison.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import calc_core  # noqa: E402
+from calc_batch import evaluate_many  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).resolve().with_name("baseline.json")
+CORPUS_SIZE = 2000
+
+_FUNCS = ("sin", "cos", "tan", "sqrt", "exp", "ln", "log10", "atan")
+
+
+def _num(rng: random.Random) -> str:
+    if rng.random() < 0.5:
+        return str(rng.randint(1, 999))
+    return f"{rng.uniform(0, 100):.{rng.randint(1, 4)}f}"
+
+
+def _arithmetic(rng: random.Random) -> str:
+    parts = [_num(rng)]
+    for _ in range(rng.randint(2, 8)):
+        if rng.random() < 0.1:
+            parts.append(f"^{rng.randint(2, 3)}")
+            continue
+        parts.append(rng.choice("+-×÷*/"))
+        parts.append(_num(rng) if rng.random() < 0.8 else f"({_num(rng)}-{_num(rng)})")
+    return "".join(parts)
+
+
+def _trig(rng: random.Random) -> str:
+    terms = []
+    for _ in range(rng.randint(1, 4)):
+        fn = rng.choice(_FUNCS)
+        arg = f"{rng.uniform(0.1, 3):.3f}" if rng.random() < 0.6 else f"pi/{rng.randint(2, 12)}"
+        terms.append(f"{fn}({arg})")
+    return rng.choice(["+", "*", "-"]).join(terms)
+
+
+def _factorial(rng: random.Random) -> str:
+    terms = []
+    for _ in range(rng.randint(1, 3)):
+        n = rng.randint(0, 25)
+        style = rng.random()
+        if style < 0.4:
+            terms.append(f"{n}!")
+        elif style < 0.7:
+            terms.append(f"({n}-{rng.randint(0, n)})!")
+        elif style < 0.9:
+            terms.append(f"factorial({n})")
+        else:
+            terms.append(f"{rng.randint(0, 4)}!!")
+    return "/".join(terms) if len(terms) > 1 and rng.random() < 0.5 else "+".join(terms)
+
+
+def _percent(rng: random.Random) -> str:
+    base = _num(rng)
+    parts = [base]
+    for _ in range(rng.randint(1, 4)):
+        parts.append(rng.choice(["*", "+", "-"]))
+        parts.append(f"{rng.randint(1, 99)}%")
+    return "".join(parts)
+
+
+CORPORA: Dict[str, Callable[[random.Random], str]] = {
+    "arithmetic": _arithmetic,
+    "trig": _trig,
+    "factorial": _factorial,
+    "percent": _percent,
+}
+
+
+def make_corpus(kind: str, size: int = CORPUS_SIZE, seed: int = 1234) -> List[str]:
+    rng = random.Random(f"{kind}:{seed}")
+    return [CORPORA[kind](rng) for _ in range(size)]
+
+
+def _long_expression(kb: int) -> str:
+    rng = random.Random(kb)
+    out: List[str] = []
+    length = 0
+    while length < kb * 1024:
+        piece = rng.choice([_arithmetic, _trig, _factorial, _percent])(rng)
+        out.append(f"({piece})")
+        length += len(piece) + 3
+    return "+".join(out)
+
+
+def _nested_factorials(depth: int) -> str:
+    return "(" * depth + "1" + "".join(f"+{i % 7})!" for i in range(depth))
+
+
+def _best_ns(fn: Callable[[], Any], ops: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        fn()
+        best = min(best, time.perf_counter_ns() - start)
+    return best / ops
+
+
+def _eval_all(exprs: List[str]) -> None:
+    evaluate = calc_core.evaluate_expression
+    for text in exprs:
+        try:
+            evaluate(text)
+        except (ValueError, ZeroDivisionError, OverflowError):
+            pass
+
+
+def run_suite(repeat: int = 5, quick: bool = False) -> Dict[str, Dict[str, float]]:
+    size = 300 if quick else CORPUS_SIZE
+    results: Dict[str, Dict[str, float]] = {}
+
+    def record(name: str, fn: Callable[[], Any], ops: int, setup: Optional[Callable[[], Any]] = None) -> None:
+        def timed() -> None:
+            if setup is not None:
+                setup()
+            fn()
+
+        if setup is None:
+            fn()  # warm-up
+        results[name] = {"ns_per_op": _best_ns(timed, ops, repeat), "ops": ops}
+
+    for kind in CORPORA:
+        exprs = make_corpus(kind, size)
+        # Cold: every expression misses the compiled-expression cache.
+        record(f"evaluate.cold.{kind}", lambda: _eval_all(exprs), len(exprs), setup=calc_core.clear_cache)
+        record(f"evaluate.warm.{kind}", lambda: _eval_all(exprs), len(exprs))
+
+    for kb in ((1, 10) if quick else (1, 10, 100)):
+        text = _long_expression(kb)
+        record(f"preprocess.{kb}kb", lambda: calc_core.preprocess_expression(text), 1)
+
+    for depth in ((50, 500) if quick else (50, 500, 5000)):
+        text = _nested_factorials(depth)
+        record(f"replace_factorial.depth{depth}", lambda: calc_core.replace_factorial_operators(text), 1)
+
+    record("build_allowed_names", calc_core.build_allowed_names, 1)
+
+    batch = [e for kind in CORPORA for e in make_corpus(kind, size // 2, seed=99)]
+    record("batch.workers1", lambda: evaluate_many(batch, workers=1), len(batch), setup=calc_core.clear_cache)
+    record("batch.workers2", lambda: evaluate_many(batch, workers=2), len(batch))
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Return the names of benchmarks slower than baseline by > threshold."""
+    regressions = []
+    base = baseline.get("results", {})
+    for name, entry in results.items():
+        if name not in base:
+            entry["change"] = None
+            continue
+        change = entry["ns_per_op"] / base[name]["ns_per_op"] - 1.0
+        entry["change"] = change
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite the baseline with this run")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown that counts as a regression")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="smaller corpora and inputs")
+    args = parser.parse_args(argv)
+
+    results = run_suite(repeat=args.repeat, quick=args.quick)
+    report: Dict[str, Any] = {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+
+    baseline_path = Path(args.baseline)
+    regressions: List[str] = []
+    if baseline_path.exists() and not args.save_baseline:
+        baseline = json.loads(baseline_path.read_text())
+        regressions = compare(results, baseline, args.threshold)
+        report["baseline"] = str(baseline_path)
+        report["threshold"] = args.threshold
+        report["regressions"] = regressions
+
+    for name, entry in results.items():
+        change = entry.get("change")
+        flag = ""
+        if change is not None:
+            flag = f"{change:+7.1%}" + ("  REGRESSION" if name in regressions else "")
+        print(f"{name:<34} {entry['ns_per_op']:>14,.0f} ns/op  {flag}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"baseline saved to {baseline_path}")
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
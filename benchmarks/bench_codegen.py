@@ -0,0 +1,90 @@
+"""Closure programs against generated Python functions for hot expressions.
+
+Run with ``python benchmarks/bench_codegen.py``. Each expression is compiled
+twice outside the cache: once with code generation off, so it stays on the
+closure tier, and once promoted to a generated function. Both run the same
+optimized tree through evaluate_compiled on the float backend; "codegen us"
+is the one-off cost of generating and compiling the function, and
+"break-even" how many calls repay it. The last columns time
+compile_function, which builds its positional function straight away.
+"""
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import calc_codegen  # noqa: E402
+import calc_core  # noqa: E402
+from calc_eval import CompiledExpression, compile_tree  # noqa: E402
+from calc_opt import optimize  # noqa: E402
+
+EXPRESSIONS = {
+    "linear": "2*x + y",
+    "poly": "3*x^4 - 2*x^2*y + y^3 - 7",
+    "trig": "sin(x)*cos(y) + tan(x*y/10)",
+    "mixed": "exp(-x^2/2)/sqrt(2*pi) + ln(1 + y^2) + atan(y/x)",
+    "hoisted": "(x+y)^2 + sin(x+y) + (x+y)/tau",
+}
+POINT = {"x": 1.3, "y": 0.7}
+CALLS = 20_000
+
+
+def fresh(text: str, threshold: int) -> CompiledExpression:
+    calc_codegen.threshold = threshold
+    compiled = calc_core.compile_expression(text)
+    compiled = compile_tree(compiled.source, compiled.tree, calc_core.ALLOWED_NAMES, compiled.limits)
+    for _ in range(threshold + 1):
+        calc_core.evaluate_compiled(compiled, "float", POINT)
+    return compiled
+
+
+def _ns(fn: Callable[[], object], rounds: int = 5) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(CALLS):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best / CALLS * 1e9
+
+
+def main() -> None:
+    previous = calc_codegen.threshold
+    print(
+        f"{'expression':<10} {'closure ns':>11} {'codegen ns':>11} {'speedup':>8} {'codegen us':>11}"
+        f" {'break-even':>11} {'fn closure':>11} {'fn codegen':>11}"
+    )
+    try:
+        for label, text in EXPRESSIONS.items():
+            slow = fresh(text, 0)
+            fast = fresh(text, 1)
+            assert slow.tier("float") == "closure" and fast.tier("float") == "codegen"
+            assert calc_core.evaluate_compiled(slow, "float", POINT) == calc_core.evaluate_compiled(fast, "float", POINT)
+            closure = _ns(lambda: calc_core.evaluate_compiled(slow, "float", POINT))
+            generated = _ns(lambda: calc_core.evaluate_compiled(fast, "float", POINT))
+
+            optimized = optimize(fast.tree, calc_core.ALLOWED_NAMES, fast.limits)
+            start = time.perf_counter()
+            for _ in range(100):
+                calc_codegen.generate(optimized, calc_core.ALLOWED_NAMES, fast.limits, slow.program("float", {}), True)
+            codegen_us = (time.perf_counter() - start) / 100 * 1e6
+            break_even = codegen_us * 1e3 / max(closure - generated, 1.0)
+
+            calc_codegen.threshold = 0
+            fn_slow = calc_core.compile_function(text, "x", {"y": POINT["y"]})
+            calc_codegen.threshold = previous or 1
+            fn_fast = calc_core.compile_function(text, "x", {"y": POINT["y"]})
+            fn_closure = _ns(lambda: fn_slow(1.3))
+            fn_codegen = _ns(lambda: fn_fast(1.3))
+            print(
+                f"{label:<10} {closure:>11.0f} {generated:>11.0f} {closure / generated:>7.1f}x {codegen_us:>11.0f}"
+                f" {break_even:>11.0f} {fn_closure:>11.0f} {fn_codegen:>11.0f}"
+            )
+    finally:
+        calc_codegen.threshold = previous
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Gradients: central finite differences against forward mode and symbolic.
+
+Run with ``python benchmarks/bench_diff.py``. For each expression, times
+one full gradient at a point three ways: 2n+1 evaluations of the cached
+program (finite differences), one value_and_gradient pass, and n
+evaluations of the cached compile_derivative programs plus the value.
+"""
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import calc_core  # noqa: E402
+
+EXPRESSIONS = {
+    "poly": "3*x^4 - 2*x^2*y + y^3 - 7",
+    "trig": "sin(x)*cos(y) + tan(x*y/10)",
+    "mixed": "exp(-x^2/2)/sqrt(2*pi) + ln(1 + y^2) + atan(z/x)",
+    "wide": "x*y*z + sinh(x/3)*cosh(y/3)*tanh(z/3) + gamma(z) + sqrt(x^2 + y^2 + z^2)",
+}
+POINT = {"x": 1.3, "y": 0.7, "z": 2.1}
+STEP = 1e-6
+
+
+def finite_gradient(text: str, point: Dict[str, float]) -> Dict[str, float]:
+    compiled = calc_core.compile_expression(text)
+    calc_core.evaluate_compiled(compiled, "float", point)
+    grad = {}
+    for name in sorted(compiled.variables):
+        up, down = dict(point), dict(point)
+        up[name] += STEP
+        down[name] -= STEP
+        grad[name] = (
+            calc_core.evaluate_compiled(compiled, "float", up) - calc_core.evaluate_compiled(compiled, "float", down)
+        ) / (2 * STEP)
+    return grad
+
+
+def symbolic_gradient(text: str, point: Dict[str, float]) -> Dict[str, float]:
+    compiled = calc_core.compile_expression(text)
+    calc_core.evaluate_compiled(compiled, "float", point)
+    return {
+        name: calc_core.evaluate_compiled(calc_core.compile_derivative(text, name), "float", point)
+        for name in sorted(compiled.variables)
+    }
+
+
+def _per_call(fn: Callable[[], object], rounds: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds
+
+
+def main(rounds: int = 2000) -> None:
+    print(f"{'expression':<10} {'finite us':>10} {'forward us':>11} {'symbolic us':>12} {'max |fwd-sym|':>14}")
+    for label, text in EXPRESSIONS.items():
+        finite = _per_call(lambda: finite_gradient(text, POINT), rounds)
+        forward = _per_call(lambda: calc_core.value_and_gradient(text, POINT), rounds)
+        symbolic = _per_call(lambda: symbolic_gradient(text, POINT), rounds)
+        fwd = calc_core.value_and_gradient(text, POINT)[1]
+        sym = symbolic_gradient(text, POINT)
+        err = max(abs(fwd[name] - sym[name]) for name in sym)
+        print(f"{label:<10} {finite * 1e6:>10.1f} {forward * 1e6:>11.1f} {symbolic * 1e6:>12.1f} {err:>14.2e}")
+
+
+if __name__ == "__main__":
+    main()
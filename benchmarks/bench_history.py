@@ -0,0 +1,59 @@
+"""Calculation history at its default cap of 100,000 entries.
+
+Run with ``python benchmarks/bench_history.py``. Fills an on-disk history,
+then times appending at the cap, random row reads (what a scrolling view
+does), one page of entries, substring and prefix search, and the lookup
+used to skip re-evaluating a known expression.
+"""
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from calc_history import DEFAULT_CAP, History  # noqa: E402
+
+
+def _per_op(fn: Callable[[int], object], ops: int) -> float:
+    start = time.perf_counter()
+    for i in range(ops):
+        fn(i)
+    return (time.perf_counter() - start) / ops
+
+
+def main() -> None:
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "history.sqlite3"
+        history = History(path)
+        start = time.perf_counter()
+        with history._db:
+            history._db.executemany(
+                "INSERT INTO entries (expression, result, value) VALUES (?, ?, ?)",
+                ((f"{i}*{i % 97}+sqrt({i})", str(i), float(i)) for i in range(DEFAULT_CAP)),
+            )
+        history.close()
+        history = History(path)
+        print(f"{len(history)} entries, filled and reopened in {time.perf_counter() - start:.2f}s")
+
+        rows: Tuple[Tuple[str, float], ...] = (
+            ("add at cap", _per_op(lambda i: history.add(f"{i}+1", str(i + 1)), 200)),
+            ("entry (random)", _per_op(lambda i: history.entry(rng.randrange(len(history))), 2000)),
+            ("entry (scroll)", _per_op(lambda i: history.entry(i), 2000)),
+            ("page of 20", _per_op(lambda i: history.page(i * 20, 20), 200)),
+            ("search '*17+'", _per_op(lambda i: history.search("*17+", 20), 50)),
+            ("search prefix", _per_op(lambda i: history.search("4242", 20, prefix=True), 50)),
+            ("lookup", _per_op(lambda i: history.lookup(f"{i}*{i % 97}+sqrt({i})"), 2000)),
+        )
+        history.close()
+
+    print(f"{'operation':<16} {'us/op':>10}")
+    for label, seconds in rows:
+        print(f"{label:<16} {seconds * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
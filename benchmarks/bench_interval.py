@@ -0,0 +1,71 @@
+"""Error bounds: perturbed-input sampling against one interval evaluation.
+
+Run with ``python benchmarks/bench_interval.py``. For each expression the
+inputs are known to within +-DELTA. Sampling evaluates the float program at
+SAMPLES random points of that box and reports the spread it saw; the
+interval backend evaluates the same cached compile once and returns bounds
+that are guaranteed to hold. "sampled/bound" below 1 is how much of the
+true range sampling missed (or how much the interval overestimates).
+"""
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import calc_core  # noqa: E402
+
+EXPRESSIONS = {
+    "poly": "3*x^4 - 2*x^2*y + y^3 - 7",
+    "trig": "sin(x)*cos(y) + tan(x*y/10)",
+    "mixed": "exp(-x^2/2)/sqrt(2*pi) + ln(1 + y^2) + atan(y/x)",
+    "sine": "sin(x + y)",
+    "gamma": "gamma(x) * lgamma(y + 2)",
+}
+POINT = {"x": 1.3, "y": 0.7}
+DELTA = 1e-3
+SAMPLES = 1000
+
+
+def sampled(text: str, rng: random.Random) -> Tuple[float, float]:
+    compiled = calc_core.compile_expression(text)
+    values = []
+    for _ in range(SAMPLES):
+        point = {name: v + rng.uniform(-DELTA, DELTA) for name, v in POINT.items()}
+        values.append(calc_core.evaluate_compiled(compiled, "float", point))
+    return min(values), max(values)
+
+
+def bounded(text: str) -> calc_core.Interval:
+    box: Dict[str, Tuple[float, float]] = {name: (v - DELTA, v + DELTA) for name, v in POINT.items()}
+    return calc_core.evaluate_interval(text, box)
+
+
+def _ms(fn: Callable[[], object], rounds: int = 5) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def main() -> None:
+    rng = random.Random(0)
+    print(f"{'expression':<10} {'sampling ms':>12} {'interval ms':>12} {'speedup':>8} {'sampled/bound':>14}  inside")
+    for label, text in EXPRESSIONS.items():
+        sampling = _ms(lambda: sampled(text, rng), rounds=3)
+        interval = _ms(lambda: bounded(text))
+        low, high = sampled(text, rng)
+        bound = bounded(text)
+        inside = bound.lo <= low and high <= bound.hi
+        print(
+            f"{label:<10} {sampling:>12.2f} {interval:>12.4f} {sampling / interval:>7.0f}x"
+            f" {(high - low) / bound.width:>14.3f}  {inside}"
+        )
+
+
+if __name__ == "__main__":
+    main()
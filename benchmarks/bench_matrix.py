@@ -0,0 +1,106 @@
+"""Stacked evaluation of small-matrix batches against one expression at a time.
+
+Run with ``python benchmarks/bench_matrix.py``. Each batch holds expressions
+of one shape with random entries. "loop" evaluates them one by one with
+calc_core.evaluate_complex, "stacked" with calc_batch.evaluate_stacked,
+which parses the shape once and runs it once over arrays of the entries.
+"cold" clears the caches first, as for a batch of new expressions; "warm"
+repeats the batch, where the loop only looks up results constant-folded
+at compile time. Results are checked to agree.
+"""
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np  # noqa: E402
+
+import calc_batch  # noqa: E402
+import calc_core  # noqa: E402
+
+SIZES = (100, 1_000, 4_000)
+
+
+def _entries(rng: random.Random, n: int) -> List[int]:
+    return [rng.randint(-9, 9) for _ in range(n)]
+
+
+def det2(rng: random.Random) -> str:
+    a, b, c, d = _entries(rng, 4)
+    return f"det([[{a}, {b}], [{c}, {d}]])"
+
+
+def solve3(rng: random.Random) -> str:
+    m = _entries(rng, 12)
+    return f"inv([[{m[0]}, {m[1]}, {m[2]}], [{m[3]}, {m[4]}, {m[5]}], [{m[6]}, {m[7]}, {m[8]}]]) @ [[{m[9]}], [{m[10]}], [{m[11]}]]"
+
+
+def rotate(rng: random.Random) -> str:
+    t, x, y = rng.random(), rng.randint(-5, 5), rng.randint(-5, 5)
+    return f"[[cos({t:.3f}), -sin({t:.3f})], [sin({t:.3f}), cos({t:.3f})]] @ [[{x}], [{y}]]"
+
+
+def roots(rng: random.Random) -> str:
+    a, b, c = _entries(rng, 3)
+    return f"(-{b} + sqrt({b}^2 - 4*{a or 1}*{c})) / (2*{a or 1})"
+
+
+CASES: Dict[str, Callable[[random.Random], str]] = {
+    "det 2x2": det2,
+    "inv@ 3x3": solve3,
+    "rotate": rotate,
+    "roots": roots,
+}
+
+
+def _best(fn: Callable[[], object], cold: bool, rounds: int = 3) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        if cold:
+            calc_core.clear_cache()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    rng = random.Random(0)
+    print(
+        f"{'case':<10} {'batch':>6} {'cold loop ms':>13} {'stacked ms':>11} {'speedup':>8}"
+        f" {'warm loop ms':>13} {'stacked ms':>11}"
+    )
+    for label, make in CASES.items():
+        for size in SIZES:
+            texts = [make(rng) for _ in range(size)]
+
+            def loop() -> List[object]:
+                out = []
+                for text in texts:
+                    try:
+                        out.append(calc_core.evaluate_complex(text))
+                    except (ValueError, ZeroDivisionError):
+                        out.append(None)
+                return out
+
+            expected = loop()
+            stacked = calc_batch.evaluate_stacked(texts)
+            for want, got in zip(expected, stacked):
+                assert (want is None) == (got.value is None), (want, got)
+                if want is not None:
+                    assert np.allclose(want, got.value, rtol=1e-12, atol=1e-12), (want, got)
+            timings = [
+                _best(fn, cold) for cold in (True, False) for fn in (loop, lambda: calc_batch.evaluate_stacked(texts))
+            ]
+            cold_loop, cold_stacked, warm_loop, warm_stacked = (t * 1e3 for t in timings)
+            print(
+                f"{label:<10} {size:>6} {cold_loop:>13.1f} {cold_stacked:>11.1f} {cold_loop / cold_stacked:>7.1f}x"
+                f" {warm_loop:>13.1f} {warm_stacked:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
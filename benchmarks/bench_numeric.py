@@ -0,0 +1,66 @@
+"""Plot sampling, root finding and integration against per-point evaluation.
+
+Run with ``python benchmarks/bench_numeric.py``. The baseline substitutes
+each x into the expression text and calls evaluate_expression, as a plot
+loop without calc_numeric would; calc_numeric compiles once and evaluates
+in batches (NumPy) or through the compiled float function.
+"""
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import calc_core  # noqa: E402
+import calc_numeric  # noqa: E402
+
+CURVES = ("sin(x)", "x^3 - 2*x + 1", "exp(-x^2)*cos(5*x)", "tan(x)", "sin(1/x)", "gamma(x)")
+SPAN = (-3.0, 3.0)
+POINTS = 400
+
+
+def substituted(text: str) -> None:
+    lo, hi = SPAN
+    for i in range(POINTS):
+        x = lo + (hi - lo) * i / (POINTS - 1)
+        try:
+            calc_core.evaluate_expression(re.sub(r"\bx\b", f"({x!r})", text))
+        except (ValueError, ZeroDivisionError):
+            pass
+
+
+def _ms(fn: Callable[[], object], rounds: int = 5) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def main() -> None:
+    print(f"{'curve':<20} {'substituted ms':>15} {'uniform ms':>11} {'adaptive ms':>12} {'points':>7}")
+    for text in CURVES:
+        naive = _ms(lambda: substituted(text), rounds=1)
+        uniform = _ms(lambda: calc_numeric.sample(text, "x", SPAN, n=POINTS, max_depth=0))
+        adaptive = _ms(lambda: calc_numeric.sample(text, "x", SPAN))
+        points = len(calc_numeric.sample(text, "x", SPAN)[0])
+        print(f"{text:<20} {naive:>15.1f} {uniform:>11.2f} {adaptive:>12.2f} {points:>7}")
+
+    print()
+    print(f"{'task':<36} {'ms':>8}  result")
+    tasks = (
+        ("solve cos(x) - x on [0, 1]", lambda: calc_numeric.solve("cos(x) - x", "x", (0, 1))),
+        ("solve x^5 - x - 1 on [-10, 10]", lambda: calc_numeric.solve("x^5 - x - 1", "x", (-10, 10))),
+        ("integrate exp(-x^2) on [-5, 5]", lambda: calc_numeric.integrate("exp(-x^2)", "x", -5, 5)),
+        ("integrate 1/sqrt(x) on [0, 1]", lambda: calc_numeric.integrate("1/sqrt(x)", "x", 0, 1)),
+        ("integrate sin(50*x)^2 on [0, pi]", lambda: calc_numeric.integrate("sin(50*x)^2", "x", 0, 3.141592653589793)),
+    )
+    for label, task in tasks:
+        print(f"{label:<36} {_ms(task):>8.2f}  {task():.15g}")
+
+
+if __name__ == "__main__":
+    main()
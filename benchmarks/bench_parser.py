@@ -0,0 +1,60 @@
+"""Scaling benchmark for the single-pass tokenizer and parser.
+
+Run with ``python benchmarks/bench_parser.py``. For each corpus the time per
+KB should stay roughly flat as the input grows from 1 KB to 100 KB.
+"""
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from calc_core import preprocess_expression  # noqa: E402
+from calc_parser import parse_expression  # noqa: E402
+
+SIZES_KB = (1, 10, 25, 50, 100)
+
+
+def _grow(unit: str, joiner: str, size: int) -> str:
+    count = max(1, size // (len(unit) + len(joiner)))
+    return joiner.join([unit] * count)
+
+
+def _nested(size: int) -> str:
+    # ((((1+2)!+3)!+4)!...) -- a generated formula with deep factorial groups.
+    depth = max(1, size // 8)
+    return "(" * depth + "1" + "".join(f"+{i % 9})!" for i in range(depth))
+
+
+CORPORA: Dict[str, Callable[[int], str]] = {
+    "arithmetic": lambda size: _grow("12.5×3-4÷2", "+", size),
+    "factorial-groups": lambda size: _grow("(3+2)!", "+", size),
+    "percent-power": lambda size: _grow("2^3+15%", "-", size),
+    "nested-factorial": _nested,
+}
+
+
+def _best_of(fn: Callable[[], object], repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    print(f"{'corpus':<18} {'stage':<11}" + "".join(f"{kb:>8} KB" for kb in SIZES_KB) + "   (us per KB)")
+    for name, make in CORPORA.items():
+        inputs = [make(kb * 1024) for kb in SIZES_KB]
+        for stage, fn in (("parse", parse_expression), ("preprocess", preprocess_expression)):
+            row = []
+            for text in inputs:
+                elapsed = _best_of(lambda: fn(text))
+                row.append(elapsed * 1e6 / (len(text) / 1024))
+            print(f"{name:<18} {stage:<11}" + "".join(f"{v:>11.1f}" for v in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Shared result cache against per-process caches, for several processes at once.
+
+Run with ``python benchmarks/bench_shared_cache.py``. Each process starts
+cold, as a new server worker or batch process does, and evaluates its own
+Zipf-distributed sample of one pool of expressions, so the processes'
+workloads overlap on the popular ones. "local" runs with each process's
+compile cache only; "shared" adds calc_core.enable_shared_cache on a fresh
+table. Reported per setup: hit rate (local compile-cache hits plus shared
+results, over all evaluations), the shared table's part in that, and the
+mean CPU time per evaluation; wall time would also count the other
+processes when they outnumber the cores. Results are checked to agree.
+"""
+import math
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import calc_core  # noqa: E402
+
+PROCESSES = (2, 4, 8)
+POOL = 50_000
+EVALUATIONS = 20_000
+ZIPF_S = 1.1
+# Far below the pool size, as a long-running worker sees many more
+# distinct expressions than its cache holds.
+LOCAL_CACHE = 2_048
+
+
+def _expression(rank: int) -> str:
+    rng = random.Random(rank)
+    a, b, c, d = (rng.randint(1, 999) for _ in range(4))
+    return f"sqrt({a}^2 + {b}^2) * sin({c}/7) + log({d}) / (2 + cos({a}*pi/{b}))^2"
+
+
+def _workload(seed: int) -> List[str]:
+    weights = [1 / rank ** ZIPF_S for rank in range(1, POOL + 1)]
+    ranks = random.Random(seed).choices(range(POOL), weights=weights, k=EVALUATIONS)
+    return [_expression(rank) for rank in ranks]
+
+
+def _run(args: Tuple[int, Optional[str]]) -> Tuple[float, int, int, float]:
+    seed, path = args
+    texts = _workload(seed)
+    calc_core.set_cache_size(LOCAL_CACHE)
+    if path is not None:
+        calc_core.enable_shared_cache(path)
+    total = 0.0
+    start = time.process_time()
+    for text in texts:
+        try:
+            total += calc_core.evaluate_expression(text)
+        except (ValueError, OverflowError):
+            pass
+    elapsed = time.process_time() - start
+    local_hits = calc_core.cache_info()["hits"]
+    shared_hits = calc_core.shared_cache_info().get("hits", 0)
+    calc_core.disable_shared_cache()
+    return elapsed, local_hits, shared_hits, total
+
+
+def _measure(processes: int, shared: bool) -> Dict[str, float]:
+    path = None
+    if shared:
+        fd, path = tempfile.mkstemp(prefix="calc-bench-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+        os.close(fd)
+    try:
+        with multiprocessing.get_context("spawn").Pool(processes) as pool:
+            runs = pool.map(_run, [(seed, path) for seed in range(processes)])
+    finally:
+        if path is not None:
+            os.remove(path)
+    evaluations = processes * EVALUATIONS
+    return {
+        "hit rate": sum(r[1] + r[2] for r in runs) / evaluations,
+        "shared": sum(r[2] for r in runs) / evaluations,
+        "us": sum(r[0] for r in runs) / evaluations * 1e6,
+        "totals": [r[3] for r in runs],
+    }
+
+
+def main() -> None:
+    print(
+        f"{'procs':>5} {'local hits':>11} {'local us':>9} {'shared hits':>12} {'from shared':>12}"
+        f" {'shared us':>10} {'speedup':>8}"
+    )
+    for processes in PROCESSES:
+        local = _measure(processes, shared=False)
+        shared = _measure(processes, shared=True)
+        for want, got in zip(local["totals"], shared["totals"]):
+            assert math.isclose(want, got, rel_tol=1e-9), (want, got)
+        print(
+            f"{processes:>5} {local['hit rate']:>10.1%} {local['us']:>9.1f} {shared['hit rate']:>11.1%}"
+            f" {shared['shared']:>11.1%} {shared['us']:>10.1f} {local['us'] / shared['us']:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
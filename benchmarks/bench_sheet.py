@@ -0,0 +1,68 @@
+"""Incremental worksheet recomputation versus rebuilding the whole sheet.
+
+Run with ``python benchmarks/bench_sheet.py``. The synthetic sheet has a
+row of inputs and rows of cells that each read two cells from the row
+above, plus a user function. "edit leaf" changes an input that only one
+column reads. "edit root" changes the input that everything reads.
+"recalculate" re-evaluates every cell, which is what a sheet without a
+dependency graph does on each edit.
+"""
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from calc_sheet import Worksheet  # noqa: E402
+
+WIDTH = 100
+DEPTH = 40
+
+
+def build_lines(width: int = WIDTH, depth: int = DEPTH) -> List[str]:
+    lines = ["rate = 0.05", "scale(x) = x * (1 + rate)"]
+    lines += [f"in_{c} = {c + 1}" for c in range(width)]
+    for r in range(depth):
+        above = "in" if r == 0 else f"r{r - 1}"
+        for c in range(width):
+            left = f"{above}_{c}"
+            right = f"{above}_{(c + 1) % width}" if c % 10 else "rate"
+            lines.append(f"r{r}_{c} = scale({left}) + {right} / 2")
+    return lines
+
+
+def _timed(fn: Callable[[], object]) -> Tuple[float, object]:
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main() -> None:
+    lines = build_lines()
+    sheet = Worksheet()
+
+    for line in lines:
+        sheet.define(line)
+    print(f"{len(sheet)} cells")
+
+    rows = []
+    for label, edit in (
+        ("edit leaf", lambda: sheet.define("in_55 = 7")),
+        ("edit root", lambda: sheet.define("rate = 0.06")),
+        ("no-op edit", lambda: sheet.define("rate = 0.06")),
+    ):
+        before = sheet.evaluations
+        elapsed, _ = _timed(edit)
+        rows.append((label, elapsed, sheet.evaluations - before))
+    before = sheet.evaluations
+    elapsed, _ = _timed(sheet.recalculate)
+    rows.append(("recalculate", elapsed, sheet.evaluations - before))
+
+    print(f"{'update':<14} {'ms':>9} {'cells evaluated':>16}")
+    for label, elapsed, evaluations in rows:
+        print(f"{label:<14} {elapsed * 1e3:>9.2f} {evaluations:>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Cold-start cost of the engine alone versus the desktop app.
+
+Run with ``python benchmarks/bench_startup.py``. Every sample is a fresh
+interpreter, so module caches never carry over between runs. "import" is
+``import calc_core`` on its own. "gui import" is ``import calculator``,
+which pulls in PyQt6. "window" runs from constructing the main window
+to its first processed paint. "first paint" covers the same paint but
+measures from the start of the import. "keypad ready" runs until the
+deferred keypad is built. The GUI rows use Qt's offscreen platform and
+are skipped when PyQt6 is not installed.
+"""
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+RUNS = 15
+
+_ENGINE = """
+import time
+t0 = time.perf_counter()
+import calc_core
+print("import", time.perf_counter() - t0)
+"""
+
+_GUI = """
+import time
+t0 = time.perf_counter()
+import calculator
+print("gui import", time.perf_counter() - t0)
+from PyQt6.QtCore import QEvent, QObject
+from PyQt6.QtWidgets import QApplication
+
+class FirstPaint(QObject):
+    seen = False
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint and not self.seen:
+            self.seen = True
+            now = time.perf_counter()
+            print("window", now - t1)
+            print("first paint", now - t0)
+        return False
+
+app = QApplication([])
+watcher = FirstPaint()
+t1 = time.perf_counter()
+win = calculator.ScientificCalculator()
+win.installEventFilter(watcher)
+win.resize(980, 600)
+win.show()
+while not (watcher.seen and win.keypad_ready):
+    app.processEvents()
+print("keypad ready", time.perf_counter() - t0)
+"""
+
+
+def _sample(code: str) -> Dict[str, float]:
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    timings = {}
+    for line in out.splitlines():
+        label, _, value = line.rpartition(" ")
+        timings[label] = float(value)
+    return timings
+
+
+def _collect(code: str) -> Dict[str, List[float]]:
+    samples: Dict[str, List[float]] = {}
+    for _ in range(RUNS):
+        for label, value in _sample(code).items():
+            samples.setdefault(label, []).append(value)
+    return samples
+
+
+def main() -> None:
+    print(f"{'stage':<14} {'median ms':>10} {'min ms':>10}")
+    results = _collect(_ENGINE)
+    try:
+        import PyQt6  # noqa: F401
+    except ImportError:
+        print("PyQt6 not installed; skipping GUI startup")
+    else:
+        results.update(_collect(_GUI))
+    for label, values in results.items():
+        print(f"{label:<14} {statistics.median(values) * 1e3:>10.1f} {min(values) * 1e3:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Per-interaction latency of the Streamlit app against its budget.
+
+Run with ``python benchmarks/bench_streamlit.py``. Drives streamlit_app.py
+headlessly with streamlit.testing's AppTest: digit keypresses, "=" and a
+history recall. Wall times include AppTest's own overhead and a full
+script run per interaction; in a browser a keypress reruns only the keypad
+fragment. The budget applies to the app's own server-side measurements
+(``st.session_state.latency``): the script exits with status 1 when the
+p95 of a keypad or page run exceeds ``--budget``, which defaults to the
+app's LATENCY_BUDGET_MS.
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+APP = Path(__file__).resolve().parents[1] / "streamlit_app.py"
+DEFAULT_BUDGET_MS = 50
+
+
+def _p95(samples: List[float]) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+
+def _timed(samples: List[float], action: Callable[[], object]) -> None:
+    start = time.perf_counter()
+    action()
+    samples.append((time.perf_counter() - start) * 1e3)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--rounds", type=int, default=30)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_MS, help="p95 budget per interaction, ms")
+    args = parser.parse_args(argv)
+
+    at = AppTest.from_file(str(APP), default_timeout=30).run()
+    timings: Dict[str, List[float]] = {"keypress": [], "equals": [], "recall": []}
+    for i in range(args.rounds):
+        for digit in str(i + 2):
+            _timed(timings["keypress"], at.button(key=f"key-{digit}").click().run)
+        _timed(timings["keypress"], at.button(key="key-op-mul").click().run)
+        _timed(timings["keypress"], at.button(key="key-7").click().run)
+        _timed(timings["equals"], at.button(key="key-equals").click().run)
+        recall = [b for b in at.button if b.key and b.key.startswith("hist-") and b.key[5:].isdigit()]
+        if recall:
+            _timed(timings["recall"], recall[-1].click().run)
+        _timed(timings["keypress"], at.button(key="key-clear").click().run)
+    if at.exception:
+        print(at.exception, file=sys.stderr)
+        return 1
+
+    print(f"{'wall time':<12} {'n':>5} {'p50 ms':>9} {'p95 ms':>9}")
+    for label, samples in timings.items():
+        if samples:
+            print(f"{label:<12} {len(samples):>5} {statistics.median(samples):>9.1f} {_p95(samples):>9.1f}")
+    over = []
+    print(f"{'app run':<12} {'n':>5} {'p50 ms':>9} {'p95 ms':>9}")
+    for kind, samples in at.session_state["latency"].items():
+        p95 = _p95(list(samples))
+        print(f"{kind:<12} {len(samples):>5} {statistics.median(samples):>9.1f} {p95:>9.1f}")
+        if p95 > args.budget:
+            over.append(kind)
+    if over:
+        print(f"over the {args.budget:g} ms budget: {', '.join(over)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
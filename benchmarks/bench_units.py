@@ -0,0 +1,56 @@
+"""Cost of units: evaluate_units against the same expression on plain floats.
+
+Run with ``python benchmarks/bench_units.py``. Units are checked and
+converted to SI when an expression is compiled, so a warm evaluate_units
+should cost about what evaluating the float expression does, plus building
+the Quantity. "plain" evaluates the hand-converted float expression from
+its text through the same compile cache; "cold" includes compiling (cache
+cleared each time).
+"""
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import calc_core  # noqa: E402
+
+# label: (with units, same thing in SI floats, variables, declared units)
+CASES: Dict[str, Tuple[str, str, Dict[str, float], Optional[Mapping[str, str]]]] = {
+    "speed": ("3 km / 20 min to km/h", "3000 / 1200 * 3.6", {}, None),
+    "force": ("9.81 m/s^2 * 70 kg + 2 kN", "9.81 * 70 + 2000", {}, None),
+    "trig": ("sin(30 deg) * 5 m", "sin(30*pi/180) * 5", {}, None),
+    "variables": ("d / t to km/h", "d*1000 / (t*60) * 3.6", {"d": 42.195, "t": 125.0}, {"d": "km", "t": "min"}),
+}
+
+
+def _ns(fn: Callable[[], object], calls: int = 20_000, rounds: int = 5) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best / calls * 1e9
+
+
+def main() -> None:
+    print(f"{'case':<10} {'plain ns':>9} {'units ns':>9} {'overhead':>9} {'cold us':>8}  result")
+    for label, (text, plain, variables, units) in CASES.items():
+        quantity = calc_core.evaluate_units(text, variables, units)
+        expected = calc_core.evaluate_compiled(calc_core.compile_expression(plain), "float", variables)
+        assert abs(quantity.magnitude - expected) <= 1e-9 * abs(expected), (quantity, expected)
+        plain_ns = _ns(lambda: calc_core.evaluate_compiled(calc_core.compile_expression(plain), "float", variables))
+        units_ns = _ns(lambda: calc_core.evaluate_units(text, variables, units))
+
+        def cold() -> None:
+            calc_core.clear_cache()
+            calc_core.evaluate_units(text, variables, units)
+
+        cold_us = _ns(cold, calls=500) / 1e3
+        print(f"{label:<10} {plain_ns:>9.0f} {units_ns:>9.0f} {units_ns / plain_ns:>8.2f}x {cold_us:>8.1f}  {quantity}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Load generator for calc_server: latency percentiles and requests/second.
+
+Run with ``python benchmarks/load_server.py`` to start a server on a free
+localhost port and drive it, or point it at a running server with
+``--port 8000``. Each of ``--concurrency`` clients keeps one keep-alive
+connection and sends POST /evaluate requests drawn from the benchmark
+corpora. ``--duplicates`` is the fraction of requests that reuse a small
+hot set of expressions, which is what request coalescing helps with.
+``--batch N`` sends /batch requests of N expressions instead.
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bench_calc_core import CORPORA, make_corpus  # noqa: E402
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+async def _post(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, path: str, payload: Dict) -> int:
+    body = json.dumps(payload).encode()
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def _client(
+    host: str, port: int, requests: List[Dict], path: str, latencies: List[float], statuses: Dict[int, int]
+) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for payload in requests:
+            start = time.perf_counter()
+            status = await _post(reader, writer, path, payload)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def build_requests(total: int, batch: int, duplicates: float, seed: int = 7) -> List[Dict]:
+    rng = random.Random(seed)
+    corpus = [text for kind in CORPORA for text in make_corpus(kind, size=max(1, total * max(1, batch) // len(CORPORA)))]
+    rng.shuffle(corpus)
+    hot = corpus[:8]
+
+    def pick(i: int) -> str:
+        return rng.choice(hot) if rng.random() < duplicates else corpus[i % len(corpus)]
+
+    if batch:
+        return [{"expressions": [pick(i * batch + j) for j in range(batch)]} for i in range(total)]
+    return [{"expression": pick(i)} for i in range(total)]
+
+
+async def run_load(host: str, port: int, requests: List[Dict], concurrency: int, path: str) -> Tuple[float, List[float], Dict[int, int]]:
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    shares = [requests[i::concurrency] for i in range(concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, share, path, latencies, statuses) for share in shares if share))
+    return time.perf_counter() - start, latencies, statuses
+
+
+def _spawn(extra: List[str]) -> Tuple[subprocess.Popen, int]:
+    proc = subprocess.Popen(
+        [sys.executable, str(ROOT / "calc_server.py"), "--port", "0", *extra],
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    line = proc.stderr.readline()
+    if "listening on" not in line:
+        proc.kill()
+        raise SystemExit(f"server failed to start: {line.strip()}")
+    return proc, int(line.rsplit(":", 1)[1])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="drive a running server instead of spawning one")
+    parser.add_argument("-n", "--requests", type=int, default=5000)
+    parser.add_argument("-c", "--concurrency", type=int, default=32)
+    parser.add_argument("--batch", type=int, default=0, help="expressions per /batch request (0 = use /evaluate)")
+    parser.add_argument("--duplicates", type=float, default=0.5, help="fraction of requests from a hot set")
+    parser.add_argument("--server-args", default="", help="extra arguments for a spawned server")
+    args = parser.parse_args(argv)
+
+    requests = build_requests(args.requests, args.batch, args.duplicates)
+    path = "/batch" if args.batch else "/evaluate"
+    proc = None
+    port = args.port
+    if not port:
+        proc, port = _spawn(args.server_args.split())
+    try:
+        elapsed, latencies, statuses = asyncio.run(run_load(args.host, port, requests, args.concurrency, path))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    latencies.sort()
+    print(f"{len(latencies)} requests to {path} in {elapsed:.2f}s, concurrency {args.concurrency}")
+    print(f"  rps {len(latencies) / elapsed:>10.0f}")
+    for label, fraction in (("p50", 0.50), ("p90", 0.90), ("p99", 0.99)):
+        print(f"  {label} {_percentile(latencies, fraction) * 1e3:>10.2f} ms")
+    print("  status " + ", ".join(f"{code}: {count}" for code, count in sorted(statuses.items())))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
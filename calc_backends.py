@@ -0,0 +1,396 @@
+import math
+from contextlib import nullcontext
+from decimal import ROUND_CEILING, ROUND_FLOOR, Context, Decimal, localcontext
+from fractions import Fraction
+from importlib import import_module
+from typing import Any, Callable, ContextManager, Dict, Mapping, Optional
+
+from calc_special import exact_factorial, polygamma
+
+
+class Backend:
+    """A numeric type plus the function table the evaluator binds against.
+
+    Subclasses supply ``names`` (one entry per name in
+    calc_core.ALLOWED_NAMES), convert literals with ``number`` and check the
+    final value with ``result``. ``key`` identifies the lowered program in
+    CompiledExpression's per-backend cache.
+    """
+
+    name = ""
+
+    @property
+    def key(self) -> str:
+        return self.name
+
+    def names(self) -> Mapping[str, Any]:
+        raise NotImplementedError
+
+    def number(self, value: Any) -> Any:
+        return value
+
+    def result(self, value: Any) -> Any:
+        return value
+
+    def context(self) -> ContextManager[Any]:
+        return nullcontext()
+
+
+_BACKENDS: Dict[str, Backend] = {}
+# Backends whose modules register them when imported; they are imported the
+# first time one of these names is asked for.
+_PROVIDERS = {"interval": "calc_interval", "complex": "calc_matrix"}
+
+
+def register_backend(backend: Backend) -> None:
+    _BACKENDS[backend.name] = backend
+
+
+def get_backend(name: str) -> Backend:
+    backend = _BACKENDS.get(name)
+    if backend is None and name in _PROVIDERS:
+        import_module(_PROVIDERS[name])
+        backend = _BACKENDS.get(name)
+    if backend is None:
+        raise ValueError(f"Unknown backend: {name}")
+    return backend
+
+
+def backend_names() -> Dict[str, Backend]:
+    for module in _PROVIDERS.values():
+        import_module(module)
+    return dict(_BACKENDS)
+
+
+def to_float(value: Any) -> float:
+    """``float(value)``, with integers beyond the float range as +-inf.
+
+    Integer arithmetic is exact, so 2^10000 only overflows once the result
+    is converted; it then becomes infinite, as 1e308*10 does.
+    """
+    try:
+        return float(value)
+    except OverflowError:
+        return math.inf if value > 0 else -math.inf
+
+
+def _via_float(fn: Callable[..., float], convert: Callable[[float], Any]) -> Callable[..., Any]:
+    def wrapped(*args: Any) -> Any:
+        return convert(fn(*[float(a) for a in args]))
+
+    wrapped.__name__ = getattr(fn, "__name__", "wrapped")
+    return wrapped
+
+
+def _integral(x: Any) -> int:
+    if x != int(x):
+        raise ValueError("factorial() only accepts integral values")
+    return int(x)
+
+
+# Decimal
+
+def _dec(x: Any) -> Decimal:
+    return x if isinstance(x, Decimal) else Decimal(repr(x)) if isinstance(x, float) else Decimal(x)
+
+
+def _dec_pi() -> Decimal:
+    with localcontext() as ctx:
+        ctx.prec += 2
+        three = Decimal(3)
+        lasts, t, s, n, na, d, da = 0, three, three, 1, 0, 0, 24
+        while s != lasts:
+            lasts = s
+            n, na = n + na, na + 8
+            d, da = d + da, da + 32
+            t = (t * n) / d
+            s += t
+    return +s
+
+
+def _dec_reduce(x: Decimal) -> Decimal:
+    # Bring x into [-pi, pi] so the Taylor series converge quickly.
+    two_pi = 2 * _dec_pi()
+    return x.remainder_near(two_pi) if abs(x) > two_pi else x
+
+
+def _dec_cos(x: Any) -> Decimal:
+    with localcontext() as ctx:
+        ctx.prec += 4
+        x = _dec_reduce(_dec(x))
+        i, lasts, s, fact, num, sign = 0, 0, Decimal(1), 1, Decimal(1), 1
+        while s != lasts:
+            lasts = s
+            i += 2
+            fact *= i * (i - 1)
+            num *= x * x
+            sign *= -1
+            s += num / fact * sign
+    return +s
+
+
+def _dec_sin(x: Any) -> Decimal:
+    with localcontext() as ctx:
+        ctx.prec += 4
+        x = _dec_reduce(_dec(x))
+        i, lasts, s, fact, num, sign = 1, 0, x, 1, x, 1
+        while s != lasts:
+            lasts = s
+            i += 2
+            fact *= i * (i - 1)
+            num *= x * x
+            sign *= -1
+            s += num / fact * sign
+    return +s
+
+
+def _dec_tan(x: Any) -> Decimal:
+    with localcontext() as ctx:
+        ctx.prec += 4
+        result = _dec_sin(x) / _dec_cos(x)
+    return +result
+
+
+def _dec_atan(x: Any) -> Decimal:
+    with localcontext() as ctx:
+        ctx.prec += 6
+        x = _dec(x)
+        if x.is_nan():
+            return x
+        sign = -1 if x < 0 else 1
+        x = abs(x)
+        invert = x > 1
+        if invert:
+            x = 1 / x
+        # atan(x) = 2*atan(x / (1 + sqrt(1 + x^2))) until the series is fast.
+        doublings = 0
+        while x > Decimal("0.1"):
+            x = x / (1 + (1 + x * x).sqrt())
+            doublings += 1
+        x2 = x * x
+        lasts, s, term, k = 0, x, x, 1
+        while s != lasts:
+            lasts = s
+            term *= -x2
+            k += 2
+            s += term / k
+        s *= 2 ** doublings
+        if invert:
+            s = _dec_pi() / 2 - s
+        s *= sign
+    return +s
+
+
+def _dec_asin(x: Any) -> Decimal:
+    x = _dec(x)
+    if abs(x) > 1:
+        raise ValueError("math domain error")
+    if abs(x) == 1:
+        return x * _dec_pi() / 2
+    with localcontext() as ctx:
+        ctx.prec += 4
+        result = _dec_atan(x / (1 - x * x).sqrt())
+    return +result
+
+
+def _dec_acos(x: Any) -> Decimal:
+    with localcontext() as ctx:
+        ctx.prec += 4
+        result = _dec_pi() / 2 - _dec_asin(x)
+    return +result
+
+
+def _dec_sinh(x: Any) -> Decimal:
+    with localcontext() as ctx:
+        ctx.prec += 4
+        ex = _dec(x).exp()
+        result = (ex - 1 / ex) / 2
+    return +result
+
+
+def _dec_cosh(x: Any) -> Decimal:
+    with localcontext() as ctx:
+        ctx.prec += 4
+        ex = _dec(x).exp()
+        result = (ex + 1 / ex) / 2
+    return +result
+
+
+def _dec_tanh(x: Any) -> Decimal:
+    with localcontext() as ctx:
+        ctx.prec += 4
+        e2x = (2 * _dec(x)).exp()
+        result = (e2x - 1) / (e2x + 1)
+    return +result
+
+
+def _dec_log(x: Any, base: Any = None) -> Decimal:
+    if base is None:
+        return _dec(x).ln()
+    with localcontext() as ctx:
+        ctx.prec += 4
+        result = _dec(x).ln() / _dec(base).ln()
+    return +result
+
+
+def _dec_factorial(x: Any) -> Decimal:
+    return +Decimal(exact_factorial(_integral(x)))
+
+
+def _dec_gamma(x: Any) -> Decimal:
+    x = _dec(x)
+    if x == x.to_integral_value() and x > 0:
+        return _dec_factorial(x - 1)
+    return Decimal(repr(math.gamma(float(x))))
+
+
+class DecimalBackend(Backend):
+    """decimal.Decimal arithmetic at a fixed precision (significant digits)."""
+
+    name = "decimal"
+
+    def __init__(self, precision: int = 28) -> None:
+        self.precision = precision
+        self._context = Context(prec=precision)
+        self._names: Optional[Dict[str, Any]] = None
+
+    @property
+    def key(self) -> str:
+        return f"decimal:{self.precision}"
+
+    def context(self) -> ContextManager[Any]:
+        return localcontext(self._context)
+
+    def number(self, value: Any) -> Any:
+        return _dec(value)
+
+    def names(self) -> Mapping[str, Any]:
+        if self._names is None:
+            with self.context():
+                pi = _dec_pi()
+                self._names = {
+                    "sin": _dec_sin,
+                    "cos": _dec_cos,
+                    "tan": _dec_tan,
+                    "asin": _dec_asin,
+                    "acos": _dec_acos,
+                    "atan": _dec_atan,
+                    "sinh": _dec_sinh,
+                    "cosh": _dec_cosh,
+                    "tanh": _dec_tanh,
+                    "log": _dec_log,
+                    "log10": lambda x: _dec(x).log10(),
+                    "sqrt": lambda x: _dec(x).sqrt(),
+                    "pow": lambda x, y: _dec(x) ** _dec(y),
+                    "exp": lambda x: _dec(x).exp(),
+                    "fabs": lambda x: abs(_dec(x)),
+                    "floor": lambda x: _dec(x).to_integral_value(rounding=ROUND_FLOOR),
+                    "ceil": lambda x: _dec(x).to_integral_value(rounding=ROUND_CEILING),
+                    "degrees": lambda x: _dec(x) * 180 / _dec_pi(),
+                    "radians": lambda x: _dec(x) * _dec_pi() / 180,
+                    "factorial": _dec_factorial,
+                    "lfactorial": lambda x: _dec(exact_factorial(_integral(x))).ln(),
+                    "gamma": _dec_gamma,
+                    "lgamma": _via_float(math.lgamma, lambda v: Decimal(repr(v))),
+                    "polygamma": _via_float(polygamma, lambda v: Decimal(repr(v))),
+                    "ln": lambda x: _dec(x).ln(),
+                    "abs": abs,
+                    "pi": pi,
+                    "e": Decimal(1).exp(),
+                    "tau": 2 * pi,
+                    "inf": Decimal("Infinity"),
+                    "nan": Decimal("NaN"),
+                }
+        return self._names
+
+    def result(self, value: Any) -> Any:
+        if isinstance(value, (Decimal, int, float)) and not isinstance(value, bool):
+            with self.context():
+                return +_dec(value)
+        raise ValueError("Expression did not evaluate to a number")
+
+
+# Fraction
+
+def _frac(x: Any) -> Fraction:
+    return x if isinstance(x, Fraction) else Fraction(repr(x)) if isinstance(x, float) else Fraction(x)
+
+
+def _frac_sqrt(x: Any) -> Any:
+    x = _frac(x)
+    if x >= 0:
+        num, den = math.isqrt(x.numerator), math.isqrt(x.denominator)
+        if num * num == x.numerator and den * den == x.denominator:
+            return Fraction(num, den)
+    return Fraction(math.sqrt(x))
+
+
+def _frac_gamma(x: Any) -> Fraction:
+    x = _frac(x)
+    if x.denominator == 1 and x > 0:
+        return Fraction(exact_factorial(x.numerator - 1))
+    return Fraction(math.gamma(x))
+
+
+def _frac_lfactorial(x: Any) -> Fraction:
+    return Fraction(math.lgamma(_integral(x) + 1))
+
+
+# Computed in floats, so any argument costs the same.
+_frac_lfactorial.cost_bounded = True  # type: ignore[attr-defined]
+
+
+class FractionBackend(Backend):
+    """Exact rational arithmetic with fractions.Fraction.
+
+    +, -, *, /, integer powers, factorial, floor/ceil/abs and square roots of
+    perfect squares are exact. Functions with no rational result (sin, exp,
+    ...) are computed in floating point and converted back.
+    """
+
+    name = "fraction"
+
+    def __init__(self) -> None:
+        self._names: Optional[Dict[str, Any]] = None
+
+    def number(self, value: Any) -> Any:
+        return _frac(value)
+
+    def names(self) -> Mapping[str, Any]:
+        if self._names is None:
+            approx = Fraction
+            names: Dict[str, Any] = {}
+            for name in ("sin", "cos", "tan", "asin", "acos", "atan", "sinh", "cosh", "tanh",
+                         "log", "log10", "exp", "degrees", "radians", "lgamma"):
+                names[name] = _via_float(getattr(math, name), approx)
+            names.update({
+                "ln": names["log"],
+                "sqrt": _frac_sqrt,
+                "pow": lambda x, y: _frac(x) ** _frac(y),
+                "fabs": lambda x: abs(_frac(x)),
+                "abs": abs,
+                "floor": lambda x: Fraction(math.floor(x)),
+                "ceil": lambda x: Fraction(math.ceil(x)),
+                "factorial": lambda x: Fraction(exact_factorial(_integral(x))),
+                "lfactorial": _frac_lfactorial,
+                "gamma": _frac_gamma,
+                "polygamma": _via_float(polygamma, approx),
+                "pi": Fraction(math.pi),
+                "e": Fraction(math.e),
+                "tau": Fraction(math.tau),
+                "inf": math.inf,
+                "nan": math.nan,
+            })
+            self._names = names
+        return self._names
+
+    def result(self, value: Any) -> Any:
+        if isinstance(value, float) and not math.isfinite(value):
+            raise ValueError("Result is not a finite rational number")
+        if isinstance(value, (Fraction, int, float)) and not isinstance(value, bool):
+            return _frac(value)
+        raise ValueError("Expression did not evaluate to a number")
+
+
+register_backend(DecimalBackend())
+register_backend(FractionBackend())
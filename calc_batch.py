@@ -0,0 +1,414 @@
+import math
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import replace
+from itertools import islice
+from multiprocessing.connection import Connection
+from multiprocessing.connection import wait as wait_connections
+from typing import Any, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import calc_core
+from calc_eval import CompiledExpression
+from calc_matrix import STACK_PREFIX, ComplexBackend
+
+DEFAULT_CHUNKSIZE = 512
+
+
+class EvalResult(NamedTuple):
+    index: int
+    value: Any
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def jsonable(value: Any) -> Any:
+    """``value`` as plain JSON data.
+
+    Non-finite floats become strings, complex numbers ``[re, im]`` pairs and
+    arrays nested lists.
+    """
+    if value is None or isinstance(value, (bool, int)):
+        return value
+    if isinstance(value, float):
+        return value if math.isfinite(value) else str(value)
+    if isinstance(value, complex):
+        return [jsonable(value.real), jsonable(value.imag)]
+    if isinstance(value, list):
+        return [jsonable(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): jsonable(v) for k, v in value.items()}
+    if hasattr(value, "tolist"):
+        # NumPy arrays and scalars: nested lists of Python numbers.
+        return jsonable(value.tolist())
+    return str(value)
+
+
+def _evaluate_one(index: int, text: str) -> EvalResult:
+    try:
+        return EvalResult(index, calc_core.evaluate_expression(text))
+    except (ZeroDivisionError, ValueError, OverflowError) as exc:
+        return EvalResult(index, None, exc)
+    except Exception as exc:
+        return EvalResult(index, None, ValueError(str(exc) or "Invalid expression"))
+
+
+def _evaluate_complex_one(index: int, text: str) -> EvalResult:
+    try:
+        return EvalResult(index, calc_core.evaluate_complex(text))
+    except (ZeroDivisionError, ValueError, OverflowError) as exc:
+        return EvalResult(index, None, exc)
+    except Exception as exc:
+        return EvalResult(index, None, ValueError(str(exc) or "Invalid expression"))
+
+
+def _evaluate_chunk(start: int, chunk: Sequence[str]) -> List[EvalResult]:
+    return [_evaluate_one(start + offset, text) for offset, text in enumerate(chunk)]
+
+
+def _init_worker(
+    cache_size: int, limits: calc_core.Limits, warmup: Sequence[str], shared_path: Optional[str] = None
+) -> None:
+    # Each worker keeps its own compiled-expression cache for its lifetime;
+    # compiling the known hot set up front saves the first chunks the misses.
+    # With the parent's shared result cache, workers also share results.
+    calc_core.set_limits(limits)
+    calc_core.set_cache_size(cache_size)
+    if shared_path is not None:
+        calc_core.enable_shared_cache(shared_path)
+    for text in warmup:
+        try:
+            calc_core.compile_expression(text)
+        except ValueError:
+            pass
+
+
+def _chunks(expressions: Iterable[str], chunksize: int) -> Iterator[Tuple[int, List[str]]]:
+    it = iter(expressions)
+    start = 0
+    while True:
+        chunk = list(islice(it, chunksize))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+def _make_pool(workers: int, warmup: Sequence[str]) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(
+            calc_core.cache_info()["maxsize"],
+            calc_core.get_limits(),
+            tuple(warmup),
+            calc_core.shared_cache_path(),
+        ),
+    )
+
+
+def _supervised_worker(
+    conn: Connection,
+    current: Any,
+    cache_size: int,
+    limits: calc_core.Limits,
+    warmup: Sequence[str],
+    shared_path: Optional[str],
+) -> None:
+    # Publishes the index of the expression it is on in ``current`` (shared
+    # memory, so it costs no message) and sends results a chunk at a time.
+    _init_worker(cache_size, limits, warmup, shared_path)
+    while True:
+        job = conn.recv()
+        if job is None:
+            return
+        start, chunk = job
+        results = []
+        for offset, text in enumerate(chunk):
+            current.value = start + offset
+            results.append(_evaluate_one(start + offset, text))
+        conn.send(results)
+
+
+class _Worker:
+    __slots__ = ("process", "conn", "current", "jobs", "seen", "since")
+
+    def __init__(self, cache_size: int, limits: calc_core.Limits, warmup: Sequence[str]) -> None:
+        self.conn, child = multiprocessing.Pipe()
+        self.current = multiprocessing.RawValue("q", -1)
+        self.process = multiprocessing.Process(
+            target=_supervised_worker,
+            args=(child, self.current, cache_size, limits, tuple(warmup), calc_core.shared_cache_path()),
+            daemon=True,
+        )
+        self.process.start()
+        child.close()
+        # Chunks sent and not yet returned, oldest first.
+        self.jobs: Deque[Tuple[int, List[str]]] = deque()
+        # The last value read from ``current`` and when it was first seen.
+        self.seen = -1
+        self.since = time.monotonic()
+
+    def watch(self, now: float) -> None:
+        value = self.current.value
+        if value != self.seen:
+            self.seen, self.since = value, now
+
+    def started(self) -> bool:
+        # False while the worker is still starting up or between chunks.
+        start, chunk = self.jobs[0]
+        return start <= self.seen < start + len(chunk)
+
+    def stop(self, kill: bool = False) -> None:
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+def _iter_supervised(
+    expressions: Iterable[str], workers: int, chunksize: int, ordered: bool, warmup: Sequence[str], timeout: float
+) -> Iterator[EvalResult]:
+    # A pool that can kill a worker stuck on one expression. An item whose
+    # index has not moved for ``timeout`` seconds is failed with an
+    # EvaluationTimeoutError, its worker is replaced, and the rest of that
+    # worker's chunks (including results it had not sent yet) are handed
+    # out again. So a stuck item is cut off after one to two timeouts.
+    limits = replace(calc_core.get_limits(), timeout=timeout)
+    cache_size = calc_core.cache_info()["maxsize"]
+    chunks = _chunks(expressions, chunksize)
+    retry: Deque[Tuple[int, List[str]]] = deque()
+    exhausted = False
+    # Ordered output is buffered; no chunk is handed out more than
+    # ``window`` items past the next one to yield, which bounds the buffer.
+    window = workers * 2 * chunksize
+    buffer: Dict[int, EvalResult] = {}
+    next_index = issued = 0
+    pool = [_Worker(cache_size, limits, warmup) for _ in range(workers)]
+
+    def finish(results: List[EvalResult]) -> Iterator[EvalResult]:
+        nonlocal next_index
+        if not ordered:
+            yield from results
+            return
+        for result in results:
+            buffer[result.index] = result
+        while next_index in buffer:
+            yield buffer.pop(next_index)
+            next_index += 1
+
+    def abandon(worker: _Worker, error: Exception) -> Iterator[EvalResult]:
+        start, chunk = worker.jobs.popleft()
+        failed = worker.current.value
+        if not start <= failed < start + len(chunk):
+            # Died before starting the chunk; nothing in it is to blame.
+            worker.jobs.appendleft((start, chunk))
+            failed = -1
+        else:
+            done = failed - start
+            if done + 1 < len(chunk):
+                worker.jobs.appendleft((failed + 1, chunk[done + 1:]))
+            if done:
+                worker.jobs.appendleft((start, chunk[:done]))
+        retry.extendleft(reversed(worker.jobs))
+        pool[pool.index(worker)] = _Worker(cache_size, limits, warmup)
+        worker.stop(kill=True)
+        if failed >= 0:
+            yield from finish([EvalResult(failed, None, error)])
+
+    try:
+        while True:
+            for worker in pool:
+                while len(worker.jobs) < 2:
+                    if retry:
+                        job = retry.popleft()
+                    elif exhausted or (ordered and issued - next_index >= window):
+                        break
+                    else:
+                        job = next(chunks, None)
+                        if job is None:
+                            exhausted = True
+                            break
+                        issued = job[0] + len(job[1])
+                    if not worker.jobs:
+                        worker.seen, worker.since = worker.current.value, time.monotonic()
+                    worker.jobs.append(job)
+                    worker.conn.send(job)
+            busy = [worker for worker in pool if worker.jobs]
+            if not busy:
+                return
+            wait_for = max(0.0, min(worker.since for worker in busy) + timeout - time.monotonic())
+            ready = wait_connections([worker.conn for worker in busy], wait_for)
+            now = time.monotonic()
+            for worker in busy:
+                if worker.conn in ready:
+                    try:
+                        results = worker.conn.recv()
+                    except (EOFError, OSError):
+                        yield from abandon(worker, ValueError("Evaluation worker exited unexpectedly"))
+                        continue
+                    worker.jobs.popleft()
+                    yield from finish(results)
+                worker.watch(now)
+                if worker.jobs and now - worker.since > timeout and worker.started() and not worker.conn.poll():
+                    yield from abandon(worker, calc_core.EvaluationTimeoutError(f"Evaluation took longer than {timeout:g} s"))
+    finally:
+        for worker in pool:
+            worker.stop(kill=bool(worker.jobs))
+
+
+def iter_evaluate(
+    expressions: Iterable[str],
+    workers: Optional[int] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    ordered: bool = True,
+    warmup: Sequence[str] = (),
+    timeout: Optional[float] = None,
+) -> Iterator[EvalResult]:
+    """Evaluate ``expressions`` across a process pool, yielding as chunks finish.
+
+    The input is consumed lazily with at most two chunks in flight per
+    worker, so arbitrarily long iterables run in bounded memory. With
+    ``ordered=False`` results are yielded in completion order; every result
+    carries its input index either way. ``workers=1`` evaluates in-process.
+
+    With a ``timeout`` (seconds per expression), a worker stuck on one
+    expression is killed and replaced; that item's result carries an
+    EvaluationTimeoutError and the rest of the batch carries on. Work that
+    never returns to the evaluator (one huge integer operation) can only be
+    stopped that way, so with a timeout even ``workers=1`` runs in one
+    supervised worker process.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, chunksize)
+    if timeout is not None:
+        yield from _iter_supervised(expressions, workers, chunksize, ordered, warmup, timeout)
+        return
+    if workers <= 1:
+        for text in warmup:
+            try:
+                calc_core.compile_expression(text)
+            except ValueError:
+                pass
+        for start, chunk in _chunks(expressions, chunksize):
+            yield from _evaluate_chunk(start, chunk)
+        return
+
+    max_pending = workers * 2
+    chunks = _chunks(expressions, chunksize)
+    with _make_pool(workers, warmup) as pool:
+        if ordered:
+            pending: Deque[Future] = deque()
+            for start, chunk in chunks:
+                pending.append(pool.submit(_evaluate_chunk, start, chunk))
+                if len(pending) >= max_pending:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        else:
+            running: Set[Future] = set()
+            exhausted = False
+            while running or not exhausted:
+                while not exhausted and len(running) < max_pending:
+                    try:
+                        start, chunk = next(chunks)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    running.add(pool.submit(_evaluate_chunk, start, chunk))
+                if not running:
+                    break
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+
+
+def evaluate_many(
+    expressions: Iterable[str],
+    workers: Optional[int] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    warmup: Sequence[str] = (),
+    timeout: Optional[float] = None,
+) -> List[EvalResult]:
+    """Evaluate a batch in parallel; results come back in input order.
+
+    A failing item does not abort the batch: its EvalResult carries the
+    ZeroDivisionError or ValueError that evaluate_expression raised, or an
+    EvaluationTimeoutError when it ran past ``timeout``.
+    """
+    return list(
+        iter_evaluate(expressions, workers=workers, chunksize=chunksize, ordered=True, warmup=warmup, timeout=timeout)
+    )
+
+
+_stacked_backend = ComplexBackend(stacked=True)
+# Smaller groups are evaluated one expression at a time.
+_MIN_STACK = 4
+
+
+def _run_stacked(
+    template: CompiledExpression, members: List[Tuple[int, Tuple[Any, ...]]], results: List[Optional[EvalResult]]
+) -> None:
+    # Fills in results for the members the stacked run got a finite value
+    # for; the rest are left for one-at-a-time evaluation, which reports
+    # errors as evaluate_complex does. One singular matrix fails a whole
+    # stacked inv, so a group that raises is split in half and retried.
+    import numpy as np
+
+    columns = np.array([literals for _, literals in members], dtype=float).T
+    bound = {f"{STACK_PREFIX}{k}": column for k, column in enumerate(columns)}
+    try:
+        values = calc_core.evaluate_compiled(template, _stacked_backend, bound)
+    except Exception:
+        if len(members) >= _MIN_STACK * 2:
+            half = len(members) // 2
+            _run_stacked(template, members[:half], results)
+            _run_stacked(template, members[half:], results)
+        return
+    if not isinstance(values, np.ndarray) or values.shape[0] != len(members):
+        return
+    finite = np.isfinite(values).reshape(len(members), -1).all(axis=1)
+    for (index, _), value, ok in zip(members, values, finite):
+        if ok:
+            results[index] = EvalResult(index, complex(value) if value.ndim == 0 else value)
+
+
+def evaluate_stacked(expressions: Iterable[str]) -> List[EvalResult]:
+    """Evaluate a batch on the complex backend, one NumPy operation per shape.
+
+    Expressions that differ only in their numbers, such as many
+    det([[a, b], [c, d]]) or inv(...) @ [[x], [y]], share a template; each
+    template runs once over arrays of those numbers, so a thousand 2x2
+    determinants cost one stacked det. Values are what
+    calc_core.evaluate_complex returns, up to rounding; anything a stacked
+    run cannot reproduce (errors, inf and nan, exact big integers, lone
+    vectors) is evaluated on its own. Runs in-process, in input order.
+    """
+    texts = list(expressions)
+    results: List[Optional[EvalResult]] = [None] * len(texts)
+    groups: Dict[int, Tuple[CompiledExpression, List[Tuple[int, Tuple[Any, ...]]]]] = {}
+    for index, text in enumerate(texts):
+        try:
+            entry = calc_core.compile_stacked(text)
+        except Exception:
+            continue
+        if entry is not None:
+            template, literals = entry
+            groups.setdefault(id(template), (template, []))[1].append((index, literals))
+    for template, members in groups.values():
+        if len(members) >= _MIN_STACK:
+            _run_stacked(template, members, results)
+    return [
+        result if result is not None else _evaluate_complex_one(index, text)
+        for index, (text, result) in enumerate(zip(texts, results))
+    ]
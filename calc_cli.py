@@ -0,0 +1,189 @@
+"""Headless bulk evaluation: ``python calc_cli.py [input] [options]``.
+
+Reads one expression per line (or a CSV/JSONL column) from a file or stdin
+and streams results out as they are computed, so memory stays bounded no
+matter how large the input is.
+"""
+import argparse
+import csv
+import json
+import sys
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, TextIO, Tuple
+
+import calc_core
+from calc_batch import DEFAULT_CHUNKSIZE, EvalResult, iter_evaluate, jsonable
+
+# The record as read, its expression, the line of the input it ends on, and
+# the error that made the record unreadable, if any.
+Record = Tuple[Any, str, int, Optional[Exception]]
+
+
+def _read_lines(stream: TextIO) -> Iterator[Record]:
+    for number, line in enumerate(stream, 1):
+        text = line.rstrip("\r\n")
+        yield text, text, number, None
+
+
+def _read_csv(stream: TextIO, column: Optional[str]) -> Iterator[Record]:
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames:
+        return
+    key = column or reader.fieldnames[0]
+    if key not in reader.fieldnames:
+        raise SystemExit(f"error: column {key!r} not found in CSV header")
+    for row in reader:
+        yield row, row.get(key) or "", reader.line_num, None
+
+
+def _read_jsonl(stream: TextIO, column: Optional[str]) -> Iterator[Record]:
+    key = column or "expression"
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        text = line.strip()
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield None, text, number, ValueError(f"Invalid JSON on line {number}: {exc.msg}")
+            continue
+        if isinstance(obj, dict):
+            if key in obj:
+                yield obj, str(obj[key]), number, None
+            else:
+                yield obj, "", number, ValueError(f"No {key!r} field on line {number}")
+        elif isinstance(obj, str) or (isinstance(obj, (int, float)) and not isinstance(obj, bool)):
+            yield {key: obj}, str(obj), number, None
+        else:
+            yield None, text, number, ValueError(f"Line {number} is not a JSON object or expression")
+
+
+def read_records(stream: TextIO, input_format: str, column: Optional[str]) -> Iterator[Record]:
+    if input_format == "csv":
+        return _read_csv(stream, column)
+    if input_format == "jsonl":
+        return _read_jsonl(stream, column)
+    return _read_lines(stream)
+
+
+class _Writer:
+    def __init__(self, out: TextIO, output_format: str) -> None:
+        self.out = out
+        self.format = output_format
+        self._csv: Optional[Any] = None
+
+    def write(self, record: Any, expression: str, result: EvalResult) -> None:
+        error = f"{type(result.error).__name__}: {result.error}" if result.error else None
+        if self.format == "text":
+            self.out.write(f"ERROR {error}\n" if error else f"{result.value!r}\n")
+        elif self.format == "jsonl":
+            obj: Dict[str, Any] = dict(record) if isinstance(record, dict) else {"expression": expression}
+            obj["result"] = result.value
+            obj["error"] = error
+            # Infinite and NaN results (171!) become strings, not the
+            # Infinity/NaN tokens strict JSON parsers reject.
+            self.out.write(json.dumps(jsonable(obj), allow_nan=False) + "\n")
+        else:
+            row: Dict[str, Any] = dict(record) if isinstance(record, dict) else {"expression": expression}
+            row["result"] = "" if result.value is None else repr(result.value)
+            row["error"] = error or ""
+            if self._csv is None:
+                # The first record fixes the columns; keys other records add
+                # are dropped and the ones they lack are left empty.
+                self._csv = csv.DictWriter(self.out, fieldnames=list(row), extrasaction="ignore")
+                self._csv.writeheader()
+            self._csv.writerow(row)
+
+
+def run(
+    stream: TextIO,
+    out: TextIO,
+    input_format: str = "lines",
+    output_format: str = "text",
+    column: Optional[str] = None,
+    errors: str = "mark",
+    workers: Optional[int] = 1,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    timeout: Optional[float] = None,
+) -> int:
+    """Evaluate every record from ``stream`` and write results to ``out``.
+
+    Returns the process exit status: 0 on success, 1 if ``errors='abort'``
+    stopped at a failing expression.
+    """
+    # Records whose results have not come back yet; results are ordered, so
+    # they pair up with the head of this queue.
+    pending: Deque[Record] = deque()
+
+    def expressions() -> Iterator[str]:
+        for record in read_records(stream, input_format, column):
+            pending.append(record)
+            # An unreadable record still takes its place in the ordered
+            # results, as a blank expression whose result is replaced below.
+            yield "" if record[3] else record[1]
+
+    writer = _Writer(out, output_format)
+    results = iter_evaluate(expressions(), workers=workers, chunksize=chunksize, ordered=True, timeout=timeout)
+    try:
+        for result in results:
+            record, expression, line, unreadable = pending.popleft()
+            if unreadable is not None:
+                result = EvalResult(result.index, None, unreadable)
+            if result.error is not None:
+                if errors == "skip":
+                    continue
+                if errors == "abort":
+                    sys.stderr.write(f"line {line}: {expression!r}: {result.error}\n")
+                    return 1
+            writer.write(record, expression, result)
+    finally:
+        results.close()
+        out.flush()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Evaluate calculator expressions in bulk.")
+    parser.add_argument("input", nargs="?", default="-", help="input file, or - for stdin (default)")
+    parser.add_argument("-o", "--output", default="-", help="output file, or - for stdout (default)")
+    parser.add_argument("-i", "--input-format", choices=("lines", "csv", "jsonl"), default="lines")
+    parser.add_argument("-f", "--output-format", choices=("text", "csv", "jsonl"), default="text")
+    parser.add_argument("-c", "--column", help="CSV column or JSONL field holding the expression")
+    parser.add_argument("-e", "--errors", choices=("skip", "mark", "abort"), default="mark",
+                        help="drop failing rows, mark them in the output, or stop at the first one")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="worker processes (0 = one per CPU)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("-t", "--timeout", type=float,
+                        help="seconds allowed per expression; stuck workers are killed and replaced")
+    parser.add_argument("--shared-cache", nargs="?", const="", metavar="PATH",
+                        help="share results with other processes through PATH (default: a per-user file in /dev/shm)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.shared_cache is not None:
+        calc_core.enable_shared_cache(args.shared_cache or None)
+    stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", newline="")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        return run(
+            stream,
+            out,
+            input_format=args.input_format,
+            output_format=args.output_format,
+            column=args.column,
+            errors=args.errors,
+            workers=args.workers or None,
+            chunksize=args.chunksize,
+            timeout=args.timeout,
+        )
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+import ast
+import math
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from calc_eval import Limits, Program, guarded_binops, guarded_function
+from calc_opt import TEMP_PREFIX, Optimized, _children, _postorder
+
+# Evaluations of one compiled expression, per backend, before it is
+# compiled to a Python function; 0 keeps every expression on closures.
+threshold = 100
+
+# Generated expressions are split into locals past this nesting depth,
+# well inside what CPython's parser and compiler accept.
+_MAX_NESTING = 50
+
+_OPERATORS = {
+    ast.Add: "+",
+    ast.Sub: "-",
+    ast.Mult: "*",
+    ast.Div: "/",
+    ast.FloorDiv: "//",
+    ast.Mod: "%",
+    ast.Pow: "**",
+    ast.MatMult: "@",
+}
+# Functions in the float table whose result can be an int; everything else
+# returns a float (abs returns whatever it is given).
+_INTEGER_RESULTS = frozenset({"floor", "ceil"})
+
+
+class Unsupported(Exception):
+    """The tree cannot be compiled to Python; the closure program stays."""
+
+
+class _Emitter:
+    """Python source for one Optimized tree.
+
+    User names become locals ``v0``, ``v1``, ... (never the names themselves:
+    Python NFKC-normalizes identifiers, so "ﬁ" and "fi" would be one local)
+    and everything the code needs besides literals (functions, guarded
+    operators, constants without a literal form) becomes a keyword default
+    starting with ``_``, so the two never collide and every load in the
+    body is a fast local.
+    """
+
+    def __init__(self, names: Mapping[str, Any], limits: Limits, floats: Optional[Sequence[str]]) -> None:
+        self.names = names
+        self.limits = limits
+        # Names whose values are known to be floats at run time; None for
+        # other backends, where no value is assumed to be a float and every
+        # operator is guarded, as lower does for them.
+        self.typed = floats is not None
+        self.ops = guarded_binops(limits, not self.typed)
+        self.floats = set(floats or ())
+        self.defaults: Dict[str, Any] = {}
+        self._bound: Dict[int, str] = {}
+        self._variables: Dict[str, str] = {}
+        self.lines: List[str] = []
+        self._locals = 0
+
+    def bind(self, hint: str, value: Any) -> str:
+        name = self._bound.get(id(value))
+        if name is None:
+            name = f"_{hint}"
+            if name in self.defaults:
+                name = f"_{hint}_{len(self.defaults)}"
+            self.defaults[name] = value
+            self._bound[id(value)] = name
+        return name
+
+    def variable(self, name: str) -> str:
+        local = self._variables.get(name)
+        if local is None:
+            local = self._variables[name] = f"v{len(self._variables)}"
+        return local
+
+    def literal(self, value: Any) -> Tuple[str, bool]:
+        kind = type(value)
+        if kind is float and math.isfinite(value):
+            text = repr(value)
+            return (f"({text})" if text[0] == "-" else text), True
+        if kind is int and value.bit_length() < 64:
+            return f"({value!r})" if value < 0 else repr(value), False
+        return self.bind("c", value), kind is float
+
+    def spill(self, text: str) -> str:
+        name = f"_r{self._locals}"
+        self._locals += 1
+        self.lines.append(f"{name} = {text}")
+        return name
+
+    def expression(self, root: ast.expr) -> Tuple[str, bool]:
+        """Source for ``root`` and whether its value is known to be a float."""
+        # node -> (source, nesting depth, known to be a float)
+        done: Dict[int, Tuple[str, int, bool]] = {}
+        for node in _postorder(root):
+            done[id(node)] = self._node(node, done)
+        text, _, is_float = done[id(root)]
+        return text, is_float and self.typed
+
+    def _node(self, node: ast.expr, done: Dict[int, Tuple[str, int, bool]]) -> Tuple[str, int, bool]:
+        kind = type(node)
+        if kind is ast.Constant:
+            text, is_float = self.literal(node.value)
+            return text, 0, is_float
+        if kind is ast.Name:
+            if node.id.startswith(TEMP_PREFIX):
+                return "_t" + node.id[len(TEMP_PREFIX):], 0, node.id in self.floats
+            if node.id in self.names:
+                text, is_float = self.literal(self.names[node.id])
+                return text, 0, is_float
+            return self.variable(node.id), 0, node.id in self.floats
+        operands = [self._operand(child, done) for child in _children(node)]
+        depth = 1 + max((d for _, d, _ in operands), default=0)
+        if kind is ast.UnaryOp:
+            text, _, is_float = operands[0]
+            return (text, depth - 1, is_float) if type(node.op) is ast.UAdd else (f"(-{text})", depth, is_float)
+        if kind is ast.BinOp:
+            (left, _, left_float), (right, _, right_float) = operands
+            op = type(node.op)
+            # * and ** are the operators guarded against big integers; a
+            # float operand makes the guard a no-op.
+            if op is ast.Mult and not (left_float or right_float):
+                return f"{self.bind('mul', self.ops[op])}({left}, {right})", depth, False
+            if op is ast.Pow and not left_float:
+                return f"{self.bind('power', self.ops[op])}({left}, {right})", depth, right_float
+            if not self.typed:
+                return f"{self.bind(op.__name__.lower(), self.ops[op])}({left}, {right})", depth, False
+            return f"({left} {_OPERATORS[op]} {right})", depth, left_float or right_float or op is ast.Div
+        if kind is ast.Call:
+            name = node.func.id
+            if name not in self.names:
+                raise Unsupported(f"call to user function {name}")
+            fn = guarded_function(name, self.names[name], self.limits, not self.typed)
+            args = ", ".join(text for text, _, _ in operands)
+            if name == "abs":
+                is_float = operands[0][2]
+            else:
+                is_float = name not in _INTEGER_RESULTS
+            return f"{self.bind(name, fn)}({args})", depth, is_float
+        raise Unsupported(kind.__name__)
+
+    def _operand(self, child: ast.expr, done: Dict[int, Tuple[str, int, bool]]) -> Tuple[str, int, bool]:
+        text, depth, is_float = done.pop(id(child))
+        is_float = is_float and self.typed
+        if depth >= _MAX_NESTING:
+            return self.spill(text), 0, is_float
+        return text, depth, is_float
+
+
+def _free_names(optimized: Optimized, names: Mapping[str, Any]) -> List[str]:
+    free = set()
+    for root in [optimized.body, *(expr for _, expr in optimized.temps)]:
+        for node in ast.walk(root):
+            if type(node) is ast.Name and node.id not in names and not node.id.startswith(TEMP_PREFIX):
+                free.add(node.id)
+    return sorted(free)
+
+
+def _source(optimized: Optimized, emitter: _Emitter, head: str, prologue: List[str]) -> str:
+    for name, expr in optimized.temps:
+        text, is_float = emitter.expression(expr)
+        emitter.lines.append(f"_t{name[len(TEMP_PREFIX):]} = {text}")
+        if is_float:
+            emitter.floats.add(name)
+    body, _ = emitter.expression(optimized.body)
+    defaults = "".join(f", {name}={name}" for name in emitter.defaults)
+    lines = [f"def {head}{defaults}):", *prologue, *emitter.lines, f"return {body}"]
+    return "\n    ".join(lines) + "\n"
+
+
+def _build(source: str, head: str, emitter: _Emitter) -> Any:
+    namespace = dict(emitter.defaults)
+    try:
+        code = compile(source, "<calc>", "exec")
+    except (SyntaxError, RecursionError, MemoryError) as exc:
+        raise Unsupported(str(exc)) from None
+    exec(code, namespace)
+    fn = namespace[head]
+    fn.generated_source = source
+    return fn
+
+
+def generate(optimized: Optimized, names: Mapping[str, Any], limits: Limits, fallback: Program, floats: bool) -> Program:
+    """A Python function equivalent to ``lower_optimized(optimized, ...)``.
+
+    It takes the same variable mapping as the closure program. With
+    ``floats`` (the float backend), arithmetic on variables compiles to
+    plain operators; a call whose variables are not all floats is passed
+    to ``fallback``, the closure program, instead. Raises Unsupported for
+    trees that call user functions.
+    """
+    free = _free_names(optimized, names)
+    emitter = _Emitter(names, limits, free if floats else None)
+    # A missing name is left to the closure program, which reports it.
+    local = emitter.variable
+    prologue = ["try:", *(f"    {local(name)} = env[{name!r}]" for name in free), "except KeyError:", "    return _fallback(env)"]
+    if floats and free:
+        check = " or ".join(f"type({local(name)}) is not _float" for name in free)
+        prologue.append(f"if {check}:")
+        prologue.append("    return _fallback(env)")
+    emitter.defaults.update(_fallback=fallback, _float=float)
+    source = _source(optimized, emitter, "program(env, *", prologue)
+    return _build(source, "program", emitter)
+
+
+def generate_function(
+    optimized: Optimized,
+    names: Mapping[str, Any],
+    limits: Limits,
+    fallback: Program,
+    var: str,
+    fixed: Mapping[str, Any],
+) -> Any:
+    """The float program as a function of ``var`` alone.
+
+    Every other free name is taken from ``fixed`` once, as a keyword
+    default, so a call is ``fn(x)``. Arguments that are not floats go to
+    ``fallback`` with a mapping built for the call.
+    """
+    free = _free_names(optimized, names)
+    others = [name for name in free if name != var]
+    missing = [name for name in others if name not in fixed]
+    if missing:
+        raise Unsupported(f"unbound name {missing[0]}")
+    emitter = _Emitter(names, limits, [var] + [name for name in others if type(fixed[name]) is float])
+    local = emitter.variable
+    mapping = ", ".join(f"{name!r}: {local(name)}" for name in [var] + others)
+    prologue = [
+        f"if type({local(var)}) is not _float:",
+        f"    return _fallback({{{mapping}}})",
+    ]
+    emitter.defaults.update(_fallback=fallback, _float=float)
+    emitter.defaults.update({local(name): fixed[name] for name in others})
+    source = _source(optimized, emitter, f"function({local(var)}, *", prologue)
+    return _build(source, "function", emitter)
+
+
+def promote(optimized: Optimized, names: Mapping[str, Any], limits: Limits, fallback: Program, floats: bool) -> Optional[Program]:
+    """generate(), or None when the tree has to stay on closures."""
+    if type(optimized.body) is ast.Constant and not optimized.temps:
+        return None
+    try:
+        return generate(optimized, names, limits, fallback, floats)
+    except Unsupported:
+        return None
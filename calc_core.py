@@ -1,6 +1,60 @@
+import ast
 import math
-import re
-from typing import Any, Dict
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import replace
+from functools import partial
+from importlib import import_module
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Mapping, Optional, Tuple, Union
+
+import calc_special
+from calc_backends import Backend, DecimalBackend, FractionBackend, get_backend, register_backend, to_float
+from calc_eval import (
+    DEFAULT_LIMITS,
+    CompiledExpression,
+    EvaluationLimitError,
+    EvaluationTimeoutError,
+    InputTooLongError,
+    IntegerTooLargeError,
+    Limits,
+    MatrixError,
+    NestingTooDeepError,
+    compile_tree,
+)
+from calc_parser import IncrementalParser, parse_expression, parse_tokens, to_python, tokenize
+from calc_profile import ACTIVE, Profile, count, now, record
+
+if TYPE_CHECKING:
+    from calc_interval import Interval
+    from calc_units import CompiledQuantity, Quantity
+
+# Optimizer, code generator, dual numbers, intervals, matrices and units are
+# imported by the functions that use them, so "import calc_core" only loads
+# the float evaluator. Their public names are still calc_core attributes,
+# resolved on first access by __getattr__ below.
+_LAZY_EXPORTS = {
+    "calc_codegen": ("Unsupported", "generate", "generate_function"),
+    "calc_diff": ("Dual", "DualBackend", "derivative", "source"),
+    "calc_interval": ("Interval", "IntervalBackend", "to_interval"),
+    "calc_matrix": ("COMPLEX_NAMES", "ComplexBackend", "needs_complex", "stack_template", "stackable"),
+    "calc_opt": ("describe", "fold", "optimize"),
+    "calc_units": (
+        "UNITS", "CompiledQuantity", "DimensionError", "Quantity", "analyze", "attach_units", "format_dims",
+        "has_units", "parse_unit",
+    ),
+}
+_LAZY_MODULES = {name: module for module, names in _LAZY_EXPORTS.items() for name in names}
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY_MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module), name)
+    globals()[name] = value
+    return value
 
 
 def build_allowed_names() -> Dict[str, Any]:
@@ -25,11 +79,13 @@ def build_allowed_names() -> Dict[str, Any]:
         "ceil",
         "degrees",
         "radians",
-        "factorial",
-        "gamma",
-        "lgamma",
     ]:
         allowed[name] = getattr(math, name)
+    allowed["factorial"] = calc_special.factorial
+    allowed["lfactorial"] = calc_special.lfactorial
+    allowed["gamma"] = calc_special.gamma
+    allowed["lgamma"] = calc_special.lgamma
+    allowed["polygamma"] = calc_special.polygamma
     allowed["ln"] = math.log
     allowed["abs"] = abs
     allowed.update({
@@ -43,65 +99,885 @@ def build_allowed_names() -> Dict[str, Any]:
 
 
 def replace_factorial_operators(expression: str) -> str:
-    pattern_number = re.compile(r"(?P<val>(?:\d+(?:\.\d+)?)|(?:pi|e|tau|inf|nan))!")
-    pattern_paren = re.compile(r"\)(!)+")
-
-    prev = None
-    s = expression
-    while prev != s:
-        prev = s
-        s = pattern_number.sub(lambda m: f"factorial({m.group('val')})", s)
-
-    while True:
-        match = pattern_paren.search(s)
-        if not match:
-            break
-        bangs = match.group(1)
-        close_index = match.start()
-        open_index = close_index
-        depth = 0
-        while open_index >= 0:
-            ch = s[open_index]
-            if ch == ')':
-                depth += 1
-            elif ch == '(':
-                depth -= 1
-                if depth == 0:
-                    break
-            open_index -= 1
-        if open_index < 0:
-            break
-        inner = s[open_index: close_index + 1]
-        wrapped = inner
-        for _ in bangs:
-            wrapped = f"factorial{wrapped}"
-        s = s[:open_index] + wrapped + s[close_index + 1 + len(bangs):]
-    return s
+    """Convert occurrences of x! into factorial(x), including 5!! and (3+2)!."""
+    return to_python(tokenize(expression), percent=False)
 
 
 def preprocess_expression(expr: str) -> str:
-    s = expr.strip()
-    if not s:
-        return s
-    s = s.replace('×', '*').replace('÷', '/')
-    s = s.replace('^', '**')
-    s = re.sub(r"(\d+(?:\.\d+)?)%", r"(\1/100)", s)
-    s = replace_factorial_operators(s)
-    return s
-
-
-def evaluate_expression(text: str) -> float:
-    expr = preprocess_expression(text)
-    if not expr:
-        return 0.0
+    """Rewrite calculator syntax (×, ÷, ^, %, !) as equivalent Python source."""
+    return to_python(tokenize(expr))
+
+
+ALLOWED_NAMES: Mapping[str, Any] = MappingProxyType(build_allowed_names())
+
+DEFAULT_CACHE_SIZE = 4096
+_MISSING = object()
+
+
+class _CompileCache:
+    """Thread-safe LRU mapping raw expression text to compiled expressions."""
+
+    def __init__(self, maxsize: int) -> None:
+        self._data: "OrderedDict[str, Optional[CompiledExpression]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return _MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Optional[CompiledExpression]) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._trim()
+
+    def resize(self, maxsize: int) -> None:
+        with self._lock:
+            self.maxsize = max(0, int(maxsize))
+            self._trim()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self) -> Dict[str, int]:
+        with self._lock:
+            tiers = [c.tier("float") for c in self._data.values() if c is not None]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                # How the cached expressions currently run on the float backend.
+                "closure": tiers.count("closure"),
+                "codegen": tiers.count("codegen"),
+            }
+
+    def _trim(self) -> None:
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+
+_cache = _CompileCache(DEFAULT_CACHE_SIZE)
+# Derivatives, keyed by "variable:text"; a name cannot contain ":".
+_derivative_cache = _CompileCache(DEFAULT_CACHE_SIZE)
+# Expressions with units, keyed by text, or by (text, declared units).
+_units_cache = _CompileCache(DEFAULT_CACHE_SIZE)
+# Complex-backend compiles, keyed by text.
+_complex_cache = _CompileCache(DEFAULT_CACHE_SIZE)
+# Stacking templates by calc_matrix.stack_template key; None for shapes
+# that cannot be stacked.
+_stack_cache = _CompileCache(DEFAULT_CACHE_SIZE)
+_limits = DEFAULT_LIMITS
+# A calc_shared.SharedCache holding results of closed expressions for other
+# processes; see enable_shared_cache. calc_shared needs fcntl, so it is
+# only imported once the cache is enabled.
+_shared: Any = None
+# Results under other limits may differ (an error instead of a value), so
+# the limits are part of every shared key.
+_shared_salt = b""
+
+
+def cache_info() -> Dict[str, int]:
+    return _cache.info()
+
+
+def set_cache_size(maxsize: int) -> None:
+    """Resize the compiled-expression cache; 0 disables caching."""
+    _cache.resize(maxsize)
+    _derivative_cache.resize(maxsize)
+    _units_cache.resize(maxsize)
+    _complex_cache.resize(maxsize)
+    _stack_cache.resize(maxsize)
+
+
+def set_codegen_threshold(calls: int) -> None:
+    """Compile an expression to Python after ``calls`` evaluations; 0 never does.
+
+    Applies to expressions lowered from now on.
+    """
+    import calc_codegen
+
+    calc_codegen.threshold = max(0, int(calls))
+
+
+def clear_cache() -> None:
+    _cache.clear()
+    _derivative_cache.clear()
+    _units_cache.clear()
+    _complex_cache.clear()
+    _stack_cache.clear()
+
+
+def get_limits() -> Limits:
+    return _limits
+
+
+def set_limits(limits: Limits) -> None:
+    """Replace the default evaluation limits; cached compiles are dropped."""
+    global _limits, _shared_salt
+    _limits = limits
+    _shared_salt = _salt(limits)
+    _cache.clear()
+    _derivative_cache.clear()
+    _units_cache.clear()
+    _complex_cache.clear()
+    _stack_cache.clear()
+
+
+def compile_expression(text: str, limits: Optional[Limits] = None) -> Optional[CompiledExpression]:
+    """Parse and validate ``text``, reusing earlier work when possible.
+
+    Returns None for an empty expression. ``limits`` other than the
+    configured defaults apply to this compile only; it is cached apart from
+    compiles under the defaults.
+    """
+    key: Any = text
+    if limits is None or limits == _limits:
+        limits = _limits
+    else:
+        key = (text, limits)
+    compiled = _cache.get(key)
+    if compiled is not _MISSING:
+        if ACTIVE:
+            count("cache_hit")
+        return compiled
+    if ACTIVE:
+        count("cache_miss")
+    compiled = _compile(text, limits)
+    _cache.put(key, compiled)
+    return compiled
+
+
+def _check_length(text: str, limits: Limits) -> None:
+    if len(text) > limits.max_length:
+        raise InputTooLongError(f"Expression is longer than {limits.max_length} characters")
+
+
+def _compile(text: str, limits: Limits) -> Optional[CompiledExpression]:
+    _check_length(text, limits)
+    started = now() if ACTIVE else 0
+    tree = parse_expression(text)
+    if started:
+        validating = now()
+        record("parse", started, validating)
+    if tree is None:
+        return None
+    compiled = compile_tree(text, tree, ALLOWED_NAMES, limits)
+    if started:
+        record("validate", validating)
+    return compiled
+
+
+def _check_bound(compiled: CompiledExpression, bound: Mapping[str, Any]) -> None:
+    if compiled.variables:
+        missing = compiled.variables.difference(bound)
+        if missing:
+            raise ValueError(f"Unknown name: {min(missing)}")
+
+
+def compile_parsed(text: str, tree: Optional[ast.Expression]) -> Optional[CompiledExpression]:
+    """Validate an already parsed tree (e.g. from IncrementalParser) for ``text``.
+
+    The result is stored in the compiled-expression cache under ``text``.
+    """
+    _check_length(text, _limits)
+    compiled = compile_tree(text, tree, ALLOWED_NAMES, _limits) if tree is not None else None
+    _cache.put(text, compiled)
+    return compiled
+
+
+class FloatBackend(Backend):
+    """The default backend: Python floats and the math module."""
+
+    name = "float"
+
+    def names(self) -> Mapping[str, Any]:
+        return ALLOWED_NAMES
+
+    def result(self, value: Any) -> Any:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return to_float(value)
+        raise ValueError("Expression did not evaluate to a number")
+
+
+_float_backend = FloatBackend()
+register_backend(_float_backend)
+
+
+def evaluate_expression(
+    text: str, backend: Union[str, Backend] = "float", variables: Optional[Mapping[str, Any]] = None
+) -> Any:
+    """Evaluate ``text`` and return a float, or the ``backend``'s number type.
+
+    ``backend`` is a registered name ("float", "decimal", "fraction") or a
+    Backend instance such as DecimalBackend(precision=60). Free names are
+    bound from ``variables``, as in evaluate_compiled.
+    """
+    if not ACTIVE:
+        return _evaluate_text(text, backend, variables)
+    started = now()
+    try:
+        return _evaluate_text(text, backend, variables)
+    except Exception:
+        count("error")
+        raise
+    finally:
+        record("evaluate", started)
+
+
+def _evaluate_text(text: str, backend: Union[str, Backend], variables: Optional[Mapping[str, Any]]) -> Any:
+    shared = _shared
+    if shared is None:
+        return evaluate_compiled(compile_expression(text), backend, variables)
+    # A local compile is cheaper to run than a shared lookup, so the shared
+    # table is only consulted for text this process has not compiled yet.
+    compiled = _cache.get(text)
+    if compiled is not _MISSING:
+        if ACTIVE:
+            count("cache_hit")
+        return evaluate_compiled(compiled, backend, variables)
+    key = _shared_key(text, backend)
+    value = shared.get(key, _MISSING)
+    if value is not _MISSING:
+        if ACTIVE:
+            count("shared_hit")
+        return value
+    if ACTIVE:
+        count("cache_miss")
+        count("shared_miss")
+    compiled = _compile(text, _limits)
+    _cache.put(text, compiled)
+    value = evaluate_compiled(compiled, backend, variables)
+    if compiled is not None and not compiled.variables:
+        shared.put(key, value)
+    return value
+
+
+def evaluate_compiled(
+    compiled: Optional[CompiledExpression],
+    backend: Union[str, Backend] = "float",
+    variables: Optional[Mapping[str, Any]] = None,
+) -> Any:
+    """Evaluate a compiled expression, binding free names from ``variables``.
+
+    Values in ``variables`` may be numbers or callables (user functions).
+    With a ``timeout`` in the expression's Limits, the deadline is checked
+    each time a user function is called.
+    """
+    bound = variables if variables is not None else {}
+    if compiled is not None and compiled.limits.timeout is not None:
+        return _evaluate_before_deadline(compiled, backend, bound)
+    return _evaluate(compiled, backend, bound)
+
+
+# The deadline of the outermost evaluation on this thread; user functions
+# evaluate their bodies through evaluate_compiled, which checks it.
+_deadline = threading.local()
+
+
+def _evaluate_before_deadline(compiled: CompiledExpression, backend: Union[str, Backend], bound: Mapping[str, Any]) -> Any:
+    deadline = getattr(_deadline, "at", None)
+    if deadline is not None:
+        if time.monotonic() > deadline:
+            raise EvaluationTimeoutError(f"Evaluation took longer than {compiled.limits.timeout:g} s")
+        return _evaluate(compiled, backend, bound)
+    _deadline.at = time.monotonic() + compiled.limits.timeout
+    try:
+        return _evaluate(compiled, backend, bound)
+    finally:
+        _deadline.at = None
+
+
+def _evaluate(compiled: Optional[CompiledExpression], backend: Union[str, Backend], bound: Mapping[str, Any]) -> Any:
+    if backend == "float" or backend is _float_backend:
+        if compiled is None:
+            return 0.0
+        _check_bound(compiled, bound)
+        return _run_float(compiled.program("float", ALLOWED_NAMES), bound)
+
+    if isinstance(backend, str):
+        backend = get_backend(backend)
+    if compiled is None:
+        return backend.result(0)
+    _check_bound(compiled, bound)
+    with backend.context():
+        try:
+            program = compiled.program(backend.key, backend.names(), backend.number)
+            started = now() if ACTIVE else 0
+            result = program(bound)
+        except ZeroDivisionError as exc:
+            raise ZeroDivisionError("Division by zero") from exc
+        except (EvaluationLimitError, MatrixError):
+            raise
+        except RecursionError:
+            raise NestingTooDeepError("Expression is nested too deeply") from None
+        except Exception as exc:
+            raise ValueError("Invalid expression") from exc
+        if not started:
+            return backend.result(result)
+        converting = now()
+        record("execute", started, converting)
+        try:
+            return backend.result(result)
+        finally:
+            record("result", converting)
+
+
+def _run_float(program: Callable[[Any], Any], bound: Any) -> float:
+    # ``bound`` is the variable mapping, or the argument of a generated function.
+    started = now() if ACTIVE else 0
     try:
-        result = eval(expr, {"__builtins__": {}}, build_allowed_names())
+        result = program(bound)
     except ZeroDivisionError as exc:
         raise ZeroDivisionError("Division by zero") from exc
+    except EvaluationLimitError:
+        raise
+    except RecursionError:
+        raise NestingTooDeepError("Expression is nested too deeply") from None
     except Exception as exc:
         raise ValueError("Invalid expression") from exc
-    if isinstance(result, (int, float)):
-        return float(result)
+    if started:
+        converting = now()
+        record("execute", started, converting)
+    if isinstance(result, (int, float)) and not isinstance(result, bool):
+        result = to_float(result)
+        if started:
+            record("result", converting)
+        return result
     raise ValueError("Expression did not evaluate to a number")
 
 
+def compile_function(
+    text: str, var: str, variables: Optional[Mapping[str, Any]] = None, vectorized: bool = False
+) -> Callable[[Any], Any]:
+    """``text`` as a function of ``var``, compiled once for repeated calls.
+
+    Other free names are bound from ``variables``. The float function
+    raises like evaluate_expression; it reuses one binding dict, so do not
+    share it between threads. With ``vectorized`` the function maps a NumPy
+    array to an array like evaluate_vectorized, and ``variables`` must be
+    numbers.
+    """
+    if var in ALLOWED_NAMES:
+        raise ValueError(f"Variable name shadows a built-in: {var}")
+    compiled = compile_expression(text)
+    bound = dict(variables) if variables is not None else {}
+    bound[var] = 0.0
+    if vectorized:
+        return _vector_function(compiled, var, bound)
+    if compiled is None:
+        return lambda x: 0.0
+    _check_bound(compiled, bound)
+    program = compiled.program("float", ALLOWED_NAMES)
+    import calc_codegen
+
+    if calc_codegen.threshold:
+        from calc_codegen import Unsupported, generate_function
+        from calc_opt import optimize
+
+        # Built for repeated calls, so it skips the closure tier.
+        optimized = optimize(compiled.tree, ALLOWED_NAMES, compiled.limits)
+        try:
+            return partial(_run_float, generate_function(optimized, ALLOWED_NAMES, compiled.limits, program, var, bound))
+        except Unsupported:
+            pass
+
+    def function(x: Any) -> float:
+        bound[var] = x
+        return _run_float(program, bound)
+
+    return function
+
+
+def explain(text: str, backend: Union[str, Backend] = "float") -> str:
+    """Show what the optimizer folded, simplified and hoisted in ``text``.
+
+    The listing has the tree before and after optimization for ``backend``,
+    plus any hoisted temporaries; the same optimized tree is what
+    evaluate_expression lowers and caches. It ends with the Python function
+    the expression is compiled to once it is hot.
+    """
+    from calc_codegen import Unsupported, generate
+    from calc_opt import describe, optimize
+
+    compiled = compile_expression(text)
+    if compiled is None:
+        return "(empty expression)"
+    if isinstance(backend, str):
+        backend = get_backend(backend)
+    with backend.context():
+        optimized = optimize(compiled.tree, backend.names(), compiled.limits, backend.number)
+    listing = describe(compiled.tree, optimized)
+    try:
+        program = generate(optimized, backend.names(), compiled.limits, lambda env: None, isinstance(backend, FloatBackend))
+    except Unsupported as exc:
+        return f"{listing}\nstays on closures: {exc}"
+    return f"{listing}\ngenerated:\n{program.generated_source.rstrip()}"
+
+
+# Shared result cache
+
+def _salt(limits: Limits) -> bytes:
+    return repr(replace(limits, timeout=None)).encode()
+
+
+def _shared_key(text: str, backend: Union[str, Backend]) -> bytes:
+    # Runs of spaces collapse to one, which keeps "2 3" apart from "23".
+    # Tokenizing would merge more spellings, but costs more than a lookup.
+    _check_length(text, _limits)
+    name = (get_backend(backend) if isinstance(backend, str) else backend).key
+    normalized = " ".join(text.split())
+    return b"\0".join((_shared_salt, name.encode(), normalized.encode("utf-8", "surrogatepass")))
+
+
+def enable_shared_cache(path: Optional[str] = None, slots: Optional[int] = None) -> None:
+    """Share the results of closed expressions with other processes on this host.
+
+    Processes that enable the cache with the same ``path`` (by default a
+    per-user file in /dev/shm) reuse each other's results in
+    evaluate_expression: an expression this process has not compiled yet is
+    looked up in a memory-mapped table before it is compiled, and its result
+    is stored there afterwards. Only float, complex, decimal and fraction
+    results of expressions without free names are shared; errors never are.
+    ``slots`` sizes a new table (64 bytes each, 65,536 by default); see
+    calc_shared.SharedCache, which also needs a POSIX system.
+    """
+    from calc_shared import DEFAULT_SLOTS, SharedCache
+
+    global _shared, _shared_salt
+    disable_shared_cache()
+    _shared_salt = _salt(_limits)
+    _shared = SharedCache(path, DEFAULT_SLOTS if slots is None else slots)
+
+
+def disable_shared_cache() -> None:
+    global _shared
+    shared, _shared = _shared, None
+    if shared is not None:
+        shared.close()
+
+
+def shared_cache_path() -> Optional[str]:
+    return _shared.path if _shared is not None else None
+
+
+def shared_cache_info() -> Dict[str, int]:
+    """Hits, misses and stores of this process, and the shared table's size."""
+    return _shared.info() if _shared is not None else {}
+
+
+# Differentiation
+
+_dual_backend: Optional[Backend] = None
+
+
+def _get_dual_backend() -> Backend:
+    global _dual_backend
+    if _dual_backend is None:
+        from calc_diff import DualBackend
+
+        _dual_backend = DualBackend(ALLOWED_NAMES)
+    return _dual_backend
+
+
+def differentiate(text: str, wrt: str) -> str:
+    """d(text)/d(wrt) in calculator syntax, e.g. "2*x" for "x^2"."""
+    from calc_diff import derivative, source
+    from calc_opt import fold
+
+    compiled = compile_expression(text)
+    if compiled is None:
+        return "0"
+    body = fold(derivative(compiled.tree.body, wrt, ALLOWED_NAMES), ALLOWED_NAMES, compiled.limits)
+    try:
+        return source(body)
+    except RecursionError:
+        raise NestingTooDeepError("Expression is nested too deeply") from None
+
+
+def compile_derivative(text: str, wrt: str) -> Optional[CompiledExpression]:
+    """d(text)/d(wrt) compiled for evaluate_compiled, on any backend.
+
+    Built once per (wrt, text) and cached like compile_expression. The
+    derivative is left unfolded here: each backend's program folds it with
+    its own number type.
+    """
+    key = f"{wrt}:{text}"
+    compiled = _derivative_cache.get(key)
+    if compiled is not _MISSING:
+        return compiled
+    from calc_diff import derivative
+
+    base = compile_expression(text)
+    if base is None:
+        compiled = None
+    else:
+        tree = ast.Expression(derivative(base.tree.body, wrt, ALLOWED_NAMES))
+        compiled = compile_tree(f"d/d{wrt}({text})", tree, ALLOWED_NAMES, _limits)
+    _derivative_cache.put(key, compiled)
+    return compiled
+
+
+def value_and_gradient(
+    text: str, variables: Mapping[str, Any], wrt: Optional[Iterable[str]] = None
+) -> Tuple[float, Dict[str, float]]:
+    """Evaluate ``text`` and its gradient in one forward-mode pass.
+
+    ``wrt`` defaults to every free variable of ``text``; each needs a value
+    in ``variables``. Uses the same cached program as evaluate_expression,
+    lowered once against dual numbers.
+    """
+    from calc_diff import Dual
+
+    compiled = compile_expression(text)
+    names = sorted(compiled.variables if compiled is not None else ()) if wrt is None else list(wrt)
+    bound = dict(variables)
+    for i, name in enumerate(names):
+        if name in ALLOWED_NAMES:
+            raise ValueError(f"Cannot differentiate with respect to built-in name: {name}")
+        if name not in bound:
+            raise ValueError(f"Unknown name: {name}")
+        seed = [0.0] * len(names)
+        seed[i] = 1.0
+        bound[name] = Dual(float(bound[name]), tuple(seed))
+    result = evaluate_compiled(compiled, _get_dual_backend(), bound)
+    if type(result) is Dual:
+        return float(result.value), dict(zip(names, result.grad))
+    return float(result), dict.fromkeys(names, 0.0)
+
+
+def evaluate_interval(text: str, variables: Optional[Mapping[str, Any]] = None) -> "Interval":
+    """Evaluate ``text`` over intervals; the result encloses every value it can take.
+
+    Values in ``variables`` may be Intervals, (lo, hi) pairs or numbers,
+    which are exact points. Uses the same cached compile as
+    evaluate_expression, lowered once against the interval backend.
+    """
+    from calc_interval import to_interval
+
+    bound = {name: to_interval(value) for name, value in (variables or {}).items()}
+    return evaluate_compiled(compile_expression(text), "interval", bound)
+
+
+# Complex numbers and matrices
+
+def compile_complex(text: str, limits: Optional[Limits] = None) -> Optional[CompiledExpression]:
+    """Compile ``text`` for the complex backend.
+
+    Like compile_expression, except that i, det, inv, transpose and solve
+    are built-in names rather than free variables.
+    """
+    key: Any = text
+    if limits is None or limits == _limits:
+        limits = _limits
+    else:
+        key = (text, limits)
+    compiled = _complex_cache.get(key)
+    if compiled is not _MISSING:
+        return compiled
+    _check_length(text, limits)
+    tree = parse_expression(text)
+    compiled = compile_tree(text, tree, get_backend("complex").names(), limits) if tree is not None else None
+    _complex_cache.put(key, compiled)
+    return compiled
+
+
+def evaluate_complex(text: str, variables: Optional[Mapping[str, Any]] = None) -> Any:
+    """Evaluate ``text`` over complex numbers and matrices.
+
+    Returns a complex number, or a NumPy array of complex numbers for a
+    matrix, e.g. "sqrt(-4)" gives 2j and "inv([[1, 2], [3, 4]])" a 2x2 array.
+    """
+    return evaluate_compiled(compile_complex(text), "complex", variables)
+
+
+def compile_stacked(text: str) -> Optional[Tuple[CompiledExpression, Tuple[Any, ...]]]:
+    """The template ``text`` shares with expressions differing only in their numbers.
+
+    Returns the template, compiled once per shape, and the numbers of
+    ``text`` in the order the template's names #0, #1, ... stand for them.
+    Only the first expression of a shape is parsed. Returns None for
+    expressions that cannot be stacked (see calc_matrix.stack_template and
+    stackable), that have free variables or that fail to compile.
+    """
+    from calc_matrix import stack_template, stackable
+
+    _check_length(text, _limits)
+    stacked = stack_template(tokenize(text))
+    if stacked is None or not stacked[2]:
+        return None
+    key, tokens, literals = stacked
+    template = _stack_cache.get(key)
+    if template is _MISSING:
+        try:
+            tree = parse_tokens(tokens)
+            template = compile_tree(key, tree, get_backend("complex").names(), _limits) if tree is not None else None
+        except ValueError:
+            template = None
+        if template is not None and not (stackable(template.tree) and len(template.variables) == len(literals)):
+            template = None
+        _stack_cache.put(key, template)
+    return None if template is None else (template, tuple(literals))
+
+
+# Units
+
+def compile_units(text: str, units: Optional[Mapping[str, str]] = None) -> "CompiledQuantity":
+    """Compile ``text`` with unit suffixes, such as "3 km / 20 min to km/h".
+
+    The units are checked here, once: mismatches raise DimensionError. The
+    expression is rewritten to plain floats in SI base units, so evaluating
+    it costs what a float expression does. ``units`` declares the unit of
+    variables ({"v": "km/h"}); other variables are plain numbers.
+    """
+    key: Any = (text, tuple(sorted(units.items()))) if units else text
+    cached = _units_cache.get(key)
+    if cached is not _MISSING:
+        return cached
+    from calc_units import CompiledQuantity, DimensionError, analyze, attach_units, format_dims, parse_unit
+
+    _check_length(text, _limits)
+    tokens, target = attach_units(tokenize(text))
+    if not tokens:
+        raise ValueError("Invalid expression")
+    tree, dims = analyze(parse_tokens(tokens), ALLOWED_NAMES, units, _limits)
+    if target is None:
+        unit, scale = format_dims(dims), 1.0
+    else:
+        scale, target_dims = parse_unit(target)
+        if target_dims != dims:
+            raise DimensionError(f"Cannot convert {format_dims(dims) or 'a number'} to {target}")
+        unit = target
+    compiled = CompiledQuantity(compile_tree(text, tree, ALLOWED_NAMES, _limits), dims, unit, scale)
+    _units_cache.put(key, compiled)
+    return compiled
+
+
+def evaluate_units(
+    text: str, variables: Optional[Mapping[str, Any]] = None, units: Optional[Mapping[str, str]] = None
+) -> "Quantity":
+    """Evaluate ``text`` with units; see compile_units.
+
+    The result is shown in the "to" unit if there is one, else in SI units
+    ("2.5 m/s"); ``Quantity.to`` converts it afterwards.
+    """
+    from calc_units import Quantity
+
+    compiled = compile_units(text, units)
+    value = evaluate_compiled(compiled.compiled, "float", variables)
+    return Quantity(value, compiled.dims, compiled.unit, compiled.scale)
+
+
+# Vectorized (NumPy) evaluation
+
+_LANCZOS_G = 7.0
+_LANCZOS_COEFFS = (
+    0.99999999999980993,
+    676.5203681218851,
+    -1259.1392167224028,
+    771.32342877765313,
+    -176.61502916214059,
+    12.507343278686905,
+    -0.13857109526572012,
+    9.9843695780195716e-6,
+    1.5056327351493116e-7,
+)
+_vector_names: Optional[Dict[str, Any]] = None
+
+
+def _np_lgamma_and_sign(np: Any, z: Any) -> Any:
+    z = np.asarray(z, dtype=float)
+    reflect = z < 0.5
+    w = np.where(reflect, 1.0 - z, z) - 1.0
+    series = np.full_like(w, _LANCZOS_COEFFS[0])
+    for i, coeff in enumerate(_LANCZOS_COEFFS[1:], start=1):
+        series = series + coeff / (w + i)
+    t = w + _LANCZOS_G + 0.5
+    lg = 0.5 * math.log(2 * math.pi) + (w + 0.5) * np.log(t) - t + np.log(series)
+    sin_pz = np.sin(math.pi * z)
+    lg = np.where(reflect, math.log(math.pi) - np.log(np.abs(sin_pz)) - lg, lg)
+    sign = np.where(reflect, np.sign(sin_pz), 1.0)
+    poles = (z <= 0) & (z == np.floor(z))
+    lg = np.where(poles, np.nan, lg)
+    return lg, sign
+
+
+def _build_vector_names() -> Dict[str, Any]:
+    import numpy as np
+
+    fact_table = np.array(calc_special.FACTORIAL_TABLE)
+    max_fact = calc_special.MAX_FLOAT_FACTORIAL
+
+    def gamma(z: Any) -> Any:
+        z = np.asarray(z, dtype=float)
+        lg, sign = _np_lgamma_and_sign(np, z)
+        result = sign * np.exp(lg)
+        # Positive integers are exact through the factorial table.
+        exact = (z >= 1) & (z <= max_fact + 1) & (z == np.floor(z))
+        idx = np.where(exact, z - 1, 0).astype(np.intp)
+        return np.where(exact, fact_table[idx], result)
+
+    def lgamma(z: Any) -> Any:
+        lg, _ = _np_lgamma_and_sign(np, z)
+        return lg
+
+    def factorial(x: Any) -> Any:
+        x = np.asarray(x, dtype=float)
+        integral = (x >= 0) & (x == np.floor(x))
+        idx = np.where(integral & (x <= max_fact), x, 0).astype(np.intp)
+        result = np.where(x > max_fact, np.inf, fact_table[idx])
+        return np.where(integral, result, np.nan)
+
+    def lfactorial(x: Any) -> Any:
+        x = np.asarray(x, dtype=float)
+        integral = (x >= 0) & (x == np.floor(x))
+        return np.where(integral, lgamma(x + 1), np.nan)
+
+    def log(x: Any, base: Any = None) -> Any:
+        if base is None:
+            return np.log(x)
+        return np.log(x) / np.log(base)
+
+    def polygamma(n: Any, x: Any) -> Any:
+        n = calc_special.polygamma_order(float(n))
+        x = np.asarray(x, dtype=float)
+        bad = ((x <= 0) & (x == np.floor(x))) | (x < calc_special.POLYGAMMA_MIN_ARG)
+        reflect = (x < 0) if n == 0 else np.zeros(x.shape, dtype=bool)
+        z = np.where(bad, n + 15.0, np.where(reflect, 1.0 - x, x))
+        shift = np.zeros_like(z)
+        small = z < n + 15
+        while small.any():
+            shift = shift + np.where(small, 1.0 / np.where(small, z, 1.0) ** (n + 1), 0.0)
+            z = np.where(small, z + 1.0, z)
+            small = z < n + 15
+        step = math.factorial(n) * shift
+        result = calc_special.polygamma_asymptotic(n, z, np.log) - (-step if n % 2 else step)
+        if n == 0:
+            result = np.where(reflect, result - math.pi / np.tan(math.pi * x), result)
+        return np.where(bad, np.nan, result)
+
+    names: Dict[str, Any] = {
+        "sin": np.sin,
+        "cos": np.cos,
+        "tan": np.tan,
+        "asin": np.arcsin,
+        "acos": np.arccos,
+        "atan": np.arctan,
+        "sinh": np.sinh,
+        "cosh": np.cosh,
+        "tanh": np.tanh,
+        "log": log,
+        "log10": np.log10,
+        "sqrt": np.sqrt,
+        "pow": np.power,
+        "exp": np.exp,
+        "fabs": np.fabs,
+        "floor": np.floor,
+        "ceil": np.ceil,
+        "degrees": np.degrees,
+        "radians": np.radians,
+        "factorial": factorial,
+        "lfactorial": lfactorial,
+        "gamma": gamma,
+        "lgamma": lgamma,
+        "polygamma": polygamma,
+        "ln": np.log,
+        "abs": np.abs,
+    }
+    for name, value in ALLOWED_NAMES.items():
+        if not callable(value):
+            names[name] = value
+    return names
+
+
+def _get_vector_names() -> Dict[str, Any]:
+    global _vector_names
+    if _vector_names is None:
+        _vector_names = _build_vector_names()
+    return _vector_names
+
+
+def _run_vector(np: Any, program: Callable[[Mapping[str, Any]], Any], bound: Mapping[str, Any], shape: Any) -> Any:
+    started = now() if ACTIVE else 0
+    try:
+        with np.errstate(all="ignore"):
+            result = program(bound)
+    except ZeroDivisionError as exc:
+        raise ZeroDivisionError("Division by zero") from exc
+    except EvaluationLimitError:
+        raise
+    except RecursionError:
+        raise NestingTooDeepError("Expression is nested too deeply") from None
+    except Exception as exc:
+        raise ValueError("Invalid expression") from exc
+    if started:
+        converting = now()
+        record("execute", started, converting)
+    try:
+        result = np.asarray(to_float(result) if type(result) is int else result, dtype=float)
+    except (TypeError, ValueError) as exc:
+        raise ValueError("Expression did not evaluate to a number") from exc
+    result = np.broadcast_to(result, np.broadcast_shapes(result.shape, shape)).copy()
+    if started:
+        record("result", converting)
+    return result
+
+
+def _bind_vectors(np: Any, names: Mapping[str, Any], arrays: Mapping[str, Any]) -> Dict[str, Any]:
+    for name in arrays:
+        if name in names:
+            raise ValueError(f"Variable name shadows a built-in: {name}")
+    return {name: np.asarray(value, dtype=float) for name, value in arrays.items()}
+
+
+def _vector_function(compiled: Optional[CompiledExpression], var: str, bound: Dict[str, Any]) -> Callable[[Any], Any]:
+    import numpy as np
+
+    names = _get_vector_names()
+    bound = _bind_vectors(np, names, bound)
+    if compiled is None:
+        return lambda x: np.zeros(np.shape(x))
+    _check_bound(compiled, bound)
+    program = compiled.program("numpy", names)
+    fixed = [a.shape for name, a in bound.items() if name != var]
+
+    def function(x: Any) -> Any:
+        bound[var] = x = np.asarray(x, dtype=float)
+        return _run_vector(np, program, bound, np.broadcast_shapes(x.shape, *fixed))
+
+    return function
+
+
+def evaluate_vectorized(text: str, **arrays: Any) -> Any:
+    """Evaluate ``text`` once over NumPy arrays bound to its free variables.
+
+    Inputs are broadcast against each other; domain errors and division by
+    zero yield nan/inf per element instead of raising.
+    """
+    import numpy as np
+
+    bound = _bind_vectors(np, _get_vector_names(), arrays)
+    shape = np.broadcast_shapes(*(a.shape for a in bound.values())) if bound else ()
+
+    compiled = compile_expression(text)
+    if compiled is None:
+        return np.zeros(shape)
+    _check_bound(compiled, bound)
+    return _run_vector(np, compiled.program("numpy", _get_vector_names()), bound, shape)
@@ -0,0 +1,411 @@
+import ast
+import math
+import operator
+from typing import Any, Callable, Dict, Mapping, Tuple
+
+import calc_special
+from calc_backends import Backend, to_float
+from calc_opt import _postorder
+
+# Symbolic differentiation
+
+
+def _is(node: ast.expr, value: int) -> bool:
+    return type(node) is ast.Constant and not isinstance(node.value, bool) and node.value == value
+
+
+def _num(value: Any) -> ast.expr:
+    return ast.Constant(value)
+
+
+def _name(name: str) -> ast.expr:
+    return ast.Name(name, ast.Load())
+
+
+def _call(name: str, *args: ast.expr) -> ast.expr:
+    return ast.Call(_name(name), list(args), [])
+
+
+def _neg(a: ast.expr) -> ast.expr:
+    if _is(a, 0):
+        return a
+    if type(a) is ast.UnaryOp and type(a.op) is ast.USub:
+        return a.operand
+    return ast.UnaryOp(ast.USub(), a)
+
+
+def _add(a: ast.expr, b: ast.expr) -> ast.expr:
+    if _is(a, 0):
+        return b
+    if _is(b, 0):
+        return a
+    return ast.BinOp(a, ast.Add(), b)
+
+
+def _sub(a: ast.expr, b: ast.expr) -> ast.expr:
+    if _is(b, 0):
+        return a
+    if _is(a, 0):
+        return _neg(b)
+    return ast.BinOp(a, ast.Sub(), b)
+
+
+def _mul(a: ast.expr, b: ast.expr) -> ast.expr:
+    # A zero factor drops the term even when the other side could be inf
+    # or nan: it is a derivative that is identically zero.
+    if _is(a, 0) or _is(b, 0):
+        return _num(0)
+    if _is(a, 1):
+        return b
+    if _is(b, 1):
+        return a
+    return ast.BinOp(a, ast.Mult(), b)
+
+
+def _div(a: ast.expr, b: ast.expr) -> ast.expr:
+    if _is(a, 0):
+        return _num(0)
+    if _is(b, 1):
+        return a
+    return ast.BinOp(a, ast.Div(), b)
+
+
+def _pow(a: ast.expr, b: ast.expr) -> ast.expr:
+    if _is(b, 1):
+        return a
+    return ast.BinOp(a, ast.Pow(), b)
+
+
+# f'(u) for the one-argument functions in calc_core.ALLOWED_NAMES.
+_RULES: Dict[str, Callable[[ast.expr], ast.expr]] = {
+    "sin": lambda u: _call("cos", u),
+    "cos": lambda u: _neg(_call("sin", u)),
+    "tan": lambda u: _div(_num(1), _pow(_call("cos", u), _num(2))),
+    "asin": lambda u: _div(_num(1), _call("sqrt", _sub(_num(1), _pow(u, _num(2))))),
+    "acos": lambda u: _neg(_div(_num(1), _call("sqrt", _sub(_num(1), _pow(u, _num(2)))))),
+    "atan": lambda u: _div(_num(1), _add(_num(1), _pow(u, _num(2)))),
+    "sinh": lambda u: _call("cosh", u),
+    "cosh": lambda u: _call("sinh", u),
+    "tanh": lambda u: _sub(_num(1), _pow(_call("tanh", u), _num(2))),
+    "ln": lambda u: _div(_num(1), u),
+    "log10": lambda u: _div(_num(1), _mul(u, _call("ln", _num(10)))),
+    "sqrt": lambda u: _div(_num(1), _mul(_num(2), _call("sqrt", u))),
+    "exp": lambda u: _call("exp", u),
+    "fabs": lambda u: _div(u, _call("fabs", u)),
+    "abs": lambda u: _div(u, _call("abs", u)),
+    "floor": lambda u: _num(0),
+    "ceil": lambda u: _num(0),
+    "degrees": lambda u: _div(_num(180), _name("pi")),
+    "radians": lambda u: _div(_name("pi"), _num(180)),
+    "factorial": lambda u: _mul(_call("factorial", u), _call("polygamma", _num(0), _add(u, _num(1)))),
+    "lfactorial": lambda u: _call("polygamma", _num(0), _add(u, _num(1))),
+    "gamma": lambda u: _mul(_call("gamma", u), _call("polygamma", _num(0), u)),
+    "lgamma": lambda u: _call("polygamma", _num(0), u),
+}
+
+
+def _power_rule(node: ast.expr, u: ast.expr, v: ast.expr, du: ast.expr, dv: ast.expr) -> ast.expr:
+    if _is(dv, 0):
+        return _mul(_mul(v, _pow(u, _sub(v, _num(1)))), du)
+    if _is(du, 0):
+        return _mul(_mul(node, _call("ln", u)), dv)
+    return _mul(node, _add(_mul(dv, _call("ln", u)), _div(_mul(v, du), u)))
+
+
+def _call_rule(node: ast.Call, derivatives: Dict[int, ast.expr]) -> ast.expr:
+    name = node.func.id
+    args = node.args
+    dargs = [derivatives[id(a)] for a in args]
+    if name == "pow" and len(args) == 2:
+        return _power_rule(node, args[0], args[1], dargs[0], dargs[1])
+    if name == "log" and len(args) == 2:
+        # log(u, b) = ln(u) / ln(b)
+        u, b = args
+        du, db = dargs
+        ln_b = _call("ln", b)
+        return _sub(
+            _div(du, _mul(u, ln_b)),
+            _div(_mul(_call("ln", u), db), _mul(b, _pow(ln_b, _num(2)))),
+        )
+    if name == "polygamma" and len(args) == 2:
+        if not _is(dargs[0], 0):
+            raise ValueError("Cannot differentiate polygamma() with respect to its order")
+        return _mul(_call("polygamma", _add(args[0], _num(1)), args[1]), dargs[1])
+    rule = _RULES.get("ln" if name == "log" else name)
+    if rule is None:
+        raise ValueError(f"Cannot differentiate unknown function: {name}")
+    if len(args) != 1:
+        raise ValueError(f"{name}() takes exactly one argument")
+    return _mul(rule(args[0]), dargs[0])
+
+
+def derivative(node: ast.expr, wrt: str, names: Mapping[str, Any]) -> ast.expr:
+    """d(node)/d(wrt) as a new tree, built bottom-up with the chain rule.
+
+    Subtrees of ``node`` are shared into the result. Zero and unit factors
+    are dropped as the tree is built; calc_opt.fold simplifies the rest.
+    Names in ``names`` are constants; every other name is an independent
+    variable. Calls to functions without a rule (user functions) raise
+    ValueError.
+    """
+    if wrt in names:
+        raise ValueError(f"Cannot differentiate with respect to built-in name: {wrt}")
+    derivatives: Dict[int, ast.expr] = {}
+    for n in _postorder(node):
+        kind = type(n)
+        if kind is ast.Constant:
+            d = _num(0)
+        elif kind is ast.Name:
+            d = _num(1 if n.id == wrt else 0)
+        elif kind is ast.UnaryOp:
+            d = derivatives[id(n.operand)]
+            if type(n.op) is ast.USub:
+                d = _neg(d)
+        elif kind is ast.BinOp:
+            u, v = n.left, n.right
+            du, dv = derivatives[id(u)], derivatives[id(v)]
+            op = type(n.op)
+            if op is ast.Add:
+                d = _add(du, dv)
+            elif op is ast.Sub:
+                d = _sub(du, dv)
+            elif op is ast.Mult:
+                d = _add(_mul(du, v), _mul(u, dv))
+            elif op is ast.Div:
+                d = _sub(_div(du, v), _div(_mul(u, dv), _pow(v, _num(2))))
+            elif op is ast.Pow:
+                d = _power_rule(n, u, v, du, dv)
+            elif op is ast.FloorDiv:
+                d = _num(0)
+            elif op is ast.Mod:
+                # u % v = u - v*floor(u/v)
+                d = _sub(du, _mul(dv, _call("floor", _div(u, v))))
+            else:
+                raise ValueError("Cannot differentiate matrix products")
+        elif kind is ast.Call:
+            d = _call_rule(n, derivatives)
+        else:
+            raise ValueError(f"Unsupported syntax: {kind.__name__}")
+        derivatives[id(n)] = d
+    return derivatives[id(node)]
+
+
+def source(node: ast.AST) -> str:
+    """Calculator syntax for a tree: Python's unparse with ^ for powers."""
+    return ast.unparse(node).replace(" ** ", "^")
+
+
+# Forward-mode differentiation
+
+
+class Dual:
+    """A value and its partial derivatives, one per differentiation variable.
+
+    Arithmetic on Duals applies the chain rule as it goes, so one
+    evaluation yields the value and the whole gradient.
+    """
+
+    __slots__ = ("value", "grad")
+
+    def __init__(self, value: Any, grad: Tuple[float, ...]) -> None:
+        self.value = value
+        self.grad = grad
+
+    def __add__(self, other: Any) -> "Dual":
+        if type(other) is Dual:
+            return Dual(self.value + other.value, tuple(map(operator.add, self.grad, other.grad)))
+        return Dual(self.value + other, self.grad)
+
+    __radd__ = __add__
+
+    def __sub__(self, other: Any) -> "Dual":
+        if type(other) is Dual:
+            return Dual(self.value - other.value, tuple(map(operator.sub, self.grad, other.grad)))
+        return Dual(self.value - other, self.grad)
+
+    def __rsub__(self, other: Any) -> "Dual":
+        return Dual(other - self.value, tuple([-a for a in self.grad]))
+
+    def __mul__(self, other: Any) -> "Dual":
+        if type(other) is Dual:
+            u, v = self.value, other.value
+            return Dual(u * v, tuple([a * v + u * b for a, b in zip(self.grad, other.grad)]))
+        return Dual(self.value * other, tuple([a * other for a in self.grad]))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other: Any) -> "Dual":
+        if type(other) is Dual:
+            v = other.value
+            q = self.value / v
+            return Dual(q, tuple([(a - q * b) / v for a, b in zip(self.grad, other.grad)]))
+        return Dual(self.value / other, tuple([a / other for a in self.grad]))
+
+    def __rtruediv__(self, other: Any) -> "Dual":
+        v = self.value
+        q = other / v
+        return Dual(q, tuple([-q * a / v for a in self.grad]))
+
+    def __pow__(self, other: Any) -> "Dual":
+        u = self.value
+        if type(other) is Dual:
+            if any(other.grad):
+                value = u ** other.value
+                log_u = math.log(u)
+                v = other.value
+                return Dual(value, tuple([value * (b * log_u + v * a / u) for a, b in zip(self.grad, other.grad)]))
+            other = other.value
+        if other == 0:
+            return Dual(u ** other, (0.0,) * len(self.grad))
+        scale = other * u ** (other - 1)
+        return Dual(u ** other, tuple([scale * a for a in self.grad]))
+
+    def __rpow__(self, other: Any) -> "Dual":
+        value = other ** self.value
+        if other == 0 or not any(self.grad):
+            return Dual(value, (0.0,) * len(self.grad))
+        scale = value * math.log(other)
+        return Dual(value, tuple([scale * a for a in self.grad]))
+
+    def __neg__(self) -> "Dual":
+        return Dual(-self.value, tuple([-a for a in self.grad]))
+
+    def __pos__(self) -> "Dual":
+        return self
+
+    def __abs__(self) -> "Dual":
+        sign = _sign(self.value)
+        return Dual(abs(self.value), tuple([sign * a for a in self.grad]))
+
+    def __floordiv__(self, other: Any) -> "Dual":
+        return Dual(self.value // _value(other), (0.0,) * len(self.grad))
+
+    def __rfloordiv__(self, other: Any) -> "Dual":
+        return Dual(other // self.value, (0.0,) * len(self.grad))
+
+    def __mod__(self, other: Any) -> Any:
+        # u % v = u - v*floor(u/v), with floor(u/v) locally constant.
+        return self - other * math.floor(self.value / _value(other))
+
+    def __rmod__(self, other: Any) -> Any:
+        return other - self * math.floor(other / self.value)
+
+    def __repr__(self) -> str:
+        return f"Dual({self.value!r}, {self.grad!r})"
+
+
+def _value(x: Any) -> Any:
+    return x.value if type(x) is Dual else x
+
+
+def _sign(v: float) -> float:
+    return 1.0 if v > 0 else -1.0 if v < 0 else 0.0
+
+
+def _lift(fn: Callable[[Any], Any], slope: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    def lifted(x: Any) -> Any:
+        if type(x) is not Dual:
+            return fn(x)
+        s = slope(x.value)
+        return Dual(fn(x.value), tuple([s * a for a in x.grad]))
+
+    lifted.__name__ = getattr(fn, "__name__", "lifted")
+    return lifted
+
+
+def _dual_names(names: Mapping[str, Any]) -> Dict[str, Any]:
+    polygamma = calc_special.polygamma
+    slopes: Dict[str, Callable[[Any], Any]] = {
+        "sin": math.cos,
+        "cos": lambda v: -math.sin(v),
+        "tan": lambda v: 1 / math.cos(v) ** 2,
+        "asin": lambda v: 1 / math.sqrt(1 - v * v),
+        "acos": lambda v: -1 / math.sqrt(1 - v * v),
+        "atan": lambda v: 1 / (1 + v * v),
+        "sinh": math.cosh,
+        "cosh": math.sinh,
+        "tanh": lambda v: 1 - math.tanh(v) ** 2,
+        "ln": lambda v: 1 / v,
+        "log10": lambda v: 1 / (v * math.log(10)),
+        "sqrt": lambda v: 0.5 / math.sqrt(v),
+        "exp": math.exp,
+        "fabs": _sign,
+        "abs": _sign,
+        "floor": lambda v: 0.0,
+        "ceil": lambda v: 0.0,
+        "degrees": lambda v: 180 / math.pi,
+        "radians": lambda v: math.pi / 180,
+        "lfactorial": lambda v: polygamma(0, v + 1),
+        "gamma": lambda v: names["gamma"](v) * polygamma(0, v),
+        "lgamma": lambda v: polygamma(0, v),
+    }
+    table: Dict[str, Any] = {name: _lift(names[name], slope) for name, slope in slopes.items()}
+    exact_factorial = names["factorial"]
+
+    def factorial(x: Any) -> Any:
+        # n! is an exact integer, but the parts of a Dual are floats, so there
+        # it becomes one (inf beyond 170!).
+        if type(x) is not Dual:
+            return exact_factorial(x)
+        value = to_float(exact_factorial(x.value))
+        s = value * polygamma(0, x.value + 1)
+        return Dual(value, tuple([s * a for a in x.grad]))
+
+    table["factorial"] = factorial
+    ln = table["ln"]
+
+    def log(x: Any, base: Any = None) -> Any:
+        if base is None:
+            return ln(x)
+        if type(x) is not Dual and type(base) is not Dual:
+            return math.log(x, base)
+        return ln(x) / ln(base)
+
+    def power(x: Any, y: Any) -> Any:
+        if type(x) is not Dual and type(y) is not Dual:
+            return math.pow(x, y)
+        return x ** y
+
+    def polygamma_dual(n: Any, x: Any) -> Any:
+        if type(n) is Dual:
+            if any(n.grad):
+                raise ValueError("Cannot differentiate polygamma() with respect to its order")
+            n = n.value
+        if type(x) is not Dual:
+            return polygamma(n, x)
+        s = polygamma(n + 1, x.value)
+        return Dual(polygamma(n, x.value), tuple([s * a for a in x.grad]))
+
+    table.update({"log": log, "pow": power, "polygamma": polygamma_dual})
+    for name, value in names.items():
+        if not callable(value):
+            table[name] = value
+    missing = set(names).difference(table)
+    if missing:
+        raise RuntimeError(f"No forward-mode rule for: {', '.join(sorted(missing))}")
+    return table
+
+
+class DualBackend(Backend):
+    """Evaluates with Dual numbers over a float function table.
+
+    Not registered by name: calc_core.value_and_gradient seeds the
+    variables and unpacks the result.
+    """
+
+    name = "dual"
+
+    def __init__(self, names: Mapping[str, Any]) -> None:
+        self._float_names = names
+        self._names: Dict[str, Any] = {}
+
+    def names(self) -> Mapping[str, Any]:
+        if not self._names:
+            self._names = _dual_names(self._float_names)
+        return self._names
+
+    def result(self, value: Any) -> Any:
+        number = _value(value)
+        if isinstance(number, (int, float)) and not isinstance(number, bool):
+            return value
+        raise ValueError("Expression did not evaluate to a number")
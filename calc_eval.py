@@ -0,0 +1,465 @@
+import ast
+import operator
+from dataclasses import dataclass
+from decimal import Decimal
+from fractions import Fraction
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional
+
+from calc_profile import ACTIVE, count, now, record
+
+Program = Callable[[Mapping[str, Any]], Any]
+
+
+class EvaluationLimitError(ValueError):
+    """Raised when an expression exceeds one of the configured Limits."""
+
+
+class InputTooLongError(EvaluationLimitError):
+    """The text is longer than max_length, or parses to more than max_nodes."""
+
+
+class NestingTooDeepError(EvaluationLimitError):
+    """Parentheses, calls or user functions nest deeper than allowed."""
+
+
+class IntegerTooLargeError(EvaluationLimitError):
+    """An exact intermediate result would exceed max_int_bits."""
+
+
+class EvaluationTimeoutError(EvaluationLimitError):
+    """Evaluation ran past the timeout."""
+
+
+class MatrixError(ValueError):
+    """A matrix has the wrong shape for an operation, or is singular."""
+
+
+@dataclass(frozen=True)
+class Limits:
+    max_nodes: int = 10_000
+    max_depth: int = 400
+    # Upper bound on the bit length of an exact integer (or of a fraction's
+    # numerator and denominator) produced along the way.
+    max_int_bits: int = 65_536
+    max_factorial: int = 5_000
+    max_length: int = 100_000
+    # Seconds of wall-clock time per evaluation; None means no timeout.
+    timeout: Optional[float] = None
+
+
+DEFAULT_LIMITS = Limits()
+
+# The entry in a backend's names that builds matrix literals. It is called
+# as builder(rows, *elements), with rows true when every element is itself
+# a bracketed list. Backends without it reject matrices.
+MATRIX_BUILDER = "[]"
+
+_BINOPS: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.MatMult: operator.matmul,
+}
+_UNARYOPS: Dict[type, Callable[[Any], Any]] = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+def validate(tree: ast.Expression, names: Mapping[str, Any], limits: Limits = DEFAULT_LIMITS) -> FrozenSet[str]:
+    """Reject anything outside the calculator grammar.
+
+    Walks the tree iteratively so hostile nesting cannot exhaust the stack.
+    Returns the free variable names, i.e. names not found in ``names``.
+    """
+    free = set()
+    count = 0
+    stack = [(tree.body, 1)]
+    while stack:
+        node, depth = stack.pop()
+        count += 1
+        if count > limits.max_nodes:
+            raise InputTooLongError("Expression is too large")
+        if depth > limits.max_depth:
+            raise NestingTooDeepError("Expression is nested too deeply")
+        kind = type(node)
+        if kind is ast.Constant:
+            if type(node.value) not in (int, float):
+                raise ValueError("Unsupported literal")
+        elif kind is ast.Name:
+            if node.id not in names:
+                free.add(node.id)
+        elif kind is ast.BinOp:
+            if type(node.op) not in _BINOPS:
+                raise ValueError("Unsupported operator")
+            # Left-associative chains are lowered into a loop, so only the
+            # right operand adds nesting.
+            left_depth = depth + 1 if type(node.op) is ast.Pow else depth
+            stack.append((node.left, left_depth))
+            stack.append((node.right, depth + 1))
+        elif kind is ast.UnaryOp:
+            if type(node.op) not in _UNARYOPS:
+                raise ValueError("Unsupported operator")
+            stack.append((node.operand, depth + 1))
+        elif kind is ast.Call:
+            if type(node.func) is not ast.Name or node.keywords:
+                raise ValueError("Unsupported function call")
+            if node.func.id not in names:
+                free.add(node.func.id)
+            for arg in node.args:
+                if type(arg) is ast.Starred:
+                    raise ValueError("Unsupported function call")
+                stack.append((arg, depth + 1))
+        elif kind is ast.List:
+            for elt in node.elts:
+                stack.append((elt, depth + 1))
+        else:
+            raise ValueError(f"Unsupported syntax: {kind.__name__}")
+    return frozenset(free)
+
+
+def _bits(value: Any) -> int:
+    kind = type(value)
+    if kind is int:
+        return value.bit_length()
+    if kind is Fraction:
+        return max(value.numerator.bit_length(), value.denominator.bit_length())
+    return 0
+
+
+def _guarded(op: Callable[[Any, Any], Any], max_bits: int) -> Callable[[Any, Any], Any]:
+    # Operands already passed this check, so computing the result first
+    # costs at most one operation on max_bits-sized numbers.
+    def guarded(left: Any, right: Any) -> Any:
+        result = op(left, right)
+        if type(result) is not float and _bits(result) > max_bits:
+            raise IntegerTooLargeError("Intermediate result is too large")
+        return result
+
+    return guarded
+
+
+_GUARDED_BINOPS: Dict[Any, Dict[type, Callable[[Any, Any], Any]]] = {}
+
+
+def guarded_binops(limits: Limits, exact: bool) -> Dict[type, Callable[[Any, Any], Any]]:
+    """The binary operators, with result sizes checked against max_int_bits.
+
+    With float arithmetic big integers only come from literals, and only
+    products grow them faster than one bit per operation, so only * is
+    checked. Exact backends (``exact``) also check +, -, / and the rest:
+    adding fractions multiplies their denominators.
+    """
+    key = (limits.max_int_bits, exact)
+    ops = _GUARDED_BINOPS.get(key)
+    if ops is None:
+        ops = dict(_BINOPS)
+        for kind in (ops if exact else (ast.Mult,)):
+            if kind is not ast.Pow:
+                ops[kind] = _guarded(ops[kind], limits.max_int_bits)
+        ops[ast.Pow] = _guarded_pow(limits)
+        ops = _GUARDED_BINOPS.setdefault(key, ops)
+    return ops
+
+
+def _guarded_pow(limits: Limits, op: Callable[[Any, Any], Any] = operator.pow) -> Callable[[Any, Any], Any]:
+    max_bits = limits.max_int_bits
+
+    def power(base: Any, exponent: Any) -> Any:
+        # Only exact integer and rational powers can grow without bound;
+        # float and Decimal powers overflow on their own. A negative power
+        # of a fraction grows as fast as a positive one.
+        kind = type(exponent)
+        if kind is Fraction and exponent.denominator == 1:
+            exponent, kind = exponent.numerator, int
+        if kind is int and (exponent > 0 or type(base) is Fraction):
+            if type(base) is int:
+                bits = abs(base).bit_length() - 1
+            elif type(base) is Fraction:
+                bits = max(abs(base.numerator).bit_length(), base.denominator.bit_length()) - 1
+            else:
+                bits = 0
+            if abs(exponent) * bits > max_bits:
+                raise IntegerTooLargeError("Exponent is too large")
+        return op(base, exponent)
+
+    return power
+
+
+def _guarded_factorial(fn: Callable[[Any], Any], limits: Limits) -> Callable[[Any], Any]:
+    max_arg = limits.max_factorial
+
+    def factorial(x: Any) -> Any:
+        # Dual numbers carry their point in .value, complex numbers in .real.
+        n = getattr(x, "value", x)
+        n = n.real if isinstance(n, complex) else n
+        if isinstance(n, (int, float, Decimal, Fraction)) and n > max_arg:
+            raise IntegerTooLargeError("Factorial argument is too large")
+        return fn(x)
+
+    return factorial
+
+
+# Functions whose cost grows with their argument, like the ! operator.
+_FACTORIAL_LIKE = frozenset({"factorial", "gamma", "lfactorial"})
+
+
+def guarded_function(name: str, fn: Any, limits: Limits, exact: bool) -> Any:
+    """``fn`` with the checks its operator counterpart gets.
+
+    factorial, gamma and lfactorial are held to max_factorial, and pow on
+    exact backends to max_int_bits, unless ``fn`` is marked cost_bounded.
+    """
+    if getattr(fn, "cost_bounded", False):
+        return fn
+    if name in _FACTORIAL_LIKE:
+        return _guarded_factorial(fn, limits)
+    if name == "pow" and exact:
+        return _guarded_pow(limits, fn)
+    return fn
+
+
+def _lookup(name: str) -> Program:
+    def load(env: Mapping[str, Any]) -> Any:
+        try:
+            return env[name]
+        except KeyError:
+            raise ValueError(f"Unknown name: {name}") from None
+
+    return load
+
+
+_NOT_CONSTANT = object()
+
+
+def _constant(value: Any) -> Program:
+    def constant(env: Mapping[str, Any]) -> Any:
+        return value
+
+    constant.value = value  # type: ignore[attr-defined]
+    return constant
+
+
+def _constant_value(program: Program) -> Any:
+    return getattr(program, "value", _NOT_CONSTANT)
+
+
+def _fold(program: Program, *operands: Program) -> Program:
+    # Operands that are all constant make the node constant too. Anything
+    # that fails here (1/0, a domain error) is left to fail at run time so
+    # the error surfaces through the normal evaluation path.
+    if any(_constant_value(p) is _NOT_CONSTANT for p in operands):
+        return program
+    try:
+        return _constant(program({}))
+    except Exception:
+        return program
+
+
+def lower(
+    node: ast.AST,
+    names: Mapping[str, Any],
+    limits: Limits = DEFAULT_LIMITS,
+    number: Optional[Callable[[Any], Any]] = None,
+) -> Program:
+    """Turn a validated tree into nested closures taking a variable mapping.
+
+    ``number`` converts literals for non-float backends. Subtrees that only
+    involve literals and constants are evaluated once here, so a closed
+    expression lowers to a single constant.
+    """
+    kind = type(node)
+    if kind is ast.Expression:
+        return lower(node.body, names, limits, number)
+
+    if kind is ast.Constant:
+        return _constant(number(node.value) if number is not None else node.value)
+
+    if kind is ast.Name:
+        if node.id in names:
+            return _constant(names[node.id])
+        return _lookup(node.id)
+
+    if kind is ast.UnaryOp:
+        operand = lower(node.operand, names, limits, number)
+        if type(node.op) is ast.UAdd:
+            return operand
+        return _fold(lambda env: -operand(env), operand)
+
+    if kind is ast.BinOp:
+        if type(node.op) is not ast.Pow and type(node.left) is ast.BinOp and type(node.left.op) is not ast.Pow:
+            return _lower_chain(node, names, limits, number)
+        op = guarded_binops(limits, number is not None)[type(node.op)]
+        return _lower_binop(op, lower(node.left, names, limits, number), lower(node.right, names, limits, number))
+
+    if kind is ast.Call:
+        name = node.func.id
+        args: List[Program] = [lower(arg, names, limits, number) for arg in node.args]
+        if name not in names:
+            load = _lookup(name)
+            return lambda env: load(env)(*[a(env) for a in args])
+        fn = guarded_function(name, names[name], limits, number is not None)
+        if len(args) == 1:
+            (arg,) = args
+            return _fold(lambda env: fn(arg(env)), arg)
+        if len(args) == 2:
+            first, second = args
+            return _fold(lambda env: fn(first(env), second(env)), first, second)
+        return _fold(lambda env: fn(*[a(env) for a in args]), *args)
+
+    if kind is ast.List:
+        build = names.get(MATRIX_BUILDER)
+        if build is None:
+            raise ValueError("Matrices need the complex backend")
+        rows = all(type(elt) is ast.List for elt in node.elts)
+        elts = [lower(elt, names, limits, number) for elt in node.elts]
+        return _fold(lambda env: build(rows, *[e(env) for e in elts]), *elts)
+
+    raise ValueError(f"Unsupported syntax: {kind.__name__}")
+
+
+def _lower_binop(op: Callable[[Any, Any], Any], left: Program, right: Program) -> Program:
+    left_value = _constant_value(left)
+    right_value = _constant_value(right)
+    if left_value is not _NOT_CONSTANT and right_value is not _NOT_CONSTANT:
+        return _fold(lambda env: op(left_value, right_value), left, right)
+    if right_value is not _NOT_CONSTANT:
+        return lambda env: op(left(env), right_value)
+    if left_value is not _NOT_CONSTANT:
+        return lambda env: op(left_value, right(env))
+    return lambda env: op(left(env), right(env))
+
+
+def _lower_chain(
+    node: ast.BinOp,
+    names: Mapping[str, Any],
+    limits: Limits,
+    number: Optional[Callable[[Any], Any]],
+) -> Program:
+    # a + b - c * ... parses as a left-leaning spine; evaluate it in a loop
+    # instead of one closure per level so long sums do not recurse deeply.
+    ops = guarded_binops(limits, number is not None)
+    spine = []
+    while type(node) is ast.BinOp and type(node.op) is not ast.Pow:
+        spine.append((ops[type(node.op)], node.right))
+        node = node.left
+    first = lower(node, names, limits, number)
+    steps = []
+    for op, right in reversed(spine):
+        operand = lower(right, names, limits, number)
+        if not steps:
+            # Fold the constant head of the chain (2*3 + x -> 6 + x).
+            head = _lower_binop(op, first, operand)
+            if _constant_value(head) is not _NOT_CONSTANT:
+                first = head
+                continue
+        steps.append((op, operand))
+    if not steps:
+        return first
+    if len(steps) == 1:
+        return _lower_binop(steps[0][0], first, steps[0][1])
+
+    def chain(env: Mapping[str, Any]) -> Any:
+        acc = first(env)
+        for op, operand in steps:
+            acc = op(acc, operand(env))
+        return acc
+
+    return chain
+
+
+class CompiledExpression:
+    """A validated expression tree plus its lowered programs.
+
+    The tree is kept so the same compile can be lowered against different
+    function tables; each lowering is cached under a caller-chosen key.
+    """
+
+    __slots__ = ("source", "tree", "variables", "limits", "_programs", "_pending")
+
+    def __init__(self, source: str, tree: ast.Expression, variables: FrozenSet[str], limits: Limits) -> None:
+        self.source = source
+        self.tree = tree
+        self.variables = variables
+        self.limits = limits
+        self._programs: Dict[str, Program] = {}
+        # key -> [calls left before code generation, optimized tree, names,
+        # float backend]; None once nothing is waiting.
+        self._pending: Optional[Dict[str, list]] = None
+
+    def program(self, key: str, names: Mapping[str, Any], number: Optional[Callable[[Any], Any]] = None) -> Program:
+        """The program for ``key``, lowered on first use.
+
+        Programs start as closures. After calc_codegen.threshold requests
+        for the same key the closure program is replaced by a generated
+        Python function; see tier().
+        """
+        prog = self._programs.get(key)
+        if prog is None:
+            # calc_opt and calc_codegen build on this module, so they are
+            # imported on first use.
+            import calc_codegen
+            from calc_opt import lower_optimized, optimize
+
+            started = now() if ACTIVE else 0
+            optimized = optimize(self.tree, names, self.limits, number)
+            if started:
+                lowering = now()
+                record("optimize", started, lowering)
+            prog = lower_optimized(optimized, names, self.limits, number is not None)
+            if started:
+                record("lower", lowering)
+            self._programs[key] = prog
+            if calc_codegen.threshold:
+                if self._pending is None:
+                    self._pending = {}
+                self._pending[key] = [calc_codegen.threshold, optimized, names, number is None]
+        elif self._pending is not None:
+            pending = self._pending.get(key)
+            if pending is not None:
+                pending[0] -= 1
+                if pending[0] <= 0:
+                    prog = self._promote(key, prog)
+        if ACTIVE:
+            count("tier_codegen" if hasattr(prog, "generated_source") else "tier_closure")
+        return prog
+
+    def _promote(self, key: str, closure: Program) -> Program:
+        import calc_codegen
+
+        pending = self._pending.pop(key, None) if self._pending is not None else None
+        if not self._pending:
+            self._pending = None
+        if pending is None:
+            # Another thread got here first.
+            return self._programs[key]
+        _, optimized, names, floats = pending
+        started = now() if ACTIVE else 0
+        generated = calc_codegen.promote(optimized, names, self.limits, closure, floats)
+        if started:
+            record("codegen", started)
+            count("promoted" if generated is not None else "not_promoted")
+        if generated is None:
+            return closure
+        self._programs[key] = generated
+        return generated
+
+    def tier(self, key: str) -> Optional[str]:
+        """How ``key`` currently runs: "closure", "codegen", or None if never lowered."""
+        prog = self._programs.get(key)
+        if prog is None:
+            return None
+        return "codegen" if hasattr(prog, "generated_source") else "closure"
+
+    def __repr__(self) -> str:
+        return f"CompiledExpression({self.source!r})"
+
+
+def compile_tree(source: str, tree: ast.Expression, names: Mapping[str, Any], limits: Optional[Limits] = None) -> CompiledExpression:
+    limits = limits or DEFAULT_LIMITS
+    variables = validate(tree, names, limits)
+    return CompiledExpression(source, tree, variables, limits)
@@ -0,0 +1,46 @@
+import math
+from typing import Any
+
+from calc_units import Quantity
+
+
+def format_result(value: float) -> str:
+    """``value`` as the calculators show it.
+
+    Whole numbers have no decimal point, other values get 12 significant
+    digits, and inf and nan are shown as such.
+    """
+    # Normalize -0.0 to 0
+    if abs(value) == 0:
+        value = 0.0
+    if not math.isfinite(value) or value != int(value):
+        return "%.*g" % (12, value)
+    return str(int(value))
+
+
+def format_quantity(quantity: Quantity) -> str:
+    return f"{format_result(quantity.magnitude)} {quantity.unit}".rstrip()
+
+
+def format_complex(value: complex) -> str:
+    # A part below the 12 digits shown of the other one is rounding noise
+    # (exp(i*pi) is -1); the result reads back in as "3+4*i".
+    real, imag = value.real, value.imag
+    if abs(imag) < 1e-12 * abs(real):
+        imag = 0.0
+    if abs(real) < 1e-12 * abs(imag):
+        real = 0.0
+    if imag == 0:
+        return format_result(real)
+    size = format_result(abs(imag))
+    term = "i" if size == "1" else f"{size}*i"
+    if real == 0:
+        return f"-{term}" if imag < 0 else term
+    return f"{format_result(real)}{'-' if imag < 0 else '+'}{term}"
+
+
+def format_matrix(value: Any) -> str:
+    """A complex-backend result: a number, or nested brackets for a matrix."""
+    if getattr(value, "ndim", 0) == 0:
+        return format_complex(complex(value))
+    return "[" + ", ".join(format_matrix(row) for row in value) + "]"
@@ -0,0 +1,201 @@
+import os
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, Union
+
+import calc_core
+from calc_sheet import parse_definition
+
+DEFAULT_CAP = 100_000
+# Rows fetched per read when the GUI scrolls; see History.entry.
+BLOCK_SIZE = 256
+_MAX_BLOCKS = 16
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    expression TEXT NOT NULL,
+    result TEXT NOT NULL,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS entries_expression ON entries (expression, id);
+"""
+
+# Trigram full-text index for substring search; SQLite builds without FTS5
+# fall back to a LIKE scan of the entries table.
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts
+    USING fts5(expression, content='entries', content_rowid='id', tokenize='trigram');
+CREATE TRIGGER IF NOT EXISTS entries_fts_insert AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts (rowid, expression) VALUES (new.id, new.expression);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_fts_delete AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, expression) VALUES ('delete', old.id, old.expression);
+END;
+"""
+
+
+class HistoryEntry(NamedTuple):
+    id: int
+    expression: str
+    result: str
+
+
+def default_path() -> Path:
+    """Where the desktop app keeps its history; override with CALC_HISTORY."""
+    return Path(os.environ.get("CALC_HISTORY") or Path.home() / ".calculator_history.sqlite3")
+
+
+def cacheable(text: str) -> bool:
+    """True when ``text`` is a plain expression without free variables.
+
+    Such an expression always evaluates to the same value, so a result
+    recorded for it can be reused instead of evaluating again.
+    """
+    if parse_definition(text) is not None:
+        return False
+    try:
+        compiled = calc_core.compile_expression(text)
+    except ValueError:
+        return False
+    return compiled is not None and not compiled.variables
+
+
+class History:
+    """Calculation history capped at ``cap`` entries, newest first.
+
+    Entries go to an append-only SQLite table. Once there are more than
+    ``cap`` entries the oldest are deleted, so ids stay contiguous and row
+    ``i`` (0 = newest) is id ``last - i``. Reading a row is a primary-key
+    lookup, and blocks of rows are cached for views that scroll through
+    them. Substring and prefix search use a trigram index. ``path`` None
+    keeps the history in memory. One writer per file is assumed.
+    """
+
+    def __init__(self, path: Union[str, Path, None] = None, cap: int = DEFAULT_CAP) -> None:
+        if cap < 1:
+            raise ValueError("cap must be at least 1")
+        self.cap = cap
+        self.path = path
+        self._db = sqlite3.connect(":memory:" if path is None else str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        try:
+            self._db.executescript(_FTS_SCHEMA)
+            self._search_table = "entries_fts"
+        except sqlite3.OperationalError:
+            self._search_table = "entries"
+        self._db.commit()
+        self._blocks: "OrderedDict[int, List[Optional[HistoryEntry]]]" = OrderedDict()
+        # AUTOINCREMENT never reuses ids, so a cleared history continues
+        # after the last id it handed out.
+        row = self._db.execute("SELECT seq FROM sqlite_sequence WHERE name = 'entries'").fetchone()
+        self._last = row[0] if row else 0
+        self._first = self._db.execute("SELECT MIN(id) FROM entries").fetchone()[0] or self._last + 1
+        self._trim()
+
+    def __len__(self) -> int:
+        return self._last - self._first + 1
+
+    def __iter__(self) -> Iterator[HistoryEntry]:
+        for start in range(0, len(self), BLOCK_SIZE):
+            yield from self.page(start, BLOCK_SIZE)
+
+    def add(self, expression: str, result: str, value: Optional[float] = None) -> HistoryEntry:
+        """Append an entry. Pass ``value`` only for ``cacheable`` expressions."""
+        with self._db:
+            cursor = self._db.execute(
+                "INSERT INTO entries (expression, result, value) VALUES (?, ?, ?)", (expression, result, value)
+            )
+            self._last = cursor.lastrowid
+            self._trim()
+        # The newest block may have been cached before this row existed.
+        self._blocks.pop(self._last // BLOCK_SIZE, None)
+        return HistoryEntry(self._last, expression, result)
+
+    def _trim(self) -> None:
+        if len(self) > self.cap:
+            self._first = self._last - self.cap + 1
+            self._db.execute("DELETE FROM entries WHERE id < ?", (self._first,))
+
+    def entry(self, row: int) -> Optional[HistoryEntry]:
+        """Row ``row`` counted from the newest entry, or None when out of range."""
+        if not 0 <= row < len(self):
+            return None
+        entry_id = self._last - row
+        block = entry_id // BLOCK_SIZE
+        entries = self._blocks.get(block)
+        if entries is None:
+            entries = [None] * BLOCK_SIZE
+            start = block * BLOCK_SIZE
+            for entry in self._db.execute(
+                "SELECT id, expression, result FROM entries WHERE id >= ? AND id < ?", (start, start + BLOCK_SIZE)
+            ):
+                entries[entry[0] - start] = HistoryEntry(*entry)
+            self._blocks[block] = entries
+            if len(self._blocks) > _MAX_BLOCKS:
+                self._blocks.popitem(last=False)
+        else:
+            self._blocks.move_to_end(block)
+        return entries[entry_id % BLOCK_SIZE]
+
+    def page(self, offset: int, limit: int) -> List[HistoryEntry]:
+        """Up to ``limit`` entries starting ``offset`` rows from the newest."""
+        top = self._last - max(offset, 0)
+        bottom = max(top - limit + 1, self._first)
+        rows = self._db.execute(
+            "SELECT id, expression, result FROM entries WHERE id BETWEEN ? AND ? ORDER BY id DESC", (bottom, top)
+        )
+        return [HistoryEntry(*row) for row in rows]
+
+    def search(self, query: str, limit: int = 100, prefix: bool = False) -> List[HistoryEntry]:
+        """Newest entries whose expression contains (or starts with) ``query``.
+
+        Substring matching is case-insensitive and uses the trigram index
+        for queries of three or more characters. Prefix matching is a range
+        scan of the expression index and is case-sensitive.
+        """
+        if prefix:
+            # U+10FFFF sorts after every character, bounding the range.
+            rows = self._db.execute(
+                "SELECT id, expression, result FROM entries WHERE expression >= ? AND expression < ? "
+                "ORDER BY id DESC LIMIT ?",
+                (query, query + "\U0010ffff", limit),
+            )
+        elif len(query) >= 3 and self._search_table == "entries_fts":
+            phrase = '"' + query.replace('"', '""') + '"'
+            rows = self._db.execute(
+                "SELECT e.id, e.expression, e.result FROM entries_fts s JOIN entries e ON e.id = s.rowid "
+                "WHERE entries_fts MATCH ? ORDER BY s.rowid DESC LIMIT ?",
+                (phrase, limit),
+            )
+        else:
+            escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            rows = self._db.execute(
+                "SELECT id, expression, result FROM entries WHERE expression LIKE ? ESCAPE '\\' "
+                "ORDER BY id DESC LIMIT ?",
+                (f"%{escaped}%", limit),
+            )
+        return [HistoryEntry(*row) for row in rows]
+
+    def lookup(self, expression: str) -> Optional[float]:
+        """The value last recorded for ``expression``, if it was cacheable."""
+        row = self._db.execute(
+            "SELECT value FROM entries WHERE expression = ? AND value IS NOT NULL ORDER BY id DESC LIMIT 1",
+            (expression,),
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def clear(self) -> None:
+        with self._db:
+            self._db.execute("DELETE FROM entries")
+        self._blocks.clear()
+        self._first = self._last + 1
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __repr__(self) -> str:
+        return f"History({self.path!r}, {len(self)} of {self.cap})"
@@ -0,0 +1,719 @@
+import math
+from decimal import Decimal
+from fractions import Fraction
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+import calc_special
+from calc_backends import Backend, register_backend
+
+_INF = math.inf
+_MAX = 1.7976931348623157e308
+_MIN_NORMAL = 2.2250738585072014e-308
+# Integers up to 2**53 are exact floats, and so are sums and products of
+# integral floats while they stay below it.
+_EXACT_INT = 2.0 ** 53
+_nextafter = math.nextafter
+
+
+def _down(v: float) -> float:
+    return _nextafter(v, -_INF)
+
+
+def _up(v: float) -> float:
+    return _nextafter(v, _INF)
+
+
+class Interval:
+    """A closed interval [lo, hi] of reals.
+
+    Arithmetic rounds outward, so the result of each operation encloses the
+    exact result for every choice of operands in the operand intervals.
+    An operand that is not an Interval is taken as an exact point.
+    """
+
+    __slots__ = ("lo", "hi")
+
+    def __init__(self, lo: float, hi: float) -> None:
+        self.lo = lo
+        self.hi = hi
+
+    @property
+    def mid(self) -> float:
+        return self.lo + (self.hi - self.lo) / 2
+
+    @property
+    def width(self) -> float:
+        return self.hi - self.lo
+
+    def __contains__(self, x: Any) -> bool:
+        return self.lo <= x <= self.hi
+
+    def __eq__(self, other: Any) -> Any:
+        if type(other) is not Interval:
+            return NotImplemented
+        return self.lo == other.lo and self.hi == other.hi
+
+    def __hash__(self) -> int:
+        return hash((self.lo, self.hi))
+
+    def __repr__(self) -> str:
+        return f"Interval({self.lo!r}, {self.hi!r})"
+
+    def __str__(self) -> str:
+        return f"[{self.lo!r}, {self.hi!r}]"
+
+    def __add__(self, other: Any) -> "Interval":
+        other = to_interval(other)
+        return Interval(_sum_down(self.lo, other.lo), _sum_up(self.hi, other.hi))
+
+    __radd__ = __add__
+
+    def __sub__(self, other: Any) -> "Interval":
+        other = to_interval(other)
+        return Interval(_sum_down(self.lo, -other.hi), _sum_up(self.hi, -other.lo))
+
+    def __rsub__(self, other: Any) -> "Interval":
+        return to_interval(other) - self
+
+    def __mul__(self, other: Any) -> "Interval":
+        other = to_interval(other)
+        a, b, c, d = self.lo, self.hi, other.lo, other.hi
+        if a >= 0 and c >= 0:
+            lo, hi = _mul(a, c), _mul(b, d)
+        elif b <= 0 and d <= 0:
+            lo, hi = _mul(b, d), _mul(a, c)
+        else:
+            products = (_mul(a, c), _mul(a, d), _mul(b, c), _mul(b, d))
+            lo, hi = min(products), max(products)
+        if _integral(a, b, c, d) and -_EXACT_INT < lo and hi < _EXACT_INT:
+            return Interval(lo, hi)
+        return Interval(_down(lo), _up(hi))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other: Any) -> "Interval":
+        other = to_interval(other)
+        a, b, c, d = self.lo, self.hi, other.lo, other.hi
+        if c > 0 or d < 0:
+            if c == d:
+                quotients = (_quotient(a, c), _quotient(b, c))
+            else:
+                quotients = (_quotient(a, c), _quotient(a, d), _quotient(b, c), _quotient(b, d))
+            return Interval(min(q[0] for q in quotients), max(q[1] for q in quotients))
+        if c == d == 0:
+            raise ZeroDivisionError("Division by zero")
+        # The divisor touches zero: the quotient is unbounded on that side.
+        if c < 0 < d or (a < 0 < b):
+            return Interval(-_INF, _INF)
+        if c == 0:
+            # other is [0, d] with d > 0
+            return Interval(_quotient(a, d)[0], _INF) if a >= 0 else Interval(-_INF, _quotient(b, d)[1])
+        # other is [c, 0] with c < 0
+        return Interval(-_INF, _quotient(a, c)[1]) if a >= 0 else Interval(_quotient(b, c)[0], _INF)
+
+    def __rtruediv__(self, other: Any) -> "Interval":
+        return to_interval(other) / self
+
+    def __floordiv__(self, other: Any) -> "Interval":
+        q = self / other
+        return Interval(_floor(q.lo), _floor(q.hi))
+
+    def __rfloordiv__(self, other: Any) -> "Interval":
+        return to_interval(other) // self
+
+    def __mod__(self, other: Any) -> "Interval":
+        # u % v = u - v*floor(u/v), with the sign of v.
+        other = to_interval(other)
+        q = self // other
+        if q.lo == q.hi and math.isfinite(q.lo):
+            return self - other * q.lo
+        c, d = other.lo, other.hi
+        if c > 0:
+            return Interval(0.0, d)
+        if d < 0:
+            return Interval(c, 0.0)
+        return Interval(min(c, 0.0), max(d, 0.0))
+
+    def __rmod__(self, other: Any) -> "Interval":
+        return to_interval(other) % self
+
+    def __pow__(self, other: Any) -> "Interval":
+        other = to_interval(other)
+        if other.lo == other.hi and other.lo.is_integer():
+            return _integer_power(self, int(other.lo))
+        return _real_power(self, other)
+
+    def __rpow__(self, other: Any) -> "Interval":
+        return to_interval(other) ** self
+
+    def __neg__(self) -> "Interval":
+        return Interval(-self.hi, -self.lo)
+
+    def __pos__(self) -> "Interval":
+        return self
+
+    def __abs__(self) -> "Interval":
+        lo, hi = self.lo, self.hi
+        if lo >= 0:
+            return self
+        if hi <= 0:
+            return Interval(-hi, -lo)
+        return Interval(0.0, max(-lo, hi))
+
+
+def to_interval(value: Any) -> Interval:
+    """``value`` as an Interval: Intervals as they are, (lo, hi) pairs, or
+    numbers, which become the tightest interval containing them."""
+    kind = type(value)
+    if kind is Interval:
+        return value
+    if kind is float:
+        return Interval(value, value)
+    if kind is int:
+        return Interval(*_from_int(value))
+    if kind is tuple:
+        lo, hi = value
+        lo, hi = to_interval(lo).lo, to_interval(hi).hi
+        if not lo <= hi:
+            raise ValueError("An interval needs lo <= hi")
+        return Interval(lo, hi)
+    if isinstance(value, bool):
+        raise ValueError("Expression did not evaluate to a number")
+    if isinstance(value, float):
+        return Interval(float(value), float(value))
+    if isinstance(value, int):
+        return Interval(*_from_int(int(value)))
+    if isinstance(value, (Fraction, Decimal)):
+        f = float(value)
+        if type(value)(f) == value:
+            return Interval(f, f)
+        return Interval(_down(f), _up(f))
+    raise ValueError("Expression did not evaluate to a number")
+
+
+def _literal(value: Any) -> Interval:
+    # A float literal came from decimal text such as 0.1, whose exact value
+    # lies within half an ulp of the float; widen unless they agree.
+    if type(value) is float and math.isfinite(value) and not value.is_integer():
+        if Fraction(repr(value)) != Fraction(value):
+            return Interval(_down(value), _up(value))
+    return to_interval(value)
+
+
+def _from_int(n: int) -> Tuple[float, float]:
+    try:
+        f = float(n)
+    except OverflowError:
+        return (_MAX, _INF) if n > 0 else (-_INF, -_MAX)
+    if int(f) == n:
+        return f, f
+    return _down(f), _up(f)
+
+
+def _integral(*values: float) -> bool:
+    for v in values:
+        if not v.is_integer():
+            return False
+    return True
+
+
+# Outward-rounded sums: TwoSum recovers the rounding error of a + b exactly,
+# so a sum is only moved when it was actually rounded.
+
+def _sum_down(a: float, b: float) -> float:
+    s = a + b
+    t = s - a
+    err = (a - (s - t)) + (b - t)
+    return s if err >= 0 else _down(s)
+
+
+def _sum_up(a: float, b: float) -> float:
+    s = a + b
+    t = s - a
+    err = (a - (s - t)) + (b - t)
+    return s if err <= 0 else _up(s)
+
+
+def _mul(a: float, b: float) -> float:
+    # 0 * inf is 0 here: every point of [0, x] times a finite number is finite.
+    if a == 0 or b == 0:
+        return 0.0
+    return a * b
+
+
+def _quotient(x: float, y: float) -> Tuple[float, float]:
+    # An enclosure of x / y for y != 0; exact when integers divide evenly.
+    q = x / y
+    if q != q:
+        # inf / inf: any quotient of the values near the ends is possible,
+        # and the other corners already bound it.
+        return (0.0, 0.0) if x == x and y == y else (q, q)
+    if q.is_integer() and x.is_integer() and y.is_integer() and abs(x) < _EXACT_INT and q * y == x:
+        return q, q
+    # Dividing by a power of two only changes the exponent.
+    if abs(math.frexp(y)[0]) == 0.5 and abs(q) >= _MIN_NORMAL:
+        return q, q
+    return _down(q), _up(q)
+
+
+def _floor(v: float) -> float:
+    return float(math.floor(v)) if math.isfinite(v) else v
+
+
+def _ceil(v: float) -> float:
+    return float(math.ceil(v)) if math.isfinite(v) else v
+
+
+# Enclosures of one function value. libm results are taken to be within
+# two ulps of the exact value; ``exact`` lists points where they are exact.
+
+_ZERO = {0.0: 0.0}
+_ONE_AT_ZERO = {0.0: 1.0}
+_ZERO_AT_ONE = {1.0: 0.0}
+
+
+def _near(v: float) -> Tuple[float, float]:
+    if v != v:
+        return v, v
+    return _down(_down(v)), _up(_up(v))
+
+
+def _loose(v: float, rel: float, absolute: float = 0.0) -> Tuple[float, float]:
+    # For the series-based special functions, good to a relative ``rel``.
+    if not math.isfinite(v):
+        return (_MAX, _INF) if v == _INF else (-_INF, -_MAX) if v == -_INF else (v, v)
+    slack = abs(v) * rel + absolute
+    return _down(v - slack), _up(v + slack)
+
+
+def _at(fn: Callable[[float], float], x: float, exact: Mapping[float, float]) -> Tuple[float, float]:
+    if x in exact:
+        v = exact[x]
+        return v, v
+    return _near(fn(x))
+
+
+def _increasing(fn: Callable[[float], float], exact: Mapping[float, float]) -> Callable[[Any], Interval]:
+    def apply(x: Any) -> Interval:
+        x = to_interval(x)
+        return Interval(_at(fn, x.lo, exact)[0], _at(fn, x.hi, exact)[1])
+
+    return apply
+
+
+def _decreasing(fn: Callable[[float], float], exact: Mapping[float, float]) -> Callable[[Any], Interval]:
+    def apply(x: Any) -> Interval:
+        x = to_interval(x)
+        return Interval(_at(fn, x.hi, exact)[0], _at(fn, x.lo, exact)[1])
+
+    return apply
+
+
+def _overflow_to_inf(fn: Callable[[float], float]) -> Callable[[float], float]:
+    def wrapped(x: float) -> float:
+        try:
+            return fn(x)
+        except OverflowError:
+            return math.copysign(_INF, x)
+
+    return wrapped
+
+
+def _clip(x: Interval, lo: float, hi: float) -> Interval:
+    # The part of x inside a function's domain [lo, hi]; outside points
+    # have no value to enclose.
+    if x.lo != x.lo or x.hi != x.hi:
+        return x
+    if x.hi < lo or x.lo > hi:
+        raise ValueError("math domain error")
+    return Interval(max(x.lo, lo), min(x.hi, hi))
+
+
+def _domain(fn: Callable[[Any], Interval], lo: float, hi: float) -> Callable[[Any], Interval]:
+    def apply(x: Any) -> Interval:
+        return fn(_clip(to_interval(x), lo, hi))
+
+    return apply
+
+
+def _bounded(fn: Callable[[Any], Interval], lo: float, hi: float) -> Callable[[Any], Interval]:
+    def apply(x: Any) -> Interval:
+        r = fn(x)
+        return Interval(max(r.lo, lo), min(r.hi, hi))
+
+    return apply
+
+
+# Trigonometric functions: sin, cos and tan are monotonic between multiples
+# of pi/2. In units of t = x/(pi/2), sin peaks at t = 1 (mod 4) and dips at
+# t = 3, cos at 0 and 2, and tan has poles at odd t.
+
+_TWO_OVER_PI = 2 / math.pi
+
+
+def _quarter_turns(lo: float, hi: float) -> Tuple[float, float]:
+    # t for both ends, widened well past the rounding of x*(2/pi); a turning
+    # point that is only nearly inside counts as inside, which is sound.
+    tlo, thi = lo * _TWO_OVER_PI, hi * _TWO_OVER_PI
+    return tlo - abs(tlo) * 1e-14 - 1e-300, thi + abs(thi) * 1e-14 + 1e-300
+
+
+def _hits(tlo: float, thi: float, at: int, period: int) -> bool:
+    # Whether [tlo, thi] contains at + period*k for some integer k.
+    return math.floor((thi - at) / period) >= math.ceil((tlo - at) / period)
+
+
+def _periodic(fn: Callable[[float], float], peak: int, dip: int, exact: Mapping[float, float]) -> Callable[[Any], Interval]:
+    def apply(x: Any) -> Interval:
+        x = to_interval(x)
+        lo, hi = x.lo, x.hi
+        if not (math.isfinite(lo) and math.isfinite(hi)):
+            if lo == hi:
+                raise ValueError("math domain error")
+            return x if lo != lo or hi != hi else Interval(-1.0, 1.0)
+        a_lo, a_hi = _at(fn, lo, exact)
+        b_lo, b_hi = (a_lo, a_hi) if lo == hi else _at(fn, hi, exact)
+        tlo, thi = _quarter_turns(lo, hi)
+        low = -1.0 if _hits(tlo, thi, dip, 4) else max(-1.0, min(a_lo, b_lo))
+        high = 1.0 if _hits(tlo, thi, peak, 4) else min(1.0, max(a_hi, b_hi))
+        return Interval(low, high)
+
+    return apply
+
+
+def _tan(x: Any) -> Interval:
+    x = to_interval(x)
+    lo, hi = x.lo, x.hi
+    if not (math.isfinite(lo) and math.isfinite(hi)):
+        if lo == hi:
+            raise ValueError("math domain error")
+        return x if lo != lo or hi != hi else Interval(-_INF, _INF)
+    if lo != hi and _hits(*_quarter_turns(lo, hi), 1, 2):
+        return Interval(-_INF, _INF)
+    return Interval(_at(math.tan, lo, _ZERO)[0], _at(math.tan, hi, _ZERO)[1])
+
+
+def _cosh(x: Any) -> Interval:
+    x = to_interval(x)
+    cosh = _overflow_to_inf(math.cosh)
+    ends = (_at(cosh, x.lo, _ONE_AT_ZERO), _at(cosh, x.hi, _ONE_AT_ZERO))
+    high = max(ends[0][1], ends[1][1])
+    if x.lo >= 0:
+        return Interval(max(1.0, ends[0][0]), high)
+    if x.hi <= 0:
+        return Interval(max(1.0, ends[1][0]), high)
+    return Interval(1.0, high)
+
+
+def _log(x: Any, base: Any = None) -> Interval:
+    x = _clip(to_interval(x), 0.0, _INF)
+    result = Interval(-_INF if x.lo == 0 else _at(math.log, x.lo, _ZERO_AT_ONE)[0], _at(math.log, x.hi, _ZERO_AT_ONE)[1])
+    if base is None:
+        return result
+    return result / _log(base)
+
+
+def _log10(x: Any) -> Interval:
+    x = _clip(to_interval(x), 0.0, _INF)
+    return Interval(-_INF if x.lo == 0 else _at(math.log10, x.lo, _ZERO_AT_ONE)[0], _at(math.log10, x.hi, _ZERO_AT_ONE)[1])
+
+
+def _sqrt_at(v: float) -> Tuple[float, float]:
+    if v.is_integer() and v < _EXACT_INT:
+        n = int(v)
+        root = math.isqrt(n)
+        if root * root == n:
+            return float(root), float(root)
+    r = math.sqrt(v)
+    # sqrt is correctly rounded, so one step out is enough.
+    return _down(r), _up(r)
+
+
+def _sqrt(x: Any) -> Interval:
+    x = _clip(to_interval(x), 0.0, _INF)
+    return Interval(max(0.0, _sqrt_at(x.lo)[0]), _sqrt_at(x.hi)[1])
+
+
+def _power_at(v: float, n: int) -> Tuple[float, float]:
+    # v**n for an integer n >= 1, exactly when an integer power fits.
+    if v.is_integer() and abs(v) < _EXACT_INT and n * int(abs(v)).bit_length() <= 1100:
+        return _from_int(int(v) ** n)
+    try:
+        return _near(v ** n)
+    except OverflowError:
+        return (_MAX, _INF) if v > 0 or n % 2 == 0 else (-_INF, -_MAX)
+
+
+def _integer_power(x: Interval, n: int) -> Interval:
+    if n == 0:
+        return Interval(1.0, 1.0)
+    if n < 0:
+        if x.lo == x.hi == 0:
+            raise ZeroDivisionError("0.0 cannot be raised to a negative power")
+        return 1.0 / _integer_power(x, -n)
+    lo, hi = x.lo, x.hi
+    if n % 2 or lo >= 0:
+        return Interval(_power_at(lo, n)[0], _power_at(hi, n)[1])
+    if hi <= 0:
+        return Interval(_power_at(hi, n)[0], _power_at(lo, n)[1])
+    return Interval(0.0, max(_power_at(lo, n)[1], _power_at(hi, n)[1]))
+
+
+def _corner(a: float, b: float) -> Tuple[float, float]:
+    # a**b for a >= 0, with 0**negative taken as its limit, inf.
+    if a == 0:
+        v = _INF if b < 0 else 1.0 if b == 0 else 0.0
+        return v, v
+    if a == 1 or b == 0:
+        return 1.0, 1.0
+    try:
+        return _near(a ** b)
+    except OverflowError:
+        return _MAX, _INF
+
+
+def _real_power(x: Interval, y: Interval) -> Interval:
+    # For a base >= 0, x**y is monotonic in each argument, so its extremes
+    # over the box are at the corners.
+    if x.hi < 0:
+        raise ValueError("Negative base with a non-integer exponent")
+    x = Interval(max(x.lo, 0.0), x.hi)
+    corners = [_corner(a, b) for a in (x.lo, x.hi) for b in (y.lo, y.hi)]
+    return Interval(max(0.0, min(c[0] for c in corners)), max(c[1] for c in corners))
+
+
+def _pow(x: Any, y: Any) -> Interval:
+    return to_interval(x) ** y
+
+
+def _floor_interval(x: Any) -> Interval:
+    x = to_interval(x)
+    return Interval(_floor(x.lo), _floor(x.hi))
+
+
+def _ceil_interval(x: Any) -> Interval:
+    x = to_interval(x)
+    return Interval(_ceil(x.lo), _ceil(x.hi))
+
+
+# Factorials: n! is increasing over the integers the interval contains.
+
+def _integers(x: Any) -> Tuple[float, float]:
+    x = to_interval(x)
+    first, last = max(0.0, _ceil(x.lo)), _floor(x.hi)
+    if not first <= last:
+        raise ValueError("factorial() not defined for negative or non-integral values")
+    return first, last
+
+
+def _factorial_at(k: float) -> Tuple[float, float]:
+    if k > calc_special.MAX_FLOAT_FACTORIAL:
+        return _MAX, _INF
+    return _from_int(calc_special.exact_factorial(int(k)))
+
+
+def _factorial(x: Any) -> Interval:
+    first, last = _integers(x)
+    return Interval(_factorial_at(first)[0], _factorial_at(last)[1])
+
+
+def _lfactorial(x: Any) -> Interval:
+    first, last = _integers(x)
+    exact = {0.0: 0.0, 1.0: 0.0}
+    return Interval(max(0.0, _at(calc_special.lfactorial, first, exact)[0]), _at(calc_special.lfactorial, last, exact)[1])
+
+
+# gamma and lgamma: on x > 0 both fall to a minimum at _GAMMA_ARGMIN and
+# then rise; each interval (-k-1, -k) between poles holds one turning point
+# of |gamma|, where digamma changes sign.
+
+_GAMMA_ARGMIN = 1.4616321449683623
+_GAMMA_MIN = 0.8856031944108887
+# Relative accuracy assumed for math.gamma/lgamma and calc_special.polygamma.
+_SPECIAL_REL = 1e-13
+
+
+def _gamma_at(x: float) -> Tuple[float, float]:
+    if x.is_integer() and 1 <= x <= calc_special.MAX_FLOAT_FACTORIAL + 1:
+        return _factorial_at(x - 1)
+    return _loose(calc_special.gamma(x), _SPECIAL_REL)
+
+
+def _lgamma_at(x: float) -> Tuple[float, float]:
+    if x in (1.0, 2.0):
+        return 0.0, 0.0
+    return _loose(calc_special.lgamma(x), _SPECIAL_REL, 1e-15)
+
+
+def _has_pole(x: Interval) -> bool:
+    return x.lo <= 0 and _ceil(x.lo) <= min(x.hi, 0.0)
+
+
+def _turning(x: Interval) -> int:
+    """-1 where |gamma| falls across x, 1 where it rises, 0 if it turns."""
+    lo, hi = x.lo, x.hi
+    if lo > 0:
+        if hi < _GAMMA_ARGMIN * (1 - 1e-14):
+            return -1
+        if lo > _GAMMA_ARGMIN * (1 + 1e-14):
+            return 1
+        return 0
+    # On a negative piece |gamma|'/|gamma| is digamma, which is increasing;
+    # near its root the sign is uncertain, so treat that as a turn.
+    if calc_special.polygamma(0, lo) > 1e-9:
+        return 1
+    if calc_special.polygamma(0, hi) < -1e-9:
+        return -1
+    return 0
+
+
+def _gamma(x: Any) -> Interval:
+    x = to_interval(x)
+    if _has_pole(x):
+        if x.lo == x.hi:
+            raise ValueError("math domain error")
+        return Interval(-_INF, _INF)
+    a, b = _gamma_at(x.lo), _gamma_at(x.hi)
+    turning = _turning(x)
+    if turning == 0:
+        if x.lo > 0:
+            return Interval(_GAMMA_MIN * (1 - 1e-14), max(a[1], b[1]))
+        # |gamma(x)| = pi / (|sin(pi x)| gamma(1 - x)) >= pi / gamma(1 - x),
+        # and gamma(1 - x) <= max(1, gamma(1 - lo)) here.
+        floor_abs = math.pi / max(1.0, _gamma_at(1.0 - x.lo)[1]) * (1 - 1e-12)
+        if a[0] > 0:
+            return Interval(floor_abs, max(a[1], b[1]))
+        return Interval(min(a[0], b[0]), -floor_abs)
+    sign = 1.0 if a[0] > 0 else -1.0
+    # gamma itself rises where |gamma| rises and gamma > 0, and so on.
+    if turning * sign > 0:
+        return Interval(a[0], b[1])
+    return Interval(b[0], a[1])
+
+
+def _lgamma(x: Any) -> Interval:
+    x = to_interval(x)
+    if _has_pole(x):
+        if x.lo == x.hi:
+            raise ValueError("math domain error")
+        return Interval(-_INF, _INF)
+    a, b = _lgamma_at(x.lo), _lgamma_at(x.hi)
+    turning = _turning(x)
+    if turning == 0:
+        if x.lo > 0:
+            low = math.log(_GAMMA_MIN) - 1e-14
+        else:
+            low = math.log(math.pi) - max(0.0, _lgamma_at(1.0 - x.lo)[1]) - 1e-12
+        return Interval(low, max(a[1], b[1]))
+    if turning > 0:
+        return Interval(a[0], b[1])
+    return Interval(b[0], a[1])
+
+
+def _polygamma(n: Any, x: Any) -> Interval:
+    n = to_interval(n)
+    if n.lo != n.hi:
+        raise ValueError("polygamma() order must be a non-negative integer")
+    order = calc_special.polygamma_order(n.lo)
+    x = to_interval(x)
+    if _has_pole(x):
+        if x.lo == x.hi:
+            raise ValueError("math domain error")
+        return Interval(-_INF, _INF)
+
+    def at(v: float) -> Tuple[float, float]:
+        return _loose(calc_special.polygamma(order, v), _SPECIAL_REL, 1e-15)
+
+    a, b = at(x.lo), at(x.hi)
+    # Between poles polygamma(n) is increasing for even n. For odd n it is
+    # positive, decreasing on x > 0 and convex on each negative piece.
+    if order % 2 == 0:
+        return Interval(a[0], b[1])
+    if x.lo > 0:
+        return Interval(b[0], a[1])
+    slope_lo = calc_special.polygamma(order + 1, x.lo)
+    slope_hi = calc_special.polygamma(order + 1, x.hi)
+    if slope_lo >= 0:
+        return Interval(a[0], b[1])
+    if slope_hi <= 0:
+        return Interval(b[0], a[1])
+    return Interval(0.0, max(a[1], b[1]))
+
+
+def _scaled(factor: float) -> Callable[[Any], Interval]:
+    constant = Interval(*_near(factor))
+
+    def apply(x: Any) -> Interval:
+        return to_interval(x) * constant
+
+    return apply
+
+
+def _constant(value: float) -> Interval:
+    return Interval(_down(value), _up(value))
+
+
+class IntervalBackend(Backend):
+    """Interval arithmetic: each result is an Interval enclosing the exact value.
+
+    Bind variables to Intervals (or numbers, taken as exact points). Every
+    operation rounds outward; functions are evaluated at the interval ends,
+    plus the turning points they contain, and widened by the error of the
+    underlying float function. Parts of an interval outside a function's
+    domain are dropped, and a pole inside one gives an unbounded result.
+    """
+
+    name = "interval"
+
+    def __init__(self) -> None:
+        self._names: Optional[Dict[str, Any]] = None
+
+    def number(self, value: Any) -> Any:
+        return _literal(value)
+
+    def names(self) -> Mapping[str, Any]:
+        if self._names is None:
+            names: Dict[str, Any] = {
+                "sin": _periodic(math.sin, 1, 3, _ZERO),
+                "cos": _periodic(math.cos, 0, 2, _ONE_AT_ZERO),
+                "tan": _tan,
+                "asin": _domain(_increasing(math.asin, _ZERO), -1.0, 1.0),
+                "acos": _domain(_bounded(_decreasing(math.acos, _ZERO_AT_ONE), 0.0, _INF), -1.0, 1.0),
+                "atan": _increasing(math.atan, _ZERO),
+                "sinh": _increasing(_overflow_to_inf(math.sinh), _ZERO),
+                "cosh": _cosh,
+                "tanh": _bounded(_increasing(math.tanh, _ZERO), -1.0, 1.0),
+                "log": _log,
+                "log10": _log10,
+                "sqrt": _sqrt,
+                "pow": _pow,
+                "exp": _bounded(_increasing(_overflow_to_inf(math.exp), _ONE_AT_ZERO), 0.0, _INF),
+                "fabs": abs,
+                "floor": _floor_interval,
+                "ceil": _ceil_interval,
+                "degrees": _scaled(180 / math.pi),
+                "radians": _scaled(math.pi / 180),
+                "factorial": _factorial,
+                "lfactorial": _lfactorial,
+                "gamma": _gamma,
+                "lgamma": _lgamma,
+                "polygamma": _polygamma,
+                "ln": _log,
+                "abs": abs,
+                "pi": _constant(math.pi),
+                "e": _constant(math.e),
+                "tau": _constant(math.tau),
+                "inf": Interval(_INF, _INF),
+                "nan": Interval(math.nan, math.nan),
+            }
+            self._names = names
+        return self._names
+
+    def result(self, value: Any) -> Any:
+        value = to_interval(value)
+        if value.lo != value.lo or value.hi != value.hi:
+            return Interval(math.nan, math.nan)
+        return value
+
+
+register_backend(IntervalBackend())
@@ -0,0 +1,316 @@
+import ast
+import cmath
+import math
+import sys
+from contextlib import nullcontext
+from typing import Any, Callable, Collection, ContextManager, Dict, List, Mapping, Optional, Tuple
+
+import calc_special
+from calc_backends import Backend, register_backend, to_float
+from calc_eval import MATRIX_BUILDER, MatrixError
+from calc_parser import BANG, COMMA, LBRACKET, LPAREN, NAME, NUMBER, OP, PERCENT, Token, _number, tokenize
+
+# Values the cmath functions take directly. NumPy's float64 and complex128
+# scalars subclass float and complex, so det() results are numbers too.
+_NUMBERS = (int, float, complex)
+
+# Built-in names of the complex backend that the float table lacks.
+COMPLEX_NAMES = frozenset({"i", "det", "inv", "transpose", "solve"})
+
+# Prefix for the names stack_template puts in place of literals. "#" cannot
+# appear in a parsed name, nor in calc_opt's temporaries.
+STACK_PREFIX = "#"
+
+# Literals with a larger magnitude lose precision as float64 array entries.
+_EXACT_INT = 2 ** 53
+
+
+def _elementwise(scalar: Callable[[Any], Any], array: str) -> Callable[[Any], Any]:
+    # ``array`` names the NumPy function for array arguments; the np.emath
+    # ones return complex values where the real function has none.
+    module, _, attr = array.rpartition(".")
+
+    def fn(x: Any) -> Any:
+        if isinstance(x, _NUMBERS):
+            return scalar(x)
+        import numpy as np
+
+        return getattr(np.emath if module else np, attr)(x)
+
+    fn.__name__ = attr
+    return fn
+
+
+def _log(x: Any, base: Any = None) -> Any:
+    if isinstance(x, _NUMBERS) and isinstance(base, (*_NUMBERS, type(None))):
+        return cmath.log(x) if base is None else cmath.log(x, base)
+    import numpy as np
+
+    if base is None:
+        return np.emath.log(x)
+    return np.emath.log(x) / np.emath.log(base)
+
+
+def _pow(x: Any, y: Any) -> Any:
+    if isinstance(x, _NUMBERS) and isinstance(y, _NUMBERS):
+        return complex(x) ** y
+    import numpy as np
+
+    return np.power(np.asarray(x, dtype=complex), y)
+
+
+def _real(x: Any, name: str) -> Any:
+    if isinstance(x, complex):
+        if x.imag:
+            raise ValueError(f"{name}() needs a real argument")
+        return x.real
+    if isinstance(x, (int, float)):
+        return x
+    import numpy as np
+
+    x = np.asarray(x)
+    if np.iscomplexobj(x):
+        if np.any(x.imag):
+            raise ValueError(f"{name}() needs a real argument")
+        return x.real
+    return x
+
+
+def _real_only(fn: Callable[..., Any], name: str) -> Callable[..., Any]:
+    # floor, factorial, gamma and the like: defined for complex values with
+    # no imaginary part, applied entry by entry to arrays.
+    def wrapped(*args: Any) -> Any:
+        reals = [_real(a, name) for a in args]
+        if all(isinstance(r, (int, float)) for r in reals):
+            return fn(*reals)
+        import numpy as np
+
+        return np.vectorize(fn, otypes=[float])(*reals)
+
+    wrapped.__name__ = name
+    wrapped.cost_bounded = getattr(fn, "cost_bounded", False)  # type: ignore[attr-defined]
+    return wrapped
+
+
+def _square(x: Any, name: str) -> Any:
+    import numpy as np
+
+    x = np.asarray(x)
+    if x.ndim < 2 or x.shape[-1] != x.shape[-2]:
+        raise MatrixError(f"{name}() needs a square matrix")
+    return x
+
+
+def _det(x: Any) -> Any:
+    import numpy as np
+
+    return np.linalg.det(_square(x, "det"))
+
+
+def _inv(x: Any) -> Any:
+    import numpy as np
+
+    try:
+        return np.linalg.inv(_square(x, "inv"))
+    except np.linalg.LinAlgError:
+        raise MatrixError("Matrix is singular") from None
+
+
+def _transpose(x: Any) -> Any:
+    import numpy as np
+
+    x = np.asarray(x)
+    return x if x.ndim < 2 else np.swapaxes(x, -1, -2)
+
+
+def _solve(a: Any, b: Any) -> Any:
+    import numpy as np
+
+    a = _square(a, "solve")
+    b = np.asarray(b)
+    try:
+        if b.ndim == a.ndim - 1:
+            # A vector right-hand side (or a stack of them): solve for a column.
+            return np.linalg.solve(a, b[..., None])[..., 0]
+        return np.linalg.solve(a, b)
+    except np.linalg.LinAlgError:
+        raise MatrixError("Matrix is singular") from None
+
+
+def _builder(entry_ndim: int) -> Callable[..., Any]:
+    # Entries of a vector have entry_ndim dimensions: 0 for plain numbers,
+    # 1 when each literal stands for a stack of numbers (see stack_template).
+    def build(rows: bool, *elements: Any) -> Any:
+        import numpy as np
+
+        arrays = [np.asarray(e, dtype=complex) for e in elements]
+        if rows:
+            if len({a.shape[-1] for a in arrays}) > 1:
+                raise MatrixError("Matrix rows must have the same length")
+        elif any(a.ndim > entry_ndim for a in arrays):
+            raise MatrixError("Matrix entries must be numbers")
+        return np.stack(np.broadcast_arrays(*arrays), axis=-2 if rows else -1)
+
+    return build
+
+
+class ComplexBackend(Backend):
+    """Complex numbers through cmath, and matrices as NumPy arrays.
+
+    sqrt(-1) and log(-1) have values here. ``i`` is the imaginary unit and
+    [[1, 2], [3, 4]] a matrix literal; +, -, *, / and ^ work entry by entry
+    and @ is the matrix product, with det, inv, transpose and solve on top.
+    NumPy is only imported once an expression uses a matrix.
+
+    ``stacked`` is the variant stack_template's programs run on: every
+    literal is a 1-d array holding that literal from each expression of a
+    batch, so matrices gain a leading batch axis.
+    """
+
+    name = "complex"
+
+    def __init__(self, stacked: bool = False) -> None:
+        self.stacked = stacked
+        self._names: Optional[Dict[str, Any]] = None
+
+    @property
+    def key(self) -> str:
+        return "complex:stacked" if self.stacked else "complex"
+
+    def context(self) -> ContextManager[Any]:
+        # Array results carry inf and nan without NumPy's warnings. Nothing
+        # imports NumPy just for this, so scalar-only use stays free of it.
+        np = sys.modules.get("numpy")
+        return np.errstate(all="ignore") if np is not None else nullcontext()
+
+    def names(self) -> Mapping[str, Any]:
+        if self._names is None:
+            names: Dict[str, Any] = {
+                "sin": _elementwise(cmath.sin, "sin"),
+                "cos": _elementwise(cmath.cos, "cos"),
+                "tan": _elementwise(cmath.tan, "tan"),
+                "asin": _elementwise(cmath.asin, "emath.arcsin"),
+                "acos": _elementwise(cmath.acos, "emath.arccos"),
+                "atan": _elementwise(cmath.atan, "arctan"),
+                "sinh": _elementwise(cmath.sinh, "sinh"),
+                "cosh": _elementwise(cmath.cosh, "cosh"),
+                "tanh": _elementwise(cmath.tanh, "tanh"),
+                "log": _log,
+                "log10": _elementwise(cmath.log10, "emath.log10"),
+                "sqrt": _elementwise(cmath.sqrt, "emath.sqrt"),
+                "pow": _pow,
+                "exp": _elementwise(cmath.exp, "exp"),
+                "fabs": abs,
+                "degrees": lambda x: x * (180 / math.pi),
+                "radians": lambda x: x * (math.pi / 180),
+                "ln": _log,
+                "abs": abs,
+                "pi": math.pi,
+                "e": math.e,
+                "tau": math.tau,
+                "inf": math.inf,
+                "nan": math.nan,
+                "i": 1j,
+                "det": _det,
+                "inv": _inv,
+                "transpose": _transpose,
+                "solve": _solve,
+                MATRIX_BUILDER: _builder(1 if self.stacked else 0),
+            }
+            for name, fn in (
+                ("floor", math.floor),
+                ("ceil", math.ceil),
+                ("factorial", calc_special.factorial),
+                ("lfactorial", calc_special.lfactorial),
+                ("gamma", calc_special.gamma),
+                ("lgamma", calc_special.lgamma),
+                ("polygamma", calc_special.polygamma),
+            ):
+                names[name] = _real_only(fn, name)
+            self._names = names
+        return self._names
+
+    def result(self, value: Any) -> Any:
+        if isinstance(value, _NUMBERS) and not isinstance(value, bool):
+            return complex(to_float(value)) if isinstance(value, int) else complex(value)
+        kind = getattr(getattr(value, "dtype", None), "kind", "")
+        if kind in ("i", "u", "f", "c"):
+            return complex(value) if value.ndim == 0 else value.astype(complex)
+        raise ValueError("Expression did not evaluate to a number")
+
+
+def needs_complex(text: str, variables: Collection[str] = ()) -> bool:
+    """Whether ``text`` has a matrix literal, @, or one of COMPLEX_NAMES.
+
+    Names in ``variables`` are the user's own, so they do not count.
+    """
+    return any(
+        token.kind == LBRACKET
+        or (token.kind == OP and token.text == "@")
+        or (token.kind == NAME and token.text in COMPLEX_NAMES and token.text not in variables)
+        for token in tokenize(text)
+    )
+
+
+def stack_template(tokens: List[Token]) -> Optional[Tuple[str, List[Token], List[Any]]]:
+    """``tokens`` with each number replaced by a name: #0, #1, ...
+
+    Expressions that differ only in their numbers share a template, so a
+    batch of them can run as one program over arrays of those numbers on
+    the stacked backend. Returns a key identifying the template, its
+    tokens and the numbers. Returns None when stacking could change the
+    result: for integers float64 cannot hold exactly, and for "%", whose
+    modulo NumPy does not support on complex arrays.
+    """
+    key: List[str] = []
+    template: List[Token] = []
+    literals: List[Any] = []
+    sign = 1
+    for i, token in enumerate(tokens):
+        if token.kind == NUMBER:
+            value = sign * _number(token.text)
+            if type(value) is int and abs(value) > _EXACT_INT:
+                return None
+            token = Token(NAME, f"{STACK_PREFIX}{len(literals)}", token.pos, token.end)
+            literals.append(value)
+            sign = 1
+        elif token.kind == PERCENT:
+            return None
+        elif _negates_number(tokens, i):
+            # -2 and 2 share a template, so the sign goes into the number.
+            sign = -1
+            continue
+        key.append(token.text)
+        template.append(token)
+    return " ".join(key), template, literals
+
+
+def _negates_number(tokens: List[Token], i: int) -> bool:
+    # A unary minus directly before a number, unless a power or factorial
+    # binds the number first: -2^2 is -(2^2).
+    if tokens[i].text != "-" or i + 1 == len(tokens) or tokens[i + 1].kind != NUMBER:
+        return False
+    if i > 0 and tokens[i - 1].kind not in (OP, LPAREN, LBRACKET, COMMA):
+        return False
+    after = tokens[i + 2] if i + 2 < len(tokens) else None
+    return after is None or not (after.kind == BANG or after.text in ("^", "**"))
+
+
+def stackable(tree: ast.Expression) -> bool:
+    """Whether a template tree gives the same results stacked.
+
+    A vector literal that is not a row of a matrix does not: the batch axis
+    would make it look like a matrix to @, solve and transpose.
+    """
+    rows = set()
+    vectors = []
+    for node in ast.walk(tree.body):
+        if type(node) is ast.List:
+            if all(type(e) is ast.List for e in node.elts):
+                rows.update(id(e) for e in node.elts)
+            else:
+                vectors.append(node)
+    return all(id(vector) in rows for vector in vectors)
+
+
+register_backend(ComplexBackend())
@@ -0,0 +1,302 @@
+import heapq
+import math
+import sys
+from typing import Any, Callable, List, Mapping, Optional, Sequence, Tuple
+
+import calc_core
+
+# Gauss-Kronrod 7/15 nodes and weights on [-1, 1] (QUADPACK's qk15).
+_XGK = (
+    0.991455371120812639206854697526329, 0.949107912342758524526189684047851,
+    0.864864423359769072789712788640926, 0.741531185599394439863864773280788,
+    0.586087235467691130294144845693013, 0.405845151377397166906606412076961,
+    0.207784955007898467600689403773245, 0.0,
+)
+_WGK = (
+    0.022935322010529224963732008058970, 0.063092092629978553290700663189204,
+    0.104790010322250183839876322541518, 0.140653259715525918745189590510238,
+    0.169004726639267902826583426598550, 0.190350578064785409913256402421014,
+    0.204432940075298892414161999234649, 0.209482141084727828012999174891714,
+)
+_WG = (0.129484966168869693270611432679082, 0.279705391489276667901467771423780,
+       0.381830050505118944950369775488975, 0.417959183673469387755102040816327)
+_NODES = tuple(-x for x in _XGK[:-1]) + tuple(reversed(_XGK))
+_KRONROD = _WGK[:-1] + tuple(reversed(_WGK))
+# The Gauss rule uses every other Kronrod node.
+_GAUSS_HALF = tuple(_WG[i // 2] if i % 2 else 0.0 for i in range(len(_XGK)))
+_GAUSS = _GAUSS_HALF[:-1] + tuple(reversed(_GAUSS_HALF))
+
+DEFAULT_SAMPLES = 200
+MAX_SAMPLES = 4000
+
+_EPS = sys.float_info.epsilon
+
+
+def batch_function(
+    text: str, var: str, variables: Optional[Mapping[str, Any]] = None
+) -> Callable[[Sequence[float]], List[float]]:
+    """Evaluate ``text`` at many values of ``var`` per call.
+
+    Uses the vectorized path when NumPy is installed and every other bound
+    name is a number; otherwise the compiled float function, point by point.
+    Points where the expression is undefined come back as nan.
+    """
+    if variables is None or not any(callable(v) for v in variables.values()):
+        try:
+            vector = calc_core.compile_function(text, var, variables, vectorized=True)
+        except ImportError:
+            pass
+        else:
+            return lambda xs: vector(xs).tolist()
+    scalar = calc_core.compile_function(text, var, variables)
+
+    def batch(xs: Sequence[float]) -> List[float]:
+        ys = []
+        for x in xs:
+            try:
+                ys.append(scalar(x))
+            except (ValueError, ZeroDivisionError, OverflowError):
+                ys.append(math.nan)
+        return ys
+
+    return batch
+
+
+def solve(
+    text: str,
+    var: str,
+    bracket: Tuple[float, float],
+    variables: Optional[Mapping[str, Any]] = None,
+    xtol: float = 2e-12,
+    max_iter: Optional[int] = None,
+) -> float:
+    """A root of ``text`` in ``var`` within ``bracket``, by Brent's method.
+
+    When the expression has the same sign at both ends, the bracket is
+    sampled for the first sign change; ValueError if there is none, or if
+    the sign change is a pole or a jump rather than a root. By default
+    ``max_iter`` allows for bisecting the bracket down to ``xtol``.
+    """
+    f = calc_core.compile_function(text, var, variables)
+    a, b = float(bracket[0]), float(bracket[1])
+    if not (math.isfinite(a) and math.isfinite(b)) or a == b:
+        raise ValueError("solve() needs a finite bracket with distinct ends")
+    fa, fb = f(a), f(b)
+    if fa == 0:
+        return a
+    if fb == 0:
+        return b
+    if not (fa < 0 < fb or fb < 0 < fa):
+        a, b, fa, fb = _find_sign_change(text, var, a, b, variables, f)
+        if fa == 0:
+            return a
+        if fb == 0:
+            return b
+    if max_iter is None:
+        # Brent bisects at least every fourth step; see _brent.
+        max_iter = 4 * (math.ceil(math.log2(max(abs(b - a) / xtol, 2.0))) + 1)
+    root = _brent(f, a, b, fa, fb, xtol, max_iter)
+    _check_root(f, root, float(bracket[0]), float(bracket[1]))
+    return root
+
+
+def _find_sign_change(
+    text: str, var: str, a: float, b: float, variables: Optional[Mapping[str, Any]], f: Callable[[float], float]
+) -> Tuple[float, float, float, float]:
+    xs, ys = sample(text, var, (a, b), variables=variables)
+    for x0, y0, x1, y1 in zip(xs, ys, xs[1:], ys[1:]):
+        if y0 == 0:
+            return x0, x0, 0.0, 0.0
+        if y0 < 0 < y1 or y1 < 0 < y0:
+            # The sampled values may come from NumPy; refine with the
+            # float function the root is computed with.
+            return x0, x1, f(x0), f(x1)
+    raise ValueError("The expression does not change sign in the bracket")
+
+
+def _brent(f: Callable[[float], float], a: float, b: float, fa: float, fb: float, xtol: float, max_iter: int) -> float:
+    # Brent's method as in SciPy's brentq: secant or inverse quadratic
+    # interpolation steps, falling back to bisection when they stall.
+    # Near a multiple root such as x^3 the interpolation steps can each
+    # shave off a sliver, so a bisection is forced whenever three steps in
+    # a row have not halved the bracket.
+    xpre, xcur, fpre, fcur = a, b, fa, fb
+    xblk = fblk = spre = scur = 0.0
+    halved, stalled = abs(b - a), 0
+    for _ in range(max_iter):
+        if fpre != 0 and fcur != 0 and (fpre < 0) != (fcur < 0):
+            xblk, fblk = xpre, fpre
+            spre = scur = xcur - xpre
+        if abs(fblk) < abs(fcur):
+            xpre, xcur, xblk = xcur, xblk, xcur
+            fpre, fcur, fblk = fcur, fblk, fcur
+        delta = (xtol + 4 * _EPS * abs(xcur)) / 2
+        sbis = (xblk - xcur) / 2
+        if fcur == 0 or abs(sbis) < delta:
+            return xcur
+        if 2 * abs(sbis) <= halved / 2:
+            halved, stalled = 2 * abs(sbis), 0
+        else:
+            stalled += 1
+        if stalled < 3 and abs(spre) > delta and abs(fcur) < abs(fpre):
+            if xpre == xblk:
+                stry = -fcur * (xcur - xpre) / (fcur - fpre)
+            else:
+                dpre = (fpre - fcur) / (xpre - xcur)
+                dblk = (fblk - fcur) / (xblk - xcur)
+                # Slopes that underflow to zero leave no step; bisect instead.
+                denominator = dblk * dpre * (fblk - fpre)
+                stry = -fcur * (fblk * dblk - fpre * dpre) / denominator if denominator else math.inf
+            if 2 * abs(stry) < min(abs(spre), 3 * abs(sbis) - delta):
+                spre, scur = scur, stry
+            else:
+                spre = scur = sbis
+        else:
+            spre = scur = sbis
+        xpre, fpre = xcur, fcur
+        xcur += scur if abs(scur) > delta else (delta if sbis > 0 else -delta)
+        fcur = f(xcur)
+        if fcur != fcur:
+            raise ValueError("The expression is undefined inside the bracket")
+    raise ValueError("solve() did not converge")
+
+
+def _check_root(f: Callable[[float], float], root: float, lo: float, hi: float) -> None:
+    # A sign change across a pole (tan at pi/2) or a jump also narrows to a
+    # point. Near a root |f| falls towards zero; there it stays put or grows.
+    # So |f(root)| must be well below |f| a little way off on both sides.
+    froot = abs(f(root))
+    if froot == 0:
+        return
+    step = 2.0**20 * max(2e-12, 4 * _EPS * abs(root))
+    for probe in (max(root - step, min(lo, hi)), min(root + step, max(lo, hi))):
+        if probe != root and not 2 * froot <= abs(f(probe)):
+            raise ValueError(f"The expression changes sign at a discontinuity near {root:.12g}, not at a root")
+
+
+def integrate(
+    text: str,
+    var: str,
+    a: float,
+    b: float,
+    variables: Optional[Mapping[str, Any]] = None,
+    abs_tol: float = 1e-10,
+    rel_tol: float = 1e-10,
+    max_intervals: int = 500,
+) -> float:
+    """The definite integral of ``text`` over ``var`` from ``a`` to ``b``.
+
+    Adaptive Gauss-Kronrod 7/15: the interval with the largest error
+    estimate is bisected until the total error is within tolerance. The
+    15 points of each interval are evaluated as one batch. Raises
+    ValueError at a point where the integrand is not finite, or when the
+    tolerance is not met within ``max_intervals``.
+    """
+    a, b = float(a), float(b)
+    if not (math.isfinite(a) and math.isfinite(b)):
+        raise ValueError("integrate() needs finite bounds")
+    if a == b:
+        return 0.0
+    batch = batch_function(text, var, variables)
+
+    def rules(lo: float, hi: float, ys: Sequence[float]) -> Tuple[float, float]:
+        for x, y in zip(_NODES, ys):
+            if not math.isfinite(y):
+                raise ValueError(f"The integrand is not finite at {var} = {(lo + hi) / 2 + (hi - lo) / 2 * x:.12g}")
+        half = (hi - lo) / 2
+        kronrod = half * math.fsum(w * y for w, y in zip(_KRONROD, ys))
+        gauss = half * math.fsum(w * y for w, y in zip(_GAUSS, ys))
+        return kronrod, abs(kronrod - gauss)
+
+    def nodes(lo: float, hi: float) -> List[float]:
+        mid, half = (lo + hi) / 2, (hi - lo) / 2
+        return [mid + half * x for x in _NODES]
+
+    value, error = rules(a, b, batch(nodes(a, b)))
+    # Max-heap on error: (-error, lo, hi, value).
+    heap = [(-error, a, b, value)]
+    total, total_error = value, error
+    while total_error > max(abs_tol, rel_tol * abs(total)):
+        if len(heap) >= max_intervals:
+            raise ValueError(f"integrate() did not converge (error estimate {total_error:.3g})")
+        _, lo, hi, value = heapq.heappop(heap)
+        mid = (lo + hi) / 2
+        ys = batch(nodes(lo, mid) + nodes(mid, hi))
+        left, left_error = rules(lo, mid, ys[: len(_NODES)])
+        right, right_error = rules(mid, hi, ys[len(_NODES):])
+        heapq.heappush(heap, (-left_error, lo, mid, left))
+        heapq.heappush(heap, (-right_error, mid, hi, right))
+        total = math.fsum(item[3] for item in heap)
+        total_error = math.fsum(-item[0] for item in heap)
+    return total
+
+
+def sample(
+    text: str,
+    var: str,
+    span: Tuple[float, float],
+    n: int = DEFAULT_SAMPLES,
+    variables: Optional[Mapping[str, Any]] = None,
+    tolerance: float = 1e-3,
+    max_depth: int = 6,
+    max_points: int = MAX_SAMPLES,
+) -> Tuple[List[float], List[float]]:
+    """Points (xs, ys) for plotting ``text`` over ``span``, denser where it bends.
+
+    Starts from ``n`` evenly spaced points. Each refinement round bisects
+    the intervals next to a point that is further than ``tolerance`` times
+    the plotted height from the chord through its neighbours, and the
+    intervals where the curve enters or leaves its domain; all new points
+    of a round are evaluated as one batch. Undefined points are nan.
+    """
+    lo, hi = float(span[0]), float(span[1])
+    if not (math.isfinite(lo) and math.isfinite(hi)) or lo >= hi:
+        raise ValueError("sample() needs a finite range with low < high")
+    if n < 2:
+        raise ValueError("sample() needs at least 2 points")
+    batch = batch_function(text, var, variables)
+    xs = [lo + (hi - lo) * i / (n - 1) for i in range(n)]
+    ys = batch(xs)
+    for _ in range(max_depth):
+        finite = [y for y in ys if math.isfinite(y)]
+        height = max(finite) - min(finite) if finite else 0.0
+        threshold = tolerance * (height or 1.0)
+        refine = [math.isfinite(y0) != math.isfinite(y1) for y0, y1 in zip(ys, ys[1:])]
+        for j in range(1, len(xs) - 1):
+            x0, x1, x2 = xs[j - 1], xs[j], xs[j + 1]
+            y0, y1, y2 = ys[j - 1], ys[j], ys[j + 1]
+            chord = y0 + (y2 - y0) * (x1 - x0) / (x2 - x0)
+            # nan compares False, so intervals with undefined ends are only
+            # refined by the domain test above.
+            if abs(y1 - chord) > threshold:
+                refine[j - 1] = refine[j] = True
+        mids = [(xs[i] + xs[i + 1]) / 2 for i, flag in enumerate(refine) if flag]
+        if not mids or len(xs) + len(mids) > max_points:
+            break
+        new_ys = iter(batch(mids))
+        merged_xs, merged_ys = [xs[0]], [ys[0]]
+        for i, flag in enumerate(refine):
+            if flag:
+                merged_xs.append((xs[i] + xs[i + 1]) / 2)
+                merged_ys.append(next(new_ys))
+            merged_xs.append(xs[i + 1])
+            merged_ys.append(ys[i + 1])
+        xs, ys = merged_xs, merged_ys
+    return xs, ys
+
+
+def plot_range(ys: Sequence[float]) -> Tuple[float, float]:
+    """The y range to draw sampled values in, with a 5% margin.
+
+    Fences at three interquartile ranges keep a pole (tan, 1/x) from
+    flattening the rest of the curve. Undefined values are ignored.
+    """
+    finite = sorted(y for y in ys if math.isfinite(y))
+    if not finite:
+        return -1.0, 1.0
+    q1, q3 = finite[len(finite) // 4], finite[(3 * len(finite)) // 4]
+    low, high = max(finite[0], q1 - 3 * (q3 - q1)), min(finite[-1], q3 + 3 * (q3 - q1))
+    if low == high:
+        low, high = low - 1.0, high + 1.0
+    pad = (high - low) * 0.05
+    return low - pad, high + pad
@@ -0,0 +1,304 @@
+import ast
+from fractions import Fraction
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from calc_eval import _UNARYOPS, DEFAULT_LIMITS, Limits, Program, guarded_binops, guarded_function, lower
+
+# Prefix for hoisted temporaries. "$" cannot appear in a parsed name, so
+# temporaries never collide with user variables.
+TEMP_PREFIX = "$"
+
+
+class Optimized(NamedTuple):
+    """An optimized tree: temporaries to compute first, then the body.
+
+    ``temps`` is in dependency order; each entry may refer to the ones
+    before it.
+    """
+
+    body: ast.expr
+    temps: List[Tuple[str, ast.expr]]
+    folded: int = 0
+    simplified: int = 0
+    hoisted: int = 0
+
+
+def _is_number(node: ast.expr, value: int) -> bool:
+    if type(node) is not ast.Constant or isinstance(node.value, bool):
+        return False
+    try:
+        return bool(node.value == value)
+    except Exception:
+        return False
+
+
+def _children(node: ast.expr) -> List[ast.expr]:
+    kind = type(node)
+    if kind is ast.BinOp:
+        return [node.left, node.right]
+    if kind is ast.UnaryOp:
+        return [node.operand]
+    if kind is ast.Call:
+        return list(node.args)
+    if kind is ast.List:
+        return list(node.elts)
+    return []
+
+
+def _postorder(root: ast.expr) -> List[ast.expr]:
+    # Iterative: left-leaning chains can be far deeper than the stack.
+    order: List[ast.expr] = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(_children(node))
+    order.reverse()
+    return order
+
+
+class _Folder:
+    def __init__(self, names: Mapping[str, Any], limits: Limits, number: Optional[Callable[[Any], Any]]) -> None:
+        self.names = names
+        self.number = number
+        self.ops = guarded_binops(limits, number is not None)
+        self.limits = limits
+        self.folded = 0
+        self.simplified = 0
+
+    def _try(self, fn: Callable[[], Any], node: ast.expr) -> ast.expr:
+        # Anything that fails (1/0, a domain error, a limit) is left in the
+        # tree so the error is raised by the normal evaluation path.
+        try:
+            value = fn()
+        except Exception:
+            return node
+        self.folded += 1
+        return ast.Constant(value)
+
+    def leaf(self, node: ast.expr) -> ast.expr:
+        if type(node) is ast.Constant:
+            return ast.Constant(self.number(node.value) if self.number is not None else node.value)
+        if node.id in self.names and not callable(self.names[node.id]):
+            return ast.Constant(self.names[node.id])
+        return ast.Name(node.id, ast.Load())
+
+    def binop(self, op: ast.operator, left: ast.expr, right: ast.expr) -> ast.expr:
+        node = ast.BinOp(left, op, right)
+        kind = type(op)
+        if type(left) is ast.Constant and type(right) is ast.Constant:
+            fn = self.ops[kind]
+            return self._try(lambda: fn(left.value, right.value), node)
+        if (
+            (kind in (ast.Add, ast.Sub) and _is_number(right, 0))
+            or (kind in (ast.Mult, ast.Div, ast.Pow) and _is_number(right, 1))
+        ):
+            self.simplified += 1
+            return left
+        if (kind is ast.Add and _is_number(left, 0)) or (kind is ast.Mult and _is_number(left, 1)):
+            self.simplified += 1
+            return right
+        return node
+
+    def unaryop(self, op: ast.unaryop, operand: ast.expr) -> ast.expr:
+        if type(op) is ast.UAdd:
+            return operand
+        if type(operand) is ast.Constant:
+            return self._try(lambda: _UNARYOPS[type(op)](operand.value), ast.UnaryOp(op, operand))
+        if type(operand) is ast.UnaryOp and type(operand.op) is ast.USub:
+            self.simplified += 1
+            return operand.operand
+        return ast.UnaryOp(op, operand)
+
+    def call(self, name: str, args: List[ast.expr]) -> ast.expr:
+        node = ast.Call(ast.Name(name, ast.Load()), args, [])
+        fn = self.names.get(name)
+        if fn is None or not callable(fn) or any(type(a) is not ast.Constant for a in args):
+            return node
+        fn = guarded_function(name, fn, self.limits, self.number is not None)
+        return self._try(lambda: fn(*[a.value for a in args]), node)
+
+    def run(self, root: ast.expr) -> ast.expr:
+        results: Dict[int, ast.expr] = {}
+        for node in _postorder(root):
+            kind = type(node)
+            if kind is ast.BinOp:
+                new = self.binop(node.op, results[id(node.left)], results[id(node.right)])
+            elif kind is ast.UnaryOp:
+                new = self.unaryop(node.op, results[id(node.operand)])
+            elif kind is ast.Call:
+                new = self.call(node.func.id, [results[id(a)] for a in node.args])
+            elif kind is ast.List:
+                # Matrix literals are not folded to constants: _signature
+                # could not tell two large arrays apart by their repr.
+                new = ast.List([results[id(e)] for e in node.elts], ast.Load())
+            else:
+                new = self.leaf(node)
+            results[id(node)] = new
+        return results[id(root)]
+
+
+def _signature(node: ast.expr, key_of: Dict[int, int]) -> Tuple[Any, ...]:
+    kind = type(node)
+    if kind is ast.Constant:
+        value = node.value
+        # repr keeps -0.0 apart from 0.0 and Decimal("1.0") from Decimal("1"),
+        # but cannot print integers beyond Python's str conversion limit.
+        return ("c", type(value), value if type(value) in (int, Fraction) else repr(value))
+    if kind is ast.Name:
+        return ("n", node.id)
+    if kind is ast.BinOp:
+        return ("b", type(node.op), key_of[id(node.left)], key_of[id(node.right)])
+    if kind is ast.UnaryOp:
+        return ("u", type(node.op), key_of[id(node.operand)])
+    if kind is ast.List:
+        return ("l",) + tuple(key_of[id(e)] for e in node.elts)
+    return ("f", node.func.id) + tuple(key_of[id(a)] for a in node.args)
+
+
+def _hoist(root: ast.expr) -> Tuple[ast.expr, List[Tuple[str, ast.expr]]]:
+    # Number structurally equal subtrees alike (hash-consing).
+    key_of: Dict[int, int] = {}
+    table: Dict[Tuple[Any, ...], int] = {}
+    for node in _postorder(root):
+        key_of[id(node)] = table.setdefault(_signature(node, key_of), len(table))
+
+    # Count occurrences, descending into each distinct subtree only once so
+    # the pieces of a repeated subtree are not themselves counted twice.
+    counts: Dict[int, int] = {}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        key = key_of[id(node)]
+        counts[key] = counts.get(key, 0) + 1
+        if counts[key] == 1:
+            stack.extend(_children(node))
+    # Matrix literals are not hoisted: a row must stay a bracketed list for
+    # lower to tell a matrix from a vector.
+    repeated = {
+        key_of[id(node)]
+        for node in _postorder(root)
+        if counts[key_of[id(node)]] > 1 and type(node) in (ast.BinOp, ast.UnaryOp, ast.Call)
+    }
+    if not repeated:
+        return root, []
+
+    temps: List[Tuple[str, ast.expr]] = []
+    temp_of: Dict[int, str] = {}
+    results: Dict[int, ast.expr] = {}
+    # Post-order with explicit enter/exit so later copies of a hoisted
+    # subtree are replaced without being walked.
+    work: List[Tuple[ast.expr, bool]] = [(root, False)]
+    while work:
+        node, done = work.pop()
+        key = key_of[id(node)]
+        if not done:
+            if key in temp_of:
+                results[id(node)] = ast.Name(temp_of[key], ast.Load())
+                continue
+            work.append((node, True))
+            work.extend((child, False) for child in reversed(_children(node)))
+            continue
+        kind = type(node)
+        if kind is ast.BinOp:
+            new: ast.expr = ast.BinOp(results[id(node.left)], node.op, results[id(node.right)])
+        elif kind is ast.UnaryOp:
+            new = ast.UnaryOp(node.op, results[id(node.operand)])
+        elif kind is ast.Call:
+            new = ast.Call(node.func, [results[id(a)] for a in node.args], [])
+        elif kind is ast.List:
+            new = ast.List([results[id(e)] for e in node.elts], ast.Load())
+        else:
+            new = node
+        if key in repeated:
+            name = f"{TEMP_PREFIX}{len(temps)}"
+            temps.append((name, new))
+            temp_of[key] = name
+            new = ast.Name(name, ast.Load())
+        results[id(node)] = new
+    return results[id(root)], temps
+
+
+def fold(
+    node: ast.expr,
+    names: Mapping[str, Any],
+    limits: Limits = DEFAULT_LIMITS,
+    number: Optional[Callable[[Any], Any]] = None,
+) -> ast.expr:
+    """The folding and simplification steps of ``optimize``, without hoisting."""
+    return _Folder(names, limits, number).run(node)
+
+
+def optimize(
+    tree: ast.Expression,
+    names: Mapping[str, Any],
+    limits: Limits = DEFAULT_LIMITS,
+    number: Optional[Callable[[Any], Any]] = None,
+) -> Optimized:
+    """Fold constants, drop identities (x*1, x^1, x+0, --x) and hoist repeats.
+
+    Folding evaluates with ``names`` and ``number``, the same function table
+    and literal conversion the tree will be lowered against, so the result
+    is specific to one backend.
+    """
+    folder = _Folder(names, limits, number)
+    body = folder.run(tree.body)
+    body, temps = _hoist(body)
+    return Optimized(body, temps, folder.folded, folder.simplified, len(temps))
+
+
+class _Scope(dict):
+    """Per-call storage for temporaries, falling back to the caller's names."""
+
+    __slots__ = ("env",)
+
+    def __missing__(self, key: str) -> Any:
+        return self.env[key]
+
+
+def lower_optimized(
+    optimized: Optimized, names: Mapping[str, Any], limits: Limits = DEFAULT_LIMITS, exact: bool = False
+) -> Program:
+    """Lower an Optimized tree; temporaries are computed once per call.
+
+    Literals were already converted by ``optimize``. ``exact`` is true for
+    backends that passed a ``number`` hook there; it selects the operator
+    guards lower applies for such backends.
+    """
+    number = _converted if exact else None
+    body = lower(optimized.body, names, limits, number)
+    if not optimized.temps:
+        return body
+    steps = [(name, lower(expr, names, limits, number)) for name, expr in optimized.temps]
+
+    def program(env: Mapping[str, Any]) -> Any:
+        scope = _Scope()
+        scope.env = env
+        for name, step in steps:
+            scope[name] = step(scope)
+        return body(scope)
+
+    return program
+
+
+def _converted(value: Any) -> Any:
+    return value
+
+
+def _source(node: ast.expr) -> str:
+    try:
+        return ast.unparse(node)
+    except RecursionError:
+        return "<too deeply nested to print>"
+
+
+def describe(tree: ast.Expression, optimized: Optimized) -> str:
+    """Before/after listing of an optimization, for debugging."""
+    lines = [f"before: {_source(tree.body)}"]
+    for name, expr in optimized.temps:
+        lines.append(f"  let {name} = {_source(expr)}")
+    lines.append(f"after:  {_source(optimized.body)}")
+    lines.append(
+        f"folded {optimized.folded}, simplified {optimized.simplified}, hoisted {optimized.hoisted}"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,438 @@
+import ast
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+# Token kinds
+DIGITS = "0123456789"
+
+NUMBER = "number"
+NAME = "name"
+OP = "op"
+LPAREN = "("
+RPAREN = ")"
+LBRACKET = "["
+RBRACKET = "]"
+COMMA = ","
+BANG = "!"
+PERCENT = "%"
+UNKNOWN = "?"
+
+_UNICODE = {
+    "×": ("*", OP),
+    "·": ("*", OP),
+    "÷": ("/", OP),
+    "−": ("-", OP),
+    "π": ("pi", NAME),
+    "τ": ("tau", NAME),
+}
+
+# Binary operators: (ast op type, precedence, right associative)
+_BINARY = {
+    "+": (ast.Add, 1, False),
+    "-": (ast.Sub, 1, False),
+    "*": (ast.Mult, 2, False),
+    "/": (ast.Div, 2, False),
+    "//": (ast.FloorDiv, 2, False),
+    "%": (ast.Mod, 2, False),
+    "@": (ast.MatMult, 2, False),
+    "^": (ast.Pow, 4, True),
+    "**": (ast.Pow, 4, True),
+}
+# _Group.func for an open '[': a matrix or vector literal, not a call.
+_LIST = "["
+_UNARY_PREC = 3
+
+
+class Token(NamedTuple):
+    kind: str
+    text: str
+    pos: int
+    end: int
+
+
+def _scan_number(text: str, i: int) -> int:
+    n = len(text)
+    while i < n and text[i] in DIGITS:
+        i += 1
+    if i < n and text[i] == ".":
+        i += 1
+        while i < n and text[i] in DIGITS:
+            i += 1
+    if i < n and text[i] in "eE":
+        j = i + 1
+        if j < n and text[j] in "+-":
+            j += 1
+        if j < n and text[j] in DIGITS:
+            i = j
+            while i < n and text[i] in DIGITS:
+                i += 1
+    return i
+
+
+def tokenize(text: str, start: int = 0) -> List[Token]:
+    """Split ``text`` into tokens in a single left-to-right pass.
+
+    Unicode operators are normalised here. Characters that are not part of
+    the grammar become UNKNOWN tokens so callers can decide how to report
+    them.
+    """
+    tokens: List[Token] = []
+    append = tokens.append
+    n = len(text)
+    i = start
+    while i < n:
+        ch = text[i]
+        if ch.isspace():
+            i += 1
+        elif ch in DIGITS or (ch == "." and i + 1 < n and text[i + 1] in DIGITS):
+            j = _scan_number(text, i)
+            append(Token(NUMBER, text[i:j], i, j))
+            i = j
+        elif ch.isalpha() or ch == "_":
+            j = i + 1
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            if j - i == 1 and ch in _UNICODE:
+                sub, kind = _UNICODE[ch]
+                append(Token(kind, sub, i, j))
+            else:
+                append(Token(NAME, text[i:j], i, j))
+            i = j
+        elif ch == "*" or ch == "/":
+            if i + 1 < n and text[i + 1] == ch:
+                append(Token(OP, ch * 2, i, i + 2))
+                i += 2
+            else:
+                append(Token(OP, ch, i, i + 1))
+                i += 1
+        elif ch in "+-^@":
+            append(Token(OP, ch, i, i + 1))
+            i += 1
+        elif ch == "(":
+            append(Token(LPAREN, ch, i, i + 1))
+            i += 1
+        elif ch == ")":
+            append(Token(RPAREN, ch, i, i + 1))
+            i += 1
+        elif ch == "[":
+            append(Token(LBRACKET, ch, i, i + 1))
+            i += 1
+        elif ch == "]":
+            append(Token(RBRACKET, ch, i, i + 1))
+            i += 1
+        elif ch == ",":
+            append(Token(COMMA, ch, i, i + 1))
+            i += 1
+        elif ch == "!":
+            append(Token(BANG, ch, i, i + 1))
+            i += 1
+        elif ch == "%":
+            append(Token(PERCENT, ch, i, i + 1))
+            i += 1
+        elif ch in _UNICODE:
+            sub, kind = _UNICODE[ch]
+            append(Token(kind, sub, i, i + 1))
+            i += 1
+        else:
+            append(Token(UNKNOWN, ch, i, i + 1))
+            i += 1
+    return tokens
+
+
+def _starts_operand(token: Optional[Token]) -> bool:
+    return token is not None and token.kind in (NUMBER, NAME, LPAREN, LBRACKET)
+
+
+def _is_percent(tokens: List[Token], i: int) -> bool:
+    # One rule for every operand: '%' is modulo when another operand follows
+    # it (7%3, x % (2)) and percent otherwise (12% -> 0.12, 50% - 10).
+    return not _starts_operand(tokens[i + 1] if i + 1 < len(tokens) else None)
+
+
+def _number(text: str) -> Any:
+    if "." in text or "e" in text or "E" in text:
+        return float(text)
+    return int(text)
+
+
+def _factorial(node: ast.expr) -> ast.expr:
+    return ast.Call(func=ast.Name(id="factorial", ctx=ast.Load()), args=[node], keywords=[])
+
+
+def _percent(node: ast.expr) -> ast.expr:
+    return ast.BinOp(left=node, op=ast.Div(), right=ast.Constant(value=100))
+
+
+class _Group:
+    __slots__ = ("func", "height")
+
+    def __init__(self, func: Optional[str], height: int) -> None:
+        self.func = func
+        self.height = height
+
+
+class _Parser:
+    """Operator-precedence (shunting-yard) parser state.
+
+    Parsing never recurses, so input length and nesting depth only cost heap
+    space. The state can be copied part-way through a token list and resumed
+    later, which IncrementalParser uses to skip an unchanged prefix.
+    """
+
+    __slots__ = ("operands", "operators", "expect_operand")
+
+    def __init__(self) -> None:
+        self.operands: List[ast.expr] = []
+        # Entries are ("bin", op, prec, right_assoc), ("neg"/"pos", None,
+        # prec) or a _Group for an open parenthesis / call.
+        self.operators: List[Any] = []
+        self.expect_operand = True
+
+    def copy(self) -> "_Parser":
+        # AST nodes and groups are never mutated once built, so shallow
+        # copies of the stacks are enough.
+        other = _Parser()
+        other.operands = list(self.operands)
+        other.operators = list(self.operators)
+        other.expect_operand = self.expect_operand
+        return other
+
+    def _reduce_one(self) -> None:
+        operands = self.operands
+        entry = self.operators.pop()
+        if entry[0] == "bin":
+            right = operands.pop()
+            left = operands.pop()
+            operands.append(ast.BinOp(left=left, op=entry[1](), right=right))
+        elif entry[0] == "neg":
+            operands.append(ast.UnaryOp(op=ast.USub(), operand=operands.pop()))
+        else:
+            operands.append(ast.UnaryOp(op=ast.UAdd(), operand=operands.pop()))
+
+    def _reduce_to_group(self) -> None:
+        operators = self.operators
+        while operators and not isinstance(operators[-1], _Group):
+            self._reduce_one()
+
+    def run(self, tokens: List[Token], start: int, stop: int) -> int:
+        """Consume tokens[start:stop]; returns the index to resume from.
+
+        May consume one token past ``stop`` (the '(' after a function name).
+        """
+        operands = self.operands
+        operators = self.operators
+        expect_operand = self.expect_operand
+        n = len(tokens)
+        i = start
+        try:
+            while i < stop:
+                tok = tokens[i]
+                kind = tok.kind
+                if expect_operand:
+                    if kind == NUMBER:
+                        operands.append(ast.Constant(value=_number(tok.text)))
+                        expect_operand = False
+                    elif kind == NAME:
+                        if i + 1 < n and tokens[i + 1].kind == LPAREN:
+                            operators.append(_Group(tok.text, len(operands)))
+                            i += 1
+                        else:
+                            operands.append(ast.Name(id=tok.text, ctx=ast.Load()))
+                            expect_operand = False
+                    elif kind == LPAREN:
+                        operators.append(_Group(None, len(operands)))
+                    elif kind == LBRACKET:
+                        operators.append(_Group(_LIST, len(operands)))
+                    elif kind == OP and tok.text in "+-":
+                        operators.append(("neg" if tok.text == "-" else "pos", None, _UNARY_PREC))
+                    elif kind == RPAREN and operators and isinstance(operators[-1], _Group) \
+                            and operators[-1].func not in (None, _LIST) and len(operands) == operators[-1].height:
+                        group = operators.pop()
+                        operands.append(ast.Call(func=ast.Name(id=group.func, ctx=ast.Load()), args=[], keywords=[]))
+                        expect_operand = False
+                    elif kind == PERCENT:
+                        raise ValueError("'%' must follow a value: 12% is 0.12, 7 % 3 is 1")
+                    else:
+                        raise ValueError("Invalid expression")
+                else:
+                    if kind == BANG:
+                        operands[-1] = _factorial(operands[-1])
+                    elif kind == PERCENT and _is_percent(tokens, i):
+                        operands[-1] = _percent(operands[-1])
+                    elif kind == OP or kind == PERCENT:
+                        op, prec, right_assoc = _BINARY[tok.text]
+                        while operators and not isinstance(operators[-1], _Group):
+                            top_prec = operators[-1][2]
+                            if top_prec > prec or (top_prec == prec and not right_assoc):
+                                self._reduce_one()
+                            else:
+                                break
+                        operators.append(("bin", op, prec, right_assoc))
+                        expect_operand = True
+                    elif kind == RPAREN:
+                        self._reduce_to_group()
+                        if not operators:
+                            raise ValueError("Invalid expression")
+                        group = operators.pop()
+                        if group.func == _LIST:
+                            raise ValueError("Invalid expression")
+                        if group.func is not None:
+                            args = operands[group.height:]
+                            del operands[group.height:]
+                            operands.append(ast.Call(func=ast.Name(id=group.func, ctx=ast.Load()), args=args, keywords=[]))
+                        elif len(operands) != group.height + 1:
+                            raise ValueError("Invalid expression")
+                    elif kind == RBRACKET:
+                        self._reduce_to_group()
+                        if not operators or operators[-1].func != _LIST:
+                            raise ValueError("Invalid expression")
+                        group = operators.pop()
+                        elts = operands[group.height:]
+                        del operands[group.height:]
+                        operands.append(ast.List(elts=elts, ctx=ast.Load()))
+                    elif kind == COMMA:
+                        self._reduce_to_group()
+                        if not operators or operators[-1].func is None:
+                            raise ValueError("Invalid expression")
+                        expect_operand = True
+                    else:
+                        raise ValueError("Invalid expression")
+                i += 1
+        finally:
+            self.expect_operand = expect_operand
+        return i
+
+    def finish(self) -> ast.Expression:
+        if self.expect_operand:
+            raise ValueError("Invalid expression")
+        operators = self.operators
+        while operators:
+            if isinstance(operators[-1], _Group):
+                raise ValueError("Invalid expression")
+            self._reduce_one()
+        if len(self.operands) != 1:
+            raise ValueError("Invalid expression")
+        return ast.Expression(body=self.operands[0])
+
+
+def parse_tokens(tokens: List[Token]) -> ast.Expression:
+    """Build an ``ast.Expression`` from tokens without recursion."""
+    parser = _Parser()
+    parser.run(tokens, 0, len(tokens))
+    return parser.finish()
+
+
+def parse_expression(text: str) -> Optional[ast.Expression]:
+    """Parse calculator syntax into a Python ``ast.Expression``.
+
+    Returns None for blank input. Raises ValueError on malformed input.
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return None
+    return parse_tokens(tokens)
+
+
+class IncrementalParser:
+    """Parser for text that is edited a little at a time (as-you-type).
+
+    Tokens that end before the first changed character are reused, and the
+    parser resumes from a snapshot taken before the previous last token, so
+    appending digits or an operator costs work proportional to the edit
+    rather than to the whole expression.
+    """
+
+    def __init__(self) -> None:
+        self._text = ""
+        self._tokens: List[Token] = []
+        # (index of next token, parser state, kind of that token or None)
+        self._snapshot: Optional[Tuple[int, _Parser, Optional[str]]] = None
+
+    def _retokenize(self, text: str) -> Tuple[List[Token], int]:
+        old = self._tokens
+        limit = min(len(text), len(self._text))
+        common = 0
+        while common < limit and text[common] == self._text[common]:
+            common += 1
+        # A token is only final once the characters the scanner peeks at
+        # after it are unchanged: "12" can grow to "123", and a number looks
+        # up to two characters ahead for an exponent ("2e+5").
+        keep = 0
+        while keep < len(old) and old[keep].end + 2 < common:
+            keep += 1
+        start = old[keep - 1].end if keep else 0
+        tokens = old[:keep] + tokenize(text, start)
+        same = keep
+        while same < len(old) and same < len(tokens) and old[same] == tokens[same]:
+            same += 1
+        return tokens, same
+
+    def parse(self, text: str) -> Optional[ast.Expression]:
+        tokens, same = self._retokenize(text)
+        self._text = text
+        self._tokens = tokens
+        if not tokens:
+            self._snapshot = None
+            return None
+
+        parser: Optional[_Parser] = None
+        start = 0
+        snap = self._snapshot
+        if snap is not None:
+            index, state, lookahead = snap
+            current = tokens[index].kind if index < len(tokens) else None
+            if index <= same and current == lookahead:
+                parser = state.copy()
+                start = index
+        if parser is None:
+            parser = _Parser()
+
+        self._snapshot = None
+        stop = len(tokens) - 1
+        if start < stop:
+            start = parser.run(tokens, start, stop)
+        if start <= stop:
+            lookahead = tokens[start].kind if start < len(tokens) else None
+            self._snapshot = (start, parser.copy(), lookahead)
+        parser.run(tokens, start, len(tokens))
+        return parser.finish()
+
+
+def to_python(tokens: List[Token], percent: bool = True) -> str:
+    """Render tokens as Python source, rewriting postfix '!' and '%'.
+
+    Linear in the number of tokens: each postfix operator prepends to the
+    chunk where its operand starts instead of rescanning for the matching
+    parenthesis.
+    """
+    chunks: List[str] = []
+    opens: List[int] = []
+    # Index in chunks where the most recent complete operand begins.
+    operand_start = -1
+    prev_word = False
+    for i, tok in enumerate(tokens):
+        kind = tok.kind
+        word = kind in (NUMBER, NAME)
+        if word and prev_word:
+            chunks.append(" ")
+        if kind == BANG and operand_start >= 0:
+            chunks[operand_start] = "factorial(" + chunks[operand_start]
+            chunks.append(")")
+        elif kind == PERCENT and percent and operand_start >= 0 and _is_percent(tokens, i):
+            chunks[operand_start] = "(" + chunks[operand_start]
+            chunks.append("/100)")
+        elif kind == LPAREN:
+            call = i > 0 and tokens[i - 1].kind == NAME
+            opens.append(len(chunks) - 1 if call else len(chunks))
+            chunks.append("(")
+            operand_start = -1
+        elif kind == RPAREN:
+            chunks.append(")")
+            operand_start = opens.pop() if opens else -1
+        elif word:
+            operand_start = len(chunks)
+            chunks.append(tok.text)
+        else:
+            chunks.append("**" if tok.text == "^" else tok.text)
+            operand_start = -1
+        prev_word = word
+    return "".join(chunks)
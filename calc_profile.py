@@ -0,0 +1,128 @@
+import threading
+import time
+from contextlib import ContextDecorator
+from typing import Any, Dict, List, Optional
+
+# Profiles currently collecting. Instrumented code tests ``if ACTIVE:``
+# before taking a timestamp, so with profiling off each stage costs one
+# truth test.
+ACTIVE: List["Profile"] = []
+_lock = threading.Lock()
+
+now = time.perf_counter_ns
+
+
+class StageStats:
+    __slots__ = ("calls", "total_ns", "max_ns")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+
+class Profile(ContextDecorator):
+    """Per-stage timings and event counters, collected while active.
+
+    Use as a context manager or a decorator. A profile can be entered
+    repeatedly (or from several threads at once) and keeps accumulating.
+    While active it records evaluations from every thread in the process,
+    not only the one that entered it. With ``local`` it records only those
+    on threads that are inside it, e.g. one web session's script thread.
+    """
+
+    def __init__(self, local: bool = False) -> None:
+        self.stages: Dict[str, StageStats] = {}
+        self.counters: Dict[str, int] = {}
+        self.local = local
+        self._depth = 0
+        # Entries per thread currently inside the profile.
+        self._threads: Dict[int, int] = {}
+
+    def __enter__(self) -> "Profile":
+        ident = threading.get_ident()
+        with _lock:
+            if self._depth == 0:
+                ACTIVE.append(self)
+            self._depth += 1
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        ident = threading.get_ident()
+        with _lock:
+            self._depth -= 1
+            if self._threads[ident] == 1:
+                del self._threads[ident]
+            else:
+                self._threads[ident] -= 1
+            if self._depth == 0:
+                ACTIVE.remove(self)
+
+    def reset(self) -> None:
+        with _lock:
+            self.stages.clear()
+            self.counters.clear()
+
+    def as_dict(self) -> Dict[str, Any]:
+        with _lock:
+            return {
+                "stages": {
+                    name: {
+                        "calls": s.calls,
+                        "total_ns": s.total_ns,
+                        "max_ns": s.max_ns,
+                        "mean_ns": s.total_ns // s.calls if s.calls else 0,
+                    }
+                    for name, s in self.stages.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+    def to_prometheus(self, prefix: str = "calc") -> str:
+        """The profile in Prometheus text exposition format."""
+        data = self.as_dict()
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str, samples: Dict[str, Any], label: str) -> None:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for key, value in sorted(samples.items()):
+                lines.append(f'{prefix}_{name}{{{label}="{key}"}} {value}')
+
+        stages = data["stages"]
+        family("stage_calls_total", "counter", "Calls per evaluation stage.",
+               {k: s["calls"] for k, s in stages.items()}, "stage")
+        family("stage_seconds_total", "counter", "Time spent per evaluation stage.",
+               {k: s["total_ns"] / 1e9 for k, s in stages.items()}, "stage")
+        family("stage_max_seconds", "gauge", "Slowest single call per evaluation stage.",
+               {k: s["max_ns"] / 1e9 for k, s in stages.items()}, "stage")
+        family("events_total", "counter", "Evaluation events such as cache hits.", data["counters"], "event")
+        return "\n".join(lines) + "\n"
+
+
+def record(stage: str, started_ns: int, finished_ns: Optional[int] = None) -> None:
+    """Add the time since ``started_ns`` to ``stage`` in every active profile that watches this thread."""
+    elapsed = (finished_ns if finished_ns is not None else now()) - started_ns
+    ident = threading.get_ident()
+    with _lock:
+        for profile in ACTIVE:
+            if profile.local and ident not in profile._threads:
+                continue
+            stats = profile.stages.get(stage)
+            if stats is None:
+                stats = profile.stages[stage] = StageStats()
+            stats.calls += 1
+            stats.total_ns += elapsed
+            if elapsed > stats.max_ns:
+                stats.max_ns = elapsed
+
+
+def count(event: str, n: int = 1) -> None:
+    """Add ``n`` to the ``event`` counter of every active profile that watches this thread."""
+    ident = threading.get_ident()
+    with _lock:
+        for profile in ACTIVE:
+            if profile.local and ident not in profile._threads:
+                continue
+            profile.counters[event] = profile.counters.get(event, 0) + n
@@ -0,0 +1,376 @@
+"""HTTP/JSON evaluation service: ``python calc_server.py [--port 8000]``.
+
+Endpoints:
+
+    POST /evaluate  {"expression": "2^10", "backend": "float"}
+                    -> {"expression": ..., "result": 1024.0, "error": null}
+    POST /batch     {"expressions": ["1+1", "1/0"], "backend": "float"}
+                    -> {"results": [{"result": 2.0, "error": null}, ...]}
+    GET  /stats     counters for requests, computed, coalesced and rejected work
+    GET  /health    {"status": "ok"}
+
+Evaluation runs in a bounded executor off the event loop. When the number
+of queued jobs reaches ``--max-pending`` new work is rejected with 503 and
+a Retry-After header instead of queueing without bound. Identical
+expressions already in flight are coalesced: concurrent requests for the
+same (backend, expression) await one computation. Failed evaluations are
+ordinary results with an ``error`` string; non-finite floats are returned
+as the strings "inf", "-inf" and "nan", and decimal/fraction results as
+strings, since JSON cannot represent them. Complex results are [re, im]
+pairs and matrices nested lists of them.
+
+Expressions come from untrusted clients, so they are evaluated under the
+stricter SERVER_LIMITS, which bound the work any one of them can cause. A
+request still waiting after ``--timeout`` seconds gets 504; its work runs
+to the end of those bounds in the background.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import calc_core
+from calc_backends import backend_names
+from calc_batch import jsonable
+from calc_eval import Limits
+
+DEFAULT_MAX_PENDING = 64
+DEFAULT_CHUNKSIZE = 256
+DEFAULT_MAX_BODY = 1 << 20
+DEFAULT_MAX_BATCH = 10_000
+DEFAULT_TIMEOUT = 10.0
+# Tighter than calc_core's defaults: at these sizes no expression keeps a
+# worker busy for more than a fraction of a second.
+SERVER_LIMITS = Limits(max_nodes=2_000, max_depth=200, max_int_bits=16_384, max_factorial=1_000, max_length=10_000)
+_MAX_HEADERS = 100
+
+Outcome = Tuple[Any, Optional[str]]
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None) -> None:
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def _evaluate_job(texts: Sequence[str], backend: str, limits: Limits) -> List[Outcome]:
+    """Evaluate a chunk in the executor under ``limits``; errors become result strings.
+
+    The limits go with each compile rather than through calc_core.set_limits,
+    which would change them for everything else in a threaded server's process.
+    """
+    outcomes: List[Outcome] = []
+    # The complex backend's own names (i, det, inv, ...) come with its compile.
+    compile_text = calc_core.compile_complex if backend == "complex" else calc_core.compile_expression
+    for text in texts:
+        try:
+            outcomes.append((jsonable(calc_core.evaluate_compiled(compile_text(text, limits), backend)), None))
+        except Exception as exc:
+            outcomes.append((None, f"{type(exc).__name__}: {exc}"))
+    return outcomes
+
+
+class CalcServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        workers: Optional[int] = None,
+        executor: str = "thread",
+        max_pending: int = DEFAULT_MAX_PENDING,
+        chunksize: int = DEFAULT_CHUNKSIZE,
+        max_body: int = DEFAULT_MAX_BODY,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        limits: Limits = SERVER_LIMITS,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.executor_kind = executor
+        self.max_pending = max(1, max_pending)
+        self.chunksize = max(1, chunksize)
+        self.max_body = max_body
+        self.max_batch = max_batch
+        self.limits = limits
+        self.timeout = timeout
+        self.stats = {"requests": 0, "computed": 0, "coalesced": 0, "rejected": 0}
+        self._pending = 0
+        self._inflight: Dict[Tuple[str, str], "asyncio.Future[Outcome]"] = {}
+        self._executor: Optional[Executor] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    # Lifecycle
+
+    async def start(self) -> None:
+        if self.executor_kind == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=calc_core.set_limits, initargs=(self.limits,)
+            )
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="calc")
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # Pick up the real port when started with port=0.
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        assert self._server is not None
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # Evaluation
+
+    async def evaluate(self, texts: Sequence[str], backend: str = "float") -> List[Outcome]:
+        """Evaluate ``texts``, coalescing with identical work already in flight.
+
+        Raises HTTPError(503) when the executor queue has no room, 413 when
+        the new work could never fit in it, and 504 after ``timeout``.
+        """
+        loop = asyncio.get_running_loop()
+        waiting: Dict[str, "asyncio.Future[Outcome]"] = {}
+        fresh: List[str] = []
+        for text in texts:
+            if text in waiting:
+                self.stats["coalesced"] += 1
+                continue
+            future = self._inflight.get((backend, text))
+            if future is not None:
+                self.stats["coalesced"] += 1
+                waiting[text] = future
+            else:
+                waiting[text] = loop.create_future()
+                fresh.append(text)
+
+        chunks = [fresh[i:i + self.chunksize] for i in range(0, len(fresh), self.chunksize)]
+        if len(chunks) > self.max_pending:
+            raise HTTPError(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                f"At most {self.max_pending * self.chunksize} new expressions fit in one request",
+            )
+        if chunks and self._pending + len(chunks) > self.max_pending:
+            self.stats["rejected"] += 1
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Server is busy", {"Retry-After": "1"})
+
+        for chunk in chunks:
+            futures = [waiting[text] for text in chunk]
+            for text, future in zip(chunk, futures):
+                self._inflight[(backend, text)] = future
+            self._pending += 1
+            job = loop.run_in_executor(self._executor, _evaluate_job, chunk, backend, self.limits)
+            job.add_done_callback(partial(self._chunk_done, backend, chunk, futures))
+
+        # shield: a client that disconnects must not cancel work other
+        # requests are coalesced onto.
+        try:
+            outcomes = await asyncio.wait_for(
+                asyncio.gather(*(asyncio.shield(f) for f in waiting.values())), self.timeout
+            )
+        except asyncio.TimeoutError:
+            raise HTTPError(HTTPStatus.GATEWAY_TIMEOUT, f"Evaluation took longer than {self.timeout:g} s") from None
+        by_text = dict(zip(waiting, outcomes))
+        return [by_text[text] for text in texts]
+
+    def _chunk_done(
+        self, backend: str, chunk: List[str], futures: List["asyncio.Future[Outcome]"], job: "asyncio.Future[Any]"
+    ) -> None:
+        self._pending -= 1
+        for text in chunk:
+            self._inflight.pop((backend, text), None)
+        if job.cancelled():
+            error: Optional[BaseException] = asyncio.CancelledError()
+        else:
+            error = job.exception()
+        if error is not None:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        self.stats["computed"] += len(chunk)
+        for future, outcome in zip(futures, job.result()):
+            if not future.done():
+                future.set_result(outcome)
+
+    # HTTP
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Any]:
+        path = path.split("?", 1)[0]
+        if path == "/health":
+            return HTTPStatus.OK, {"status": "ok"}
+        if path == "/stats":
+            return HTTPStatus.OK, dict(self.stats, pending=self._pending, inflight=len(self._inflight))
+        if path not in ("/evaluate", "/batch"):
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No such endpoint: {path}")
+        if method != "POST":
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"{path} only accepts POST", {"Allow": "POST"})
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body is not valid JSON") from None
+        if not isinstance(request, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object")
+        backend = request.get("backend", "float")
+        if not isinstance(backend, str):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'backend' must be a string")
+        if backend not in backend_names():
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Unknown backend: {backend}")
+
+        if path == "/evaluate":
+            text = request.get("expression")
+            if not isinstance(text, str):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "'expression' must be a string")
+            ((value, error),) = await self.evaluate([text], backend)
+            return HTTPStatus.OK, {"expression": text, "result": value, "error": error}
+
+        texts = request.get("expressions")
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'expressions' must be a list of strings")
+        if len(texts) > self.max_batch:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Batches are limited to {self.max_batch} expressions")
+        outcomes = await self.evaluate(texts, backend)
+        return HTTPStatus.OK, {"results": [{"result": value, "error": error} for value, error in outcomes]}
+
+    @staticmethod
+    async def _readline(reader: asyncio.StreamReader, status: int) -> bytes:
+        try:
+            return await reader.readline()
+        except ValueError:
+            # StreamReader's way of reporting a line over its 64 KiB limit.
+            raise HTTPError(status, "Request line or header is too long") from None
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, str, Dict[str, str], bytes]]:
+        line = await self._readline(reader, HTTPStatus.REQUEST_URI_TOO_LONG)
+        if not line:
+            return None
+        try:
+            method, path, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line") from None
+        headers: Dict[str, str] = {}
+        for _ in range(_MAX_HEADERS):
+            line = await self._readline(reader, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers")
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length") from None
+        if length > self.max_body:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body is too large")
+        body = await reader.readexactly(length) if length > 0 else b""
+        return method.upper(), path, version, headers, body
+
+    @staticmethod
+    def _write_response(
+        writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool, headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        body = json.dumps(payload, allow_nan=False).encode()
+        status = HTTPStatus(status)
+        lines = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as exc:
+                    self._write_response(writer, exc.status, {"error": str(exc)}, False, exc.headers)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, version, headers, body = request
+                self.stats["requests"] += 1
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+                try:
+                    status, payload = await self._dispatch(method, path, body)
+                    extra: Dict[str, str] = {}
+                except HTTPError as exc:
+                    status, payload, extra = exc.status, {"error": str(exc)}, exc.headers
+                except Exception as exc:
+                    status, payload, extra = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(exc) or "Internal error"}, {}
+                self._write_response(writer, status, payload, keep_alive, extra)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Serve calculator evaluation over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("-w", "--workers", type=int, default=0, help="executor workers (0 = one per CPU)")
+    parser.add_argument("--executor", choices=("thread", "process"), default="thread",
+                        help="threads suit cheap expressions; processes sidestep the GIL for heavy ones")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                        help="queued executor jobs before new work is rejected with 503")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help="expressions per executor job for /batch")
+    parser.add_argument("--max-body", type=int, default=DEFAULT_MAX_BODY)
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument("-t", "--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help="seconds a request may wait for its results before 504")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    server = CalcServer(
+        host=args.host,
+        port=args.port,
+        workers=args.workers or None,
+        executor=args.executor,
+        max_pending=args.max_pending,
+        chunksize=args.chunksize,
+        max_body=args.max_body,
+        max_batch=args.max_batch,
+        timeout=args.timeout,
+    )
+
+    async def run() -> None:
+        await server.start()
+        print(f"listening on http://{server.host}:{server.port}", file=sys.stderr, flush=True)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import stat
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from decimal import Decimal
+from fractions import Fraction
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_SLOTS = 65_536
+# Slots per bucket. A key can live in any slot of its bucket, and a full
+# bucket evicts the slot used least recently.
+WAYS = 4
+# Writers lock one stripe of buckets; readers take no lock at all.
+STRIPES = 32
+
+_MAGIC = b"CALCSHM1"
+# magic, slots, ways
+_HEADER = struct.Struct("<8sII")
+_HEADER_SIZE = 64
+# seq, stamp, crc, tag, length, key digest, payload: one 64-byte line.
+#
+# seq is a seqlock: odd while a writer is changing the slot, then even
+# again. crc covers seq and everything after crc, so a reader that copied
+# the slot in the middle of a write sees an odd seq or a bad crc and treats
+# the slot as a miss. stamp only orders evictions and is not covered.
+_SLOT = struct.Struct("<IIIBB2x16s32s")
+_SLOT_SIZE = 64
+_SEQ = struct.Struct("<I")
+_BODY = 12
+_DIGEST_SIZE = 16
+_PAYLOAD_SIZE = 32
+
+_FLOAT, _COMPLEX, _DECIMAL, _FRACTION = 1, 2, 3, 4
+_DOUBLE = struct.Struct("<d")
+_DOUBLES = struct.Struct("<dd")
+
+
+def default_path() -> str:
+    """A per-user file in /dev/shm, or in the temp directory without it."""
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, f"calculator-results-{os.getuid()}")
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=_DIGEST_SIZE).digest()
+
+
+def _encode(value: Any) -> Optional[Tuple[int, bytes]]:
+    # Float, complex, decimal and fraction results; anything else (arrays,
+    # intervals, quantities) is not shared.
+    kind = type(value)
+    if kind is float:
+        return _FLOAT, _DOUBLE.pack(value)
+    if kind is complex:
+        return _COMPLEX, _DOUBLES.pack(value.real, value.imag)
+    if kind is Decimal:
+        text = str(value).encode("ascii")
+        return (_DECIMAL, text) if len(text) <= _PAYLOAD_SIZE else None
+    if kind is Fraction:
+        text = str(value).encode("ascii")
+        return (_FRACTION, text) if len(text) <= _PAYLOAD_SIZE else None
+    return None
+
+
+def _decode(tag: int, payload: bytes) -> Any:
+    if tag == _FLOAT:
+        return _DOUBLE.unpack_from(payload)[0]
+    if tag == _COMPLEX:
+        return complex(*_DOUBLES.unpack_from(payload))
+    if tag == _DECIMAL:
+        return Decimal(payload.decode("ascii"))
+    return Fraction(payload.decode("ascii"))
+
+
+def _stamp() -> int:
+    # Milliseconds, wrapping after about 50 days; only compared within a bucket.
+    return (time.monotonic_ns() // 1_000_000) & 0xFFFFFFFF
+
+
+class SharedCache:
+    """A fixed-size hash table of results in a memory-mapped file.
+
+    Every process that opens the same ``path`` sees the same table, so a
+    result one of them stores is a hit for the others. Keys are bytes,
+    stored as 16-byte digests; values are float, complex, Decimal or
+    Fraction. Lookups are lock-free. Stores lock one of STRIPES byte ranges
+    of the file with fcntl, plus a thread lock within the process, so this
+    needs a POSIX system.
+
+    The file is created with ``slots`` slots (rounded down to a multiple of
+    WAYS); an existing file keeps the size it was created with. Anyone who
+    can write the file can plant results, so it is only opened if it is a
+    regular file (not a symlink) owned by this user and writable by no one
+    else; otherwise PermissionError is raised.
+    """
+
+    def __init__(self, path: Optional[str] = None, slots: int = DEFAULT_SLOTS) -> None:
+        self.path = path or default_path()
+        buckets = max(1, int(slots) // WAYS)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        try:
+            self._check_owner()
+            self._buckets = self._attach(buckets)
+            self._mm = mmap.mmap(self._fd, _HEADER_SIZE + self._buckets * WAYS * _SLOT_SIZE)
+        except BaseException:
+            os.close(self._fd)
+            raise
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def _check_owner(self) -> None:
+        info = os.fstat(self._fd)
+        if not stat.S_ISREG(info.st_mode):
+            raise PermissionError(f"{self.path} is not a regular file")
+        if info.st_uid != os.getuid():
+            raise PermissionError(f"{self.path} belongs to another user")
+        if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise PermissionError(f"{self.path} is writable by other users")
+
+    def _attach(self, buckets: int) -> int:
+        # The header is read and, for a new file, written under the lock on
+        # byte 0, so two processes starting at once agree on one layout.
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, 0)
+        try:
+            header = os.pread(self._fd, _HEADER.size, 0)
+            if len(header) == _HEADER.size:
+                magic, slots, ways = _HEADER.unpack(header)
+                if magic == _MAGIC and ways == WAYS and slots % WAYS == 0 and slots:
+                    if os.fstat(self._fd).st_size >= _HEADER_SIZE + slots * _SLOT_SIZE:
+                        return slots // WAYS
+                if magic == _MAGIC:
+                    raise ValueError(f"{self.path} is a shared cache with a different layout")
+            if os.fstat(self._fd).st_size:
+                raise ValueError(f"{self.path} is not a shared result cache")
+            os.ftruncate(self._fd, _HEADER_SIZE + buckets * WAYS * _SLOT_SIZE)
+            os.pwrite(self._fd, _HEADER.pack(_MAGIC, buckets * WAYS, WAYS), 0)
+            return buckets
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, 0)
+
+    def _bucket(self, key: bytes) -> int:
+        return int.from_bytes(key[:8], "little") % self._buckets
+
+    def get(self, key: bytes, default: Any = None) -> Any:
+        """The value stored under ``key``, or ``default``."""
+        key = _digest(key)
+        mm = self._mm
+        start = _HEADER_SIZE + self._bucket(key) * WAYS * _SLOT_SIZE
+        for offset in range(start, start + WAYS * _SLOT_SIZE, _SLOT_SIZE):
+            raw = mm[offset:offset + _SLOT_SIZE]
+            seq, stamp, crc, tag, length, stored, payload = _SLOT.unpack(raw)
+            if stored != key or seq & 1 or not seq:
+                continue
+            if zlib.crc32(raw[_BODY:], zlib.crc32(raw[:4])) != crc:
+                continue
+            now = _stamp()
+            if now != stamp:
+                _SEQ.pack_into(mm, offset + 4, now)
+            self.hits += 1
+            return _decode(tag, payload[:length])
+        self.misses += 1
+        return default
+
+    def put(self, key: bytes, value: Any) -> bool:
+        """Store ``value`` under ``key``; False for a value it cannot hold."""
+        encoded = _encode(value)
+        if encoded is None:
+            return False
+        tag, payload = encoded
+        key = _digest(key)
+        bucket = self._bucket(key)
+        stripe = 1 + bucket % STRIPES
+        mm = self._mm
+        start = _HEADER_SIZE + bucket * WAYS * _SLOT_SIZE
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                offset = self._victim(start, key)
+                seq = _SEQ.unpack_from(mm, offset)[0]
+                seq += 2 if seq % 2 == 0 else 1
+                body = _SLOT.pack(seq, 0, 0, tag, len(payload), key, payload)[_BODY:]
+                crc = zlib.crc32(body, zlib.crc32(_SEQ.pack(seq)))
+                _SEQ.pack_into(mm, offset, seq - 1)
+                mm[offset + _BODY:offset + _SLOT_SIZE] = body
+                _SEQ.pack_into(mm, offset + 4, _stamp())
+                _SEQ.pack_into(mm, offset + 8, crc)
+                _SEQ.pack_into(mm, offset, seq)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+            self.stores += 1
+        return True
+
+    def _victim(self, start: int, key: bytes) -> int:
+        # The slot already holding ``key``, else an empty one, else the one
+        # used least recently.
+        slots = [
+            (offset, *_SLOT.unpack_from(self._mm, offset))
+            for offset in range(start, start + WAYS * _SLOT_SIZE, _SLOT_SIZE)
+        ]
+        for offset, seq, _, _, _, _, stored, _ in slots:
+            if seq and stored == key:
+                return offset
+        for offset, seq, *_ in slots:
+            if not seq:
+                return offset
+        now = _stamp()
+        return max(slots, key=lambda slot: (now - slot[2]) & 0xFFFFFFFF)[0]
+
+    def clear(self) -> None:
+        """Empty the table for every process using it."""
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, STRIPES, 1)
+            try:
+                self._mm[_HEADER_SIZE:] = bytes(len(self._mm) - _HEADER_SIZE)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, STRIPES, 1)
+            self.hits = self.misses = self.stores = 0
+
+    def info(self) -> Dict[str, int]:
+        """This process's hits, misses and stores, and the table's occupancy."""
+        used = sum(
+            1
+            for offset in range(_HEADER_SIZE, len(self._mm), _SLOT_SIZE)
+            if _SEQ.unpack_from(self._mm, offset)[0]
+        )
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "size": used,
+            "maxsize": self._buckets * WAYS,
+        }
+
+    def close(self) -> None:
+        self._mm.close()
+        os.close(self._fd)
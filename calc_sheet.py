@@ -0,0 +1,397 @@
+import heapq
+import re
+from collections import deque
+from types import MappingProxyType
+from typing import Any, Callable, Deque, Dict, FrozenSet, Iterator, List, Mapping, Optional, Set, Tuple, Union
+
+import calc_core
+from calc_backends import Backend
+from calc_eval import CompiledExpression
+from calc_matrix import COMPLEX_NAMES
+
+_DEFINITION = re.compile(r"\s*([^\W\d]\w*)\s*(?:\(([^()]*)\))?\s*=(?!=)(.*)", re.S)
+_IDENTIFIER = re.compile(r"[^\W\d]\w*")
+
+Params = Optional[Tuple[str, ...]]
+
+
+class CircularReferenceError(ValueError):
+    """A cell depends on itself, directly or through other cells."""
+
+
+def parse_definition(line: str) -> Optional[Tuple[str, Params, str]]:
+    """Split ``a = 3`` or ``f(x, y) = x*y`` into (name, params, body).
+
+    ``params`` is None for a variable. Returns None when ``line`` is a plain
+    expression rather than a definition.
+    """
+    match = _DEFINITION.fullmatch(line)
+    if match is None:
+        return None
+    name, params, body = match.groups()
+    if params is None:
+        return name, None, body.strip()
+    names = tuple(p.strip() for p in params.split(",")) if params.strip() else ()
+    for param in names:
+        if not _IDENTIFIER.fullmatch(param):
+            raise ValueError(f"Invalid parameter name: {param!r}")
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate parameter in {name}()")
+    return name, names, body.strip()
+
+
+class UserFunction:
+    """A function cell's value: its body bound to the values it depends on.
+
+    A new instance is made whenever one of those values changes, so cells
+    that call the function are recomputed like any other dependent.
+    """
+
+    __slots__ = ("name", "params", "compiled", "backend", "_bound")
+
+    def __init__(
+        self,
+        name: str,
+        params: Tuple[str, ...],
+        compiled: Optional[CompiledExpression],
+        backend: Union[str, Backend],
+        bound: Dict[str, Any],
+    ) -> None:
+        self.name = name
+        self.params = params
+        self.compiled = compiled
+        self.backend = backend
+        self._bound = bound
+
+    def __call__(self, *args: Any) -> Any:
+        if len(args) != len(self.params):
+            raise ValueError(f"{self.name}() takes {len(self.params)} argument(s), got {len(args)}")
+        env = dict(self._bound)
+        env.update(zip(self.params, args))
+        return calc_core.evaluate_compiled(self.compiled, self.backend, env)
+
+    def __repr__(self) -> str:
+        return f"<function {self.name}({', '.join(self.params)})>"
+
+
+class Cell:
+    __slots__ = ("name", "source", "params", "compiled", "compile_error", "deps", "value", "error", "rank")
+
+    def __init__(self, name: str, source: str, params: Params) -> None:
+        self.name = name
+        self.source = source
+        self.params = params
+        self.compiled: Optional[CompiledExpression] = None
+        self.compile_error: Optional[Exception] = None
+        self.deps: FrozenSet[str] = frozenset()
+        self.value: Any = None
+        self.error: Optional[Exception] = None
+        # Longest dependency path below this cell; readers rank higher.
+        self.rank = 0
+
+    @property
+    def definition(self) -> str:
+        if self.params is None:
+            return f"{self.name} = {self.source}"
+        return f"{self.name}({', '.join(self.params)}) = {self.source}"
+
+
+def _same_value(a: Any, b: Any) -> bool:
+    # Matrix results are NumPy arrays, whose == is elementwise.
+    if hasattr(a, "shape"):
+        return bool(a.shape == b.shape and (a == b).all())
+    return bool(a == b)
+
+
+class Worksheet:
+    """Named variables and user functions over calc_core.
+
+    Every cell records the names it reads. Editing a cell re-evaluates only
+    that cell and the cells downstream of it, in dependency order, and stops
+    propagating wherever a recomputed value comes out unchanged. Cells that
+    take part in a cycle get a CircularReferenceError instead of a value.
+    """
+
+    def __init__(self, backend: Union[str, Backend] = "float") -> None:
+        self.backend = backend
+        self._cells: Dict[str, Cell] = {}
+        # name -> cells that read it; names may be referenced before they
+        # are defined, so keys need not be cells.
+        self._dependents: Dict[str, Set[str]] = {}
+        self._values: Dict[str, Any] = {}
+        # Cells on or downstream of a cycle; their rank is meaningless.
+        self._blocked: Set[str] = set()
+        # Total cell evaluations, for profiling incremental updates.
+        self.evaluations = 0
+
+    # Reading
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._cells
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._cells)
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def __getitem__(self, name: str) -> Any:
+        cell = self._cells[name]
+        if cell.error is not None:
+            raise cell.error
+        return cell.value
+
+    @property
+    def values(self) -> Mapping[str, Any]:
+        """Current values of every cell that evaluated without error."""
+        return MappingProxyType(self._values)
+
+    def error(self, name: str) -> Optional[Exception]:
+        return self._cells[name].error
+
+    def definition(self, name: str) -> str:
+        return self._cells[name].definition
+
+    def dependents(self, name: str) -> FrozenSet[str]:
+        return frozenset(self._dependents.get(name, ()))
+
+    # Editing
+
+    def set(self, name: str, source: str, params: Params = None) -> List[str]:
+        """Define or redefine a cell and recompute what depends on it.
+
+        Returns the names whose value or error changed, in evaluation order.
+        Errors in ``source`` are stored on the cell, not raised.
+        """
+        self._check_name(name)
+        for param in params or ():
+            self._check_name(param)
+        cell = Cell(name, source, params)
+        self._compile(cell)
+        old = self._cells.get(name)
+        if old is not None and old.deps == cell.deps and name not in self._blocked:
+            # Same inputs as before: the graph is unchanged, so ranks stay
+            # valid and only cells whose inputs really change are visited.
+            cell.value, cell.error, cell.rank = old.value, old.error, old.rank
+            self._cells[name] = cell
+            return self._propagate(name)
+        if old is not None:
+            self._unlink(old)
+            # Keep the previous result so an edit that does not change the
+            # value stops there instead of touching every dependent.
+            cell.value, cell.error = old.value, old.error
+        self._cells[name] = cell
+        for dep in cell.deps:
+            self._dependents.setdefault(dep, set()).add(name)
+        return self._recompute({name})
+
+    def define(self, line: str) -> List[str]:
+        """``set`` from a definition line such as ``a = 3`` or ``f(x) = x^2``."""
+        parsed = parse_definition(line)
+        if parsed is None:
+            raise ValueError("Not a definition; expected 'name = expression'")
+        name, params, body = parsed
+        return self.set(name, body, params)
+
+    def remove(self, name: str) -> List[str]:
+        cell = self._cells.pop(name)
+        self._unlink(cell)
+        self._values.pop(name, None)
+        return [name] + self._recompute({name}, removed=True)
+
+    def recalculate(self) -> List[str]:
+        """Re-evaluate every cell, e.g. after changing ``backend``.
+
+        Cells are compiled again first: the complex backend's own names (i,
+        det, inv, ...) are variables to the other backends.
+        """
+        for cell in self._cells.values():
+            self._unlink(cell)
+            self._compile(cell)
+            for dep in cell.deps:
+                self._dependents.setdefault(dep, set()).add(cell.name)
+        return self._recompute(set(self._cells))
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._dependents.clear()
+        self._values.clear()
+        self._blocked.clear()
+
+    # Evaluating
+
+    def evaluate(self, text: str) -> Any:
+        """Evaluate a plain expression against the sheet's current values."""
+        return calc_core.evaluate_compiled(self._compiler()(text), self.backend, self._values)
+
+    def execute(self, line: str) -> Tuple[Optional[str], Any]:
+        """Run one line of input: a definition or a plain expression.
+
+        Returns (name, value) for a definition, raising the cell's error if
+        it has one, and (None, value) for an expression.
+        """
+        parsed = parse_definition(line)
+        if parsed is None:
+            return None, self.evaluate(line)
+        name, params, body = parsed
+        self.set(name, body, params)
+        return name, self[name]
+
+    # Internals
+
+    def _check_name(self, name: str) -> None:
+        if not _IDENTIFIER.fullmatch(name):
+            raise ValueError(f"Invalid name: {name!r}")
+        if name in calc_core.ALLOWED_NAMES or (self._is_complex() and name in COMPLEX_NAMES):
+            raise ValueError(f"Cannot redefine built-in name: {name}")
+
+    def _is_complex(self) -> bool:
+        return getattr(self.backend, "name", self.backend) == "complex"
+
+    def _compiler(self) -> Callable[[str], Optional[CompiledExpression]]:
+        # The complex backend has names of its own (i, det, inv, ...).
+        return calc_core.compile_complex if self._is_complex() else calc_core.compile_expression
+
+    def _compile(self, cell: Cell) -> None:
+        cell.compiled, cell.compile_error, cell.deps = None, None, frozenset()
+        try:
+            cell.compiled = self._compiler()(cell.source)
+        except ValueError as exc:
+            cell.compile_error = exc
+        else:
+            if cell.compiled is not None:
+                cell.deps = cell.compiled.variables.difference(cell.params or ())
+
+    def _unlink(self, cell: Cell) -> None:
+        for dep in cell.deps:
+            readers = self._dependents.get(dep)
+            if readers is not None:
+                readers.discard(cell.name)
+                if not readers:
+                    del self._dependents[dep]
+
+    def _downstream(self, roots: Set[str]) -> Set[str]:
+        seen = set(roots)
+        queue: Deque[str] = deque(roots)
+        while queue:
+            for reader in self._dependents.get(queue.popleft(), ()):
+                if reader not in seen:
+                    seen.add(reader)
+                    queue.append(reader)
+        return seen
+
+    def _propagate(self, root: str) -> List[str]:
+        # Visit cells in rank order, expanding only from cells whose value
+        # changed; a reader always ranks above everything it reads.
+        cells = self._cells
+        heap = [(cells[root].rank, root)]
+        queued = {root}
+        result: List[str] = []
+        while heap:
+            _, name = heapq.heappop(heap)
+            cell = cells[name]
+            if self._store(cell, *self._evaluate(cell)):
+                result.append(name)
+                for reader in self._dependents.get(name, ()):
+                    if reader not in queued and reader not in self._blocked:
+                        queued.add(reader)
+                        heapq.heappush(heap, (cells[reader].rank, reader))
+            elif name == root:
+                result.append(name)
+        return result
+
+    def _recompute(self, roots: Set[str], removed: bool = False) -> List[str]:
+        # The graph changed: order the affected cells with Kahn's algorithm,
+        # reassigning ranks on the way and finding any cycles.
+        cells = self._cells
+        affected = [name for name in self._downstream(roots) if name in cells]
+        pending = {name: 0 for name in affected}
+        for name in affected:
+            pending[name] = sum(1 for dep in cells[name].deps if dep in pending)
+        ready: Deque[str] = deque(name for name, count in pending.items() if count == 0)
+        order: List[str] = []
+        while ready:
+            name = ready.popleft()
+            order.append(name)
+            del pending[name]
+            for reader in self._dependents.get(name, ()):
+                if reader in pending:
+                    pending[reader] -= 1
+                    if pending[reader] == 0:
+                        ready.append(reader)
+
+        changed: Set[str] = set(roots) if removed else set()
+        result: List[str] = []
+        for name in order:
+            cell = cells[name]
+            self._blocked.discard(name)
+            cell.rank = 1 + max((cells[dep].rank for dep in cell.deps if dep in cells), default=-1)
+            forced = name in roots
+            if not forced and not (cell.deps & changed):
+                continue
+            if self._store(cell, *self._evaluate(cell)):
+                changed.add(name)
+                result.append(name)
+            elif forced:
+                result.append(name)
+
+        if pending:
+            # What is left sits on a cycle or downstream of one. Peel off the
+            # cells nothing else in the remainder reads; the core is cyclic.
+            readers_left = {
+                name: sum(1 for r in self._dependents.get(name, ()) if r in pending) for name in pending
+            }
+            tail = deque(name for name, count in readers_left.items() if count == 0)
+            downstream: Set[str] = set()
+            while tail:
+                name = tail.popleft()
+                downstream.add(name)
+                for dep in cells[name].deps:
+                    if dep in readers_left and dep not in downstream:
+                        readers_left[dep] -= 1
+                        if readers_left[dep] == 0:
+                            tail.append(dep)
+            core = sorted(name for name in pending if name not in downstream)
+            message = f"Circular reference: {', '.join(core)}"
+            for name in sorted(pending):
+                self._blocked.add(name)
+                error = CircularReferenceError(
+                    message if name not in downstream else f"{name} depends on a circular reference"
+                )
+                if self._store(cells[name], None, error) or name in roots:
+                    result.append(name)
+        return result
+
+    def _evaluate(self, cell: Cell) -> Tuple[Any, Optional[Exception]]:
+        self.evaluations += 1
+        if cell.compile_error is not None:
+            return None, cell.compile_error
+        missing = cell.deps.difference(self._values)
+        if missing:
+            dep = min(missing)
+            if dep in self._cells:
+                return None, ValueError(f"{cell.name} depends on {dep}, which has an error")
+            return None, ValueError(f"Unknown name: {dep}")
+        if cell.params is not None:
+            bound = {dep: self._values[dep] for dep in cell.deps}
+            return UserFunction(cell.name, cell.params, cell.compiled, self.backend, bound), None
+        try:
+            return calc_core.evaluate_compiled(cell.compiled, self.backend, self._values), None
+        except (ZeroDivisionError, ValueError, OverflowError) as exc:
+            return None, exc
+
+    def _store(self, cell: Cell, value: Any, error: Optional[Exception]) -> bool:
+        """Record a result on ``cell``; True if it differs from the last one."""
+        if error is None:
+            same = (
+                cell.error is None
+                and cell.name in self._values
+                and type(value) is type(cell.value)
+                and _same_value(value, cell.value)
+            )
+            self._values[cell.name] = value
+        else:
+            same = cell.error is not None and repr(error) == repr(cell.error)
+            self._values.pop(cell.name, None)
+        cell.value, cell.error = value, error
+        return not same
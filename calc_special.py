@@ -0,0 +1,147 @@
+import math
+from functools import lru_cache
+from typing import Any
+
+# Largest n with n! representable as a float; gamma overflows just above
+# MAX_FLOAT_FACTORIAL + 1.
+MAX_FLOAT_FACTORIAL = 170
+_GAMMA_OVERFLOW = 171.61447887182298
+
+# n! for every n whose result fits in a float, correctly rounded.
+FACTORIAL_TABLE = tuple(float(math.factorial(n)) for n in range(MAX_FLOAT_FACTORIAL + 1))
+_LOG_FACTORIAL_TABLE = tuple(math.lgamma(n + 1) for n in range(MAX_FLOAT_FACTORIAL + 1))
+
+SPECIAL_CACHE_SIZE = 4096
+
+
+def _as_index(x: Any) -> int:
+    if isinstance(x, bool) or not isinstance(x, (int, float)):
+        raise TypeError("factorial() argument must be a number")
+    if x != x or x < 0 or x != int(x):
+        raise ValueError("factorial() not defined for negative or non-integral values")
+    return int(x)
+
+
+@lru_cache(maxsize=256)
+def exact_factorial(n: int) -> int:
+    """Exact n!, memoized; the evaluator holds n to Limits.max_factorial."""
+    return math.factorial(n)
+
+
+def factorial(x: Any) -> int:
+    """n! as an exact integer, for integral ints and floats ((10/2)! is 120).
+
+    The result stays exact so that 200!/198! and 171! - 171! come out
+    right; only a final result too large for a float becomes inf.
+    """
+    return exact_factorial(_as_index(x))
+
+
+def lfactorial(x: Any) -> float:
+    """log(n!), exact-table for small n and lgamma(n + 1) otherwise."""
+    if x == math.inf:
+        return math.inf
+    n = _as_index(x)
+    if n <= MAX_FLOAT_FACTORIAL:
+        return _LOG_FACTORIAL_TABLE[n]
+    return _lgamma(float(n) + 1.0)
+
+
+@lru_cache(maxsize=SPECIAL_CACHE_SIZE)
+def _gamma(x: float) -> float:
+    return math.gamma(x)
+
+
+@lru_cache(maxsize=SPECIAL_CACHE_SIZE)
+def _lgamma(x: float) -> float:
+    return math.lgamma(x)
+
+
+def gamma(x: Any) -> float:
+    if math.isfinite(x) and x == int(x) and 1 <= x <= MAX_FLOAT_FACTORIAL + 1:
+        return FACTORIAL_TABLE[int(x) - 1]
+    if x > _GAMMA_OVERFLOW:
+        return math.inf
+    return _gamma(float(x))
+
+
+def lgamma(x: Any) -> float:
+    if math.isfinite(x) and x == int(x) and 1 <= x <= MAX_FLOAT_FACTORIAL + 1:
+        return _LOG_FACTORIAL_TABLE[int(x) - 1]
+    return _lgamma(float(x))
+
+
+# gamma overflows to inf and lfactorial/lgamma work in floats, so their cost
+# does not grow with the argument and the factorial-argument limit is not
+# needed for them.
+lfactorial.cost_bounded = True  # type: ignore[attr-defined]
+gamma.cost_bounded = True  # type: ignore[attr-defined]
+lgamma.cost_bounded = True  # type: ignore[attr-defined]
+
+
+# B2, B4, ..., B20 for the asymptotic series of polygamma.
+BERNOULLI_EVEN = (1 / 6, -1 / 30, 1 / 42, -1 / 30, 5 / 66, -691 / 2730, 7 / 6, -3617 / 510, 43867 / 798, -174611 / 330)
+# polygamma(n >= 1, x) for negative x walks up one step per unit.
+POLYGAMMA_MIN_ARG = -100_000.0
+
+
+def polygamma_order(n: Any) -> int:
+    if isinstance(n, bool) or not isinstance(n, (int, float)) or n != n or n < 0 or n != int(n):
+        raise ValueError("polygamma() order must be a non-negative integer")
+    return int(n)
+
+
+def polygamma_asymptotic(n: int, x: Any, log: Any) -> Any:
+    """Asymptotic series for polygamma(n, x), accurate once x >= n + 15.
+
+    ``x`` may be a float or a NumPy array; ``log`` is the matching log.
+    """
+    inv2 = 1.0 / (x * x)
+    power = inv2
+    if n == 0:
+        series = 0.0
+        for k, b in enumerate(BERNOULLI_EVEN, start=1):
+            series = series + b / (2 * k) * power
+            power = power * inv2
+        return log(x) - 0.5 / x - series
+    series = math.factorial(n - 1) / x ** n + math.factorial(n) / (2 * x ** (n + 1))
+    power = 1.0 / x ** (n + 2)
+    for k, b in enumerate(BERNOULLI_EVEN, start=1):
+        series = series + b * (math.factorial(2 * k + n - 1) / math.factorial(2 * k)) * power
+        power = power * inv2
+    return series if n % 2 else -series
+
+
+def polygamma(n: Any, x: Any) -> float:
+    """The n-th derivative of digamma; polygamma(0, x) is d/dx lgamma(x).
+
+    Shifts x up with psi_n(x) = psi_n(x + 1) - (-1)^n n! / x^(n+1), then
+    uses the asymptotic series. Digamma of negative x uses the reflection
+    formula. gamma'(x) = gamma(x) * polygamma(0, x).
+    """
+    n = polygamma_order(n)
+    x = float(x)
+    if x != x:
+        return x
+    if x == math.inf:
+        return math.inf if n == 0 else 0.0
+    if x <= 0 and x == int(x):
+        raise ValueError("math domain error")
+    if n == 0 and x < 0:
+        return polygamma(0, 1.0 - x) - math.pi / math.tan(math.pi * x)
+    if x < POLYGAMMA_MIN_ARG:
+        raise ValueError("polygamma() argument out of range")
+    shift = 0.0
+    while x < n + 15:
+        shift += 1.0 / x ** (n + 1)
+        x += 1.0
+    step = math.factorial(n) * shift
+    return polygamma_asymptotic(n, x, math.log) - (-step if n % 2 else step)
+
+
+def cache_info() -> dict:
+    return {
+        "gamma": _gamma.cache_info()._asdict(),
+        "lgamma": _lgamma.cache_info()._asdict(),
+        "exact_factorial": exact_factorial.cache_info()._asdict(),
+    }
@@ -0,0 +1,405 @@
+import ast
+import math
+from decimal import Decimal
+from fractions import Fraction
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from calc_eval import DEFAULT_LIMITS, Limits
+from calc_opt import _postorder, fold
+from calc_parser import LPAREN, NAME, NUMBER, OP, RPAREN, Token, tokenize
+
+# Exponents of the SI base units, in this order.
+BASE_UNITS = ("m", "kg", "s", "A", "K", "mol", "cd")
+Dims = Tuple[int, ...]
+DIMENSIONLESS: Dims = (0,) * len(BASE_UNITS)
+
+
+class DimensionError(ValueError):
+    """Raised when units do not match: 1 m + 1 s, sin(2 m), 3 kg to km."""
+
+
+def _dims(**exponents: int) -> Dims:
+    return tuple(exponents.get(name, 0) for name in BASE_UNITS)
+
+
+_LENGTH, _MASS, _TIME = _dims(m=1), _dims(kg=1), _dims(s=1)
+_FORCE = _dims(kg=1, m=1, s=-2)
+_PRESSURE = _dims(kg=1, m=-1, s=-2)
+_ENERGY = _dims(kg=1, m=2, s=-2)
+_POWER = _dims(kg=1, m=2, s=-3)
+_VOLTAGE = _dims(kg=1, m=2, s=-3, A=-1)
+_RESISTANCE = _dims(kg=1, m=2, s=-3, A=-2)
+_SPEED = _dims(m=1, s=-1)
+
+# symbol: (size in SI base units, dimensions, takes SI prefixes). Sizes are
+# decimal strings so prefixed sizes are products rounded once.
+_DEFINITIONS: Dict[str, Tuple[str, Dims, bool]] = {
+    "m": ("1", _LENGTH, True),
+    "g": ("0.001", _MASS, True),
+    "s": ("1", _TIME, True),
+    "A": ("1", _dims(A=1), True),
+    "K": ("1", _dims(K=1), True),
+    "mol": ("1", _dims(mol=1), True),
+    "cd": ("1", _dims(cd=1), True),
+    "Hz": ("1", _dims(s=-1), True),
+    "N": ("1", _FORCE, True),
+    "Pa": ("1", _PRESSURE, True),
+    "J": ("1", _ENERGY, True),
+    "W": ("1", _POWER, True),
+    "C": ("1", _dims(A=1, s=1), True),
+    "V": ("1", _VOLTAGE, True),
+    "Ω": ("1", _RESISTANCE, True),
+    "ohm": ("1", _RESISTANCE, True),
+    "L": ("0.001", _dims(m=3), True),
+    "l": ("0.001", _dims(m=3), True),
+    "eV": ("1.602176634e-19", _ENERGY, True),
+    "Wh": ("3600", _ENERGY, True),
+    "cal": ("4.184", _ENERGY, True),
+    "bar": ("100000", _PRESSURE, True),
+    "t": ("1000", _MASS, False),
+    "min": ("60", _TIME, False),
+    "h": ("3600", _TIME, False),
+    "d": ("86400", _TIME, False),
+    "day": ("86400", _TIME, False),
+    "week": ("604800", _TIME, False),
+    "yr": ("31557600", _TIME, False),
+    "in": ("0.0254", _LENGTH, False),
+    "ft": ("0.3048", _LENGTH, False),
+    "yd": ("0.9144", _LENGTH, False),
+    "mi": ("1609.344", _LENGTH, False),
+    "nmi": ("1852", _LENGTH, False),
+    "ha": ("10000", _dims(m=2), False),
+    "gal": ("0.003785411784", _dims(m=3), False),
+    "lb": ("0.45359237", _MASS, False),
+    "oz": ("0.028349523125", _MASS, False),
+    "mph": ("0.44704", _SPEED, False),
+    "kn": (repr(1852 / 3600), _SPEED, False),
+    "atm": ("101325", _PRESSURE, False),
+    "psi": ("6894.757293168361", _PRESSURE, False),
+    "rad": ("1", DIMENSIONLESS, False),
+    "deg": (repr(math.pi / 180), DIMENSIONLESS, False),
+}
+_PREFIXES = {
+    "Y": "1e24", "Z": "1e21", "E": "1e18", "P": "1e15", "T": "1e12", "G": "1e9",
+    "M": "1e6", "k": "1e3", "h": "1e2", "da": "1e1", "d": "1e-1", "c": "1e-2",
+    "m": "1e-3", "u": "1e-6", "µ": "1e-6", "μ": "1e-6", "n": "1e-9", "p": "1e-12",
+    "f": "1e-15", "a": "1e-18", "z": "1e-21", "y": "1e-24",
+}
+
+
+def _build_index() -> Dict[str, Tuple[float, Dims]]:
+    index = {symbol: (float(size), dims) for symbol, (size, dims, _) in _DEFINITIONS.items()}
+    for symbol, (size, dims, prefixed) in _DEFINITIONS.items():
+        if prefixed:
+            for prefix, factor in _PREFIXES.items():
+                # An unprefixed symbol wins a clash (min is not milli-in).
+                index.setdefault(prefix + symbol, (float(Decimal(factor) * Decimal(size)), dims))
+    return index
+
+
+# Every unit symbol, prefixed ones included, with its size in SI base units.
+UNITS: Mapping[str, Tuple[float, Dims]] = MappingProxyType(_build_index())
+
+# Results are shown in these units when their dimensions match exactly,
+# otherwise in SI base units.
+_NAMED = {
+    _FORCE: "N",
+    _PRESSURE: "Pa",
+    _ENERGY: "J",
+    _POWER: "W",
+    _dims(A=1, s=1): "C",
+    _VOLTAGE: "V",
+    _RESISTANCE: "Ω",
+}
+
+
+def format_dims(dims: Dims) -> str:
+    """SI spelling of ``dims``, such as "m/s^2"; "" when dimensionless."""
+    named = _NAMED.get(dims)
+    if named is not None:
+        return named
+    over = [_power(base, e) for base, e in zip(BASE_UNITS, dims) if e > 0]
+    under = [_power(base, -e) for base, e in zip(BASE_UNITS, dims) if e < 0]
+    text = "·".join(over) or ("1" if under else "")
+    return "".join([text, *("/" + part for part in under)])
+
+
+def _power(base: str, exponent: int) -> str:
+    return base if exponent == 1 else f"{base}^{exponent}"
+
+
+class Quantity:
+    """A float in SI base units plus its dimension vector.
+
+    ``unit`` and ``scale`` pick how it is shown: ``magnitude`` is the value
+    in ``unit``, which is ``scale`` base units.
+    """
+
+    __slots__ = ("value", "dims", "unit", "scale")
+
+    def __init__(self, value: float, dims: Dims, unit: Optional[str] = None, scale: float = 1.0) -> None:
+        self.value = value
+        self.dims = dims
+        if unit is None:
+            unit, scale = format_dims(dims), 1.0
+        self.unit = unit
+        self.scale = scale
+
+    @property
+    def magnitude(self) -> float:
+        return self.value / self.scale if self.scale != 1.0 else self.value
+
+    def to(self, unit: str) -> "Quantity":
+        scale, dims = parse_unit(unit)
+        if dims != self.dims:
+            raise DimensionError(f"Cannot convert {self.unit or 'a number'} to {unit}")
+        return Quantity(self.value, dims, unit, scale)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Quantity):
+            return NotImplemented
+        return self.value == other.value and self.dims == other.dims
+
+    def __hash__(self) -> int:
+        return hash((self.value, self.dims))
+
+    def __repr__(self) -> str:
+        return f"Quantity({self.magnitude!r}, {self.unit!r})"
+
+    def __str__(self) -> str:
+        return f"{self.magnitude:.12g} {self.unit}".rstrip()
+
+
+class CompiledQuantity:
+    """A compiled float expression in SI base units, plus what its value means.
+
+    ``dims`` were checked when it was compiled; ``unit`` and ``scale`` are
+    how results are shown (the "to" target, or SI).
+    """
+
+    __slots__ = ("compiled", "dims", "unit", "scale")
+
+    def __init__(self, compiled: Any, dims: Dims, unit: str, scale: float) -> None:
+        self.compiled = compiled
+        self.dims = dims
+        self.unit = unit
+        self.scale = scale
+
+    def __repr__(self) -> str:
+        return f"CompiledQuantity({self.compiled.source!r}, {self.unit!r})"
+
+
+def _is_unit(tokens: List[Token], i: int) -> bool:
+    # A unit is a known symbol that is not the name of a call.
+    return (
+        i < len(tokens)
+        and tokens[i].kind == NAME
+        and tokens[i].text in UNITS
+        and not (i + 1 < len(tokens) and tokens[i + 1].kind == LPAREN)
+    )
+
+
+def _unit_end(tokens: List[Token], i: int) -> int:
+    """Index just past the unit that starts at tokens[i]: km, m/s^2, kg·m^2."""
+    n = len(tokens)
+    i += 1
+    while i < n and tokens[i].kind == OP:
+        op = tokens[i].text
+        if op in ("^", "**"):
+            j = i + 1
+            if j < n and tokens[j].kind == OP and tokens[j].text == "-":
+                j += 1
+            if j < n and tokens[j].kind == NUMBER and tokens[j].text.isdigit():
+                i = j + 1
+                continue
+        elif op in ("*", "/") and _is_unit(tokens, i + 1):
+            i += 2
+            continue
+        break
+    return i
+
+
+def _unit_text(tokens: List[Token]) -> str:
+    return "".join(token.text for token in tokens)
+
+
+def attach_units(tokens: List[Token]) -> Tuple[List[Token], Optional[str]]:
+    """Fold unit suffixes into the tokens; also split off a "to <unit>" target.
+
+    "3 km / 20 min" becomes "(3 * [km]) / (20 * [min])": a unit binds to the
+    number before it, and a name after ``*`` or ``/`` inside a suffix is a
+    unit. The bracketed names are resolved by ``analyze``.
+    """
+    target = None
+    for i in range(len(tokens) - 1, 0, -1):
+        if tokens[i].kind == NAME and tokens[i].text == "to":
+            if not _is_unit(tokens, i + 1) or _unit_end(tokens, i + 1) != len(tokens):
+                raise ValueError("Invalid unit")
+            target = _unit_text(tokens[i + 1:])
+            tokens = tokens[:i]
+            break
+    out: List[Token] = []
+    i, n = 0, len(tokens)
+    while i < n:
+        token = tokens[i]
+        if token.kind == NUMBER and _is_unit(tokens, i + 1):
+            end = _unit_end(tokens, i + 1)
+            unit = Token(NAME, f"[{_unit_text(tokens[i + 1:end])}]", tokens[i + 1].pos, tokens[end - 1].end)
+            out += [
+                Token(LPAREN, "(", token.pos, token.pos),
+                token,
+                Token(OP, "*", token.end, token.end),
+                unit,
+                Token(RPAREN, ")", unit.end, unit.end),
+            ]
+            i = end
+        else:
+            out.append(token)
+            i += 1
+    return out, target
+
+
+def has_units(text: str) -> bool:
+    """Whether ``text`` has a unit suffix or a "to <unit>" conversion."""
+    tokens = tokenize(text)
+    return any(
+        (token.kind == NUMBER and _is_unit(tokens, i + 1)) or (token.kind == NAME and token.text == "to" and i > 0)
+        for i, token in enumerate(tokens)
+    )
+
+
+@lru_cache(maxsize=1024)
+def parse_unit(text: str) -> Tuple[float, Dims]:
+    """Size in SI base units and dimensions of a unit such as "km/h"."""
+    tokens = tokenize(text)
+    if not _is_unit(tokens, 0) or _unit_end(tokens, 0) != len(tokens):
+        raise ValueError(f"Unknown unit: {text}")
+    scale, dims = 1.0, DIMENSIONLESS
+    sign, i = 1, 0
+    while i < len(tokens):
+        # One term: [* or /] symbol [^ [-] integer]; a power binds to its
+        # own symbol only, so m/s^2 is m/(s^2).
+        if tokens[i].kind == OP:
+            sign = -1 if tokens[i].text == "/" else 1
+            i += 1
+        unit_scale, unit_dims = UNITS[tokens[i].text]
+        exponent = sign
+        i += 1
+        if i < len(tokens) and tokens[i].text in ("^", "**"):
+            negative = tokens[i + 1].text == "-"
+            i += 2 if negative else 1
+            exponent *= -int(tokens[i].text) if negative else int(tokens[i].text)
+            i += 1
+        scale *= unit_scale ** exponent
+        dims = _add(dims, _scale(unit_dims, exponent))
+    return scale, dims
+
+
+def _add(a: Dims, b: Dims) -> Dims:
+    return tuple(x + y for x, y in zip(a, b))
+
+
+def _scale(dims: Dims, factor: Any) -> Dims:
+    scaled = [Fraction(d) * factor for d in dims]
+    if any(d.denominator != 1 for d in scaled):
+        raise DimensionError(f"{format_dims(dims)} cannot be raised to the power {factor}")
+    return tuple(int(d) for d in scaled)
+
+
+def _describe(dims: Dims) -> str:
+    return format_dims(dims) or "a number"
+
+
+# Functions that keep the unit of their (first) argument.
+_SAME_UNIT = frozenset({"abs", "fabs", "floor", "ceil"})
+
+
+def analyze(
+    tree: ast.Expression,
+    names: Mapping[str, Any],
+    declared: Optional[Mapping[str, str]] = None,
+    limits: Limits = DEFAULT_LIMITS,
+) -> Tuple[ast.Expression, Dims]:
+    """Check the units in ``tree`` and rewrite it to plain SI floats.
+
+    Unit names from attach_units become their size in base units, and a
+    variable ``declared`` in some unit is scaled on the way in, so the result
+    evaluates like any other float expression; the returned dimensions say
+    what the float means. Undeclared variables and user functions are
+    dimensionless. Raises DimensionError where the units do not fit.
+    """
+    declared = declared or {}
+    done: Dict[int, Tuple[ast.expr, Dims]] = {}
+
+    def operand(child: ast.expr) -> Tuple[ast.expr, Dims]:
+        return done.pop(id(child))
+
+    for node in _postorder(tree.body):
+        kind = type(node)
+        if kind is ast.Constant:
+            done[id(node)] = node, DIMENSIONLESS
+        elif kind is ast.Name:
+            if node.id.startswith("["):
+                scale, dims = parse_unit(node.id[1:-1])
+                done[id(node)] = ast.Constant(value=scale), dims
+            elif node.id in declared and node.id not in names:
+                scale, dims = parse_unit(declared[node.id])
+                scaled = node if scale == 1.0 else ast.BinOp(left=node, op=ast.Mult(), right=ast.Constant(value=scale))
+                done[id(node)] = scaled, dims
+            else:
+                done[id(node)] = node, DIMENSIONLESS
+        elif kind is ast.UnaryOp:
+            child, dims = operand(node.operand)
+            done[id(node)] = ast.UnaryOp(op=node.op, operand=child), dims
+        elif kind is ast.BinOp:
+            (left, a), (right, b) = operand(node.left), operand(node.right)
+            rebuilt = ast.BinOp(left=left, op=node.op, right=right)
+            done[id(node)] = rebuilt, _binop_dims(type(node.op), a, b, right, names, limits)
+        elif kind is ast.Call:
+            args = [operand(arg) for arg in node.args]
+            rebuilt = ast.Call(func=node.func, args=[arg for arg, _ in args], keywords=[])
+            done[id(node)] = rebuilt, _call_dims(node.func.id, args, names, limits)
+        else:
+            raise ValueError(f"Unsupported syntax: {kind.__name__}")
+    body, dims = done[id(tree.body)]
+    return ast.Expression(body=body), dims
+
+
+def _binop_dims(op: type, a: Dims, b: Dims, right: ast.expr, names: Mapping[str, Any], limits: Limits) -> Dims:
+    if op in (ast.Add, ast.Sub, ast.Mod):
+        if a != b:
+            verb = "add" if op is ast.Add else "subtract" if op is ast.Sub else "take"
+            raise DimensionError(f"Cannot {verb} {_describe(a)} and {_describe(b)}")
+        return a
+    if op in (ast.Mult, ast.MatMult):
+        return _add(a, b)
+    if op in (ast.Div, ast.FloorDiv):
+        return _add(a, _scale(b, -1))
+    return _power_dims(a, b, right, names, limits)
+
+
+def _power_dims(base: Dims, exponent_dims: Dims, exponent: ast.expr, names: Mapping[str, Any], limits: Limits) -> Dims:
+    if exponent_dims != DIMENSIONLESS:
+        raise DimensionError(f"An exponent must be a number, not {_describe(exponent_dims)}")
+    if base == DIMENSIONLESS:
+        return base
+    folded = fold(exponent, names, limits)
+    if type(folded) is not ast.Constant or not isinstance(folded.value, (int, float)):
+        raise DimensionError(f"{_describe(base)} can only be raised to a constant power")
+    value = folded.value
+    return _scale(base, value if type(value) is int else Fraction(value).limit_denominator(1000))
+
+
+def _call_dims(name: str, args: List[Tuple[ast.expr, Dims]], names: Mapping[str, Any], limits: Limits) -> Dims:
+    if name in _SAME_UNIT and len(args) == 1:
+        return args[0][1]
+    if name == "sqrt" and len(args) == 1:
+        return _scale(args[0][1], Fraction(1, 2))
+    if name == "pow" and len(args) == 2:
+        return _power_dims(args[0][1], args[1][1], args[1][0], names, limits)
+    for _, dims in args:
+        if dims != DIMENSIONLESS:
+            raise DimensionError(f"{name}() needs a number, not {_describe(dims)}")
+    return DIMENSIONLESS
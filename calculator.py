@@ -1,14 +1,31 @@
 import math
 import re
+import sqlite3
 import sys
-from typing import Dict, Any
-
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QAction, QKeySequence
+from dataclasses import replace
+from functools import partial
+from typing import Any, Dict, List, Mapping, Optional
+
+from PyQt6.QtCore import (
+    QAbstractListModel,
+    QModelIndex,
+    QObject,
+    QPointF,
+    QRectF,
+    QRunnable,
+    Qt,
+    QThreadPool,
+    QTimer,
+    pyqtSignal,
+)
+from PyQt6.QtGui import QAction, QColor, QKeySequence, QPainter, QPainterPath, QPen
 from PyQt6.QtWidgets import (
     QApplication,
+    QAbstractItemView,
+    QDoubleSpinBox,
     QGridLayout,
     QHBoxLayout,
+    QHeaderView,
     QLabel,
     QLineEdit,
     QListWidget,
@@ -17,124 +34,271 @@ from PyQt6.QtWidgets import (
     QMessageBox,
     QPushButton,
     QSizePolicy,
+    QTableView,
     QVBoxLayout,
     QWidget,
 )
 
+import calc_core
+from calc_core import (
+    EvaluationLimitError,
+    IncrementalParser,
+    compile_parsed,
+    evaluate_compiled,
+    evaluate_complex,
+    evaluate_units,
+    has_units,
+    needs_complex,
+)
+from calc_format import format_matrix, format_quantity, format_result
+from calc_history import History, HistoryEntry, cacheable, default_path
+from calc_numeric import plot_range, sample
+from calc_sheet import Worksheet, parse_definition
+
+# Delay between the last keystroke and the live preview evaluation.
+PREVIEW_DEBOUNCE_MS = 120
+# "=" and the preview give up on a pathological expression after this long
+# instead of freezing the window.
+EVALUATION_TIMEOUT_S = 2.0
+# The plot panel draws its expression as a function of this name.
+PLOT_VARIABLE = "x"
+PLOT_RANGE = (-10.0, 10.0)
+
+# Keypad rows: (label, method name, *arguments). Buttons are created from
+# this table after the window's first paint.
+KEYPAD = (
+    (("MC", "memory_clear"), ("MR", "memory_read"), ("M+", "memory_add"), ("M-", "memory_subtract"), ("CE", "clear_entry"), ("C", "clear_all")),
+    (("←", "backspace"), ("(", "_insert_text", "("), (")", "_insert_text", ")"), ("±", "toggle_sign"), ("%", "_insert_text", "%"), ("÷", "_insert_text", "÷")),
+    (("7", "_insert_text", "7"), ("8", "_insert_text", "8"), ("9", "_insert_text", "9"), ("×", "_insert_text", "×"), ("x^y", "_insert_text", "^"), ("x²", "square")),
+    (("4", "_insert_text", "4"), ("5", "_insert_text", "5"), ("6", "_insert_text", "6"), ("-", "_insert_text", "-"), ("√", "sqrt"), ("x³", "cube")),
+    (("1", "_insert_text", "1"), ("2", "_insert_text", "2"), ("3", "_insert_text", "3"), ("+", "_insert_text", "+"), ("1/x", "reciprocal"), ("x!", "factorial")),
+    (("0", "_insert_text", "0"), (".", "_insert_text", "."), ("π", "_insert_text", "pi"), ("e", "_insert_text", "e"), ("Ans", "use_last_answer"), ("=", "calculate")),
+    (("sin", "_insert_text", "sin("), ("cos", "_insert_text", "cos("), ("tan", "_insert_text", "tan("), ("ln", "_insert_text", "ln("), ("log", "_insert_text", "log10("), ("exp", "_insert_text", "exp(")),
+)
+SHORTCUT_KEYS = tuple(str(i) for i in range(10)) + ("+", "-", "*", "/", ".", "(", ")", "^")
+
+STYLESHEETS = {
+    "dark": """
+        QMainWindow { background: #0f1115; }
+        QWidget { color: #e6e6e6; font-size: 16px; }
+        QLineEdit { background: #161a22; border: 1px solid #2a2f3a; padding: 10px; border-radius: 8px; font-size: 22px; }
+        QPushButton { background: #1b2130; border: 1px solid #2b3342; padding: 10px; border-radius: 10px; }
+        QPushButton:hover { background: #242c3d; }
+        QPushButton:pressed { background: #2a3447; }
+        QListView, QTableView { background: #11151c; border: 1px solid #2a2f3a; border-radius: 8px; }
+        QDoubleSpinBox { background: #161a22; border: 1px solid #2a2f3a; padding: 6px; border-radius: 8px; }
+        QMenuBar { background: #0f1115; }
+        QMenu { background: #0f1115; border: 1px solid #2a2f3a; }
+        QLabel { color: #a2adc0; font-weight: 600; }
+        """,
+    "light": """
+        QMainWindow { background: #fafafa; }
+        QWidget { color: #1f2330; font-size: 16px; }
+        QLineEdit { background: white; border: 1px solid #d0d7de; padding: 10px; border-radius: 8px; font-size: 22px; }
+        QPushButton { background: #ffffff; border: 1px solid #d0d7de; padding: 10px; border-radius: 10px; }
+        QPushButton:hover { background: #f0f3f6; }
+        QPushButton:pressed { background: #e6ebf1; }
+        QListView, QTableView { background: #ffffff; border: 1px solid #d0d7de; border-radius: 8px; }
+        QDoubleSpinBox { background: white; border: 1px solid #d0d7de; padding: 6px; border-radius: 8px; }
+        QMenuBar { background: #fafafa; }
+        QMenu { background: #ffffff; border: 1px solid #d0d7de; }
+        QLabel { color: #57606a; font-weight: 600; }
+        """,
+}
+
+
+def try_complex(text: str, variables: Mapping[str, Any]) -> Optional[str]:
+    """``text`` evaluated over complex numbers, formatted; None if that fails too.
+
+    For expressions such as sqrt(-1) that have no real value.
+    """
+    try:
+        return format_matrix(evaluate_complex(text, variables))
+    except Exception:
+        return None
+
+
+class _PreviewSignals(QObject):
+    finished = pyqtSignal(int, str)
+
 
-def build_allowed_names() -> Dict[str, Any]:
-    allowed: Dict[str, Any] = {}
-    # math functions
-    for name in [
-        "sin",
-        "cos",
-        "tan",
-        "asin",
-        "acos",
-        "atan",
-        "sinh",
-        "cosh",
-        "tanh",
-        "log",
-        "log10",
-        "sqrt",
-        "pow",
-        "exp",
-        "fabs",
-        "floor",
-        "ceil",
-        "degrees",
-        "radians",
-        "factorial",
-        "gamma",
-        "lgamma",
-    ]:
-        allowed[name] = getattr(math, name)
-
-    # aliases
-    allowed["ln"] = math.log
-    allowed["abs"] = abs
-
-    # constants
-    allowed.update({
-        "pi": math.pi,
-        "e": math.e,
-        "tau": math.tau,
-        "inf": math.inf,
-        "nan": math.nan,
-    })
-    return allowed
-
-
-def replace_factorial_operators(expression: str) -> str:
-    """Convert occurrences of x! into factorial(x).
-
-    Supports nested and chained factorials like 5!! or (3+2)!
+class _PreviewTask(QRunnable):
+    """Evaluates a parsed preview expression on a pool thread."""
+
+    def __init__(
+        self,
+        generation: int,
+        text: str,
+        tree: Any,
+        variables: Dict[str, Any],
+        signals: _PreviewSignals,
+        complex_numbers: bool = False,
+    ) -> None:
+        super().__init__()
+        self.setAutoDelete(False)
+        self.generation = generation
+        self.text = text
+        self.tree = tree
+        self.variables = variables
+        self.signals = signals
+        self.complex_numbers = complex_numbers
+
+    def run(self) -> None:
+        try:
+            result = "= " + self._evaluate()
+        except Exception as exc:
+            result = str(exc)
+        self.signals.finished.emit(self.generation, result)
+
+    def _evaluate(self) -> str:
+        if self.complex_numbers:
+            return format_matrix(evaluate_complex(self.text, self.variables))
+        if self.tree is None:
+            return format_quantity(evaluate_units(self.text, self.variables))
+        compiled = compile_parsed(self.text, self.tree)
+        try:
+            return format_result(evaluate_compiled(compiled, "float", self.variables))
+        except EvaluationLimitError:
+            raise
+        except ValueError:
+            result = try_complex(self.text, self.variables)
+            if result is None:
+                raise
+            return result
+
+
+class HistoryModel(QAbstractListModel):
+    """A History as a list model, newest first.
+
+    Rows are read from the store only when the view paints them, so a long
+    history costs no more to show than a short one. While a search query is
+    set the model lists the matching entries instead.
     """
-    # Handle multiple factorials by repeatedly applying regex until stable
-    pattern_number = re.compile(r"(?P<val>(?:\d+(?:\.\d+)?)|(?:pi|e|tau|inf|nan))!")
-    pattern_paren = re.compile(r"\)(!)+")
-
-    prev = None
-    s = expression
-    # First, numbers/constants followed by !
-    while prev != s:
-        prev = s
-        s = pattern_number.sub(lambda m: f"factorial({m.group('val')})", s)
-
-    # Then, closing parens followed by one or more !
-    # Replace )! -> ) and wrap with factorial( ... )
-    # We do this by scanning and inserting wrappers
-    while True:
-        match = pattern_paren.search(s)
-        if not match:
-            break
-        bangs = match.group(1)
-        # Find matching open paren for the ) at match.start()
-        close_index = match.start()
-        open_index = close_index
-        depth = 0
-        while open_index >= 0:
-            ch = s[open_index]
-            if ch == ')':
-                depth += 1
-            elif ch == '(':
-                depth -= 1
-                if depth == 0:
-                    break
-            open_index -= 1
-        if open_index < 0:
-            # unmatched, stop to avoid infinite loop
-            break
-        inner = s[open_index: close_index + 1]
-        # apply factorial as many times as bangs length
-        wrapped = inner
-        for _ in bangs:
-            wrapped = f"factorial{wrapped}"
-        s = s[:open_index] + wrapped + s[close_index + 1 + len(bangs):]
-    return s
-
-
-def preprocess_expression(expr: str) -> str:
-    s = expr.strip()
-    if not s:
-        return s
-    # Replace unicode multiplication and division
-    s = s.replace('×', '*').replace('÷', '/')
-    # Replace caret with exponentiation
-    s = s.replace('^', '**')
-    # Percent: convert trailing % to /100
-    s = re.sub(r"(\d+(?:\.\d+)?)%", r"(\1/100)", s)
-    # Factorial handling
-    s = replace_factorial_operators(s)
-    return s
+
+    SEARCH_LIMIT = 500
+
+    def __init__(self, history: History, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.history = history
+        self._rows = len(history)
+        self._query = ""
+        self._matches: Optional[List[HistoryEntry]] = None
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return self._rows if self._matches is None else len(self._matches)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        row = index.row()
+        if self._matches is None:
+            entry = self.history.entry(row)
+        else:
+            entry = self._matches[row] if 0 <= row < len(self._matches) else None
+        if entry is None:
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"{entry.expression} = {entry.result}"
+        if role == Qt.ItemDataRole.UserRole:
+            return entry.expression
+        return None
+
+    def add(self, expression: str, result: str, value: Optional[float] = None) -> None:
+        if self._matches is not None:
+            self.history.add(expression, result, value)
+            self.set_query(self._query)
+            return
+        self.beginInsertRows(QModelIndex(), 0, 0)
+        self.history.add(expression, result, value)
+        self._rows += 1
+        self.endInsertRows()
+        # At the cap the store dropped its oldest entries.
+        excess = self._rows - len(self.history)
+        if excess > 0:
+            self.beginRemoveRows(QModelIndex(), self._rows - excess, self._rows - 1)
+            self._rows -= excess
+            self.endRemoveRows()
+
+    def set_query(self, query: str) -> None:
+        self.beginResetModel()
+        self._query = query
+        self._matches = self.history.search(query, self.SEARCH_LIMIT) if query else None
+        self._rows = len(self.history)
+        self.endResetModel()
+
+    def clear(self) -> None:
+        self.beginResetModel()
+        self.history.clear()
+        self._rows = 0
+        if self._matches is not None:
+            self._matches = []
+        self.endResetModel()
+
+
+class PlotWidget(QWidget):
+    """Draws sampled points as a line, with gaps where the curve is undefined."""
+
+    def __init__(self, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self.xs: List[float] = []
+        self.ys: List[float] = []
+        self.setMinimumHeight(160)
+
+    def set_points(self, xs: List[float], ys: List[float]) -> None:
+        self.xs, self.ys = xs, ys
+        self.update()
+
+    def paintEvent(self, event: Any) -> None:
+        if len(self.xs) < 2 or not any(math.isfinite(y) for y in self.ys):
+            return
+        low, high = plot_range(self.ys)
+        x0, x1 = self.xs[0], self.xs[-1]
+        rect = QRectF(self.rect()).adjusted(6, 6, -6, -6)
+
+        def px(x: float) -> float:
+            return rect.left() + (x - x0) / (x1 - x0) * rect.width()
+
+        def py(y: float) -> float:
+            # Clamp far off-screen values; Qt coordinates overflow otherwise.
+            y = min(max(y, 2 * low - high), 2 * high - low)
+            return rect.bottom() - (y - low) / (high - low) * rect.height()
+
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        axis = QColor(self.palette().color(self.foregroundRole()))
+        axis.setAlpha(90)
+        painter.setPen(QPen(axis, 1))
+        if low <= 0 <= high:
+            painter.drawLine(QPointF(rect.left(), py(0)), QPointF(rect.right(), py(0)))
+        if x0 <= 0 <= x1:
+            painter.drawLine(QPointF(px(0), rect.top()), QPointF(px(0), rect.bottom()))
+        painter.drawText(rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop, f"{high:.4g}")
+        painter.drawText(rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignBottom, f"{low:.4g}")
+
+        path = QPainterPath()
+        previous = math.nan
+        for x, y in zip(self.xs, self.ys):
+            if not math.isfinite(y):
+                previous = math.nan
+                continue
+            point = QPointF(px(x), py(y))
+            # Lift the pen across undefined points and across a jump from
+            # above the view to below it (or back), as at a pole.
+            if previous != previous or (previous > high and y < low) or (previous < low and y > high):
+                path.moveTo(point)
+            else:
+                path.lineTo(point)
+            previous = y
+        painter.setClipRect(rect)
+        painter.setPen(QPen(QColor("#7c3aed"), 2))
+        painter.drawPath(path)
+        painter.end()
 
 
 class ScientificCalculator(QMainWindow):
     def __init__(self) -> None:
         super().__init__()
         self.setWindowTitle("Modern Scientific Calculator")
-        self.allowed_names = build_allowed_names()
         self.current_theme = "dark"
 
         self._build_ui()
@@ -149,7 +313,7 @@ class ScientificCalculator(QMainWindow):
         menu.addAction(toggle_theme_action)
 
         clear_history_action = QAction("Clear History", self)
-        clear_history_action.triggered.connect(self.history.clear)
+        clear_history_action.triggered.connect(self.history_model.clear)
         menu.addAction(clear_history_action)
 
     def _build_ui(self) -> None:
@@ -168,53 +332,111 @@ class ScientificCalculator(QMainWindow):
         self.display.setReadOnly(False)
         self.display.setMaxLength(512)
         self.display.returnPressed.connect(self.calculate)
+        self.display.textChanged.connect(self._schedule_preview)
         left.addWidget(self.display)
 
-        grid = QGridLayout()
-        left.addLayout(grid)
+        # Live result preview, evaluated off the GUI thread
+        self.preview = QLabel()
+        self.preview.setAlignment(Qt.AlignmentFlag.AlignRight)
+        left.addWidget(self.preview)
+        self._preview_parser = IncrementalParser()
+        self._preview_generation = 0
+        self._preview_task: _PreviewTask | None = None
+        self._preview_pool = QThreadPool(self)
+        self._preview_pool.setMaxThreadCount(2)
+        self._preview_signals = _PreviewSignals(self)
+        self._preview_signals.finished.connect(self._on_preview_ready)
+        self._preview_timer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.setInterval(PREVIEW_DEBOUNCE_MS)
+        self._preview_timer.timeout.connect(self._start_preview)
+
+        self.keypad = QGridLayout()
+        left.addLayout(self.keypad)
+        self.keypad_ready = False
 
         # Right side: history panel
         right = QVBoxLayout()
         root_layout.addLayout(right, 2)
         right.addWidget(QLabel("History"))
-        self.history = QListWidget()
-        self.history.itemClicked.connect(self._on_history_clicked)
+        self.history_search = QLineEdit()
+        self.history_search.setPlaceholderText("Search history...")
+        right.addWidget(self.history_search)
+        try:
+            history = History(default_path())
+        except (sqlite3.Error, OSError):
+            # Unwritable home directory: keep this session's history only.
+            history = History()
+        self.history_model = HistoryModel(history, self)
+        self.history_search.textChanged.connect(self.history_model.set_query)
+        # A table view with fixed row heights lays out only the visible
+        # rows; QListView walks every row on each insert.
+        self.history = QTableView()
+        self.history.horizontalHeader().hide()
+        self.history.horizontalHeader().setStretchLastSection(True)
+        self.history.verticalHeader().hide()
+        self.history.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.history.setShowGrid(False)
+        self.history.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.history.setModel(self.history_model)
+        self.history.clicked.connect(self._on_history_index_clicked)
         right.addWidget(self.history)
-
-        # Row definitions (text, slot, span)
-        buttons = [
-            # Row 0
-            [("MC", self.memory_clear), ("MR", self.memory_read), ("M+", self.memory_add), ("M-", self.memory_subtract), ("CE", self.clear_entry), ("C", self.clear_all)],
-            # Row 1
-            [("←", self.backspace), ("(", lambda: self._insert_text("(")), (")", lambda: self._insert_text(")")), ("±", self.toggle_sign), ("%", lambda: self._insert_text("%")), ("÷", lambda: self._insert_text("÷"))],
-            # Row 2
-            [("7", lambda: self._insert_text("7")), ("8", lambda: self._insert_text("8")), ("9", lambda: self._insert_text("9")), ("×", lambda: self._insert_text("×")), ("x^y", lambda: self._insert_text("^")), ("x²", lambda: self.square)],
-            # Row 3
-            [("4", lambda: self._insert_text("4")), ("5", lambda: self._insert_text("5")), ("6", lambda: self._insert_text("6")), ("-", lambda: self._insert_text("-")), ("√", self.sqrt), ("x³", self.cube)],
-            # Row 4
-            [("1", lambda: self._insert_text("1")), ("2", lambda: self._insert_text("2")), ("3", lambda: self._insert_text("3")), ("+", lambda: self._insert_text("+")), ("1/x", self.reciprocal), ("x!", self.factorial)],
-            # Row 5
-            [("0", lambda: self._insert_text("0")), (".", lambda: self._insert_text(".")), ("π", lambda: self._insert_text("pi")), ("e", lambda: self._insert_text("e")), ("Ans", self.use_last_answer), ("=", self.calculate)],
-            # Row 6 functions
-            [("sin", lambda: self._insert_text("sin(")), ("cos", lambda: self._insert_text("cos(")), ("tan", lambda: self._insert_text("tan(")), ("ln", lambda: self._insert_text("ln(")), ("log", lambda: self._insert_text("log10(")), ("exp", lambda: self._insert_text("exp("))],
-        ]
-
-        # Create buttons
-        for r, row in enumerate(buttons):
-            for c, (text, handler) in enumerate(row):
-                btn = QPushButton(text)
-                btn.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
-                btn.clicked.connect(handler)
-                grid.addWidget(btn, r, c)
+        right.addWidget(QLabel("Variables"))
+        self.variables = QListWidget()
+        self.variables.itemClicked.connect(self._on_history_clicked)
+        right.addWidget(self.variables)
+        self.sheet = Worksheet()
+
+        right.addWidget(QLabel("Plot"))
+        self.plot_expression = QLineEdit()
+        self.plot_expression.setPlaceholderText(f"f({PLOT_VARIABLE}), e.g. sin({PLOT_VARIABLE})")
+        right.addWidget(self.plot_expression)
+        plot_row = QHBoxLayout()
+        self.plot_from = QDoubleSpinBox()
+        self.plot_to = QDoubleSpinBox()
+        for spin, value in zip((self.plot_from, self.plot_to), PLOT_RANGE):
+            spin.setRange(-1e6, 1e6)
+            spin.setButtonSymbols(QDoubleSpinBox.ButtonSymbols.NoButtons)
+            spin.setValue(value)
+            spin.valueChanged.connect(self._schedule_plot)
+            plot_row.addWidget(spin)
+        right.addLayout(plot_row)
+        self.plot = PlotWidget()
+        right.addWidget(self.plot)
+        self.plot_status = QLabel()
+        right.addWidget(self.plot_status)
+        self._plot_timer = QTimer(self)
+        self._plot_timer.setSingleShot(True)
+        self._plot_timer.setInterval(PREVIEW_DEBOUNCE_MS)
+        self._plot_timer.timeout.connect(self._update_plot)
+        self.plot_expression.textChanged.connect(self._schedule_plot)
 
         self.memory_value = 0.0
         self.last_answer: float | None = None
 
+
+    def paintEvent(self, event: Any) -> None:
+        super().paintEvent(event)
+        # The keypad and shortcuts are not needed for the first frame; build
+        # them right after it so the window appears sooner.
+        if not self.keypad_ready:
+            QTimer.singleShot(0, self._build_keypad)
+
+    def _build_keypad(self) -> None:
+        if self.keypad_ready:
+            return
+        for r, row in enumerate(KEYPAD):
+            for c, (text, slot, *args) in enumerate(row):
+                btn = QPushButton(text)
+                btn.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+                btn.clicked.connect(partial(getattr(self, slot), *args))
+                self.keypad.addWidget(btn, r, c)
+
         # Keyboard shortcuts
-        for key in [str(i) for i in range(10)] + ["+", "-", "*", "/", ".", "(", ")", "^"]:
+        for key in SHORTCUT_KEYS:
             sc = QAction(self)
             sc.setShortcut(QKeySequence(key))
-            sc.triggered.connect(lambda k=key: self._insert_text(k))
+            sc.triggered.connect(partial(self._insert_text, key))
             self.addAction(sc)
 
         enter = QAction(self)
@@ -231,38 +453,10 @@ class ScientificCalculator(QMainWindow):
         esc.setShortcut(QKeySequence(Qt.Key.Key_Escape))
         esc.triggered.connect(self.clear_entry)
         self.addAction(esc)
+        self.keypad_ready = True
 
     def _apply_theme(self, theme: str) -> None:
-        if theme == "dark":
-            self.setStyleSheet(
-                """
-                QMainWindow { background: #0f1115; }
-                QWidget { color: #e6e6e6; font-size: 16px; }
-                QLineEdit { background: #161a22; border: 1px solid #2a2f3a; padding: 10px; border-radius: 8px; font-size: 22px; }
-                QPushButton { background: #1b2130; border: 1px solid #2b3342; padding: 10px; border-radius: 10px; }
-                QPushButton:hover { background: #242c3d; }
-                QPushButton:pressed { background: #2a3447; }
-                QListWidget { background: #11151c; border: 1px solid #2a2f3a; border-radius: 8px; }
-                QMenuBar { background: #0f1115; }
-                QMenu { background: #0f1115; border: 1px solid #2a2f3a; }
-                QLabel { color: #a2adc0; font-weight: 600; }
-                """
-            )
-        else:
-            self.setStyleSheet(
-                """
-                QMainWindow { background: #fafafa; }
-                QWidget { color: #1f2330; font-size: 16px; }
-                QLineEdit { background: white; border: 1px solid #d0d7de; padding: 10px; border-radius: 8px; font-size: 22px; }
-                QPushButton { background: #ffffff; border: 1px solid #d0d7de; padding: 10px; border-radius: 10px; }
-                QPushButton:hover { background: #f0f3f6; }
-                QPushButton:pressed { background: #e6ebf1; }
-                QListWidget { background: #ffffff; border: 1px solid #d0d7de; border-radius: 8px; }
-                QMenuBar { background: #fafafa; }
-                QMenu { background: #ffffff; border: 1px solid #d0d7de; }
-                QLabel { color: #57606a; font-weight: 600; }
-                """
-            )
+        self.setStyleSheet(STYLESHEETS[theme])
 
     # Actions
     def _insert_text(self, text: str) -> None:
@@ -339,6 +533,9 @@ class ScientificCalculator(QMainWindow):
         expr = item.data(Qt.ItemDataRole.UserRole) or ""
         self.display.setText(expr)
 
+    def _on_history_index_clicked(self, index: QModelIndex) -> None:
+        self.display.setText(index.data(Qt.ItemDataRole.UserRole) or "")
+
     # Memory operations
     def memory_clear(self) -> None:
         self.memory_value = 0.0
@@ -348,55 +545,162 @@ class ScientificCalculator(QMainWindow):
 
     def memory_add(self) -> None:
         try:
-            val = float(self._evaluate_text(self.display.text() or "0"))
+            val = float(self.sheet.evaluate(self.display.text() or "0"))
             self.memory_value += val
         except Exception:
             pass
 
     def memory_subtract(self) -> None:
         try:
-            val = float(self._evaluate_text(self.display.text() or "0"))
+            val = float(self.sheet.evaluate(self.display.text() or "0"))
             self.memory_value -= val
         except Exception:
             pass
 
-    # Evaluation
-    def _evaluate_text(self, text: str) -> float:
-        expr = preprocess_expression(text)
-        if not expr:
-            return 0.0
+    # Live preview
+    def _schedule_preview(self) -> None:
+        # Any result still in flight is now stale; a task that has not
+        # started yet is dropped from the pool queue outright.
+        self._preview_generation += 1
+        if self._preview_task is not None:
+            self._preview_pool.tryTake(self._preview_task)
+            self._preview_task = None
+        self._preview_timer.start()
+
+    def _start_preview(self) -> None:
+        text = self.display.text()
+        units = matrices = False
         try:
-            result = eval(expr, {"__builtins__": {}}, self.allowed_names)
-        except ZeroDivisionError as exc:
-            raise ZeroDivisionError("Division by zero") from exc
-        except Exception as exc:
-            raise ValueError("Invalid expression") from exc
-        if isinstance(result, (int, float)):
-            return float(result)
-        raise ValueError("Expression did not evaluate to a number")
+            definition = parse_definition(text)
+            if definition is not None:
+                # Preview the right-hand side of "a = ..."; a function body
+                # has free parameters and nothing to show yet.
+                text = definition[2] if definition[1] is None else ""
+            # Expressions with units or matrices are parsed on the pool
+            # thread instead.
+            units = has_units(text)
+            matrices = not units and needs_complex(text, self.sheet.values)
+            tree = None if units or matrices else self._preview_parser.parse(text)
+        except ValueError:
+            tree = None
+        if tree is None and not units and not matrices:
+            self.preview.clear()
+            return
+        variables = dict(self.sheet.values)
+        self._preview_task = _PreviewTask(
+            self._preview_generation, text, tree, variables, self._preview_signals, matrices
+        )
+        self._preview_pool.start(self._preview_task)
+
+    def _on_preview_ready(self, generation: int, result: str) -> None:
+        if generation == self._preview_generation:
+            self.preview.setText(result)
 
     def calculate(self) -> None:
         text = self.display.text()
         if not text:
             return
-        try:
-            value = self._evaluate_text(text)
-        except Exception as exc:
-            QMessageBox.critical(self, "Error", str(exc))
+        plain = parse_definition(text) is None
+        if plain and has_units(text):
+            self._calculate_units(text)
+            return
+        if plain and needs_complex(text, self.sheet.values):
+            self._calculate_complex(text)
             return
+        # Expressions without variables evaluated before need no work.
+        name, value = None, self.history_model.history.lookup(text)
+        if value is None:
+            try:
+                name, value = self.sheet.execute(text)
+            except Exception as exc:
+                if plain and isinstance(exc, ValueError) and not isinstance(exc, EvaluationLimitError):
+                    # No real value (sqrt(-1)); try the complex numbers.
+                    result_str = try_complex(text, self.sheet.values)
+                    if result_str is not None:
+                        self._show_complex(text, result_str)
+                        return
+                # A definition is stored even when it fails to evaluate.
+                self._refresh_variables()
+                self._schedule_plot()
+                QMessageBox.critical(self, "Error", str(exc))
+                return
+        if name is not None:
+            self._refresh_variables()
+            self._schedule_plot()
+            if callable(value):
+                self.history_model.add(self.sheet.definition(name), "defined")
+                self.display.clear()
+                return
 
         # Normalize -0.0 to 0
         if abs(value) == 0:
             value = 0.0
 
         self.last_answer = value
-        result_str = ("%.*g" % (12, value)) if value != int(value) else str(int(value))
+        result_str = format_result(value)
         self.display.setText(result_str)
 
-        # Add to history
-        item = QListWidgetItem(f"{text} = {result_str}")
-        item.setData(Qt.ItemDataRole.UserRole, text)
-        self.history.insertItem(0, item)
+        self.history_model.add(text, result_str, value if name is None and cacheable(text) else None)
+
+    def _calculate_units(self, text: str) -> None:
+        try:
+            quantity = evaluate_units(text, self.sheet.values)
+        except Exception as exc:
+            QMessageBox.critical(self, "Error", str(exc))
+            return
+        self.last_answer = quantity.magnitude
+        result_str = format_quantity(quantity)
+        self.display.setText(result_str)
+        self.history_model.add(text, result_str)
+
+    def _calculate_complex(self, text: str) -> None:
+        try:
+            value = evaluate_complex(text, self.sheet.values)
+        except Exception as exc:
+            QMessageBox.critical(self, "Error", str(exc))
+            return
+        self._show_complex(text, format_matrix(value))
+
+    def _show_complex(self, text: str, result_str: str) -> None:
+        # Ans keeps the last real result; the display holds this one.
+        self.display.setText(result_str)
+        self.history_model.add(text, result_str)
+
+    def _schedule_plot(self) -> None:
+        self._plot_timer.start()
+
+    def _update_plot(self) -> None:
+        text = self.plot_expression.text().strip()
+        low, high = self.plot_from.value(), self.plot_to.value()
+        if not text:
+            self.plot.set_points([], [])
+            self.plot_status.clear()
+            return
+        # The plot variable shadows a worksheet variable of the same name.
+        variables = {k: v for k, v in self.sheet.values.items() if k != PLOT_VARIABLE}
+        try:
+            xs, ys = sample(text, PLOT_VARIABLE, (low, high), variables=variables)
+        except Exception as exc:
+            self.plot.set_points([], [])
+            self.plot_status.setText(str(exc))
+            return
+        self.plot_status.clear()
+        self.plot.set_points(xs, ys)
+
+    def _refresh_variables(self) -> None:
+        self.variables.clear()
+        for name in self.sheet:
+            error = self.sheet.error(name)
+            value = self.sheet.values.get(name)
+            if error is not None:
+                shown = f"error: {error}"
+            elif callable(value):
+                shown = "function"
+            else:
+                shown = format_result(value)
+            item = QListWidgetItem(f"{self.sheet.definition(name)}   → {shown}")
+            item.setData(Qt.ItemDataRole.UserRole, self.sheet.definition(name))
+            self.variables.addItem(item)
 
     def toggle_theme(self) -> None:
         self.current_theme = "light" if self.current_theme == "dark" else "dark"
@@ -404,9 +708,10 @@ class ScientificCalculator(QMainWindow):
 
 
 def main() -> None:
+    calc_core.set_limits(replace(calc_core.get_limits(), timeout=EVALUATION_TIMEOUT_S))
     app = QApplication(sys.argv)
     win = ScientificCalculator()
-    win.resize(980, 600)
+    win.resize(980, 760)
     win.show()
     sys.exit(app.exec())
 
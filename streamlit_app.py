@@ -1,16 +1,60 @@
+import logging
+import os
+import time
+from collections import deque
+from contextlib import nullcontext
+from dataclasses import replace
+
 import streamlit as st
-from calc_core import evaluate_expression
 
+import calc_core
+from calc_format import format_matrix, format_quantity, format_result
+from calc_history import History, cacheable
+from calc_numeric import plot_range, sample
+from calc_sheet import Worksheet, parse_definition
+
+HISTORY_PAGE_SIZE = 10
+# The compile cache is shared by every session served by this process.
+SHARED_CACHE_SIZE = 65_536
+# Server-side time allowed for one interaction: a keypad fragment run for a
+# keypress, a full run for "=" and history clicks.
+LATENCY_BUDGET_MS = 50
+LATENCY_SAMPLES = 50
+# A pathological expression fails after this long instead of holding the
+# server thread.
+EVALUATION_TIMEOUT_S = 2.0
+# The plot panel draws its expression as a function of this name.
+PLOT_VARIABLE = "x"
+
+log = logging.getLogger(__name__)
+_started = time.perf_counter()
 
 st.set_page_config(page_title="Modern Scientific Calculator", page_icon="🧮", layout="wide")
 
-# Subtle, colorful styling
+
+@st.cache_resource
+def engine():
+    """calc_core, configured once per server process instead of per rerun."""
+    calc_core.set_cache_size(SHARED_CACHE_SIZE)
+    calc_core.set_limits(replace(calc_core.get_limits(), timeout=EVALUATION_TIMEOUT_S))
+    # Server processes on one host can share results: set CALC_SHARED_CACHE
+    # to a file path, or to "1" for the default one.
+    shared = os.environ.get("CALC_SHARED_CACHE")
+    if shared:
+        calc_core.enable_shared_cache(None if shared == "1" else shared)
+    return calc_core
+
+
+engine()
+
+# Subtle, colorful styling. A keyed button gets an st-key-<key> class, so
+# one stylesheet covers the accent groups.
 st.markdown(
     """
     <style>
-    .app-title h1 { 
+    .app-title h1 {
         background: linear-gradient(90deg, #7c3aed, #2563eb, #10b981);
-        -webkit-background-clip: text; background-clip: text; color: transparent; 
+        -webkit-background-clip: text; background-clip: text; color: transparent;
         font-weight: 800; letter-spacing: -0.5px;
     }
     .stButton > button {
@@ -21,9 +65,9 @@ st.markdown(
     }
     .stButton > button:hover { background: #eef2ff; border-color: #c7d2fe; }
     .stButton > button:active { transform: translateY(1px); }
-    .primary-equals > button { background: linear-gradient(180deg, #34d399, #10b981); color: white; border: none; }
-    .danger-clear > button { background: linear-gradient(180deg, #fca5a5, #f87171); color: white; border: none; }
-    .accent-ops > button { background: linear-gradient(180deg, #c7d2fe, #a5b4fc); color: #111827; border: none; }
+    .st-key-key-equals button { background: linear-gradient(180deg, #34d399, #10b981); color: white; border: none; }
+    .st-key-key-clear button { background: linear-gradient(180deg, #fca5a5, #f87171); color: white; border: none; }
+    [class*="st-key-key-op-"] button { background: linear-gradient(180deg, #c7d2fe, #a5b4fc); color: #111827; border: none; }
     .stTextInput > div > div > input { border-radius: 12px; border: 1px solid #e5e7eb; height: 48px; }
     </style>
     """,
@@ -34,15 +78,35 @@ st.markdown(
 if "display" not in st.session_state:
     st.session_state.display = ""
 if "history" not in st.session_state:
-    st.session_state.history = []
+    # Per session and in memory: sessions of a shared server must not see
+    # each other's calculations.
+    st.session_state.history = History()
+if "history_page" not in st.session_state:
+    st.session_state.history_page = 0
 if "last_answer" not in st.session_state:
     st.session_state.last_answer = None
 if "memory" not in st.session_state:
     st.session_state.memory = 0.0
 if "advanced" not in st.session_state:
     st.session_state.advanced = False
+if "sheet" not in st.session_state:
+    st.session_state.sheet = Worksheet()
+if "latency" not in st.session_state:
+    st.session_state.latency = {}
+if "profile" not in st.session_state:
+    # Local: other sessions evaluate on their own script threads, and those
+    # evaluations stay out of this session's table.
+    st.session_state.profile = calc_core.Profile(local=True)
 
 
+def profiled():
+    """The session's profile while the debug panel's toggle is on."""
+    return st.session_state.profile if st.session_state.get("profiling") else nullcontext()
+
+
+# Button callbacks run before the rerun they trigger, so they can change
+# the "display" widget's value before it is drawn.
+
 def press(key: str) -> None:
     st.session_state.display += key
 
@@ -55,20 +119,69 @@ def backspace() -> None:
     st.session_state.display = st.session_state.display[:-1]
 
 
+def calculate_complex(text: str) -> bool:
+    """Show ``text`` evaluated over complex numbers; False if that fails."""
+    try:
+        with profiled():
+            val = calc_core.evaluate_complex(text, st.session_state.sheet.values)
+    except Exception as exc:
+        st.session_state.error = str(exc)
+        return False
+    result_str = format_matrix(val)
+    st.session_state.history.add(text, result_str)
+    st.session_state.history_page = 0
+    st.session_state.display = result_str
+    return True
+
+
 def calculate() -> None:
     text = st.session_state.display
     if not text:
         return
-    try:
-        val = evaluate_expression(text)
-    except Exception as exc:
-        st.error(str(exc))
+    # History and variables are drawn outside the keypad fragment.
+    st.session_state.page_stale = True
+    history = st.session_state.history
+    plain = parse_definition(text) is None
+    if plain and calc_core.has_units(text):
+        try:
+            with profiled():
+                quantity = calc_core.evaluate_units(text, st.session_state.sheet.values)
+        except Exception as exc:
+            st.session_state.error = str(exc)
+            return
+        st.session_state.last_answer = quantity.magnitude
+        result_str = format_quantity(quantity)
+        history.add(text, result_str)
+        st.session_state.history_page = 0
+        st.session_state.display = result_str
+        return
+    if plain and calc_core.needs_complex(text, st.session_state.sheet.values):
+        calculate_complex(text)
+        return
+    # Expressions without variables evaluated before need no work.
+    name, val = None, history.lookup(text)
+    if val is None:
+        try:
+            with profiled():
+                name, val = st.session_state.sheet.execute(text)
+        except Exception as exc:
+            # No real value (sqrt(-1)): try the complex numbers, keeping
+            # the original error if that fails too.
+            if plain and isinstance(exc, ValueError) and not isinstance(exc, calc_core.EvaluationLimitError):
+                if calculate_complex(text):
+                    return
+            st.session_state.error = str(exc)
+            return
+    if callable(val):
+        history.add(st.session_state.sheet.definition(name), "defined")
+        st.session_state.display = ""
         return
     if abs(val) == 0:
         val = 0.0
     st.session_state.last_answer = val
-    result_str = ("%.*g" % (12, val)) if val != int(val) else str(int(val))
-    st.session_state.history.insert(0, f"{text} = {result_str}")
+    result_str = format_result(val)
+    history.add(text, result_str, val if name is None and cacheable(text) else None)
+    st.session_state.history_page = 0
     st.session_state.display = result_str
 
 
@@ -77,6 +190,18 @@ def use_ans() -> None:
         st.session_state.display += str(st.session_state.last_answer)
 
 
+def recall(expression: str) -> None:
+    st.session_state.display = expression
+
+
+def reset_history_page() -> None:
+    st.session_state.history_page = 0
+
+
+def turn_history_page(step: int) -> None:
+    st.session_state.history_page += step
+
+
 def memory_clear() -> None:
     st.session_state.memory = 0.0
 
@@ -87,7 +212,7 @@ def memory_read() -> None:
 
 def memory_add() -> None:
     try:
-        val = float(evaluate_expression(st.session_state.display or "0"))
+        val = float(st.session_state.sheet.evaluate(st.session_state.display or "0"))
         st.session_state.memory += val
     except Exception:
         pass
@@ -95,89 +220,189 @@ def memory_add() -> None:
 
 def memory_subtract() -> None:
     try:
-        val = float(evaluate_expression(st.session_state.display or "0"))
+        val = float(st.session_state.sheet.evaluate(st.session_state.display or "0"))
         st.session_state.memory -= val
     except Exception:
         pass
 
 
+def record_latency(kind: str, started: float) -> float:
+    """Keep the last LATENCY_SAMPLES run times for ``kind``; log overruns."""
+    elapsed_ms = (time.perf_counter() - started) * 1e3
+    st.session_state.latency.setdefault(kind, deque(maxlen=LATENCY_SAMPLES)).append(elapsed_ms)
+    if elapsed_ms > LATENCY_BUDGET_MS:
+        log.warning("%s run took %.1f ms, over the %d ms budget", kind, elapsed_ms, LATENCY_BUDGET_MS)
+    return elapsed_ms
+
+
+# Keypad rows: (label, key, callback, *arguments). Keys starting with "op-"
+# get the accent style.
+KEYPAD = (
+    (
+        ("MC", "mem-clear", memory_clear), ("MR", "mem-read", memory_read), ("M+", "mem-add", memory_add),
+        ("M-", "mem-sub", memory_subtract), ("CE", "clear", clear_entry), ("←", "back", backspace),
+    ),
+    (
+        ("(", "lparen", press, "("), (")", "rparen", press, ")"), ("±", "neg", press, "-"),
+        ("%", "percent", press, "%"), ("÷", "op-div", press, "÷"), ("×", "op-mul", press, "×"),
+    ),
+    (
+        ("7", "7", press, "7"), ("8", "8", press, "8"), ("9", "9", press, "9"),
+        ("-", "op-sub", press, "-"), ("x^y", "op-pow", press, "^"), ("x²", "op-square", press, "^2"),
+    ),
+    (
+        ("4", "4", press, "4"), ("5", "5", press, "5"), ("6", "6", press, "6"),
+        ("+", "op-add", press, "+"), ("√", "op-sqrt", press, "sqrt("), ("x³", "op-cube", press, "^3"),
+    ),
+    (
+        ("1", "1", press, "1"), ("2", "2", press, "2"), ("3", "3", press, "3"),
+        (".", "point", press, "."), ("1/x", "reciprocal", press, "1/("), ("x!", "factorial", press, "!"),
+    ),
+    (
+        ("0", "0", press, "0"), ("π", "pi", press, "pi"), ("e", "e", press, "e"),
+        ("Ans", "ans", use_ans), ("=", "equals", calculate),
+    ),
+)
+ADVANCED_ROW = (
+    ("sin", "sin", press, "sin("), ("cos", "cos", press, "cos("), ("tan", "tan", press, "tan("),
+    ("ln", "ln", press, "ln("), ("log", "log", press, "log10("), ("exp", "exp", press, "exp("),
+)
+
+
+@st.fragment
+def calculator_panel() -> None:
+    """Display and keypad. A keypress reruns only this fragment."""
+    if st.session_state.pop("page_stale", False):
+        st.rerun()
+    started = time.perf_counter()
+    st.text_input("Expression", key="display", placeholder="Enter expression…")
+    error = st.session_state.pop("error", None)
+    if error is not None:
+        st.error(error)
+    advanced = st.toggle("Advanced mode", key="advanced", help="Switch between basic and advanced functions")
+    for row in KEYPAD + (ADVANCED_ROW,) if advanced else KEYPAD:
+        for col, (label, key, callback, *args) in zip(st.columns(len(row)), row):
+            col.button(label, key=f"key-{key}", on_click=callback, args=tuple(args), use_container_width=True)
+    elapsed_ms = record_latency("keypad", started)
+    st.caption(f"Keypad run {elapsed_ms:.1f} ms (budget {LATENCY_BUDGET_MS} ms)")
+
+
 st.markdown('<div class="app-title">\n<h1>Modern Scientific Calculator</h1>\n</div>', unsafe_allow_html=True)
 
 top_col1, top_col2 = st.columns([3, 2])
 with top_col1:
-    # Reserve space for the input at the very top, but don't instantiate it yet.
-    # This allows button handlers below to mutate st.session_state.display first.
-    input_placeholder = st.empty()
-    advanced = st.toggle("Advanced mode", value=st.session_state.advanced, help="Switch between basic and advanced functions")
-    st.session_state.advanced = advanced
-
-    # Define keypad buttons; include advanced rows conditionally
-    btn_rows = [
-        [
-            ("MC", memory_clear), ("MR", memory_read), ("M+", memory_add), ("M-", memory_subtract),
-            ("CE", clear_entry), ("←", backspace)
-        ],
-        [
-            ("(", lambda: press("(")), (")", lambda: press(")")), ("±", lambda: press("-")), ("%", lambda: press("%")), ("÷", lambda: press("÷")), ("×", lambda: press("×"))
-        ],
-        [
-            ("7", lambda: press("7")), ("8", lambda: press("8")), ("9", lambda: press("9")), ("-", lambda: press("-")), ("x^y", lambda: press("^")), ("x²", lambda: press("^2"))
-        ],
-        [
-            ("4", lambda: press("4")), ("5", lambda: press("5")), ("6", lambda: press("6")), ("+", lambda: press("+")), ("√", lambda: press("sqrt(")), ("x³", lambda: press("^3"))
-        ],
-        [
-            ("1", lambda: press("1")), ("2", lambda: press("2")), ("3", lambda: press("3")), (".", lambda: press(".")), ("1/x", lambda: press("1/(")), ("x!", lambda: press("!"))
-        ],
-        [
-            ("0", lambda: press("0")), ("π", lambda: press("pi")), ("e", lambda: press("e")), ("Ans", use_ans), ("=", calculate)
-        ],
-    ]
-
-    if advanced:
-        btn_rows.append([
-            ("sin", lambda: press("sin(")), ("cos", lambda: press("cos(")), ("tan", lambda: press("tan(")), ("ln", lambda: press("ln(")), ("log", lambda: press("log10(")), ("exp", lambda: press("exp("))
-        ])
-
-    for row in btn_rows:
-        cols = st.columns(len(row))
-        for idx, (text, handler) in enumerate(row):
-            col = cols[idx]
-            with col:
-                # Assign subtle styles to certain action groups
-                btn_container = st.container()
-                btn_class = ""
-                if text in ("=",):
-                    btn_class = "primary-equals"
-                elif text in ("CE",):
-                    btn_class = "danger-clear"
-                elif text in ("+", "-", "×", "÷", "x^y", "x²", "x³", "√"):
-                    btn_class = "accent-ops"
-                with btn_container:
-                    if st.button(text, use_container_width=True, key=f"btn-{text}-{idx}"):
-                        handler()
-                if btn_class:
-                    st.markdown(f"<style>.element-container:has(> div button[data-testid='baseButton'][aria-label='{text}']) > div > button {{}} </style>", unsafe_allow_html=True)
-                    # Fallback: apply class to last rendered button
-                    st.markdown(f"<script>const bs=document.querySelectorAll('.stButton button'); if(bs.length) bs[bs.length-1].parentElement.classList.add('{btn_class}');</script>", unsafe_allow_html=True)
-
-    # Now create the input widget after handlers may have modified the value.
-    input_placeholder.text_input(
-        "Expression",
-        key="display",
-        value=st.session_state.display,
-        placeholder="Enter expression…",
-    )
+    calculator_panel()
 
 with top_col2:
     st.subheader("History")
-    if st.session_state.history:
-        for i, item in enumerate(st.session_state.history):
-            if st.button(item, key=f"hist-{i}", use_container_width=True):
-                st.session_state.display = item.split(" = ")[0]
+    history = st.session_state.history
+    query = st.text_input(
+        "Search history", key="history_query", placeholder="Search…", label_visibility="collapsed",
+        on_change=reset_history_page,
+    )
+    page = st.session_state.history_page
+    offset = page * HISTORY_PAGE_SIZE
+    if query:
+        # Fetch one extra row to know whether there is a next page.
+        entries = history.search(query, limit=offset + HISTORY_PAGE_SIZE + 1)[offset:]
+        has_next = len(entries) > HISTORY_PAGE_SIZE
+        entries = entries[:HISTORY_PAGE_SIZE]
+    else:
+        entries = history.page(offset, HISTORY_PAGE_SIZE)
+        has_next = offset + HISTORY_PAGE_SIZE < len(history)
+    if entries:
+        # Only one page of buttons is rendered, however long the history.
+        for entry in entries:
+            st.button(
+                f"{entry.expression} = {entry.result}", key=f"hist-{entry.id}", on_click=recall,
+                args=(entry.expression,), use_container_width=True,
+            )
+        prev_col, info_col, next_col = st.columns([1, 2, 1])
+        prev_col.button(
+            "‹", key="hist-prev", disabled=page == 0, on_click=turn_history_page, args=(-1,), use_container_width=True
+        )
+        info_col.caption(f"Page {page + 1} · {len(history)} entries")
+        next_col.button(
+            "›", key="hist-next", disabled=not has_next, on_click=turn_history_page, args=(1,), use_container_width=True
+        )
+    elif query:
+        st.caption("No matches.")
     else:
         st.caption("No calculations yet.")
 
-st.caption("Tip: Use ^ for power, % for percent, π/e constants, and functions like sin( ), ln( ), log10( ).")
-
+    sheet = st.session_state.sheet
+    if len(sheet):
+        st.subheader("Variables")
+        for name in sheet:
+            error = sheet.error(name)
+            value = sheet.values.get(name)
+            if error is not None:
+                st.caption(f"`{sheet.definition(name)}` — error: {error}")
+            elif callable(value):
+                st.caption(f"`{sheet.definition(name)}`")
+            else:
+                st.caption(f"`{sheet.definition(name)}` → {value:.12g}")
+
+
+@st.fragment
+def plot_panel() -> None:
+    """Plot of an expression in x. Editing it reruns only this fragment."""
+    started = time.perf_counter()
+    st.subheader("Plot")
+    text_col, low_col, high_col = st.columns([4, 1, 1])
+    text = text_col.text_input(
+        "Expression to plot", key="plot_expression", placeholder=f"f({PLOT_VARIABLE}), e.g. sin({PLOT_VARIABLE})"
+    )
+    low = low_col.number_input("From", key="plot_from", value=-10.0)
+    high = high_col.number_input("To", key="plot_to", value=10.0)
+    if text.strip():
+        # The plot variable shadows a worksheet variable of the same name.
+        variables = {k: v for k, v in st.session_state.sheet.values.items() if k != PLOT_VARIABLE}
+        try:
+            with profiled():
+                xs, ys = sample(text, PLOT_VARIABLE, (low, high), variables=variables)
+        except Exception as exc:
+            st.error(str(exc))
+        else:
+            # Values past the range (near a pole) are left out as gaps. The
+            # spec carries its data inline; st.line_chart's DataFrame and
+            # Altair conversion cost more than the sampling.
+            bottom, top = plot_range(ys)
+            values = [{"x": x, "y": y if bottom <= y <= top else None} for x, y in zip(xs, ys)]
+            st.vega_lite_chart(
+                {
+                    "data": {"values": values},
+                    "mark": {"type": "line", "color": "#7c3aed"},
+                    "encoding": {
+                        "x": {"field": "x", "type": "quantitative", "title": PLOT_VARIABLE},
+                        "y": {"field": "y", "type": "quantitative", "title": None, "scale": {"zero": False}},
+                    },
+                    "height": 260,
+                },
+            )
+    record_latency("plot", started)
+
+
+plot_panel()
+
+with st.expander("Debug"):
+    st.toggle("Profile evaluations", key="profiling", help="Time each stage of this session's evaluations")
+    stats = st.session_state.profile.as_dict()
+    if stats["stages"]:
+        rows = ["| stage | calls | total ms | mean µs | max µs |", "|---|---:|---:|---:|---:|"]
+        for stage, t in stats["stages"].items():
+            rows.append(
+                f"| {stage} | {t['calls']} | {t['total_ns'] / 1e6:.2f} | {t['mean_ns'] / 1e3:.1f} | {t['max_ns'] / 1e3:.1f} |"
+            )
+        st.markdown("\n".join(rows))
+        st.caption(" · ".join(f"{event}: {n}" for event, n in sorted(stats["counters"].items())))
+        st.code(st.session_state.profile.to_prometheus(), language="text")
+        st.button("Reset profile", key="profile-reset", on_click=st.session_state.profile.reset)
+    else:
+        st.caption("No profile yet: turn profiling on and evaluate something.")
 
+st.caption(
+    "Tip: Use ^ for power, % for percent, π/e constants, and functions like sin( ), ln( ), log10( ). "
+    "Define variables and functions with a = 3 or f(x) = x^2 + a."
+)
+record_latency("page", _started)
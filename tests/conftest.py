@@ -0,0 +1,22 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import calc_codegen  # noqa: E402
+import calc_core  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_core():
+    # Tests change module-wide settings; each one starts from the defaults.
+    threshold = calc_codegen.threshold
+    limits = calc_core.get_limits()
+    calc_core.clear_cache()
+    yield
+    calc_core.set_codegen_threshold(threshold)
+    calc_core.set_limits(limits)
+    calc_core.disable_shared_cache()
+    calc_core.clear_cache()
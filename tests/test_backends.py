@@ -0,0 +1,85 @@
+import math
+from decimal import Context, Decimal
+from fractions import Fraction
+
+import pytest
+
+import calc_core
+from calc_backends import DecimalBackend, backend_names, get_backend
+
+PI_60 = "3.14159265358979323846264338327950288419716939937510582097494"
+
+
+@pytest.mark.parametrize(
+    "text, backend, want",
+    [
+        ("0.1+0.2", "fraction", Fraction(3, 10)),
+        ("1/3 + 1/6", "fraction", Fraction(1, 2)),
+        ("sqrt(9/4) + 2^-3", "fraction", Fraction(13, 8)),
+        ("30!/28!", "fraction", Fraction(870)),
+        ("5%", "fraction", Fraction(1, 20)),
+        ("0.1+0.2", "decimal", Decimal("0.3")),
+        ("1/3", "decimal", Decimal("0.3333333333333333333333333333")),
+        ("20!/18!", "decimal", Decimal(380)),
+    ],
+)
+@pytest.mark.parametrize("threshold", [0, 1])
+def test_exact_results(text, backend, want, threshold):
+    calc_core.set_codegen_threshold(threshold)
+    for _ in range(3):
+        result = calc_core.evaluate_expression(text, backend)
+        assert type(result) is type(want)
+        assert result == want
+
+
+def test_200_factorial_does_not_overflow():
+    assert calc_core.evaluate_expression("200!", "fraction") == math.factorial(200)
+    assert calc_core.evaluate_expression("200!", "float") == math.inf
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["sin(1)", "cos(2) + tan(0.5)", "asin(0.5) + acos(0.25) + atan(3)", "sinh(1) - cosh(1) + tanh(2)",
+     "exp(2) + ln(3) + log10(7) + log(8, 2)", "sqrt(2) + 2^0.5", "gamma(4.5) + lgamma(3.5)", "degrees(1) + radians(90)"],
+)
+@pytest.mark.parametrize("backend", ["decimal", "fraction"])
+def test_transcendental_functions_agree_with_float(text, backend):
+    result = calc_core.evaluate_expression(text, backend)
+    assert float(result) == pytest.approx(calc_core.evaluate_expression(text), rel=1e-12)
+
+
+def test_decimal_precision():
+    backend = DecimalBackend(precision=60)
+    assert str(calc_core.evaluate_expression("pi", backend)) == PI_60
+    third = calc_core.evaluate_expression("1/3", backend)
+    assert third == Decimal("0." + "3" * 60)
+    assert abs(calc_core.evaluate_expression("sin(pi)", backend)) < Decimal("1e-58")
+    assert calc_core.evaluate_expression("e", backend) == Decimal(1).exp(Context(prec=60))
+
+
+def test_backends_keep_separate_programs():
+    compiled = calc_core.compile_expression("x/3")
+    assert calc_core.evaluate_compiled(compiled, "fraction", {"x": 1}) == Fraction(1, 3)
+    assert calc_core.evaluate_compiled(compiled, "float", {"x": 1}) == pytest.approx(1 / 3)
+    assert calc_core.evaluate_compiled(compiled, DecimalBackend(precision=5), {"x": 1}) == Decimal("0.33333")
+    assert calc_core.evaluate_compiled(compiled, "decimal", {"x": 1}) == Decimal("0." + "3" * 28)
+
+
+@pytest.mark.parametrize("backend", ["decimal", "fraction"])
+def test_errors(backend):
+    with pytest.raises(ZeroDivisionError, match="Division by zero"):
+        calc_core.evaluate_expression("1/0", backend)
+    with pytest.raises(ValueError):
+        calc_core.evaluate_expression("2.5!", backend)
+
+
+def test_fraction_rejects_non_finite_results():
+    with pytest.raises(ValueError, match="finite rational"):
+        calc_core.evaluate_expression("inf", "fraction")
+
+
+def test_registry():
+    assert {"float", "decimal", "fraction"} <= set(backend_names())
+    assert get_backend("decimal").key == "decimal:28"
+    with pytest.raises(ValueError, match="Unknown backend: nope"):
+        calc_core.evaluate_expression("1", "nope")
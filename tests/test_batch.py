@@ -0,0 +1,19 @@
+import calc_core
+from calc_batch import evaluate_many, iter_evaluate
+
+
+def test_in_process_batch():
+    results = evaluate_many(["1+1", "1/0", "bad(", "2^10"], workers=1, chunksize=2)
+    assert [result.index for result in results] == [0, 1, 2, 3]
+    assert [result.value for result in results] == [2.0, None, None, 1024.0]
+    assert isinstance(results[1].error, ZeroDivisionError)
+    assert isinstance(results[2].error, ValueError)
+
+
+def test_timeout_with_one_worker_cuts_off_stuck_expression():
+    # Limits loose enough that 9^(9^9) is attempted: one long integer
+    # operation that a cooperative timeout never gets to interrupt.
+    calc_core.set_limits(calc_core.Limits(max_int_bits=10 ** 12))
+    results = list(iter_evaluate(["1+1", "9^(9^9)", "2*3"], workers=1, timeout=0.5))
+    assert [result.value for result in results] == [2.0, None, 6.0]
+    assert isinstance(results[1].error, calc_core.EvaluationTimeoutError)
@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+
+import calc_cli
+
+
+def _run(text, **kwargs):
+    out = io.StringIO()
+    status = calc_cli.run(io.StringIO(text), out, **kwargs)
+    return status, out.getvalue()
+
+
+def test_text_output():
+    status, out = _run("1+2\n1/0\n")
+    assert status == 0
+    assert out.splitlines() == ["3.0", "ERROR ZeroDivisionError: Division by zero"]
+
+
+def test_jsonl_output_is_strict_json():
+    status, out = _run("171!\n2*3\n1/0\n", output_format="jsonl")
+    assert status == 0
+    assert "Infinity" not in out
+    rows = [json.loads(line) for line in out.splitlines()]
+    assert rows[0] == {"expression": "171!", "result": "inf", "error": None}
+    assert rows[1]["result"] == 6.0
+    assert rows[2]["result"] is None and rows[2]["error"].startswith("ZeroDivisionError")
+
+
+def test_jsonl_input_keeps_fields():
+    text = '{"id": 1, "expression": "2^10"}\n\n{"id": 2, "expression": "sqrt(16)"}\n'
+    _, out = _run(text, input_format="jsonl", output_format="jsonl")
+    rows = [json.loads(line) for line in out.splitlines()]
+    assert [(row["id"], row["result"]) for row in rows] == [(1, 1024.0), (2, 4.0)]
+
+
+def test_csv_output_with_varying_keys():
+    text = '{"expression": "1+1", "a": 1}\n{"expression": "2+2", "b": 2}\n{"expression": "3+3"}\n'
+    status, out = _run(text, input_format="jsonl", output_format="csv")
+    assert status == 0
+    rows = list(csv.DictReader(io.StringIO(out)))
+    assert list(rows[0]) == ["expression", "a", "result", "error"]
+    assert [(row["a"], row["result"]) for row in rows] == [("1", "2.0"), ("", "4.0"), ("", "6.0")]
+
+
+def test_csv_column():
+    text = "name,formula\nx,2*21\ny,bad(\n"
+    _, out = _run(text, input_format="csv", output_format="csv", column="formula", errors="skip")
+    rows = list(csv.DictReader(io.StringIO(out)))
+    assert rows == [{"name": "x", "formula": "2*21", "result": "42.0", "error": ""}]
+
+
+def test_abort_reports_input_line(capsys):
+    text = '{"expression": "1+1"}\n\n\n{"expression": "1/0"}\n'
+    status, out = _run(text, input_format="jsonl", output_format="jsonl", errors="abort")
+    assert status == 1
+    assert len(out.splitlines()) == 1
+    assert capsys.readouterr().err.startswith("line 4: '1/0'")
+
+
+def test_abort_reports_csv_line(capsys):
+    status, _ = _run("formula\n1+1\n2+2\n1/0\n", input_format="csv", errors="abort")
+    assert status == 1
+    assert capsys.readouterr().err.startswith("line 4: '1/0'")
+
+
+BAD_JSONL = '{"expression": "1+1"}\n{bad\n[1, 2]\n{"id": 4}\n"2*3"\n'
+
+
+def test_unreadable_jsonl_records_are_marked():
+    status, out = _run(BAD_JSONL, input_format="jsonl", output_format="jsonl")
+    assert status == 0
+    rows = [json.loads(line) for line in out.splitlines()]
+    assert [row["result"] for row in rows] == [2.0, None, None, None, 6.0]
+    assert rows[1]["error"].startswith("ValueError: Invalid JSON on line 2")
+    assert rows[2]["error"] == "ValueError: Line 3 is not a JSON object or expression"
+    assert rows[3] == {"id": 4, "result": None, "error": "ValueError: No 'expression' field on line 4"}
+
+
+def test_unreadable_jsonl_records_are_skipped():
+    status, out = _run(BAD_JSONL, input_format="jsonl", output_format="jsonl", errors="skip")
+    assert status == 0
+    assert [json.loads(line)["result"] for line in out.splitlines()] == [2.0, 6.0]
+
+
+def test_unreadable_jsonl_record_aborts(capsys):
+    status, out = _run(BAD_JSONL, input_format="jsonl", output_format="jsonl", errors="abort")
+    assert status == 1
+    assert len(out.splitlines()) == 1
+    assert capsys.readouterr().err.startswith("line 2: '{bad': Invalid JSON on line 2")
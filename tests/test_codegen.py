@@ -0,0 +1,78 @@
+import math
+
+import pytest
+
+import calc_core
+
+EXPRESSIONS = [
+    "1 + 2 * 3 - 4 / 5",
+    "2^10 + 5! + 12%",
+    "7 % 3 + x % 4",
+    "-x^2 + 3*x - 1",
+    "sqrt(x) * sin(pi / 6) + cos(0)",
+    "(x + 1) * (x + 1) - (x + 1)",
+    "abs(-x) + floor(x / 3) + ceil(x / 3)",
+    "exp(1) - e + log(100) + ln(e)",
+    "factorial(6) / 3!",
+    "pow(2, 8) - 2^8",
+    "exp(x / 7) - e + log(x^2) + ln(e)",
+    "factorial(x - 1) / (x - 4)!",
+    "pow(x, 3) - x^3 + pow(2, -x)",
+    "1 / (x - x)",
+    "sqrt(-1)",
+    "unknown + 1",
+]
+BACKENDS = ["float", "decimal", "fraction", "interval", "complex"]
+
+
+def _outcome(text, backend):
+    try:
+        if backend == "complex":
+            value = calc_core.evaluate_complex(text, {"x": 7})
+        else:
+            value = calc_core.evaluate_expression(text, backend, {"x": 7})
+    except Exception as exc:
+        return type(exc), str(exc)
+    if isinstance(value, float) and math.isnan(value):
+        return "nan"
+    return type(value), value
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("text", EXPRESSIONS)
+def test_codegen_matches_closures(text, backend):
+    calc_core.set_codegen_threshold(0)
+    want = _outcome(text, backend)
+    calc_core.clear_cache()
+    calc_core.set_codegen_threshold(1)
+    got = [_outcome(text, backend) for _ in range(3)]
+    assert got == [want] * 3
+    compiled = calc_core.compile_complex(text) if backend == "complex" else calc_core.compile_expression(text)
+    if compiled.variables == {"x"}:
+        assert compiled.tier(calc_core.get_backend(backend).key) == "codegen"
+
+
+def test_hot_float_expression_is_generated():
+    calc_core.set_codegen_threshold(1)
+    for _ in range(3):
+        calc_core.evaluate_expression("x^2 + 1", variables={"x": 2})
+    assert calc_core.compile_expression("x^2 + 1").tier("float") == "codegen"
+
+
+@pytest.mark.parametrize("backend", ["float", "fraction"])
+@pytest.mark.parametrize("values", [(1, 100), (1.0, 100.0)])
+def test_names_equal_under_nfkc_stay_distinct(backend, values):
+    # Python identifiers are NFKC-normalized: "ﬁ" (a ligature) becomes "fi".
+    variables = dict(zip(["ﬁ", "fi"], values))
+    calc_core.set_codegen_threshold(1)
+    for _ in range(3):
+        assert calc_core.evaluate_expression("ﬁ + 2*fi", backend, variables) == 201
+    assert calc_core.compile_expression("ﬁ + 2*fi").tier(calc_core.get_backend(backend).key) == "codegen"
+
+
+def test_compiled_function_names_stay_distinct():
+    calc_core.set_codegen_threshold(1)
+    f = calc_core.compile_function("ﬁ*x + fi", "x", {"ﬁ": 2.0, "fi": 100.0})
+    assert [f(1.0) for _ in range(3)] == [102.0] * 3
+    g = calc_core.compile_function("x*fi + 1", "ﬁ", {"x": 3.0, "fi": 10.0})
+    assert g(5.0) == 31.0
@@ -0,0 +1,91 @@
+from fractions import Fraction
+
+import pytest
+
+import calc_core
+from calc_diff import Dual
+
+FUNCTIONS = [
+    "x^2 + 3*x",
+    "sin(x)*x",
+    "ln(x) + log10(x)",
+    "exp(2*x) / x",
+    "sqrt(x)^3",
+    "atan(x) + asin(x/4) + acos(x/4)",
+    "tanh(x) * cosh(x) + sinh(x)",
+    "x^x",
+    "log(x, 2)",
+    "abs(1 - x) * x",
+    "gamma(x) + lgamma(x)",
+    "pow(x, 3) + 2^x",
+]
+
+
+def _numeric(text, x, h=1e-6):
+    f = calc_core.compile_function(text, "x")
+    return (f(x + h) - f(x - h)) / (2 * h)
+
+
+@pytest.mark.parametrize("text", FUNCTIONS)
+def test_symbolic_derivative_matches_finite_differences(text):
+    compiled = calc_core.compile_derivative(text, "x")
+    value = calc_core.evaluate_compiled(compiled, "float", {"x": 1.5})
+    assert value == pytest.approx(_numeric(text, 1.5), rel=1e-5)
+
+
+@pytest.mark.parametrize("text", FUNCTIONS)
+def test_dual_gradient_matches_symbolic_derivative(text):
+    value, grad = calc_core.value_and_gradient(text, {"x": 1.5})
+    assert value == pytest.approx(calc_core.evaluate_expression(text, variables={"x": 1.5}))
+    symbolic = calc_core.evaluate_compiled(calc_core.compile_derivative(text, "x"), "float", {"x": 1.5})
+    assert grad["x"] == pytest.approx(symbolic)
+
+
+@pytest.mark.parametrize(
+    "text, wrt, want",
+    [("x^2", "x", "2 * x"), ("sin(x)*x", "x", "cos(x) * x + sin(x)"), ("3", "x", "0"), ("y", "x", "0"), ("x*y", "y", "x")],
+)
+def test_differentiate_source(text, wrt, want):
+    assert calc_core.differentiate(text, wrt) == want
+
+
+def test_factorial_derivative():
+    # x! is only defined on integers, so check the two forms agree there.
+    value, grad = calc_core.value_and_gradient("x!", {"x": 4})
+    symbolic = calc_core.evaluate_compiled(calc_core.compile_derivative("x!", "x"), "float", {"x": 4.0})
+    assert value == 24.0
+    assert grad["x"] == pytest.approx(symbolic)
+
+
+def test_derivative_on_exact_backend():
+    compiled = calc_core.compile_derivative("x^3 + x/3", "x")
+    assert calc_core.evaluate_compiled(compiled, "fraction", {"x": Fraction(2)}) == Fraction(37, 3)
+
+
+def test_gradient_of_several_variables():
+    value, grad = calc_core.value_and_gradient("x*y^2 + z", {"x": 2, "y": 3, "z": 1})
+    assert value == 19.0
+    assert grad == {"x": 9.0, "y": 12.0, "z": 1.0}
+    _, partial = calc_core.value_and_gradient("x*y^2 + z", {"x": 2, "y": 3, "z": 1}, wrt=["y"])
+    assert partial == {"y": 12.0}
+
+
+def test_constant_gradient():
+    assert calc_core.value_and_gradient("2 + 3", {}) == (5.0, {})
+
+
+def test_dual_arithmetic():
+    x = Dual(3.0, (1.0, 0.0))
+    y = Dual(2.0, (0.0, 1.0))
+    product = x * y + x / y - 1
+    assert product.value == pytest.approx(6 + 1.5 - 1)
+    assert product.grad == pytest.approx((2 + 0.5, 3 - 0.75))
+
+
+def test_errors():
+    with pytest.raises(ValueError, match="built-in"):
+        calc_core.value_and_gradient("pi*x", {"x": 1.0}, wrt=["pi"])
+    with pytest.raises(ValueError, match="Unknown name"):
+        calc_core.value_and_gradient("x*y", {"x": 1.0})
+    with pytest.raises(ValueError, match="order"):
+        calc_core.differentiate("polygamma(x, 2)", "x")
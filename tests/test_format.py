@@ -0,0 +1,41 @@
+import math
+
+import pytest
+
+from calc_format import format_complex, format_matrix, format_result
+
+
+@pytest.mark.parametrize(
+    "value, text",
+    [
+        (3.0, "3"),
+        (-0.0, "0"),
+        (0.1 + 0.2, "0.3"),
+        (1 / 3, "0.333333333333"),
+        (1e20, "100000000000000000000"),
+        (math.inf, "inf"),
+        (-math.inf, "-inf"),
+        (math.nan, "nan"),
+    ],
+)
+def test_format_result(value, text):
+    assert format_result(value) == text
+
+
+def test_format_complex_and_matrix():
+    assert format_complex(3 + 4j) == "3+4*i"
+    assert format_complex(-1j) == "-i"
+    assert format_complex(complex(-1, 1e-16)) == "-1"
+    assert format_complex(complex(math.inf, 0)) == "inf"
+    np = pytest.importorskip("numpy")
+    assert format_matrix(np.array([[1, 2j], [3, 4]])) == "[[1, 2*i], [3, 4]]"
+
+
+def test_streamlit_equals_on_overflowing_results():
+    testing = pytest.importorskip("streamlit.testing.v1")
+    app = testing.AppTest.from_file("../streamlit_app.py", default_timeout=30).run()
+    for text in ["171!", "2^10000", "200!/198!"]:
+        app.text_input(key="display").set_value(text)
+        app.button(key="key-equals").click().run()
+        assert not app.exception
+    assert app.text_input(key="display").value == "39800"
@@ -0,0 +1,96 @@
+import pytest
+
+import calc_history
+from calc_history import History, HistoryEntry, cacheable
+
+
+def _filled(count, **kwargs):
+    history = History(**kwargs)
+    for n in range(count):
+        history.add(f"{n}+1", str(n + 1.0), n + 1.0)
+    return history
+
+
+def test_rows_are_newest_first():
+    history = _filled(5)
+    assert len(history) == 5
+    assert history.entry(0) == HistoryEntry(5, "4+1", "5.0")
+    assert history.entry(4).expression == "0+1"
+    assert history.entry(5) is None and history.entry(-1) is None
+    assert [entry.expression for entry in history.page(1, 2)] == ["3+1", "2+1"]
+    assert [entry.id for entry in history] == [5, 4, 3, 2, 1]
+
+
+def test_cap_drops_the_oldest_entries():
+    history = _filled(10, cap=3)
+    assert len(history) == 3
+    assert [entry.expression for entry in history] == ["9+1", "8+1", "7+1"]
+    assert history.lookup("0+1") is None
+
+
+def test_entries_cached_before_an_add_are_refreshed(monkeypatch):
+    monkeypatch.setattr(calc_history, "BLOCK_SIZE", 4)
+    history = _filled(6)
+    assert history.entry(0).expression == "5+1"
+    history.add("new", "1.0")
+    assert history.entry(0).expression == "new"
+    assert history.entry(6).expression == "0+1"
+
+
+def test_substring_search():
+    history = History()
+    for text in ["sin(x)^2", "SIN(1)", "cos(x)", "2 * sinh(3)", "100%"]:
+        history.add(text, "0")
+    # Three or more characters use the trigram index, shorter ones LIKE.
+    assert [entry.expression for entry in history.search("sin")] == ["2 * sinh(3)", "SIN(1)", "sin(x)^2"]
+    assert [entry.expression for entry in history.search("(x")] == ["cos(x)", "sin(x)^2"]
+    assert [entry.expression for entry in history.search("%")] == ["100%"]
+    assert history.search('"') == []
+    assert len(history.search("sin", limit=1)) == 1
+
+
+def test_prefix_search_is_case_sensitive():
+    history = History()
+    for text in ["sin(x)", "sinh(x)", "SIN(1)", "asin(1)"]:
+        history.add(text, "0")
+    assert [entry.expression for entry in history.search("sin", prefix=True)] == ["sinh(x)", "sin(x)"]
+
+
+def test_lookup_returns_the_latest_cached_value():
+    history = History()
+    history.add("2+2", "4.0", 4.0)
+    history.add("x+1", "3.0")
+    history.add("2+2", "4.0", 4.5)
+    assert history.lookup("2+2") == 4.5
+    assert history.lookup("x+1") is None
+    assert history.lookup("3+3") is None
+
+
+@pytest.mark.parametrize("text, expected", [("2+2", True), ("sin(pi)", True), ("x+1", False), ("a = 2", False), ("2+", False)])
+def test_cacheable(text, expected):
+    assert cacheable(text) is expected
+
+
+def test_clear_keeps_ids_increasing():
+    history = _filled(3)
+    history.clear()
+    assert len(history) == 0 and history.entry(0) is None
+    assert history.add("1+1", "2.0").id == 4
+    assert len(history) == 1
+
+
+def test_persists_across_instances(tmp_path):
+    path = tmp_path / "history.sqlite3"
+    history = _filled(4, path=path)
+    history.close()
+    reopened = History(path, cap=2)
+    assert [entry.expression for entry in reopened] == ["3+1", "2+1"]
+    assert reopened.search("3+1")[0].result == "4.0"
+    assert reopened.lookup("3+1") == 4.0
+    assert reopened.add("x", "0").id == 5
+    reopened.close()
+
+
+def test_cap_must_be_positive():
+    with pytest.raises(ValueError, match="cap"):
+        History(cap=0)
@@ -0,0 +1,32 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import calc_core
+import calc_units
+
+ROOT = Path(__file__).resolve().parents[1]
+LAZY = ["calc_codegen", "calc_diff", "calc_interval", "calc_matrix", "calc_opt", "calc_units"]
+
+
+def _loaded_after(code):
+    script = f"import sys\n{code}\nprint(' '.join(m for m in {LAZY!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True)
+    return out.stdout.split()
+
+
+def test_import_leaves_feature_modules_unloaded():
+    assert _loaded_after("import calc_core") == []
+
+
+def test_feature_modules_load_on_first_use():
+    assert _loaded_after("import calc_core; calc_core.evaluate_expression('2+3')") == ["calc_codegen", "calc_opt"]
+    assert "calc_interval" in _loaded_after("import calc_core; calc_core.evaluate_compiled(None, 'interval')")
+    assert "calc_matrix" in _loaded_after("import calc_core; calc_core.evaluate_complex('sqrt(-1)')")
+
+
+def test_reexports_resolve_lazily():
+    assert calc_core.has_units is calc_units.has_units
+    from calc_core import DimensionError, Quantity
+
+    assert Quantity is calc_units.Quantity and DimensionError is calc_units.DimensionError
@@ -0,0 +1,88 @@
+import math
+import random
+from fractions import Fraction
+
+import pytest
+
+import calc_core
+from calc_interval import Interval, to_interval
+
+ENCLOSURES = [
+    ("sin(x)*y", {"x": (1.2, 1.3), "y": (2, 3)}),
+    ("x^2 - 2*x*y", {"x": (-2, 3), "y": (0.5, 1)}),
+    ("sin(x) + cos(x)", {"x": (-4, 7)}),
+    ("tan(x)", {"x": (-1.4, 1.4)}),
+    ("exp(x) / (1 + x^2)", {"x": (-3, 3)}),
+    ("sqrt(x) + ln(x) + log10(x)", {"x": (0.25, 9)}),
+    ("abs(x) - floor(x) + x % 3", {"x": (-2.5, 4.5)}),
+    ("cosh(x) - sinh(x)", {"x": (-1, 2)}),
+    ("gamma(x) + lgamma(x)", {"x": (0.5, 4)}),
+    ("atan(x) + asin(y) + acos(y)", {"x": (-10, 10), "y": (-0.5, 1)}),
+]
+
+
+@pytest.mark.parametrize("text, ranges", ENCLOSURES)
+@pytest.mark.parametrize("threshold", [0, 1])
+def test_result_encloses_sampled_values(text, ranges, threshold):
+    calc_core.set_codegen_threshold(threshold)
+    enclosure = calc_core.evaluate_interval(text, ranges)
+    rng = random.Random(text)
+    for _ in range(200):
+        point = {name: rng.uniform(lo, hi) for name, (lo, hi) in ranges.items()}
+        assert calc_core.evaluate_expression(text, variables=point) in enclosure
+    for corner in (0, 1):
+        point = {name: float(bounds[corner]) for name, bounds in ranges.items()}
+        assert calc_core.evaluate_expression(text, variables=point) in enclosure
+
+
+def test_decimal_literals_are_widened():
+    result = calc_core.evaluate_interval("0.1 + 0.2")
+    assert result.lo < 0.3 < result.hi
+    exact = Fraction(3, 10)
+    assert Fraction(result.lo) <= exact <= Fraction(result.hi)
+
+
+def test_integer_arithmetic_stays_exact():
+    assert calc_core.evaluate_interval("2 + 3*4") == Interval(14.0, 14.0)
+    big = calc_core.evaluate_interval("2^60 + 1")
+    assert Fraction(big.lo) <= 2**60 + 1 <= Fraction(big.hi)
+
+
+@pytest.mark.parametrize(
+    "text, ranges",
+    [("1/x", {"x": (-1, 1)}), ("tan(x)", {"x": (1, 2)}), ("gamma(x)", {"x": (-0.5, 0.5)})],
+)
+def test_poles_give_unbounded_results(text, ranges):
+    result = calc_core.evaluate_interval(text, ranges)
+    assert (result.lo, result.hi) == (-math.inf, math.inf)
+
+
+def test_periodic_functions_reach_their_extrema():
+    assert calc_core.evaluate_interval("sin(x)", {"x": (0, 4)}).hi == 1.0
+    assert calc_core.evaluate_interval("cos(x)", {"x": (3, 4)}).lo == -1.0
+
+
+def test_dependency_problem_is_conservative():
+    # Interval arithmetic treats each occurrence of x independently.
+    assert calc_core.evaluate_interval("x - x", {"x": (0, 1)}) == Interval(-1.0, 1.0)
+
+
+def test_to_interval():
+    assert to_interval(3) == Interval(3.0, 3.0)
+    assert to_interval((1, 2.5)) == Interval(1.0, 2.5)
+    third = to_interval(Fraction(1, 3))
+    assert third.lo < third.hi and Fraction(1, 3) in third
+    interval = Interval(1.0, 2.0)
+    assert to_interval(interval) is interval
+    assert (interval.mid, interval.width) == (1.5, 1.0)
+    with pytest.raises(ValueError, match="lo <= hi"):
+        to_interval((2, 1))
+    with pytest.raises(ValueError):
+        to_interval(True)
+
+
+def test_interval_backend_shares_the_compiled_expression():
+    compiled = calc_core.compile_expression("x*y + 1")
+    assert calc_core.evaluate_compiled(compiled, "float", {"x": 2.0, "y": 3.0}) == 7.0
+    result = calc_core.evaluate_compiled(compiled, "interval", {"x": Interval(1.0, 2.0), "y": Interval(3.0, 4.0)})
+    assert result == Interval(4.0, 9.0)
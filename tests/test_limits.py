@@ -0,0 +1,83 @@
+from fractions import Fraction
+
+import pytest
+
+import calc_core
+from calc_eval import IntegerTooLargeError
+
+
+def evaluate(text, backend, variables=None):
+    return calc_core.evaluate_compiled(calc_core.compile_expression(text), backend, variables)
+
+
+@pytest.mark.parametrize(
+    "backend, text",
+    [
+        ("fraction", "pow(3, 10^7)"),
+        ("fraction", "pow(9, pow(9, 9))"),
+        ("fraction", "2^-70000"),
+        ("fraction", "pow(2, -70000)"),
+    ],
+)
+def test_exact_powers_hold_to_max_int_bits(backend, text):
+    with pytest.raises(IntegerTooLargeError):
+        calc_core.evaluate_expression(text, backend)
+
+
+@pytest.mark.parametrize(
+    "backend, text",
+    [
+        ("decimal", "gamma(200000)"),
+        ("decimal", "lfactorial(200000)"),
+        ("decimal", "factorial(200000)"),
+        ("fraction", "gamma(200000)"),
+        ("fraction", "200000!"),
+    ],
+)
+def test_exact_factorials_hold_to_max_factorial(backend, text):
+    with pytest.raises(IntegerTooLargeError):
+        calc_core.evaluate_expression(text, backend)
+
+
+def test_factorial_limit_follows_configured_limits():
+    calc_core.set_limits(calc_core.Limits(max_factorial=10))
+    assert calc_core.evaluate_expression("gamma(10)", "fraction") == 362880
+    with pytest.raises(IntegerTooLargeError):
+        calc_core.evaluate_expression("gamma(12)", "fraction")
+
+
+def test_float_special_functions_are_not_limited():
+    assert calc_core.evaluate_expression("gamma(6000)") == float("inf")
+    assert calc_core.evaluate_expression("lfactorial(200000)") > 0
+    assert calc_core.evaluate_expression("lfactorial(200000)", "fraction") > 0
+
+
+@pytest.mark.parametrize("text", ["x+1", "x-1", "x/3", "x*2", "(x+1)*(x+1) + (x+1)"])
+@pytest.mark.parametrize("threshold", [0, 1])
+def test_exact_operators_guarded_on_every_tier(text, threshold):
+    calc_core.set_codegen_threshold(threshold)
+    x = Fraction(2 ** 70000)
+    for _ in range(3):
+        with pytest.raises(IntegerTooLargeError):
+            evaluate(text, "fraction", {"x": x})
+    if threshold:
+        assert calc_core.compile_expression(text).tier("fraction") == "codegen"
+
+
+def test_small_exact_values_still_evaluate():
+    assert calc_core.evaluate_expression("pow(2, 100)", "fraction") == 2 ** 100
+    assert calc_core.evaluate_expression("2^-3", "fraction") == Fraction(1, 8)
+    assert calc_core.evaluate_expression("gamma(5)", "decimal") == 24
+
+
+def test_per_call_limits_are_cached_apart():
+    strict = calc_core.Limits(max_factorial=10)
+    compiled = calc_core.compile_expression("x + 20!", strict)
+    assert calc_core.compile_expression("x + 20!", strict) is compiled
+    assert calc_core.compile_expression("x + 20!") is not compiled
+    with pytest.raises(IntegerTooLargeError):
+        calc_core.evaluate_compiled(compiled, "fraction", {"x": 1})
+    assert calc_core.evaluate_expression("x + 20!", "fraction", {"x": 1}) == 2432902008176640001
+    with pytest.raises(IntegerTooLargeError):
+        calc_core.evaluate_compiled(calc_core.compile_complex("20!", strict), "complex")
+    assert calc_core.evaluate_complex("20!") == 2432902008176640000
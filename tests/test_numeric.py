@@ -0,0 +1,109 @@
+import math
+
+import pytest
+
+import calc_numeric
+from calc_numeric import integrate, plot_range, sample, solve
+
+
+@pytest.mark.parametrize(
+    "text, bracket, root",
+    [
+        ("cos(x) - x", (0, 1), 0.7390851332151607),
+        ("x^2 - 2", (0, 1e6), math.sqrt(2)),
+        ("sin(x)", (3, 4), math.pi),
+        ("x^5 - 2", (0, 2), 2 ** 0.2),
+        ("1e10*(x - 1)", (0, 3), 1.0),
+        ("tanh(1000*(x - 1))", (0, 2), 1.0),
+        ("exp(x) - 1e-300", (-800, 1), math.log(1e-300)),
+    ],
+)
+def test_solve(text, bracket, root):
+    assert solve(text, "x", bracket) == pytest.approx(root, abs=1e-10)
+
+
+@pytest.mark.parametrize(
+    "text, bracket, root",
+    [("x^3", (-1, 2), 0.0), ("(x-1)^3", (0, 3), 1.0), ("(x-0.5)^9", (0, 7), 0.5), ("x^3", (-1e-6, 1), 0.0)],
+)
+def test_solve_multiple_roots_within_default_iterations(text, bracket, root):
+    assert solve(text, "x", bracket) == pytest.approx(root, abs=1e-9)
+
+
+@pytest.mark.parametrize("text, bracket", [("tan(x)", (1, 2)), ("floor(x) - 0.5", (0, 2)), ("1/(x - 0.3)", (0, 1))])
+def test_solve_rejects_discontinuities(text, bracket):
+    with pytest.raises(ValueError, match="discontinuity"):
+        solve(text, "x", bracket)
+
+
+def test_solve_finds_a_sign_change_inside_the_bracket():
+    assert solve("x^2 - 1", "x", (-3, 0.5)) == pytest.approx(-1.0)
+    assert solve("x^2 - a", "x", (0, 3), {"a": 2}) == pytest.approx(math.sqrt(2))
+    with pytest.raises(ValueError, match="does not change sign"):
+        solve("x^2 + 1", "x", (0, 3))
+
+
+def test_solve_errors():
+    with pytest.raises(ValueError, match="finite bracket"):
+        solve("x", "x", (1, 1))
+    with pytest.raises(ValueError, match="did not converge"):
+        solve("x^3", "x", (-1, 2), max_iter=5)
+
+
+@pytest.mark.parametrize(
+    "text, a, b, value",
+    [
+        ("exp(-x^2)", -5, 5, math.sqrt(math.pi)),
+        ("sin(x)", 0, math.pi, 2.0),
+        ("1/sqrt(x)", 1e-12, 1, 2.0 - 2e-6),
+        ("x^2", 3, 0, -9.0),
+        ("x", 1, 1, 0.0),
+    ],
+)
+def test_integrate(text, a, b, value):
+    assert integrate(text, "x", a, b) == pytest.approx(value, rel=1e-8)
+
+
+def test_integrate_errors():
+    with pytest.raises(ValueError, match="not finite at x = 0"):
+        integrate("1/x", "x", -1, 1)
+    with pytest.raises(ValueError, match="finite bounds"):
+        integrate("x", "x", 0, math.inf)
+    with pytest.raises(ValueError, match="did not converge"):
+        integrate("sin(1/x)", "x", 1e-9, 1, max_intervals=10)
+
+
+def test_sample_refines_where_the_curve_bends():
+    xs, ys = sample("tan(x)", "x", (-3, 3))
+    assert len(xs) > calc_numeric.DEFAULT_SAMPLES
+    assert xs == sorted(xs) and (xs[0], xs[-1]) == (-3.0, 3.0)
+    line_xs, _ = sample("2*x + 1", "x", (-3, 3))
+    assert len(line_xs) == calc_numeric.DEFAULT_SAMPLES
+
+
+def test_sample_marks_undefined_points():
+    xs, ys = sample("sqrt(x)", "x", (-1, 1), n=5)
+    assert all(math.isnan(y) for x, y in zip(xs, ys) if x < 0)
+    assert ys[xs.index(0.0)] == 0.0
+    assert xs.index(0.0) > 2  # refined towards the edge of the domain
+
+
+def test_sample_errors():
+    with pytest.raises(ValueError, match="low < high"):
+        sample("x", "x", (1, 0))
+    with pytest.raises(ValueError, match="2 points"):
+        sample("x", "x", (0, 1), n=1)
+
+
+def test_plot_range_ignores_poles():
+    _, ys = sample("tan(x)", "x", (-3, 3))
+    low, high = plot_range(ys)
+    assert -100 < low < -10 and 10 < high < 100
+    assert plot_range([math.nan]) == (-1.0, 1.0)
+    assert plot_range([2.0, 2.0]) == pytest.approx((0.9, 3.1))
+
+
+def test_batch_function_without_numpy_path():
+    batch = calc_numeric.batch_function("1/x", "x", {"f": lambda v: v})
+    assert batch([2.0, 4.0])[1] == 0.25
+    assert math.isnan(calc_numeric.batch_function("sqrt(x)", "x", {"f": lambda v: v})([-1.0])[0])
@@ -0,0 +1,98 @@
+import ast
+import math
+from fractions import Fraction
+
+import pytest
+
+import calc_core
+from calc_opt import TEMP_PREFIX, describe, lower_optimized, optimize
+from calc_parser import parse_expression
+
+
+def _optimize(text, names=calc_core.ALLOWED_NAMES, **kwargs):
+    return optimize(parse_expression(text), names, **kwargs)
+
+
+def test_folds_constant_subtrees():
+    optimized = _optimize("2*pi*r + sqrt(16)")
+    assert ast.unparse(optimized.body) == f"{2 * math.pi!r} * r + 4.0"
+    assert optimized.folded == 2  # 2*pi and sqrt(16)
+
+
+@pytest.mark.parametrize(
+    "text, after",
+    [("x*1", "x"), ("1*x", "x"), ("x^1", "x"), ("x/1", "x"), ("x+0", "x"), ("0+x", "x"), ("x-0", "x"), ("--x", "x")],
+)
+def test_drops_identities(text, after):
+    optimized = _optimize(text)
+    assert ast.unparse(optimized.body) == after
+    assert optimized.simplified == 1
+
+
+def test_keeps_zero_products():
+    # 0*x is nan for x = inf, so it is not an identity.
+    assert ast.unparse(_optimize("0*x").body) == "0 * x"
+    assert math.isnan(calc_core.evaluate_expression("0*x", variables={"x": math.inf}))
+
+
+def test_leaves_failing_constants_to_evaluation():
+    optimized = _optimize("1/0 + x")
+    assert optimized.folded == 0
+    with pytest.raises(ZeroDivisionError):
+        calc_core.evaluate_expression("1/0 + x", variables={"x": 1.0})
+
+
+def test_hoists_repeated_subexpressions():
+    optimized = _optimize("(x+1)^2 + sin(x+1) + (x+1)")
+    assert optimized.hoisted == 1
+    [(name, expr)] = optimized.temps
+    assert name.startswith(TEMP_PREFIX) and ast.unparse(expr) == "x + 1"
+    assert ast.unparse(optimized.body).count(name) == 3
+
+
+def test_hoisted_temporaries_nest_in_dependency_order():
+    optimized = _optimize("sqrt((x+1)*y) + sqrt((x+1)*y) + (x+1)")
+    names = [name for name, _ in optimized.temps]
+    assert len(names) == 2
+    assert names[0] in ast.unparse(optimized.temps[1][1])
+
+
+def test_does_not_hoist_across_different_operands():
+    assert _optimize("(x+1) + (x+2) + (1+x)").hoisted == 0
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "(x+1)^2 + (x+1)",
+        "sin(x)*sin(x) + cos(x)*cos(x)",
+        "2*pi*x + 0 + 3*1*y",
+        "--x*1 + y^1 - 0",
+        "(x*y + 1)/(x*y + 1) + x*y",
+        "exp(-(x-y)^2/2) * (x-y)",
+    ],
+)
+def test_optimized_program_matches_plain_evaluation(text):
+    env = {"x": 1.25, "y": -0.5}
+    program = lower_optimized(_optimize(text), calc_core.ALLOWED_NAMES)
+    want = eval(
+        text.replace("^", "**"),
+        {"sin": math.sin, "cos": math.cos, "exp": math.exp, "pi": math.pi},
+        env,
+    )
+    assert program(env) == pytest.approx(want)
+
+
+def test_folding_uses_the_backend():
+    backend = calc_core.get_backend("fraction")
+    optimized = _optimize("1/3 + x", backend.names(), number=backend.number)
+    assert optimized.body.left.value == Fraction(1, 3)
+    assert calc_core.evaluate_expression("1/3 + x", "fraction", {"x": Fraction(2, 3)}) == 1
+
+
+def test_describe_and_explain():
+    tree = parse_expression("(x+1)^2 + (x+1)")
+    listing = describe(tree, optimize(tree, calc_core.ALLOWED_NAMES))
+    assert listing.splitlines()[0] == "before: (x + 1) ** 2 + (x + 1)"
+    assert "folded 0, simplified 0, hoisted 1" in listing
+    assert "after:" in calc_core.explain("(x+1)^2 + (x+1)")
@@ -0,0 +1,46 @@
+import math
+
+import pytest
+
+import calc_core
+from calc_backends import to_float
+
+HUGE = ["2^10000", "10^400", "(10^300)*(10^300)", "-(10^400)", "-3^1001"]
+
+
+def test_to_float():
+    assert to_float(3) == 3.0
+    assert to_float(10 ** 400) == math.inf
+    assert to_float(-(10 ** 400)) == -math.inf
+
+
+@pytest.mark.parametrize("text", HUGE)
+@pytest.mark.parametrize("threshold", [0, 1])
+def test_float_overflow_is_infinite(text, threshold):
+    calc_core.set_codegen_threshold(threshold)
+    want = -math.inf if text.startswith("-") else math.inf
+    for _ in range(3):
+        assert calc_core.evaluate_expression(text) == want
+
+
+@pytest.mark.parametrize("text", HUGE)
+def test_complex_overflow_is_infinite(text):
+    want = -math.inf if text.startswith("-") else math.inf
+    assert calc_core.evaluate_complex(text) == complex(want, 0)
+
+
+@pytest.mark.parametrize("text", HUGE)
+def test_vectorized_overflow_is_infinite(text):
+    np = pytest.importorskip("numpy")
+    want = -math.inf if text.startswith("-") else math.inf
+    assert calc_core.evaluate_vectorized(text, x=np.zeros(2)).tolist() == [want, want]
+
+
+def test_compiled_function_overflow():
+    f = calc_core.compile_function("10^400", "x")
+    assert f(1.0) == math.inf
+
+
+def test_exact_backends_keep_huge_integers():
+    assert calc_core.evaluate_expression("2^10000", "fraction") == 2 ** 10000
+    assert calc_core.evaluate_expression("2^10000", "decimal") > 10 ** 3000
@@ -0,0 +1,46 @@
+import ast
+
+import pytest
+
+import calc_core
+from calc_parser import IncrementalParser, parse_expression, to_python, tokenize
+
+
+@pytest.mark.parametrize(
+    "text, value",
+    [
+        ("7%3", 1.0),
+        ("2 % 3", 2.0),
+        ("3%(2)", 1.0),
+        ("(7)%3", 1.0),
+        ("x%3", 1.0),
+        ("7 % x", 0.0),
+        ("12%", 0.12),
+        ("(50)%", 0.5),
+        ("x%", 0.07),
+        ("50% - 10", -9.5),
+        ("12%*3", 0.36),
+        ("7 % -3", 0.07 - 3),
+        ("2^10 + 5! + 12%", 1144.12),
+    ],
+)
+def test_percent_and_modulo(text, value):
+    assert calc_core.evaluate_expression(text, variables={"x": 7}) == pytest.approx(value)
+
+
+@pytest.mark.parametrize("text", ["7%3", "x % (2)", "12%", "50% - 10", "5%%"])
+def test_to_python_agrees_with_parser(text):
+    assert ast.dump(ast.parse(to_python(tokenize(text)), mode="eval")) == ast.dump(parse_expression(text))
+
+
+@pytest.mark.parametrize("text", ["%3", "2*%", "(%)"])
+def test_percent_without_operand(text):
+    with pytest.raises(ValueError, match="'%' must follow a value"):
+        parse_expression(text)
+
+
+def test_incremental_percent_becomes_modulo():
+    parser = IncrementalParser()
+    assert ast.unparse(parser.parse("7%")) == "7 / 100"
+    assert ast.unparse(parser.parse("7%3")) == "7 % 3"
+    assert ast.unparse(parser.parse("7%")) == "7 / 100"
@@ -0,0 +1,60 @@
+import threading
+
+import calc_core
+from calc_profile import ACTIVE, Profile
+
+
+def _evaluate_in_thread(text, profile=None):
+    def work():
+        if profile is None:
+            calc_core.evaluate_expression(text)
+        else:
+            with profile:
+                calc_core.evaluate_expression(text)
+
+    thread = threading.Thread(target=work)
+    thread.start()
+    thread.join()
+
+
+def test_profile_records_stages_and_counters():
+    with Profile() as profile:
+        calc_core.evaluate_expression("2+3")
+        calc_core.evaluate_expression("2+3")
+    stats = profile.as_dict()
+    assert stats["stages"]["evaluate"]["calls"] == 2
+    assert (stats["counters"]["cache_miss"], stats["counters"]["cache_hit"]) == (1, 1)
+    assert 'calc_events_total{event="cache_hit"} 1' in profile.to_prometheus()
+    assert not ACTIVE
+
+
+def test_profile_records_every_thread():
+    with Profile() as profile:
+        _evaluate_in_thread("1+1")
+    assert profile.as_dict()["stages"]["evaluate"]["calls"] == 1
+
+
+def test_local_profile_records_only_threads_inside_it():
+    session = Profile(local=True)
+    with session:
+        calc_core.evaluate_expression("1+1")
+        _evaluate_in_thread("2+2")
+    assert session.as_dict()["stages"]["evaluate"]["calls"] == 1
+    # Another session's evaluations, with its own profile active.
+    other = Profile(local=True)
+    with session:
+        _evaluate_in_thread("3+3", other)
+    assert session.as_dict()["stages"]["evaluate"]["calls"] == 1
+    assert other.as_dict()["stages"]["evaluate"]["calls"] == 1
+
+
+def test_nested_entries():
+    profile = Profile(local=True)
+    with profile:
+        with profile:
+            calc_core.evaluate_expression("1+1")
+        calc_core.evaluate_expression("2+2")
+    assert profile.as_dict()["stages"]["evaluate"]["calls"] == 2
+    assert not ACTIVE
+    profile.reset()
+    assert profile.as_dict() == {"stages": {}, "counters": {}}
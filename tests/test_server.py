@@ -0,0 +1,121 @@
+import asyncio
+import json
+
+import pytest
+
+import calc_core
+from calc_batch import jsonable
+from calc_eval import DEFAULT_LIMITS
+from calc_server import CalcServer
+
+
+def test_jsonable_numbers():
+    np = pytest.importorskip("numpy")
+    assert jsonable(float("inf")) == "inf"
+    assert jsonable(3 - 4j) == [3.0, -4.0]
+    assert jsonable(complex(float("nan"), 1)) == ["nan", 1.0]
+    assert jsonable(np.array([[1, 2j], [3, 4]])) == [[[1.0, 0.0], [0.0, 2.0]], [[3.0, 0.0], [4.0, 0.0]]]
+    assert jsonable(np.float64(0.5)) == 0.5
+
+
+async def _exchange(server, raw):
+    reader, writer = await asyncio.open_connection(server.host, server.port)
+    writer.write(raw)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+def _post(path, payload):
+    body = json.dumps(payload).encode()
+    return (
+        f"POST {path} HTTP/1.1\r\nHost: x\r\nConnection: close\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+
+
+def run(raw, **options):
+    async def main():
+        server = CalcServer(port=0, workers=2, **options)
+        await server.start()
+        try:
+            return await _exchange(server, raw)
+        finally:
+            await server.close()
+
+    return asyncio.run(main())
+
+
+def test_evaluate():
+    assert run(_post("/evaluate", {"expression": "2^10"})) == (
+        200,
+        {"expression": "2^10", "result": 1024.0, "error": None},
+    )
+
+
+def test_matrix_results_are_nested_lists():
+    pytest.importorskip("numpy")
+    status, payload = run(_post("/evaluate", {"expression": "[[1, 2], [3, 4]] * i", "backend": "complex"}))
+    assert status == 200, payload
+    assert payload["result"] == [[[0.0, 1.0], [0.0, 2.0]], [[0.0, 3.0], [0.0, 4.0]]]
+
+
+def test_exact_results_are_strings_and_errors_are_results():
+    status, payload = run(_post("/batch", {"expressions": ["1/3", "1/0", "pow(3, 10^7)"], "backend": "fraction"}))
+    assert status == 200
+    results = payload["results"]
+    assert results[0] == {"result": "1/3", "error": None}
+    assert results[1]["error"].startswith("ZeroDivisionError")
+    assert results[2]["error"].startswith("IntegerTooLargeError")
+
+
+def test_server_limits_apply():
+    status, payload = run(_post("/evaluate", {"expression": "2000!", "backend": "fraction"}))
+    assert status == 200 and payload["error"].startswith("IntegerTooLargeError")
+    status, payload = run(_post("/evaluate", {"expression": "(2000)! * i", "backend": "complex"}))
+    assert status == 200 and payload["error"].startswith("IntegerTooLargeError")
+
+
+def test_threaded_server_leaves_process_limits_alone():
+    async def main():
+        server = CalcServer(port=0, workers=2)
+        await server.start()
+        try:
+            assert calc_core.get_limits() == DEFAULT_LIMITS
+            assert calc_core.evaluate_expression("2000!", "fraction") > 0
+            return await _exchange(server, _post("/evaluate", {"expression": "2000!", "backend": "fraction"}))
+        finally:
+            await server.close()
+
+    status, payload = asyncio.run(main())
+    assert status == 200 and payload["error"].startswith("IntegerTooLargeError")
+    assert calc_core.get_limits() == DEFAULT_LIMITS
+
+
+@pytest.mark.parametrize("backend", [["float"], {"name": "float"}, 1, None])
+def test_backend_must_be_a_string(backend):
+    status, payload = run(_post("/evaluate", {"expression": "1+1", "backend": backend}))
+    assert status == 400 and payload["error"] == "'backend' must be a string"
+
+
+def test_batch_larger_than_the_queue_is_too_large():
+    status, payload = run(
+        _post("/batch", {"expressions": [f"{i}+1" for i in range(10)]}), chunksize=2, max_pending=3
+    )
+    assert status == 413, payload
+
+
+def test_slow_request_gets_504():
+    status, payload = run(_post("/evaluate", {"expression": "1+1"}), timeout=1e-9)
+    assert status == 504, payload
+
+
+def test_overlong_request_line_gets_an_error_response():
+    status, payload = run(b"GET /" + b"a" * 70_000 + b" HTTP/1.1\r\n\r\n")
+    assert status == 414 and "too long" in payload["error"]
+
+
+def test_overlong_header_gets_an_error_response():
+    status, payload = run(b"GET /health HTTP/1.1\r\nX-Big: " + b"a" * 70_000 + b"\r\n\r\n")
+    assert status == 431 and "too long" in payload["error"]
@@ -0,0 +1,122 @@
+import os
+import subprocess
+import sys
+from decimal import Decimal
+from fractions import Fraction
+from pathlib import Path
+
+import pytest
+
+import calc_core
+
+pytest.importorskip("fcntl")
+
+from calc_shared import SharedCache  # noqa: E402
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "results")
+
+
+def test_calc_core_imports_without_the_shared_cache():
+    code = "import sys, calc_core; print('calc_shared' in sys.modules, 'fcntl' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.split() == ["False", "False"]
+
+
+@pytest.mark.parametrize("value", [1.5, -0.0, float("inf"), 3 - 4j, Decimal("0.1"), Fraction(1, 3)])
+def test_values_round_trip(path, value):
+    cache = SharedCache(path, slots=64)
+    try:
+        assert cache.put(b"key", value)
+        got = cache.get(b"key")
+        assert type(got) is type(value) and got == value
+        assert cache.get(b"other") is None
+    finally:
+        cache.close()
+
+
+def test_unsupported_values_are_not_stored(path):
+    cache = SharedCache(path, slots=64)
+    try:
+        assert not cache.put(b"key", [1.0])
+        assert not cache.put(b"key", Fraction(1, 3 ** 80))
+        assert cache.get(b"key") is None
+    finally:
+        cache.close()
+
+
+def test_full_bucket_evicts_and_keeps_serving(path):
+    cache = SharedCache(path, slots=8)
+    try:
+        for i in range(100):
+            cache.put(str(i).encode(), float(i))
+        assert cache.info()["size"] == 8
+        assert cache.get(b"99") == 99.0
+    finally:
+        cache.close()
+
+
+def test_results_are_shared_between_processes(path):
+    calc_core.enable_shared_cache(path, slots=64)
+    assert calc_core.evaluate_expression("2 +  3") == 5.0
+    code = (
+        "import calc_core\n"
+        f"calc_core.enable_shared_cache({path!r})\n"
+        "print(calc_core.evaluate_expression('2 + 3'), calc_core.shared_cache_info()['hits'])\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.split() == ["5.0", "1"]
+
+
+def test_only_closed_successful_results_are_shared(path):
+    calc_core.enable_shared_cache(path, slots=64)
+    assert calc_core.evaluate_expression("x + 1", variables={"x": 1.0}) == 2.0
+    with pytest.raises(ZeroDivisionError):
+        calc_core.evaluate_expression("1/0")
+    assert calc_core.shared_cache_info()["stores"] == 0
+    # "2 3" is invalid, and must not be answered with the result for "23".
+    assert calc_core.evaluate_expression("23") == 23.0
+    with pytest.raises(ValueError):
+        calc_core.evaluate_expression("2 3")
+
+
+def test_limits_are_part_of_the_key(path):
+    calc_core.enable_shared_cache(path, slots=64)
+    assert calc_core.evaluate_expression("20!", "fraction") == 2432902008176640000
+    calc_core.set_limits(calc_core.Limits(max_factorial=10))
+    with pytest.raises(ValueError):
+        calc_core.evaluate_expression("20!", "fraction")
+
+
+def test_symlink_is_refused(tmp_path, path):
+    target = tmp_path / "target"
+    target.touch(mode=0o600)
+    os.symlink(target, path)
+    with pytest.raises(OSError):
+        SharedCache(path, slots=64)
+
+
+def test_file_writable_by_others_is_refused(path):
+    fd = os.open(path, os.O_CREAT | os.O_WRONLY, 0o600)
+    os.fchmod(fd, 0o666)
+    os.close(fd)
+    with pytest.raises(PermissionError, match="writable by other users"):
+        SharedCache(path, slots=64)
+
+
+@pytest.mark.skipif(not hasattr(os, "geteuid") or os.geteuid() != 0, reason="needs root to chown")
+def test_file_of_another_user_is_refused(path):
+    fd = os.open(path, os.O_CREAT | os.O_WRONLY, 0o600)
+    os.fchown(fd, 4242, -1)
+    os.close(fd)
+    with pytest.raises(PermissionError, match="another user"):
+        SharedCache(path, slots=64)
+
+
+def test_new_file_is_private(path):
+    SharedCache(path, slots=64).close()
+    assert os.stat(path).st_mode & 0o777 == 0o600
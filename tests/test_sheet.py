@@ -0,0 +1,59 @@
+import pytest
+
+from calc_sheet import Worksheet
+
+
+def test_unchanged_value_stops_propagation():
+    sheet = Worksheet()
+    sheet.set("a", "2")
+    sheet.set("b", "a * 3")
+    evaluations = sheet.evaluations
+    assert sheet.set("a", "1 + 1") == ["a"]
+    assert sheet.evaluations == evaluations + 1
+    assert sheet.set("a", "5") == ["a", "b"]
+    assert sheet["b"] == 15
+
+
+def test_redefining_matrix_cells():
+    np = pytest.importorskip("numpy")
+    sheet = Worksheet("complex")
+    sheet.set("m", "[[1, 2], [3, 4]]")
+    sheet.set("n", "m * 2")
+    evaluations = sheet.evaluations
+    assert sheet.set("m", "[[1, 2], [3, 4]]") == ["m"]
+    assert sheet.evaluations == evaluations + 1
+    assert sheet.set("m", "[[1, 2], [3, 5]]") == ["m", "n"]
+    assert np.array_equal(sheet["n"], [[2, 4], [6, 10]])
+    # Same elements in a different shape, then a scalar: both are changes.
+    assert sheet.set("m", "[[1, 2, 3, 5]]") == ["m", "n"]
+    assert sheet.set("m", "3") == ["m", "n"]
+    assert sheet["n"] == 6
+
+
+def test_complex_sheet_knows_complex_names():
+    np = pytest.importorskip("numpy")
+    sheet = Worksheet("complex")
+    sheet.set("m", "[[1, 2], [3, 4]]")
+    sheet.set("d", "det(m)")
+    sheet.set("n", "inv(m)")
+    sheet.set("z", "2*i + d")
+    assert sheet["d"] == pytest.approx(-2)
+    assert np.allclose(sheet["n"] @ sheet["m"], np.eye(2))
+    assert sheet["z"] == pytest.approx(-2 + 2j)
+    assert sheet.evaluate("transpose(m)")[0, 1] == 3
+    assert sheet.dependents("m") == {"d", "n"}
+    with pytest.raises(ValueError, match="built-in"):
+        sheet.set("i", "5")
+
+
+def test_recalculate_after_switching_to_complex():
+    sheet = Worksheet()
+    sheet.set("i", "2")
+    sheet.set("z", "3*j")
+    assert sheet.set("j", "i + 1") == ["j", "z"]
+    assert sheet["z"] == 9
+    sheet.remove("i")
+    sheet.set("j", "i")
+    sheet.backend = "complex"
+    assert set(sheet.recalculate()) == {"j", "z"}
+    assert sheet["z"] == 3j
@@ -0,0 +1,68 @@
+import math
+
+import pytest
+
+import calc_core
+import calc_special
+from calc_eval import IntegerTooLargeError
+
+
+@pytest.mark.parametrize(
+    "text, value",
+    [
+        ("200!/198!", 39800.0),
+        ("171!/170!", 171.0),
+        ("factorial(171) - factorial(171)", 0.0),
+        ("(10/2)!", 120.0),
+        ("170!", float(math.factorial(170))),
+        ("171!", math.inf),
+        ("5000!", math.inf),
+    ],
+)
+@pytest.mark.parametrize("threshold", [0, 1])
+def test_factorial_stays_exact_until_the_result(text, value, threshold):
+    calc_core.set_codegen_threshold(threshold)
+    for _ in range(3):
+        assert calc_core.evaluate_expression(text) == value
+
+
+@pytest.mark.parametrize("text", ["5001!", "(3000)!!", "factorial(10^6)"])
+def test_factorial_argument_limit(text):
+    with pytest.raises(IntegerTooLargeError):
+        calc_core.evaluate_expression(text)
+
+
+def test_factorial_limit_applies_to_complex_and_dual_arguments():
+    with pytest.raises(IntegerTooLargeError):
+        calc_core.evaluate_complex("(10^6)!")
+    with pytest.raises(IntegerTooLargeError):
+        calc_core.value_and_gradient("x!", {"x": 1e6})
+
+
+def test_factorials_are_memoized():
+    calc_special.exact_factorial.cache_clear()
+    calc_special.factorial(300)
+    calc_special.factorial(300.0)
+    info = calc_special.exact_factorial.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+    assert info.maxsize is not None
+
+
+def test_factorial_domain():
+    for text in ["2.5!", "(-1)!"]:
+        with pytest.raises(ValueError):
+            calc_core.evaluate_expression(text)
+
+
+def test_gradient_of_factorial():
+    value, grad = calc_core.value_and_gradient("x!", {"x": 5.0})
+    assert value == 120.0
+    assert grad["x"] == pytest.approx(120 * calc_special.polygamma(0, 6))
+
+
+def test_gamma_and_lgamma_tables():
+    assert calc_special.gamma(6) == 120.0
+    assert calc_special.gamma(0.5) == pytest.approx(math.sqrt(math.pi))
+    assert calc_special.gamma(200) == math.inf
+    assert calc_special.lgamma(6) == pytest.approx(math.log(120))
+    assert calc_special.lfactorial(1000) == pytest.approx(math.lgamma(1001))
@@ -0,0 +1,79 @@
+import pytest
+
+import calc_core
+from calc_units import DimensionError, Quantity, parse_unit
+
+
+@pytest.mark.parametrize(
+    "text, magnitude, unit",
+    [
+        ("3 km / 20 min", 2.5, "m/s"),
+        ("3 km / 20 min to km/h", 9.0, "km/h"),
+        ("2 m * 3 m", 6.0, "m^2"),
+        ("(2 m)^2", 4.0, "m^2"),
+        ("sqrt(4 m^2)", 2.0, "m"),
+        ("10 N * 3 m to J", 30.0, "J"),
+        ("9.81 m/s^2 * 2 kg to N", 19.62, "N"),
+        ("1 mi to km", 1.609344, "km"),
+        ("sin(30 deg)", 0.5, ""),
+        ("2 + 3", 5.0, ""),
+    ],
+)
+def test_evaluate_units(text, magnitude, unit):
+    result = calc_core.evaluate_units(text)
+    assert result.magnitude == pytest.approx(magnitude)
+    assert result.unit == unit
+
+
+@pytest.mark.parametrize(
+    "text, message",
+    [
+        ("1 m + 1 s", "Cannot add m and s"),
+        ("sin(2 m)", "needs a number"),
+        ("2 m ^ x", "constant power"),
+        ("5 kg to m", "Cannot convert"),
+    ],
+)
+def test_dimension_errors_at_compile_time(text, message):
+    with pytest.raises(DimensionError, match=message):
+        calc_core.compile_units(text)
+
+
+def test_dimension_error_is_a_value_error():
+    assert issubclass(DimensionError, ValueError)
+
+
+def test_variables_with_units():
+    result = calc_core.evaluate_units("v * 2 h", {"v": 50}, units={"v": "km/h"})
+    assert result.value == pytest.approx(100_000)
+    assert str(result.to("km")) == "100 km"
+    plain = calc_core.evaluate_units("v * 2 h", {"v": 50})
+    assert plain.unit == "s" and plain.value == pytest.approx(360_000)
+
+
+def test_compiled_once_per_text_and_units():
+    first = calc_core.compile_units("3 km / 20 min")
+    assert calc_core.compile_units("3 km / 20 min") is first
+    assert calc_core.compile_units("x * 2 km", {"x": "m"}) is not calc_core.compile_units("x * 2 km")
+
+
+def test_quantity_conversion_and_equality():
+    speed = calc_core.evaluate_units("3 km / 20 min")
+    assert speed == Quantity(2.5, speed.dims)
+    assert speed.to("km/h") == speed
+    assert speed.to("km/h").magnitude == pytest.approx(9.0)
+    assert repr(speed) == "Quantity(2.5, 'm/s')"
+    with pytest.raises(DimensionError):
+        speed.to("kg")
+
+
+def test_parse_unit():
+    scale, dims = parse_unit("km/h")
+    assert scale == pytest.approx(1000 / 3600)
+    assert dims == parse_unit("m/s")[1]
+
+
+def test_has_units():
+    assert calc_core.has_units("3 km")
+    assert calc_core.has_units("9.81 m/s^2")
+    assert not calc_core.has_units("3*x + sin(2)")
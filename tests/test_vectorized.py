@@ -0,0 +1,62 @@
+import math
+
+import pytest
+
+import calc_core
+
+np = pytest.importorskip("numpy")
+
+EXPRESSIONS = [
+    "sin(x)*y^2 + 3%",
+    "x^y - exp(-x) / (1 + y)",
+    "sqrt(x) + ln(x + 1) + log10(y + 1)",
+    "atan(x) + cosh(y/4) - abs(x - y)",
+    "floor(x*y) % 3 + ceil(x)",
+    "gamma(x + 1) + lgamma(y + 1)",
+]
+
+
+@pytest.mark.parametrize("text", EXPRESSIONS)
+def test_matches_scalar_evaluation(text):
+    x = np.linspace(0, 2, 7)
+    y = np.arange(7.0)
+    result = calc_core.evaluate_vectorized(text, x=x, y=y)
+    want = [calc_core.evaluate_expression(text, variables={"x": a, "y": b}) for a, b in zip(x, y)]
+    assert result == pytest.approx(want)
+
+
+def test_factorial_is_vectorized():
+    assert list(calc_core.evaluate_vectorized("x!", x=np.array([0.0, 3.0, 5.0]))) == [1.0, 6.0, 120.0]
+
+
+def test_errors_become_nan_and_inf():
+    result = calc_core.evaluate_vectorized("1/x", x=np.array([0.0, 2.0]))
+    assert list(result) == [math.inf, 0.5]
+    assert np.isnan(calc_core.evaluate_vectorized("sqrt(x)", x=np.array([-1.0, 4.0]))[0])
+
+
+def test_inputs_are_broadcast():
+    result = calc_core.evaluate_vectorized("x + y", x=np.arange(3), y=np.arange(2)[:, None])
+    assert result.shape == (2, 3)
+    assert result[1, 2] == 3.0
+    assert list(calc_core.evaluate_vectorized("3", x=np.arange(3))) == [3.0, 3.0, 3.0]
+    assert list(calc_core.evaluate_vectorized("0*x", x=np.arange(3))) == [0.0, 0.0, 0.0]
+    assert calc_core.evaluate_vectorized("2 + 3") == 5.0
+
+
+def test_bad_bindings():
+    with pytest.raises(ValueError, match="Unknown name: y"):
+        calc_core.evaluate_vectorized("x + y", x=np.arange(3))
+    with pytest.raises(ValueError, match="shadows a built-in"):
+        calc_core.evaluate_vectorized("x + 1", pi=np.arange(3))
+
+
+@pytest.mark.parametrize("threshold", [0, 1])
+def test_vectorized_compile_function(threshold):
+    calc_core.set_codegen_threshold(threshold)
+    f = calc_core.compile_function("x^2 + a", "x", {"a": 1}, vectorized=True)
+    for _ in range(3):
+        assert list(f([1, 2, 3])) == [2.0, 5.0, 10.0]
+    assert f(2.0) == 5.0
+    scalar = calc_core.compile_function("x^2 + a", "x", {"a": 1})
+    assert scalar(2.0) == 5.0